@@ -3,6 +3,7 @@ Executor configuration for parallel task processing
 This module provides a dedicated thread pool executor for CPU-bound tasks
 to prevent blocking the main event loop.
 """
+import asyncio
 import concurrent.futures
 import logging
 from typing import Optional
@@ -13,6 +14,14 @@ logger = logging.getLogger(__name__)
 # Global thread pool executor
 _task_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
 
+# Small dedicated pool for dashboard aggregation fan-out
+# Kept separate so long-running report jobs on the task executor can't starve dashboard requests
+_dashboard_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+# Small dedicated pool for bcrypt hashing/verification
+# Kept separate so a login burst queues behind itself instead of behind report jobs (or the event loop)
+_password_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
 
 def create_task_executor(max_workers: int = None) -> concurrent.futures.ThreadPoolExecutor:
     """
@@ -59,20 +68,73 @@ def get_task_executor() -> concurrent.futures.ThreadPoolExecutor:
     return _task_executor
 
 
+def get_dashboard_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Get the bounded executor used to run dashboard MongoDB aggregations concurrently,
+    creating it if it doesn't exist.
+    
+    Returns:
+        ThreadPoolExecutor instance
+    """
+    global _dashboard_executor
+    
+    if _dashboard_executor is None:
+        from app.config.settings import settings
+        _dashboard_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=settings.dashboard_aggregation_workers,
+            thread_name_prefix="dashboard_worker"
+        )
+        logger.info(f"✅ Dashboard executor created with {settings.dashboard_aggregation_workers} worker threads")
+    
+    return _dashboard_executor
+
+
+def get_password_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Get the bounded executor used for bcrypt password hashing and verification,
+    creating it if it doesn't exist.
+    
+    Returns:
+        ThreadPoolExecutor instance
+    """
+    global _password_executor
+    
+    if _password_executor is None:
+        from app.config.settings import settings
+        _password_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            thread_name_prefix="password_worker"
+        )
+        logger.info(f"✅ Password executor created with {settings.password_hash_workers} worker threads")
+    
+    return _password_executor
+
+
 async def shutdown_task_executor():
     """
     Shutdown the task executor gracefully.
-    Waits for all running tasks to complete before shutting down.
+    Waits for all running tasks to complete before shutting down; the wait happens in a
+    thread so the event loop keeps serving the other shutdown steps meanwhile.
     """
-    global _task_executor
+    global _task_executor, _dashboard_executor, _password_executor
     
     if _task_executor is not None:
         logger.info("Shutting down task executor...")
         # Python's ThreadPoolExecutor.shutdown does not support timeout parameter.
         # Wait=True ensures we block until current tasks finish.
-        _task_executor.shutdown(wait=True)
+        await asyncio.to_thread(_task_executor.shutdown, wait=True)
         _task_executor = None
         logger.info("Task executor shut down successfully")
+    
+    if _dashboard_executor is not None:
+        await asyncio.to_thread(_dashboard_executor.shutdown, wait=True)
+        _dashboard_executor = None
+        logger.info("Dashboard executor shut down successfully")
+    
+    if _password_executor is not None:
+        await asyncio.to_thread(_password_executor.shutdown, wait=True)
+        _password_executor = None
+        logger.info("Password executor shut down successfully")
 
 
 def run_in_executor(func, *args, **kwargs):
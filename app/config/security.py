@@ -2,12 +2,15 @@
 Security configuration and utilities
 """
 
+import asyncio
+import functools
 import bcrypt
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from app.config.settings import settings
+from app.config.executor import get_password_executor
 
 # Password hashing context
 # Note: Using direct bcrypt for verification due to passlib/bcrypt 5.0.0 compatibility issues
@@ -16,7 +19,7 @@ try:
     pwd_context = CryptContext(
         schemes=["bcrypt"],
         deprecated="auto",
-        bcrypt__rounds=12,
+        bcrypt__rounds=settings.password_hash_rounds,
         bcrypt__ident="2b"
     )
 except Exception:
@@ -74,6 +77,56 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if a bcrypt hash was made with a cost other than settings.password_hash_rounds"""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.password_hash_rounds
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+# Password pool load, tracked on the event loop: submitted operations not yet finished
+_password_ops_in_flight = 0
+_password_ops_max_in_flight = 0
+_password_ops_completed = 0
+
+
+async def _run_password_operation(func, *args):
+    global _password_ops_in_flight, _password_ops_max_in_flight, _password_ops_completed
+    _password_ops_in_flight += 1
+    _password_ops_max_in_flight = max(_password_ops_max_in_flight, _password_ops_in_flight)
+    try:
+        return await asyncio.get_event_loop().run_in_executor(
+            get_password_executor(), functools.partial(func, *args)
+        )
+    finally:
+        _password_ops_in_flight -= 1
+        _password_ops_completed += 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool (bcrypt takes ~250 ms at cost 12)"""
+    return await _run_password_operation(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password pool"""
+    return await _run_password_operation(get_password_hash, password)
+
+
+def get_password_hashing_stats() -> Dict[str, Any]:
+    """Password pool load for /health: queued is how many operations wait for a free worker"""
+    workers = settings.password_hash_workers
+    return {
+        "workers": workers,
+        "rounds": settings.password_hash_rounds,
+        "in_flight": _password_ops_in_flight,
+        "queued": max(_password_ops_in_flight - workers, 0),
+        "max_in_flight": _password_ops_max_in_flight,
+        "completed": _password_ops_completed
+    }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -86,6 +139,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     # JWT payload format
     to_encode.update({
         "exp": expire,
+        "iat": datetime.utcnow(),
         "id": data.get("id"),
         "email": data.get("email"),
         "role": data.get("role"),
@@ -103,6 +103,38 @@ class Settings(BaseSettings):
     # Task Executor Configuration (for parallel processing)
     task_executor_workers: int = 10  # Number of worker threads for background tasks
     
+    # Dashboard aggregation fan-out
+    dashboard_aggregation_workers: int = 8  # Max concurrent per-collection pipelines across all requests
+    dashboard_pipeline_timeout_seconds: float = 30.0  # Per-pipeline timeout (also sent to MongoDB as maxTimeMS)
+    
+    # Password hashing (bcrypt runs on a dedicated pool so logins never block the event loop)
+    password_hash_rounds: int = 12  # bcrypt cost; stored hashes with another cost are re-hashed on login
+    password_hash_workers: int = 4  # Concurrent bcrypt operations per worker process
+    
+    # Authenticated user cache (get_current_user); entries are per token and dropped when the user is edited
+    user_cache_ttl_seconds: float = 60.0
+    user_cache_max_entries: int = 10000
+    user_cache_version_check_seconds: float = 5.0  # How often workers poll for edits made on other workers (0 = local only)
+    
+    # Effective permission cache (per user; edits to user/group/organization mappings make entries stale)
+    effective_permissions_cache_max_entries: int = 10000
+    effective_permissions_version_check_seconds: float = 5.0  # How often workers poll for mapping edits (0 = local only)
+    
+    # Write-behind audit log (entries are queued per worker and written in multi-row INSERTs)
+    audit_log_queue_size: int = 10000  # Entries beyond this are spilled to disk instead of blocking requests
+    audit_log_batch_size: int = 200
+    audit_log_flush_interval_ms: int = 250  # Longest an entry waits in the queue
+    audit_log_shutdown_timeout_seconds: float = 15.0  # Time allowed to drain the queue on shutdown
+    
+    # Scheduler leader election (one worker runs each scheduler; a dead leader is replaced within one lease)
+    scheduler_lease_seconds: int = 30
+    scheduler_shutdown_grace_seconds: float = 10.0  # Time a running job gets to finish on shutdown before it is cancelled
+    
+    # Uploader API proxy (datasource uploads)
+    uploader_api_concurrency: int = 4  # Files POSTed to the Uploader API at once (per worker)
+    uploader_api_timeout_seconds: float = 600.0  # Per-request timeout (the Uploader API ingests synchronously)
+    uploader_api_max_retries: int = 3  # Retries on connection failures and 502/503/504 responses
+    
     # CORS Configuration
     cors_origins: str = "*"  # Comma-separated list of allowed origins, or "*" for all
     
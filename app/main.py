@@ -13,9 +13,16 @@ from app.config.database import create_engines, test_connections, close_connecti
 from app.config.executor import create_task_executor, shutdown_task_executor
 from app.config.settings import settings, validate_environment
 from app.config.mongodb import test_mongodb_connection, close_mongodb_connection
-from app.workers.tasks import run_scheduled_tasks
-from app.workers.formula_watcher import start_formula_watcher, stop_formula_watcher
-from app.workers.daily_sales_scheduler import start_daily_sales_scheduler, stop_daily_sales_scheduler
+from app.config.security import get_password_hashing_stats
+from app.utils.user_cache import get_user_cache_stats
+from app.services.effective_permission_service import EffectivePermissionService
+from app.workers.tasks import run_scheduled_tasks, start_stale_generation_sweep, start_upload_session_gc, start_dashboard_rollup_init
+from app.workers.formula_watcher import start_formula_watcher
+from app.workers.daily_sales_scheduler import start_daily_sales_scheduler
+from app.workers.scheduler import stop_all_jobs
+from app.workers.audit_writer import start_audit_log_writer, stop_audit_log_writer, get_audit_log_writer_stats
+from app.workers.leader_election import WORKER_ID, get_scheduler_leaders
+from app.utils.uploader_client import close_uploader_http_client
 
 # Configure logging
 logging.basicConfig(
@@ -48,7 +55,7 @@ from app.models.main import (
 )
 
 # Import routes
-from app.routes import auth, users, organizations, tools, modules, groups, permissions, audit_log, reconciliation, uploader, sheet_data, database_setup
+from app.routes import auth, users, organizations, tools, modules, groups, permissions, audit_log, reconciliation, uploader, sheet_data, database_setup, scheduler
 
 # Create FastAPI application
 app = FastAPI(
@@ -112,9 +119,19 @@ async def startup_event():
             try:
                 from app.services.excel_generation_service import ExcelGenerationService
                 ExcelGenerationService.initialize_indexes()
+                from app.services.job_service import JobService
+                JobService.initialize_indexes()
                 logger.info("✅ MongoDB indexes initialized successfully")
             except Exception as index_error:
                 logger.warning(f"⚠️ Failed to initialize MongoDB indexes: {index_error}")
+            
+            # Create report collection indexes suggested by the index advisor
+            # Runs in a worker thread - index builds on large collections must not delay startup
+            from app.services.index_advisor_service import IndexAdvisorService
+            asyncio.get_event_loop().run_in_executor(None, IndexAdvisorService.initialize_indexes)
+            
+            # Build dashboard rollups for collections that do not have them yet (leader worker only)
+            await start_dashboard_rollup_init()
         else:
             logger.warning("⚠️ MongoDB connection failed - some features may be unavailable")
         
@@ -128,6 +145,15 @@ async def startup_event():
         # Start daily sales summary scheduler (runs every 10 seconds)
         # await start_daily_sales_scheduler()
         
+        # Fail Excel generation jobs stuck in pending (runs every minute)
+        await start_stale_generation_sweep()
+        
+        # Delete abandoned resumable upload sessions (runs every 15 minutes)
+        await start_upload_session_gc()
+        
+        # Write audit log entries in the background (replays spilled entries every minute)
+        await start_audit_log_writer()
+        
         logger.info("✅ Database connections established successfully")
         logger.info("✅ Task executor initialized for parallel processing")
         logger.info("✅ Application startup completed")
@@ -145,14 +171,18 @@ async def shutdown_event():
     try:
         logger.info("🛑 Shutting down application...")
         
-        # Shutdown task executor
+        # Stop scheduled jobs first so no new work is queued on the executors
+        # (formula watcher, daily sales, stale generation sweep, upload session GC, dashboard rollup init, audit spill replay)
+        await stop_all_jobs()
+        
+        # Flush queued audit log entries while the database is still open
+        await stop_audit_log_writer()
+        
+        # Shutdown task executor once nothing submits to it any more
         await shutdown_task_executor()
-
-        # Stop formula watcher
-        await stop_formula_watcher()
         
-        # Stop daily sales scheduler
-        await stop_daily_sales_scheduler()
+        # Close the shared Uploader API client
+        await close_uploader_http_client()
         
         # Close database connections
         await close_connections()
@@ -174,7 +204,13 @@ async def health_check():
         "message": "Reconcii Admin API is running",
         "version": "1.0.0",
         "environment": settings.environment,
-        "timestamp": asyncio.get_event_loop().time()
+        "timestamp": asyncio.get_event_loop().time(),
+        "worker": WORKER_ID,
+        "schedulers": await get_scheduler_leaders(),
+        "password_hashing": get_password_hashing_stats(),
+        "user_cache": get_user_cache_stats(),
+        "effective_permissions_cache": EffectivePermissionService.get_stats(),
+        "audit_log_writer": get_audit_log_writer_stats()
     }
 
 # Include routers
@@ -190,6 +226,7 @@ app.include_router(reconciliation.router, prefix="/api/reconciliation", tags=["R
 app.include_router(uploader.router, prefix="/api/uploader", tags=["File Upload"])
 app.include_router(database_setup.router, prefix="/api", tags=["Database Setup", "Report Formulas"])
 app.include_router(sheet_data.router, prefix="/api/sheet-data", tags=["Sheet Data"])
+app.include_router(scheduler.router, prefix="/api/scheduler", tags=["Scheduler"])
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -9,6 +9,8 @@ from app.config.database import get_sso_db
 from app.config.security import verify_token
 from app.config.settings import _current_user_context
 from app.models.sso.user_details import UserDetails
+from app.utils.user_cache import token_cache_key, get_cached_user, cache_user
+from app.services.effective_permission_service import EffectivePermissionService
 from typing import Optional
 
 security = HTTPBearer()
@@ -33,19 +35,26 @@ async def get_current_user(
     user_id = payload.get("id")
     jti = payload.get("jti")     # Username from JWT
     
-    user = None
-    if jti:
-        # If jti exists, find by username
-        user = await UserDetails.get_by_username(db, jti)
-    else:
-        # Otherwise find by ID
-        user = await UserDetails.get_by_id(db, int(user_id))
+    # Every API call of a page carries the same token: resolve the user once per token
+    cache_key = token_cache_key(payload)
+    user = await get_cached_user(cache_key) if cache_key else None
     
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
+    if user is None:
+        if jti:
+            # If jti exists, find by username
+            user = await UserDetails.get_by_username(db, jti)
+        else:
+            # Otherwise find by ID
+            user = await UserDetails.get_by_id(db, int(user_id))
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        
+        if cache_key:
+            cache_user(cache_key, user)
     
     # Set context for MongoDB database resolution based on token
     _current_user_context.set({
@@ -67,3 +76,19 @@ async def get_current_active_user(
             detail="Inactive user"
         )
     return current_user
+
+
+def require_permission(permission_code: str):
+    """Dependency factory: the current user must hold permission_code (directly or through their group)"""
+    async def check_permission(
+        current_user: UserDetails = Depends(get_current_user),
+        db: AsyncSession = Depends(get_sso_db)
+    ) -> UserDetails:
+        if not await EffectivePermissionService.has_permission(db, current_user.id, permission_code):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Permission denied"
+            )
+        return current_user
+    
+    return check_permission
@@ -25,6 +25,8 @@ class UploadRecord(Base):
     status = Column(String(20), default="uploaded", nullable=False)
     message = Column(Text, nullable=True)
     processed_data = Column(Text, nullable=True)
+    # SHA-256 of content + data source + upload type; unique so identical re-uploads resolve to one record
+    content_hash = Column(String(64), nullable=True, unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -53,6 +55,17 @@ class UploadRecord(Base):
             logger.error(f"Error getting upload record by ID: {e}")
             return None
     
+    @classmethod
+    async def get_by_content_hash(cls, db: AsyncSession, content_hash: str):
+        """Get the upload record holding a content fingerprint"""
+        try:
+            from sqlalchemy import select
+            result = await db.execute(select(cls).where(cls.content_hash == content_hash))
+            return result.scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"Error getting upload record by content hash: {e}")
+            return None
+    
     @classmethod
     async def get_all_with_pagination(cls, db: AsyncSession, page: int = 1, limit: int = 10, 
                                      status: Optional[str] = None, upload_type: Optional[str] = None):
@@ -98,15 +111,15 @@ class UploadRecord(Base):
     async def update(cls, db: AsyncSession, upload_id: int, **kwargs):
         """Update upload record"""
         try:
-            from sqlalchemy import select, update
-            result = await db.execute(
+            from sqlalchemy import update
+            # MySQL has no UPDATE ... RETURNING, so re-read the row
+            await db.execute(
                 update(cls)
                 .where(cls.id == upload_id)
                 .values(**kwargs, updated_at=datetime.utcnow())
-                .returning(cls)
             )
             await db.commit()
-            return result.scalar_one_or_none()
+            return await cls.get_by_id(db, upload_id)
         except Exception as e:
             logger.error(f"Error updating upload record: {e}")
             await db.rollback()
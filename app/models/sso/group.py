@@ -5,8 +5,9 @@ Group model
 from sqlalchemy import Column, BigInteger, String, Integer, ForeignKey, Index
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, selectinload
 from app.config.database import Base
+from typing import Dict, Iterable
 import logging
 
 logger = logging.getLogger(__name__)
@@ -55,6 +56,19 @@ class Group(Base):
             logger.error(f"Error getting group by ID: {e}")
             return None
     
+    @classmethod
+    async def get_many(cls, db: AsyncSession, group_ids: Iterable[int]) -> Dict[int, "Group"]:
+        """Get groups by IDs with a single query, keyed by ID (unknown IDs are left out)"""
+        ids = {group_id for group_id in group_ids if group_id is not None}
+        if not ids:
+            return {}
+        try:
+            result = await db.execute(select(cls).where(cls.id.in_(ids)))
+            return {group.id: group for group in result.scalars().all()}
+        except Exception as e:
+            logger.error(f"Error getting groups by IDs: {e}")
+            return {}
+    
     @classmethod
     async def get_by_name(cls, db: AsyncSession, group_name: str):
         """Get group by name"""
@@ -106,6 +120,21 @@ class Group(Base):
             logger.error(f"Error getting groups by tool ID: {e}")
             return []
     
+    @classmethod
+    async def get_all_by_tool_and_org(cls, db: AsyncSession, tool_id: int, organization_id: int):
+        """Get groups of a tool within an organization, with their tool and module mappings preloaded"""
+        try:
+            result = await db.execute(
+                select(cls)
+                .where(cls.tool_id == tool_id, cls.organization_id == organization_id)
+                .options(selectinload(cls.tool), selectinload(cls.group_module_mappings))
+                .order_by(cls.group_name)
+            )
+            return result.scalars().all()
+        except Exception as e:
+            logger.error(f"Error getting groups by tool and organization: {e}")
+            return []
+    
     @classmethod
     async def update(cls, db: AsyncSession, group_id: int, **kwargs):
         """Update group"""
@@ -5,8 +5,9 @@ Module model
 from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, selectinload
 from app.config.database import Base
+from typing import Dict, Iterable, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,6 +55,19 @@ class Module(Base):
             logger.error(f"Error getting module by ID: {e}")
             return None
     
+    @classmethod
+    async def get_many(cls, db: AsyncSession, module_ids: Iterable[int]) -> Dict[int, "Module"]:
+        """Get modules by IDs with a single query, keyed by ID (unknown IDs are left out)"""
+        ids = {module_id for module_id in module_ids if module_id is not None}
+        if not ids:
+            return {}
+        try:
+            result = await db.execute(select(cls).where(cls.id.in_(ids)))
+            return {module.id: module for module in result.scalars().all()}
+        except Exception as e:
+            logger.error(f"Error getting modules by IDs: {e}")
+            return {}
+    
     @classmethod
     async def get_by_name(cls, db: AsyncSession, module_name: str):
         """Get module by name"""
@@ -92,6 +106,37 @@ class Module(Base):
             logger.error(f"Error getting modules by tool ID: {e}")
             return []
     
+    @classmethod
+    async def get_all_by_tool(cls, db: AsyncSession, tool_id: int, organization_id: Optional[int] = None):
+        """
+        Get modules of a tool - only those assigned to the organization when one is given - with
+        their tool, permissions and organization assignments preloaded
+        """
+        from app.models.sso.organization_tool import OrganizationTool
+        try:
+            query = (
+                select(cls)
+                .where(cls.tool_id == tool_id)
+                .options(
+                    selectinload(cls.tool),
+                    selectinload(cls.permissions),
+                    selectinload(cls.organization_tools)
+                )
+                .order_by(cls.module_name)
+            )
+            if organization_id is not None:
+                query = query.where(cls.id.in_(
+                    select(OrganizationTool.module_id).where(
+                        OrganizationTool.organization_id == organization_id,
+                        OrganizationTool.status == True
+                    )
+                ))
+            result = await db.execute(query)
+            return result.scalars().all()
+        except Exception as e:
+            logger.error(f"Error getting modules by tool and organization: {e}")
+            return []
+    
     @classmethod
     async def update(cls, db: AsyncSession, module_id: int, **kwargs):
         """Update module"""
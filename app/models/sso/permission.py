@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
 from sqlalchemy.orm import relationship
 from app.config.database import Base
+from typing import Dict, Iterable
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,6 +58,19 @@ class Permission(Base):
             logger.error(f"Error getting permission by ID: {e}")
             return None
     
+    @classmethod
+    async def get_many(cls, db: AsyncSession, permission_ids: Iterable[int]) -> Dict[int, "Permission"]:
+        """Get permissions by IDs with a single query, keyed by ID (unknown IDs are left out)"""
+        ids = {permission_id for permission_id in permission_ids if permission_id is not None}
+        if not ids:
+            return {}
+        try:
+            result = await db.execute(select(cls).where(cls.id.in_(ids)))
+            return {permission.id: permission for permission in result.scalars().all()}
+        except Exception as e:
+            logger.error(f"Error getting permissions by IDs: {e}")
+            return {}
+    
     @classmethod
     async def get_by_code(cls, db: AsyncSession, permission_code: str):
         """Get permission by code"""
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
 from sqlalchemy.orm import relationship
 from app.config.database import Base
+from typing import Dict, Iterable
 import logging
 
 logger = logging.getLogger(__name__)
@@ -55,6 +56,19 @@ class Tool(Base):
             logger.error(f"Error getting tool by ID: {e}")
             return None
     
+    @classmethod
+    async def get_many(cls, db: AsyncSession, tool_ids: Iterable[int]) -> Dict[int, "Tool"]:
+        """Get tools by IDs with a single query, keyed by ID (unknown IDs are left out)"""
+        ids = {tool_id for tool_id in tool_ids if tool_id is not None}
+        if not ids:
+            return {}
+        try:
+            result = await db.execute(select(cls).where(cls.id.in_(ids)))
+            return {tool.id: tool for tool in result.scalars().all()}
+        except Exception as e:
+            logger.error(f"Error getting tools by IDs: {e}")
+            return {}
+    
     @classmethod
     async def get_by_name(cls, db: AsyncSession, tool_name: str):
         """Get tool by name"""
@@ -124,15 +124,15 @@ class UserDetails(Base):
     async def update(cls, db: AsyncSession, user_id: int, **kwargs):
         """Update user"""
         try:
-            from sqlalchemy import select, update
-            result = await db.execute(
+            from sqlalchemy import update
+            # MySQL has no UPDATE ... RETURNING, so read the row back after committing
+            await db.execute(
                 update(cls)
                 .where(cls.id == user_id)
                 .values(**kwargs, updated_at=datetime.utcnow())
-                .returning(cls)
             )
             await db.commit()
-            return result.scalar_one_or_none()
+            return await cls.get_by_id(db, user_id)
         except Exception as e:
             logger.error(f"Error updating user: {e}")
             await db.rollback()
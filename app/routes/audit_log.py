@@ -9,16 +9,7 @@ from app.middleware.auth import get_current_user
 from app.models.sso.audit_log import AuditLog
 from app.models.sso.user_details import UserDetails
 from app.models.sso.group import Group
-
-async def get_group_name(db: AsyncSession, group_id: int) -> str:
-    """Helper function to get group name by ID"""
-    if not group_id:
-        return None
-    try:
-        group = await Group.get_by_id(db, group_id)
-        return group.group_name if group else "Unknown"
-    except:
-        return "Unknown"
+from app.workers.audit_writer import enqueue_audit_log
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
@@ -62,10 +53,9 @@ class AuditLogResponse(BaseModel):
 async def create_log(
     log_data: CreateLogRequest,
     request: Request,
-    db: AsyncSession = Depends(get_sso_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
-    """Create audit log entry"""
+    """Create audit log entry (written in the background by the audit log writer)"""
     try:
         # Get client IP
         client_ip = (
@@ -73,8 +63,8 @@ async def create_log(
             request.client.host if request.client else None
         )
         
-        # Create audit log entry
-        audit_log = await AuditLog.create(db,
+        # Queue audit log entry
+        enqueue_audit_log(
             username=log_data.username,
             user_email=log_data.user_email,
             system_ip=client_ip,
@@ -164,6 +154,7 @@ async def get_all_organization_users(
     try:
         # Get users by organization
         users = await UserDetails.get_all_by_organization(db, current_user.organization_id)
+        groups = await Group.get_many(db, (user.group_id for user in users))
         
         # Format response
         user_list = []
@@ -179,7 +170,7 @@ async def get_all_organization_users(
                 "group_id": user.group_id,
                 "groups": {
                     "id": user.group_id,
-                    "group_name": await get_group_name(db, user.group_id) if user.group_id else None
+                    "group_name": groups[user.group_id].group_name if user.group_id in groups else "Unknown"
                 } if user.group_id else None
             })
         
@@ -6,8 +6,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
-from app.config.security import verify_password, create_access_token, verify_token, get_password_hash
+from app.config.security import (
+    verify_password_async, create_access_token, verify_token, get_password_hash_async, password_needs_rehash
+)
 from app.models.sso.user_details import UserDetails
+from app.utils.user_cache import invalidate_user_context
 from pydantic import BaseModel
 from typing import Optional
 import random
@@ -69,12 +72,19 @@ async def login(
     # Find user by username
     user = await UserDetails.get_by_username(db, login_data.username)
     
-    if not user or not verify_password(login_data.password, user.password):
+    if not user or not await verify_password_async(login_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    # Upgrade hashes made with an old bcrypt cost while we have the plain password
+    if password_needs_rehash(user.password):
+        try:
+            await UserDetails.update(db, user.id, password=await get_password_hash_async(login_data.password))
+        except Exception as e:
+            logging.warning(f"Could not re-hash password for user {user.id}: {e}")
+    
     # Create access token
     access_token = create_access_token(
         data={
@@ -120,7 +130,7 @@ async def register(
     user_data = {
         "username": register_data.username,
         "email": register_data.email,
-        "password": get_password_hash(register_data.password),
+        "password": await get_password_hash_async(register_data.password),
         "name": f"{register_data.first_name} {register_data.last_name}".strip(),
         "active": True,
         "level": "user",  # Default level
@@ -326,7 +336,7 @@ async def reset_password(
             )
         
         # Hash the new password
-        hashed_password = get_password_hash(reset_data.new_password)
+        hashed_password = await get_password_hash_async(reset_data.new_password)
         
         # Update password and reset all OTP related fields
         await UserDetails.update(db, user.id,
@@ -336,6 +346,7 @@ async def reset_password(
             otp_attempts=0,
             otp_resend_count=0
         )
+        await invalidate_user_context(user_id=user.id)
         
         return {
             "success": True,
@@ -3,7 +3,7 @@ Database Setup and Report Formulas Routes
 Handles MongoDB collection setup and report formula management
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
@@ -19,6 +19,8 @@ from app.models.sso.user_details import UserDetails
 from app.controllers.db_setup_controller import DBSetupController
 from app.controllers.formulas_controller import FormulasController
 from app.services.mongodb_service import mongodb_service
+from app.services.index_advisor_service import IndexAdvisorService
+from app.services.dashboard_rollup_service import DashboardRollupService
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -351,6 +353,7 @@ class SaveReportFormulasResponse(BaseModel):
     status_code=status.HTTP_200_OK
 )
 async def save_report_formulas(
+    background_tasks: BackgroundTasks,
     request: SaveReportFormulasRequest = Body(...),
     current_user: UserDetails = Depends(get_current_user)
 ):
@@ -363,12 +366,21 @@ async def save_report_formulas(
         for key, conditions_list in request.conditions.items()
     }
     
-    return await formulas_controller.save_report_formulas(
+    result = await formulas_controller.save_report_formulas(
         request.report_name,
         formulas_dict,
         request.mapping_keys,
         conditions_dict
     )
+    
+    # Index the report and its joined source collections for the new query shape
+    background_tasks.add_task(
+        IndexAdvisorService.ensure_indexes,
+        [request.report_name, *request.mapping_keys.keys()]
+    )
+    # Rebuild the report's dashboard rollups for its (possibly new) fields
+    background_tasks.add_task(DashboardRollupService.refresh_collections, [request.report_name])
+    return result
 
 
 class GetReportFormulasResponse(BaseModel):
@@ -416,6 +428,7 @@ class UpdateReportFormulasResponse(BaseModel):
 )
 async def update_report_formulas(
     report_name: str,
+    background_tasks: BackgroundTasks,
     request: UpdateReportFormulasRequest = Body(...),
     current_user: UserDetails = Depends(get_current_user)
 ):
@@ -428,12 +441,21 @@ async def update_report_formulas(
         for key, conditions_list in request.conditions.items()
     }
     
-    return await formulas_controller.update_report_formulas(
+    result = await formulas_controller.update_report_formulas(
         report_name,
         formulas_dict,
         request.mapping_keys,
         conditions_dict
     )
+    
+    # Index the report and its joined source collections for the new query shape
+    background_tasks.add_task(
+        IndexAdvisorService.ensure_indexes,
+        [report_name, *request.mapping_keys.keys()]
+    )
+    # Rebuild the report's dashboard rollups for its (possibly new) fields
+    background_tasks.add_task(DashboardRollupService.refresh_collections, [report_name])
+    return result
 
 
 class DeleteReportResponse(BaseModel):
@@ -1082,6 +1104,7 @@ async def get_dashboard_api_mapping_keys(
     status_code=status.HTTP_200_OK
 )
 async def save_dashboard_api_mapping_keys(
+    background_tasks: BackgroundTasks,
     request: SaveMappingKeysRequest = Body(...),
     current_user: UserDetails = Depends(get_current_user)
 ):
@@ -1125,6 +1148,11 @@ async def save_dashboard_api_mapping_keys(
         
         collection = get_mongodb_collection(collection_name)
         
+        # Index the mapped report collection and rebuild its rollups once the mapping is stored
+        if request.is_3PO:
+            background_tasks.add_task(IndexAdvisorService.ensure_indexes, [request.name])
+        background_tasks.add_task(DashboardRollupService.refresh_collections, [request.name])
+        
         # Prepare the document
         document = {
             "name": request.name,
@@ -1177,3 +1205,186 @@ async def save_dashboard_api_mapping_keys(
             detail=f"Failed to save mapping keys: {str(e)}"
         )
 
+
+# ============================================================================
+# INDEX ADVISOR ROUTES
+# ============================================================================
+
+class IndexAdvisorResponse(BaseModel):
+    """Response model for index advisor endpoints"""
+    status: int = Field(..., description="HTTP status code", example=200)
+    message: str = Field(..., description="Response message")
+    data: Dict[str, Any] = Field(..., description="Response data")
+
+
+@router.get(
+    "/setup/indexes/advice",
+    tags=["Database Setup"],
+    summary="Get index recommendations for report collections",
+    response_model=IndexAdvisorResponse,
+    status_code=status.HTTP_200_OK
+)
+async def get_index_advice(
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """
+    Inspect report formulas and dashboard_api_mapping_keys, and return the recommended
+    compound indexes together with the collections currently answered by a collection scan.
+    """
+    if not mongodb_service.is_connected():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="MongoDB is not connected"
+        )
+    
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        advice = await run_in_threadpool(IndexAdvisorService.get_advice)
+        return {
+            "status": 200,
+            "message": f"{len(advice['unindexed_collections'])} collection query(ies) scanned without an index",
+            "data": advice
+        }
+    except Exception as e:
+        logger.error(f"❌ Error building index advice: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to build index advice: {str(e)}"
+        )
+
+
+@router.post(
+    "/setup/indexes/apply",
+    tags=["Database Setup"],
+    summary="Create recommended indexes on report collections",
+    response_model=IndexAdvisorResponse,
+    status_code=status.HTTP_200_OK
+)
+async def apply_index_advice(
+    collections: Optional[List[str]] = Body(default=None, embed=True),
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Create the recommended indexes (optionally only for the given collections) in the background"""
+    if not mongodb_service.is_connected():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="MongoDB is not connected"
+        )
+    
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        result = await run_in_threadpool(IndexAdvisorService.ensure_indexes, collections)
+        created = sum(len(names) for names in result["created"].values())
+        return {
+            "status": 200,
+            "message": f"Created {created} index(es)",
+            "data": result
+        }
+    except Exception as e:
+        logger.error(f"❌ Error applying index advice: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to apply index advice: {str(e)}"
+        )
+
+
+# ============================================================================
+# DASHBOARD ROLLUP ROUTES
+# ============================================================================
+
+class RefreshRollupsRequest(BaseModel):
+    """Request model for refreshing dashboard rollups"""
+    collections: Optional[List[str]] = Field(default=None, description="Collections to refresh (all rollup targets if omitted)")
+    start_date: Optional[str] = Field(default=None, description="First affected date in YYYY-MM-DD format", example="2024-01-01")
+    end_date: Optional[str] = Field(default=None, description="Last affected date in YYYY-MM-DD format", example="2024-01-31")
+
+
+class DashboardRollupResponse(BaseModel):
+    """Response model for dashboard rollup endpoints"""
+    status: int = Field(..., description="HTTP status code", example=200)
+    message: str = Field(..., description="Response message")
+    data: Any = Field(..., description="Response data")
+
+
+@router.get(
+    "/setup/rollups/status",
+    tags=["Database Setup"],
+    summary="Get dashboard rollup coverage per collection",
+    response_model=DashboardRollupResponse,
+    status_code=status.HTTP_200_OK
+)
+async def get_rollup_status(
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Return the fields and covered date range of every dashboard rollup collection"""
+    if not mongodb_service.is_connected():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="MongoDB is not connected"
+        )
+    
+    try:
+        states = DashboardRollupService.get_status()
+        return {
+            "status": 200,
+            "message": f"{len(states)} rollup collection(s)",
+            "data": states
+        }
+    except Exception as e:
+        logger.error(f"❌ Error getting rollup status: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get rollup status: {str(e)}"
+        )
+
+
+@router.post(
+    "/setup/rollups/refresh",
+    tags=["Database Setup"],
+    summary="Refresh dashboard rollups",
+    response_model=DashboardRollupResponse,
+    status_code=status.HTTP_200_OK
+)
+async def refresh_rollups(
+    request: Optional[RefreshRollupsRequest] = Body(default=None),
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """
+    Rebuild dashboard rollups, only for the given dates when both start_date and end_date
+    are provided (otherwise every day is rebuilt).
+    """
+    request = request or RefreshRollupsRequest()
+    if not mongodb_service.is_connected():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="MongoDB is not connected"
+        )
+    
+    try:
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d") if request.start_date else None
+        end_date = datetime.strptime(request.end_date, "%Y-%m-%d") if request.end_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Expected: YYYY-MM-DD"
+        )
+    
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        result = await run_in_threadpool(
+            DashboardRollupService.refresh_collections,
+            request.collections,
+            start_date,
+            end_date
+        )
+        return {
+            "status": 200,
+            "message": f"Refreshed rollups for {len(result['refreshed'])} collection(s)",
+            "data": result
+        }
+    except Exception as e:
+        logger.error(f"❌ Error refreshing rollups: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to refresh rollups: {str(e)}"
+        )
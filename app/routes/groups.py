@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
 from app.middleware.auth import get_current_user
+from app.services.effective_permission_service import EffectivePermissionService
 from app.models.sso.group import Group
 from app.models.sso.tool import Tool
 from app.models.sso.user_details import UserDetails
@@ -166,13 +167,14 @@ async def get_all_groups(
                 "organization_id": group.organization_id,
                 "created_by": group.created_by,
                 "updated_by": group.updated_by,
-                "created_at": group.created_at.isoformat() if group.created_at else None,
-                "updated_at": group.updated_at.isoformat() if group.updated_at else None,
+                # groups has no timestamp columns
+                "created_at": None,
+                "updated_at": None,
                 "tools": {
                     "id": group.tool.id if group.tool else None,
                     "tool_name": group.tool.tool_name if group.tool else None
                 } if group.tool else None,
-                "group_module_mapping": [mapping.to_dict() for mapping in group.group_module_mappings] if hasattr(group, 'group_module_mappings') else [],
+                "group_module_mapping": [mapping.to_dict() for mapping in group.group_module_mappings],
                 "users": []  # Users relationship would need to be implemented in UserDetails model
             })
         
@@ -217,6 +219,7 @@ async def delete_group(
             )
         
         await Group.delete(db, delete_data.id)
+        await EffectivePermissionService.invalidate()
         return {"message": "Group deleted successfully"}
         
     except HTTPException:
@@ -241,11 +244,13 @@ async def get_group_modules(
         from app.models.sso import GroupModuleMapping, Module, Permission
         
         group_mappings = await GroupModuleMapping.get_by_group(db, request_data.group_id)
+        modules_by_id = await Module.get_many(db, (mapping.module_id for mapping in group_mappings))
+        permissions = await Permission.get_many(db, (mapping.permission_id for mapping in group_mappings))
         
         modules = []
         for mapping in group_mappings:
-            module = await Module.get_by_id(db, mapping.module_id)
-            permission = await Permission.get_by_id(db, mapping.permission_id)
+            module = modules_by_id.get(mapping.module_id)
+            permission = permissions.get(mapping.permission_id)
             
             if module:
                 modules.append({
@@ -287,55 +292,43 @@ async def update_group_module_mapping(
         # Implement group module mapping update logic
         from app.models.sso import GroupModuleMapping, Module, Permission
         
-        # Get existing mappings
-        existing_mappings = await GroupModuleMapping.get_by_group(db, request_data.group_id)
-        existing_mapping_ids = {mapping.id for mapping in existing_mappings}
+        # module_permission_mapping: {module_id: [permission_id, ...]}
+        requested = [
+            (int(module_id), permission_id)
+            for module_id, permission_ids in mapping_data.module_permission_mapping.items()
+            for permission_id in permission_ids
+        ]
         
-        # Process new mappings
-        updated_mappings = []
-        for mapping_data in request_data.module_permissions:
-            # Check if module exists
-            module = await Module.get_by_id(db, mapping_data.module_id)
-            if not module:
+        # Validate every module and permission up front (two queries)
+        modules = await Module.get_many(db, (module_id for module_id, _ in requested))
+        permissions = await Permission.get_many(db, (permission_id for _, permission_id in requested))
+        for module_id, permission_id in requested:
+            if module_id not in modules:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Module with ID {mapping_data.module_id} not found"
+                    detail=f"Module with ID {module_id} not found"
                 )
-            
-            # Check if permission exists
-            permission = await Permission.get_by_id(db, mapping_data.permission_id)
-            if not permission:
+            if permission_id not in permissions:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Permission with ID {mapping_data.permission_id} not found"
-                )
-            
-            # Check if mapping already exists
-            existing_mapping = await GroupModuleMapping.get_by_group_and_module(
-                db, request_data.group_id, mapping_data.module_id
-            )
-            
-            if existing_mapping:
-                # Update existing mapping
-                await GroupModuleMapping.update(
-                    db, existing_mapping.id,
-                    permission_id=mapping_data.permission_id
+                    detail=f"Permission with ID {permission_id} not found"
                 )
-            else:
-                # Create new mapping
+        
+        # Get existing mappings
+        existing_mappings = await GroupModuleMapping.get_by_group(db, mapping_data.group_id)
+        existing_pairs = {(mapping.module_id, mapping.permission_id) for mapping in existing_mappings}
+        
+        # Process new mappings
+        for module_id, permission_id in requested:
+            if (module_id, permission_id) not in existing_pairs:
                 await GroupModuleMapping.create(
                     db,
-                    group_id=request_data.group_id,
-                    module_id=mapping_data.module_id,
-                    permission_id=mapping_data.permission_id
+                    group_id=mapping_data.group_id,
+                    module_id=module_id,
+                    permission_id=permission_id
                 )
-            
-            updated_mappings.append({
-                "module_id": mapping_data.module_id,
-                "module_name": module.module_name,
-                "permission_id": mapping_data.permission_id,
-                "permission_name": permission.permission_name
-            })
+        
+        await EffectivePermissionService.invalidate()
         
         return {
             "Message": "Group mapping updated successfully",
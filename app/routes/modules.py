@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
 from app.middleware.auth import get_current_user
+from app.services.effective_permission_service import EffectivePermissionService
 from app.models.sso.module import Module
 from app.models.sso.tool import Tool
 from app.models.sso.user_details import UserDetails
@@ -26,6 +27,7 @@ class CreateModuleRequest(BaseModel):
 class GetAllModulesRequest(BaseModel):
     tool_id: int
     organization_id: Optional[int] = None
+    user_id: Optional[int] = None  # Only the modules this user effectively has
 
 
 class DeleteModuleRequest(BaseModel):
@@ -107,12 +109,17 @@ async def get_all_modules(
     db: AsyncSession = Depends(get_sso_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
-    """Get all modules"""
+    """Get all modules of a tool (within an organization, or effective for a user when given)"""
     try:
         modules = await Module.get_all_by_tool(
             db, request_data.tool_id, request_data.organization_id
         )
         
+        if request_data.user_id is not None:
+            effective = await EffectivePermissionService.get_for_user(db, request_data.user_id)
+            effective_module_ids = {module["module_id"] for module in (effective or {}).get("modules", [])}
+            modules = [module for module in modules if module.id in effective_module_ids]
+        
         # Format response
         module_list = []
         for module in modules:
@@ -120,8 +127,9 @@ async def get_all_modules(
                 "id": module.id,
                 "module_name": module.module_name,
                 "tool_id": module.tool_id,
-                "created_at": module.created_at.isoformat() if module.created_at else None,
-                "updated_at": module.updated_at.isoformat() if module.updated_at else None,
+                # modules has no timestamp columns
+                "created_at": None,
+                "updated_at": None,
                 "tools": {
                     "id": module.tool.id if module.tool else None,
                     "tool_name": module.tool.tool_name if module.tool else None
@@ -170,6 +178,7 @@ async def delete_module(
             )
         
         await Module.delete(db, delete_data.id)
+        await EffectivePermissionService.invalidate()
         return {"message": "Module deleted successfully"}
         
     except HTTPException:
@@ -6,10 +6,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
 from app.middleware.auth import get_current_user
+from app.services.effective_permission_service import EffectivePermissionService
 from app.models.sso.user_details import UserDetails
-from app.config.security import get_password_hash
+from app.config.security import get_password_hash_async
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import logging
 
 router = APIRouter()
@@ -128,7 +129,7 @@ async def create_organization(
         )
         
         # Hash password
-        hashed_password = get_password_hash(org_data.password)
+        hashed_password = await get_password_hash_async(org_data.password)
         
         # Create admin user for the organization
         user_data = {
@@ -250,6 +251,7 @@ async def delete_organization(
             )
         
         await Organization.delete(db, delete_data.id)
+        await EffectivePermissionService.invalidate()
         
         return {"message": "Organization was deleted successfully"}
         
@@ -263,6 +265,49 @@ async def delete_organization(
         )
 
 
+async def _assign_organization_modules(
+    db: AsyncSession,
+    organization_id: int,
+    pairs: List[Tuple[int, int]],
+    tools: Dict[int, Any],
+    modules: Dict[int, Any],
+    user_id: int
+) -> List[Dict[str, Any]]:
+    """
+    Create the (tool_id, module_id) assignments an organization doesn't have yet (its active
+    assignments are read with a single query). Returns the newly created assignments.
+    """
+    from app.models.sso import OrganizationTool
+    
+    existing_mappings = await OrganizationTool.get_by_organization(db, organization_id)
+    existing_pairs = {(mapping.tool_id, mapping.module_id) for mapping in existing_mappings}
+    
+    added = []
+    for tool_id, module_id in dict.fromkeys(pairs):
+        if (tool_id, module_id) in existing_pairs:
+            continue
+        
+        await OrganizationTool.create(
+            db,
+            organization_id=organization_id,
+            tool_id=tool_id,
+            module_id=module_id,
+            status=True,
+            created_by=user_id,
+            updated_by=user_id
+        )
+        added.append({
+            "tool_id": tool_id,
+            "tool_name": tools[tool_id].tool_name,
+            "module_id": module_id,
+            "module_name": modules[module_id].module_name
+        })
+    
+    if added:
+        await EffectivePermissionService.invalidate()
+    return added
+
+
 @router.post("/tools/assign")
 async def assign_tools(
     assign_data: AssignToolsRequest,
@@ -272,71 +317,53 @@ async def assign_tools(
     """Assign tools to organization"""
     try:
         # Implement tool assignment logic
-        from app.models.sso import OrganizationTool, Organization, Tool, Module
+        from app.models.sso import Organization, Tool, Module
         
         # Check if organization exists
-        organization = await Organization.get_by_id(db, request_data.organization_id)
+        organization = await Organization.get_by_id(db, assign_data.organization_id)
         if not organization:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Organization not found"
             )
         
-        # Process tool assignments
-        assigned_tools = []
-        for tool_assignment in request_data.tool_assignments:
-            # Check if tool exists
-            tool = await Tool.get_by_id(db, tool_assignment.tool_id)
-            if not tool:
+        tools = await Tool.get_many(db, assign_data.tool_ids)
+        modules = await Module.get_many(db, assign_data.module_ids)
+        for tool_id in assign_data.tool_ids:
+            if tool_id not in tools:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Tool with ID {tool_assignment.tool_id} not found"
+                    detail=f"Tool with ID {tool_id} not found"
                 )
-            
-            # Check if module exists
-            module = await Module.get_by_id(db, tool_assignment.module_id)
+        
+        # Each module is assigned under the tool it belongs to
+        pairs = []
+        for module_id in assign_data.module_ids:
+            module = modules.get(module_id)
             if not module:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Module with ID {tool_assignment.module_id} not found"
-                )
-            
-            # Create or update organization tool mapping
-            existing_mapping = await OrganizationTool.get_by_organization_and_tool(
-                db, request_data.organization_id, tool_assignment.tool_id
-            )
-            
-            if existing_mapping:
-                await OrganizationTool.update(
-                    db, existing_mapping.id,
-                    module_id=tool_assignment.module_id,
-                    status=True,
-                    updated_by=current_user.id
+                    detail=f"Module with ID {module_id} not found"
                 )
-            else:
-                await OrganizationTool.create(
-                    db,
-                    organization_id=request_data.organization_id,
-                    tool_id=tool_assignment.tool_id,
-                    module_id=tool_assignment.module_id,
-                    status=True,
-                    created_by=current_user.id,
-                    updated_by=current_user.id
+            if module.tool_id not in tools:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Module with ID {module_id} does not belong to any of the given tools"
                 )
-            
-            assigned_tools.append({
-                "tool_id": tool_assignment.tool_id,
-                "tool_name": tool.tool_name,
-                "module_id": tool_assignment.module_id,
-                "module_name": module.module_name
-            })
+            pairs.append((module.tool_id, module_id))
+        
+        added = await _assign_organization_modules(
+            db, assign_data.organization_id, pairs, tools, modules, current_user.id
+        )
         
         return {
             "message": "Tools assigned successfully",
-            "added": [],  # Placeholder
-            "removed": []  # Placeholder
+            "added": added,
+            "removed": []
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Assign tools error: {e}")
         raise HTTPException(
@@ -357,11 +384,13 @@ async def get_organization_tools(
         from app.models.sso import OrganizationTool, Tool, Module
         
         org_tools = await OrganizationTool.get_by_organization(db, organization_id)
+        tools_by_id = await Tool.get_many(db, (org_tool.tool_id for org_tool in org_tools))
+        modules = await Module.get_many(db, (org_tool.module_id for org_tool in org_tools))
         
         tools = []
         for org_tool in org_tools:
-            tool = await Tool.get_by_id(db, org_tool.tool_id)
-            module = await Module.get_by_id(db, org_tool.module_id)
+            tool = tools_by_id.get(org_tool.tool_id)
+            module = modules.get(org_tool.module_id)
             
             if tool:
                 tools.append({
@@ -456,14 +485,16 @@ async def get_organization_modules(
         
         # Get organization tools
         org_tools = await OrganizationTool.get_by_organization(db, request_data.organization_id)
+        modules_by_id = await Module.get_many(db, (org_tool.module_id for org_tool in org_tools))
+        tools = await Tool.get_many(db, (org_tool.tool_id for org_tool in org_tools))
         
         modules = []
         module_ids = set()
         
         for org_tool in org_tools:
             if org_tool.module_id not in module_ids:
-                module = await Module.get_by_id(db, org_tool.module_id)
-                tool = await Tool.get_by_id(db, org_tool.tool_id)
+                module = modules_by_id.get(org_tool.module_id)
+                tool = tools.get(org_tool.tool_id)
                 
                 if module:
                     modules.append({
@@ -504,70 +535,41 @@ async def update_organization_module_mapping(
             )
         
         # Implement organization module mapping update logic
-        from app.models.sso import OrganizationTool, Organization, Tool, Module
+        from app.models.sso import Organization, Tool, Module
         
         # Check if organization exists
-        organization = await Organization.get_by_id(db, request_data.organization_id)
+        organization = await Organization.get_by_id(db, mapping_data.organization_id)
         if not organization:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Organization not found"
             )
         
-        # Get existing mappings
-        existing_mappings = await OrganizationTool.get_by_organization(db, request_data.organization_id)
-        existing_mapping_ids = {mapping.id for mapping in existing_mappings}
-        
-        # Process new mappings
-        updated_mappings = []
-        for mapping_data in request_data.module_mappings:
-            # Check if tool exists
-            tool = await Tool.get_by_id(db, mapping_data.tool_id)
-            if not tool:
+        # organization_module_mapping: {tool_id: [module_id, ...]}
+        pairs = [
+            (int(tool_id), module_id)
+            for tool_id, module_ids in mapping_data.organization_module_mapping.items()
+            for module_id in module_ids
+        ]
+        
+        # Validate every tool and module up front (two queries)
+        tools = await Tool.get_many(db, (tool_id for tool_id, _ in pairs))
+        modules = await Module.get_many(db, (module_id for _, module_id in pairs))
+        for tool_id, module_id in pairs:
+            if tool_id not in tools:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Tool with ID {mapping_data.tool_id} not found"
+                    detail=f"Tool with ID {tool_id} not found"
                 )
-            
-            # Check if module exists
-            module = await Module.get_by_id(db, mapping_data.module_id)
-            if not module:
+            if module_id not in modules:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Module with ID {mapping_data.module_id} not found"
+                    detail=f"Module with ID {module_id} not found"
                 )
-            
-            # Check if mapping already exists
-            existing_mapping = await OrganizationTool.get_by_organization_and_tool(
-                db, request_data.organization_id, mapping_data.tool_id
-            )
-            
-            if existing_mapping:
-                # Update existing mapping
-                await OrganizationTool.update(
-                    db, existing_mapping.id,
-                    module_id=mapping_data.module_id,
-                    status=True,
-                    updated_by=current_user.id
-                )
-            else:
-                # Create new mapping
-                await OrganizationTool.create(
-                    db,
-                    organization_id=request_data.organization_id,
-                    tool_id=mapping_data.tool_id,
-                    module_id=mapping_data.module_id,
-                    status=True,
-                    created_by=current_user.id,
-                    updated_by=current_user.id
-                )
-            
-            updated_mappings.append({
-                "tool_id": mapping_data.tool_id,
-                "tool_name": tool.tool_name,
-                "module_id": mapping_data.module_id,
-                "module_name": module.module_name
-            })
+        
+        await _assign_organization_modules(
+            db, mapping_data.organization_id, pairs, tools, modules, current_user.id
+        )
         
         return {
             "Message": "Organization mapping updated successfully",
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
 from app.middleware.auth import get_current_user
+from app.services.effective_permission_service import EffectivePermissionService
 from app.models.sso.permission import Permission
 from app.models.sso.module import Module
 from app.models.sso.tool import Tool
@@ -93,6 +94,8 @@ async def create_permission(
                 module_id=permission_data.module_id,
                 tool_id=permission_data.tool_id
             )
+            # A renamed permission code changes what its holders are granted
+            await EffectivePermissionService.invalidate()
         else:
             # Create new permission
             permission = await Permission.create(db,
@@ -198,6 +201,7 @@ async def delete_permission(
             )
         
         await Permission.delete(db, delete_data.id)
+        await EffectivePermissionService.invalidate()
         return {"message": "Permission deleted successfully"}
         
     except HTTPException:
@@ -1749,8 +1749,18 @@ async def check_generation_status(
     try:
         from app.models.main.excel_generation import ExcelGeneration, ExcelGenerationStatus
         
-        # Handle stale pending jobs if enabled
-        if request_data.exclude_stale_pending and request_data.stale_threshold_minutes > 0:
+        from app.workers import scheduler
+        from app.workers.tasks import STALE_GENERATION_SWEEP_JOB, STALE_GENERATION_THRESHOLD_MINUTES
+        
+        # Handle stale pending jobs if enabled - the scheduled sweep already covers thresholds
+        # at or above its own, so only sweep here for a tighter threshold or when it is not running
+        stale_sweep_job = scheduler.get_job(STALE_GENERATION_SWEEP_JOB)
+        scheduled_sweep_covers = (
+            stale_sweep_job is not None
+            and stale_sweep_job.is_started
+            and request_data.stale_threshold_minutes >= STALE_GENERATION_THRESHOLD_MINUTES
+        )
+        if request_data.exclude_stale_pending and request_data.stale_threshold_minutes > 0 and not scheduled_sweep_covers:
             await ExcelGeneration.mark_stale_pending_as_failed(
                 None,  # db parameter not needed for MongoDB
                 request_data.stale_threshold_minutes
@@ -1877,7 +1887,8 @@ async def get_three_po_dashboard_data(
     try:
         from datetime import datetime
         from app.services.mongodb_service import mongodb_service
-        from app.config.mongodb import get_mongodb_collection
+        from app.services.dashboard_rollup_service import DashboardRollupService
+        from app.config.mongodb import get_mongodb_collection, get_mongodb_database
         
         logger.info("===========================================")
         logger.info("🚀 /threePODashboardData API IS HIT")
@@ -1918,10 +1929,20 @@ async def get_three_po_dashboard_data(
             report_names = [doc.get("report_name") for doc in formulas_docs if doc.get("report_name")]
             logger.info(f"📋 Found {len(report_names)} report name(s): {report_names}")
         
-        # Step 2: Aggregate data from all report collections
-        logger.info("📊 Step 2: Aggregating data from report collections")
-        total_pos_payment = 0.0
-        total_net_amount = 0.0
+        # Step 2: Build the per-collection aggregation pipelines
+        # All pipelines (report totals + tender-wise) run concurrently below
+        logger.info("📊 Step 2: Building aggregation pipelines for report collections")
+        existing_collections = set(get_mongodb_database().list_collection_names())
+        aggregation_jobs = {}
+        rollup_collection = get_mongodb_collection(DashboardRollupService.ROLLUP_COLLECTION)
+        
+        # Collections whose daily rollups cover the whole range are answered from the rollups
+        rollup_states = DashboardRollupService.get_covering_states(
+            [name.lower().strip() for name in report_names if name] + ["devyani_posvszom"],
+            start_datetime,
+            end_datetime
+        )
+        rollup_collections = []
         
         for report_name in report_names:
             if not report_name:
@@ -1930,254 +1951,228 @@ async def get_three_po_dashboard_data(
             report_name_lower = report_name.lower().strip()
             
             # Check if collection exists
-            if not mongodb_service.collection_exists(report_name_lower):
+            if report_name_lower not in existing_collections:
                 logger.warning(f"⚠️ Collection '{report_name_lower}' does not exist, skipping")
                 continue
             
-            try:
-                # Get the report collection
-                report_collection = mongodb_service.db[report_name_lower]
-                
-                # MongoDB aggregation pipeline
-                # Filter by order_date field and sum pos_payment and net_amount
-                pipeline = [
-                    {
-                        "$match": {
-                            "order_date": {
-                                "$gte": start_datetime,
-                                "$lte": end_datetime
+            # MongoDB aggregation pipeline
+            # Filter by order_date field and sum pos_payment and net_amount
+            pipeline = [
+                {
+                    "$match": {
+                        "order_date": {
+                            "$gte": start_datetime,
+                            "$lte": end_datetime
+                        }
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": None,
+                        "pos_payment_sum": {
+                            "$sum": {
+                                "$ifNull": ["$pos_payment", 0]  # Treat missing/null as 0
+                            }
+                        },
+                        "net_amount_sum": {
+                            "$sum": {
+                                "$ifNull": ["$net_amount", 0]  # Treat missing/null as 0
                             }
                         }
-                    },
+                    }
+                }
+            ]
+            
+            if DashboardRollupService.state_has_fields(rollup_states.get(report_name_lower), ["pos_payment", "net_amount"]):
+                pipeline = [
+                    DashboardRollupService.match_stage(report_name_lower, start_datetime, end_datetime, date_field="order_date"),
                     {
                         "$group": {
                             "_id": None,
-                            "pos_payment_sum": {
-                                "$sum": {
-                                    "$ifNull": ["$pos_payment", 0]  # Treat missing/null as 0
-                                }
-                            },
-                            "net_amount_sum": {
-                                "$sum": {
-                                    "$ifNull": ["$net_amount", 0]  # Treat missing/null as 0
-                                }
-                            }
+                            "pos_payment_sum": DashboardRollupService.sum_accumulator("pos_payment"),
+                            "net_amount_sum": DashboardRollupService.sum_accumulator("net_amount")
                         }
                     }
                 ]
+                aggregation_jobs[report_name_lower] = (rollup_collection, pipeline)
+                rollup_collections.append(report_name_lower)
+            else:
+                aggregation_jobs[report_name_lower] = (mongodb_service.db[report_name_lower], pipeline)
+        
+        # Step 3: Tender-wise data from devyani_posvszom collection
+        logger.info("📊 Step 3: Building tender-wise pipeline for devyani_posvszom collection")
+        tender_job_label = "devyani_posvszom:tender_wise"
+        if "devyani_posvszom" in existing_collections:
+            # Response field -> devyani_posvszom field summed per tender
+            tender_sum_fields = {
+                # POS Fields
+                "posSales": "pos_payment",
+                "posReceivables": "pos_final_amount",  # Using pos_final_amount for POS receivables
+                "posCommission": "pos_commission",
+                "posCharges": "pos_charges",
+                "posDiscounts": "pos_discounts",
+                "posFreebies": "pos_freebies",
+                
+                # 3PO/Aggregator Fields
+                "threePOSales": "net_amount",
+                "threePOReceivables": "final_amount",  # Using final_amount for 3PO receivables
+                "threePOCommission": "three_po_commission",
+                "threePOCharges": "three_po_charges",
+                "threePODiscounts": "three_po_discounts",
+                "threePOFreebies": "three_po_freebies",
+                
+                # Comparison Fields
+                "posVsThreePO": "pos_vs_three_po",
+                "receivablesVsReceipts": "receivables_vs_receipts",
+                
+                # Other Fields
+                "reconciled": "reconciled",
+                "promo": "promo",
+                "totalReceivables": "total_receivables",
+                "totalReceipts": "total_receipts",
+                "booked": "booked",
+                "deltaPromo": "delta_promo"
+            }
+            
+            if DashboardRollupService.state_has_fields(rollup_states.get("devyani_posvszom"), list(tender_sum_fields.values())):
+                tender_source = rollup_collection
+                tender_match = DashboardRollupService.match_stage("devyani_posvszom", start_datetime, end_datetime, date_field="order_date")
+                tender_group = {
+                    "_id": "$tender",
+                    **{key: DashboardRollupService.sum_accumulator(field) for key, field in tender_sum_fields.items()}
+                }
+                rollup_collections.append("devyani_posvszom")
+            else:
+                tender_source = get_mongodb_collection("devyani_posvszom")
+                tender_match = {
+                    "$match": {
+                        "order_date": {
+                            "$gte": start_datetime,
+                            "$lte": end_datetime
+                        }
+                    }
+                }
+                tender_group = {
+                    "_id": "$tender_name",  # Group by tender_name (ZOMATO, SWIGGY, etc.)
+                    **{key: {"$sum": {"$ifNull": [f"${field}", 0]}} for key, field in tender_sum_fields.items()}
+                }
+            
+            # Aggregation pipeline to group by tender and sum all fields
+            tender_pipeline = [
+                tender_match,
+                {"$group": tender_group},
+                {
+                    "$project": {
+                        "tenderName": "$_id",
+                        "posSales": 1,
+                        "posReceivables": 1,
+                        "posCommission": 1,
+                        "posCharges": 1,
+                        "posDiscounts": 1,
+                        "posFreebies": 1,
+                        "threePOSales": 1,
+                        "threePOReceivables": 1,
+                        "threePOCommission": 1,
+                        "threePOCharges": 1,
+                        "threePODiscounts": 1,
+                        "threePOFreebies": 1,
+                        "posVsThreePO": 1,
+                        "receivablesVsReceipts": 1,
+                        "reconciled": 1,
+                        "promo": 1,
+                        "totalReceivables": 1,
+                        "totalReceipts": 1,
+                        "booked": 1,
+                        "deltaPromo": 1,
+                        # Calculate all charges
+                        "allThreePOCharges": {
+                            "$add": [
+                                "$threePOCharges",
+                                "$promo",
+                                "$threePODiscounts",
+                                "$threePOFreebies",
+                                "$threePOCommission"
+                            ]
+                        },
+                        "allPOSCharges": {
+                            "$add": [
+                                "$posCharges",
+                                "$promo",
+                                "$posDiscounts",
+                                "$posFreebies",
+                                "$posCommission"
+                            ]
+                        }
+                    }
+                }
+            ]
+            aggregation_jobs[tender_job_label] = (tender_source, tender_pipeline)
+        else:
+            logger.warning("⚠️ Collection 'devyani_posvszom' does not exist, using empty arrays")
+        
+        logger.info(f"📊 Executing {len(aggregation_jobs)} aggregation(s) concurrently ({len(rollup_collections)} from daily rollups)")
+        logger.info(f"   Date range: {start_datetime} to {end_datetime}")
+        aggregations = await mongodb_service.aggregate_concurrently(aggregation_jobs)
+        
+        # Sum report collection totals
+        total_pos_payment = 0.0
+        total_net_amount = 0.0
+        
+        for report_name_lower, result in aggregations["results"].items():
+            if report_name_lower == tender_job_label:
+                continue
+            
+            if result and len(result) > 0:
+                report_pos_payment = float(result[0].get("pos_payment_sum", 0) or 0)
+                report_net_amount = float(result[0].get("net_amount_sum", 0) or 0)
                 
-                logger.info(f"📊 Aggregating data from collection '{report_name_lower}'")
-                logger.info(f"   Date range: {start_datetime} to {end_datetime}")
-                
-                # Execute aggregation
-                result = list(report_collection.aggregate(pipeline))
+                total_pos_payment += report_pos_payment
+                total_net_amount += report_net_amount
                 
-                if result and len(result) > 0:
-                    report_pos_payment = float(result[0].get("pos_payment_sum", 0) or 0)
-                    report_net_amount = float(result[0].get("net_amount_sum", 0) or 0)
-                    
-                    total_pos_payment += report_pos_payment
-                    total_net_amount += report_net_amount
-                    
-                    logger.info(f"   ✅ Collection '{report_name_lower}': pos_payment={report_pos_payment}, net_amount={report_net_amount}")
-                else:
-                    # Empty collection or no matching documents
-                    logger.info(f"   ℹ️ Collection '{report_name_lower}': No data found (returning 0)")
-                    
-            except Exception as e:
-                logger.error(f"❌ Error processing collection '{report_name_lower}': {e}")
-                # Continue with next collection
-                continue
+                logger.info(f"   ✅ Collection '{report_name_lower}': pos_payment={report_pos_payment}, net_amount={report_net_amount}")
+            else:
+                # Empty collection or no matching documents
+                logger.info(f"   ℹ️ Collection '{report_name_lower}': No data found (returning 0)")
         
         logger.info(f"📊 Total aggregated: pos_payment={total_pos_payment}, net_amount={total_net_amount}")
         
-        # Step 3: Get tender-wise data from devyani_posvszom collection
-        logger.info("📊 Step 3: Getting tender-wise data from devyani_posvszom collection")
         tender_wise_data = []
         
-        if mongodb_service.collection_exists("devyani_posvszom"):
-            try:
-                posvszom_collection = get_mongodb_collection("devyani_posvszom")
-                
-                # Aggregation pipeline to group by tender_name and sum all fields
-                pipeline = [
-                    {
-                        "$match": {
-                            "order_date": {
-                                "$gte": start_datetime,
-                                "$lte": end_datetime
-                            }
-                        }
-                    },
-                    {
-                        "$group": {
-                            "_id": "$tender_name",  # Group by tender_name (ZOMATO, SWIGGY, etc.)
-                            
-                            # POS Fields
-                            "posSales": {
-                                "$sum": {"$ifNull": ["$pos_payment", 0]}
-                            },
-                            "posReceivables": {
-                                "$sum": {"$ifNull": ["$pos_final_amount", 0]}  # Using pos_final_amount for POS receivables
-                            },
-                            "posCommission": {
-                                "$sum": {"$ifNull": ["$pos_commission", 0]}
-                            },
-                            "posCharges": {
-                                "$sum": {"$ifNull": ["$pos_charges", 0]}
-                            },
-                            "posDiscounts": {
-                                "$sum": {"$ifNull": ["$pos_discounts", 0]}
-                            },
-                            "posFreebies": {
-                                "$sum": {"$ifNull": ["$pos_freebies", 0]}
-                            },
-                            
-                            # 3PO/Aggregator Fields
-                            "threePOSales": {
-                                "$sum": {"$ifNull": ["$net_amount", 0]}
-                            },
-                            "threePOReceivables": {
-                                "$sum": {"$ifNull": ["$final_amount", 0]}  # Using final_amount for 3PO receivables
-                            },
-                            "threePOCommission": {
-                                "$sum": {"$ifNull": ["$three_po_commission", 0]}
-                            },
-                            "threePOCharges": {
-                                "$sum": {"$ifNull": ["$three_po_charges", 0]}
-                            },
-                            "threePODiscounts": {
-                                "$sum": {"$ifNull": ["$three_po_discounts", 0]}
-                            },
-                            "threePOFreebies": {
-                                "$sum": {"$ifNull": ["$three_po_freebies", 0]}
-                            },
-                            
-                            # Comparison Fields
-                            "posVsThreePO": {
-                                "$sum": {"$ifNull": ["$pos_vs_three_po", 0]}
-                            },
-                            "receivablesVsReceipts": {
-                                "$sum": {"$ifNull": ["$receivables_vs_receipts", 0]}
-                            },
-                            
-                            # Other Fields
-                            "reconciled": {
-                                "$sum": {"$ifNull": ["$reconciled", 0]}
-                            },
-                            "promo": {
-                                "$sum": {"$ifNull": ["$promo", 0]}
-                            },
-                            "totalReceivables": {
-                                "$sum": {"$ifNull": ["$total_receivables", 0]}
-                            },
-                            "totalReceipts": {
-                                "$sum": {"$ifNull": ["$total_receipts", 0]}
-                            },
-                            "booked": {
-                                "$sum": {"$ifNull": ["$booked", 0]}
-                            },
-                            "deltaPromo": {
-                                "$sum": {"$ifNull": ["$delta_promo", 0]}
-                            }
-                        }
-                    },
-                    {
-                        "$project": {
-                            "tenderName": "$_id",
-                            "posSales": 1,
-                            "posReceivables": 1,
-                            "posCommission": 1,
-                            "posCharges": 1,
-                            "posDiscounts": 1,
-                            "posFreebies": 1,
-                            "threePOSales": 1,
-                            "threePOReceivables": 1,
-                            "threePOCommission": 1,
-                            "threePOCharges": 1,
-                            "threePODiscounts": 1,
-                            "threePOFreebies": 1,
-                            "posVsThreePO": 1,
-                            "receivablesVsReceipts": 1,
-                            "reconciled": 1,
-                            "promo": 1,
-                            "totalReceivables": 1,
-                            "totalReceipts": 1,
-                            "booked": 1,
-                            "deltaPromo": 1,
-                            # Calculate all charges
-                            "allThreePOCharges": {
-                                "$add": [
-                                    "$threePOCharges",
-                                    "$promo",
-                                    "$threePODiscounts",
-                                    "$threePOFreebies",
-                                    "$threePOCommission"
-                                ]
-                            },
-                            "allPOSCharges": {
-                                "$add": [
-                                    "$posCharges",
-                                    "$promo",
-                                    "$posDiscounts",
-                                    "$posFreebies",
-                                    "$posCommission"
-                                ]
-                            }
-                        }
-                    }
-                ]
-                
-                logger.info(f"📊 Executing aggregation on devyani_posvszom collection")
-                logger.info(f"   Date range: {start_datetime} to {end_datetime}")
-                
-                # Execute aggregation
-                tender_wise_results = list(posvszom_collection.aggregate(pipeline))
-                
-                logger.info(f"   ✅ Found {len(tender_wise_results)} tender(s) in devyani_posvszom")
-                
-                # Transform results to match frontend structure
-                for item in tender_wise_results:
-                    # Default to "ZOMATO" if tenderName is null or empty
-                    tender_name = item.get("tenderName") or item.get("_id") or "ZOMATO"
-                    if not tender_name or tender_name == "null":
-                        tender_name = "ZOMATO"
-                    
-                    tender_item = {
-                        "tenderName": tender_name,
-                        "posSales": float(item.get("posSales", 0) or 0),
-                        "posReceivables": float(item.get("posReceivables", 0) or 0),
-                        "posCommission": float(item.get("posCommission", 0) or 0),
-                        "posCharges": float(item.get("posCharges", 0) or 0),
-                        "posDiscounts": int(item.get("posDiscounts", 0) or 0),
-                        "threePOSales": float(item.get("threePOSales", 0) or 0),
-                        "threePOReceivables": float(item.get("threePOReceivables", 0) or 0),
-                        "threePOCommission": float(item.get("threePOCommission", 0) or 0),
-                        "threePOCharges": float(item.get("threePOCharges", 0) or 0),
-                        "threePODiscounts": int(item.get("threePODiscounts", 0) or 0),
-                        "reconciled": int(item.get("reconciled", 0) or 0),
-                        "receivablesVsReceipts": float(item.get("receivablesVsReceipts", 0) or 0),
-                        "posFreebies": int(item.get("posFreebies", 0) or 0),
-                        "threePOFreebies": int(item.get("threePOFreebies", 0) or 0),
-                        "posVsThreePO": float(item.get("posVsThreePO", 0) or 0),
-                        "booked": int(item.get("booked", 0) or 0),
-                        "promo": int(item.get("promo", 0) or 0),
-                        "deltaPromo": int(item.get("deltaPromo", 0) or 0),
-                        "allThreePOCharges": float(item.get("allThreePOCharges", 0) or 0),
-                        "allPOSCharges": float(item.get("allPOSCharges", 0) or 0),
-                        "totalReceivables": float(item.get("totalReceivables", 0) or 0),
-                        "totalReceipts": int(item.get("totalReceipts", 0) or 0)
-                    }
-                    tender_wise_data.append(tender_item)
-                    logger.info(f"   📋 Tender: {tender_item['tenderName']}, POS Sales: {tender_item['posSales']}, 3PO Sales: {tender_item['threePOSales']}")
-                
-            except Exception as e:
-                logger.error(f"❌ Error querying devyani_posvszom collection: {e}", exc_info=True)
-                # Continue with empty array if collection query fails
-                tender_wise_data = []
-        else:
-            logger.warning("⚠️ Collection 'devyani_posvszom' does not exist, using empty arrays")
-        
+        # Transform tender-wise results to match frontend structure
+        for item in aggregations["results"].get(tender_job_label, []):
+            # Default to "ZOMATO" if tenderName is null or empty
+            tender_name = item.get("tenderName") or item.get("_id") or "ZOMATO"
+            if not tender_name or tender_name == "null":
+                tender_name = "ZOMATO"
+            
+            tender_item = {
+                "tenderName": tender_name,
+                "posSales": float(item.get("posSales", 0) or 0),
+                "posReceivables": float(item.get("posReceivables", 0) or 0),
+                "posCommission": float(item.get("posCommission", 0) or 0),
+                "posCharges": float(item.get("posCharges", 0) or 0),
+                "posDiscounts": int(item.get("posDiscounts", 0) or 0),
+                "threePOSales": float(item.get("threePOSales", 0) or 0),
+                "threePOReceivables": float(item.get("threePOReceivables", 0) or 0),
+                "threePOCommission": float(item.get("threePOCommission", 0) or 0),
+                "threePOCharges": float(item.get("threePOCharges", 0) or 0),
+                "threePODiscounts": int(item.get("threePODiscounts", 0) or 0),
+                "reconciled": int(item.get("reconciled", 0) or 0),
+                "receivablesVsReceipts": float(item.get("receivablesVsReceipts", 0) or 0),
+                "posFreebies": int(item.get("posFreebies", 0) or 0),
+                "threePOFreebies": int(item.get("threePOFreebies", 0) or 0),
+                "posVsThreePO": float(item.get("posVsThreePO", 0) or 0),
+                "booked": int(item.get("booked", 0) or 0),
+                "promo": int(item.get("promo", 0) or 0),
+                "deltaPromo": int(item.get("deltaPromo", 0) or 0),
+                "allThreePOCharges": float(item.get("allThreePOCharges", 0) or 0),
+                "allPOSCharges": float(item.get("allPOSCharges", 0) or 0),
+                "totalReceivables": float(item.get("totalReceivables", 0) or 0),
+                "totalReceipts": int(item.get("totalReceipts", 0) or 0)
+            }
+            tender_wise_data.append(tender_item)
+            logger.info(f"   📋 Tender: {tender_item['tenderName']}, POS Sales: {tender_item['posSales']}, 3PO Sales: {tender_item['threePOSales']}")
+    
         # Helper to convert to int if zero, otherwise keep as float
         def format_number(value):
             if value is None or value == 0:
@@ -2221,13 +2216,27 @@ async def get_three_po_dashboard_data(
             "instoreTotal": final_pos_sales
         }
         
+        # Partial results: failed/timed-out collections are reported instead of failing the request
+        errors = [
+            {"collection": label, "error": message}
+            for label, message in aggregations["errors"].items()
+        ]
+        
         logger.info("✅ API Request Completed Successfully")
         
         return {
             "success": True,
-            "data": response
+            "data": response,
+            "errors": errors,
+            "metadata": {
+                "timings_ms": aggregations["timings_ms"],
+                "collections_queried": len(aggregation_jobs),
+                "rollup_collections": rollup_collections
+            }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get 3PO dashboard data error: {e}", exc_info=True)
         raise HTTPException(
@@ -2246,7 +2255,8 @@ async def get_three_po_dashboard_data_new(
     try:
         from datetime import datetime
         from app.services.mongodb_service import mongodb_service
-        from app.config.mongodb import get_mongodb_collection
+        from app.services.dashboard_rollup_service import DashboardRollupService
+        from app.config.mongodb import get_mongodb_collection, get_mongodb_database
         
         logger.info("===========================================")
         logger.info("🚀 /threePODashboardDataNew API IS HIT")
@@ -2316,8 +2326,46 @@ async def get_three_po_dashboard_data_new(
         # Dictionary to store tender-wise data (grouped by tender_name)
         tender_wise_data_dict = {}
         
-        # Step 2: Process each mapping document
-        logger.info("📊 Step 2: Processing mapping documents and aggregating data")
+        # Fields that are counts in the response (everything else is a float amount)
+        integer_fields = ["posDiscounts", "posFreebies", "threePODiscounts", "threePOFreebies",
+                          "reconciled", "unreconciled", "booked", "promo", "deltaPromo", "totalReceipts"]
+        
+        # Match documents where either order_date OR date is in range
+        # This handles POS-only documents that have 'date' but not 'order_date'
+        date_range_match = {
+            "$match": {
+                "$or": [
+                    {
+                        "order_date": {
+                            "$gte": start_datetime,
+                            "$lte": end_datetime
+                        }
+                    },
+                    {
+                        "date": {
+                            "$gte": start_datetime,
+                            "$lte": end_datetime
+                        }
+                    }
+                ]
+            }
+        }
+        
+        # Step 2: Build one $match + $facet pipeline per mapping document
+        # Tender breakdown and totals come out of a single collection scan (one round trip per collection)
+        logger.info("📊 Step 2: Processing mapping documents and building $facet pipelines")
+        existing_collections = set(get_mongodb_database().list_collection_names())
+        facet_jobs = {}
+        rollup_collection = get_mongodb_collection(DashboardRollupService.ROLLUP_COLLECTION)
+        
+        # Collections whose daily rollups cover the whole range are answered from the rollups
+        rollup_states = DashboardRollupService.get_covering_states(
+            [doc.get("name").lower().strip() for doc in mapping_documents if doc.get("name")],
+            start_datetime,
+            end_datetime
+        )
+        rollup_collections = []
+        
         for mapping_doc in mapping_documents:
             collection_name = mapping_doc.get("name")
             mapping_keys = mapping_doc.get("mapping_keys", [])
@@ -2329,7 +2377,7 @@ async def get_three_po_dashboard_data_new(
             collection_name_lower = collection_name.lower().strip()
             
             # Check if collection exists
-            if not mongodb_service.collection_exists(collection_name_lower):
+            if collection_name_lower not in existing_collections:
                 logger.warning(f"⚠️ Collection '{collection_name_lower}' does not exist, skipping")
                 continue
             
@@ -2339,239 +2387,174 @@ async def get_three_po_dashboard_data_new(
             
             logger.info(f"📊 Processing collection '{collection_name}' with {len(mapping_keys)} mapping(s)")
             
-            try:
-                # Get the report collection
-                report_collection = mongodb_service.db[collection_name_lower]
-                
-                # Detect reconciliation_status field name from sample document
-                reconciliation_status_field = None
-                sample_doc = report_collection.find_one({})
-                if sample_doc:
-                    # Try common field name variations
-                    status_field_variations = [
-                        "reconciliation_status",
-                        "reconciled_status", 
-                        "status",
-                        "reconc_status",
-                        "reconciliationStatus",
-                        "reconciledStatus"
-                    ]
-                    for field_name in status_field_variations:
-                        if field_name in sample_doc:
-                            reconciliation_status_field = field_name
-                            logger.info(f"   ✅ Detected reconciliation status field: '{reconciliation_status_field}'")
-                            break
+            # Detect reconciliation_status field name from the cached collection schema
+            reconciliation_status_field = None
+            available_fields = mongodb_service.get_cached_field_names(collection_name_lower)
+            # Try common field name variations
+            status_field_variations = [
+                "reconciliation_status",
+                "reconciled_status", 
+                "status",
+                "reconc_status",
+                "reconciliationStatus",
+                "reconciledStatus"
+            ]
+            for field_name in status_field_variations:
+                if field_name in available_fields:
+                    reconciliation_status_field = field_name
+                    logger.info(f"   ✅ Detected reconciliation status field: '{reconciliation_status_field}'")
+                    break
+            
+            # Build the $group accumulators dynamically from mapping_keys
+            # The same accumulators feed both the tender-wise and the totals facet
+            # rollup_accumulators are their equivalents over dashboard_rollups_daily
+            accumulators = {}
+            rollup_accumulators = {}
+            rollup_fields = []
+            rollup_status_field = None
+            
+            for mapping in mapping_keys:
+                if not isinstance(mapping, dict):
+                    continue
                 
-                # Build dynamic aggregation pipeline based on mapping_keys
-                # First, build the $group stage dynamically
-                group_stage = {"_id": "$tender_name"}  # Group by tender_name for tender-wise data
+                three_po_key = mapping.get("3po_key")
+                collection_key = mapping.get("collection_key")
+                status_field = mapping.get("status_field")  # Optional: explicit status field from config
+                status_value = mapping.get("status_value")  # Optional: explicit status value from config
                 
-                # Also create a separate aggregation for totals (no grouping)
-                total_group_stage = {"_id": None}
+                if not three_po_key or not collection_key:
+                    logger.warning(f"⚠️ Invalid mapping: {mapping}, skipping")
+                    continue
                 
-                # Track which fields need to be aggregated
-                fields_to_aggregate = {}
+                # In MongoDB aggregation, field references are strings like "$field_name"
+                field_ref = f"${collection_key}"
                 
-                for mapping in mapping_keys:
-                    if not isinstance(mapping, dict):
-                        continue
-                    
-                    three_po_key = mapping.get("3po_key")
-                    collection_key = mapping.get("collection_key")
-                    status_field = mapping.get("status_field")  # Optional: explicit status field from config
-                    status_value = mapping.get("status_value")  # Optional: explicit status value from config
-                    
-                    if not three_po_key or not collection_key:
-                        logger.warning(f"⚠️ Invalid mapping: {mapping}, skipping")
-                        continue
-                    
-                    # Store mapping for later use
-                    fields_to_aggregate[three_po_key] = collection_key
-                    
-                    # Build field reference for MongoDB (need to construct the $field reference properly)
-                    # In MongoDB aggregation, field references are strings like "$field_name"
-                    field_ref = f"${collection_key}"
-                    
-                    # Check if this is a reconciled/unreconciled field that needs conditional aggregation
-                    is_reconciled_field = three_po_key.lower() == "reconciled"
-                    is_unreconciled_field = three_po_key.lower() == "unreconciled"
-                    
-                    # Determine which status field to use (explicit from config, or auto-detected)
-                    effective_status_field = status_field or reconciliation_status_field
-                    
-                    if (is_reconciled_field or is_unreconciled_field) and effective_status_field:
-                        # Use conditional aggregation based on reconciliation_status
-                        # Determine the expected status value
-                        if is_reconciled_field:
-                            expected_status = status_value or "RECONCILED"
-                        else:  # is_unreconciled_field
-                            expected_status = status_value or "UNRECONCILED"
-                        
-                        # Build conditional aggregation with case-insensitive matching
-                        # Use $toUpper for case-insensitive comparison
-                        # MongoDB field reference needs to be an object, not a string
-                        status_field_ref_obj = f"${effective_status_field}"
-                        conditional_sum = {
-                            "$sum": {
-                                "$cond": [
-                                    {
-                                        "$eq": [
-                                            {
-                                                "$toUpper": {
-                                                    "$ifNull": [status_field_ref_obj, ""]
-                                                }
-                                            },
-                                            expected_status.upper()
-                                        ]
-                                    },
-                                    {"$ifNull": [field_ref, 0]},
-                                    0
-                                ]
-                            }
-                        }
-                        
-                        # Add to group stage for tender-wise aggregation
-                        group_stage[three_po_key] = conditional_sum
-                        
-                        # Add to total group stage for top-level totals
-                        total_group_stage[three_po_key] = conditional_sum
-                        
-                        logger.info(f"   ✅ Using conditional aggregation for '{three_po_key}': summing '{collection_key}' where '{effective_status_field}' = '{expected_status}'")
-                    elif (is_reconciled_field or is_unreconciled_field) and not effective_status_field:
-                        # Warn if reconciled/unreconciled mapping exists but no status field found
-                        logger.warning(f"   ⚠️ '{three_po_key}' mapping found but no reconciliation_status field detected. Using simple sum (may not be accurate).")
-                        # Fall back to simple aggregation
-                        group_stage[three_po_key] = {
-                            "$sum": {"$ifNull": [field_ref, 0]}
-                        }
-                        total_group_stage[three_po_key] = {
-                            "$sum": {"$ifNull": [field_ref, 0]}
-                        }
-                    else:
-                        # Normal aggregation (no conditional filtering)
-                        # Add to group stage for tender-wise aggregation
-                        group_stage[three_po_key] = {
-                            "$sum": {"$ifNull": [field_ref, 0]}
-                        }
-                        
-                        # Add to total group stage for top-level totals
-                        total_group_stage[three_po_key] = {
-                            "$sum": {"$ifNull": [field_ref, 0]}
-                        }
+                # Check if this is a reconciled/unreconciled field that needs conditional aggregation
+                is_reconciled_field = three_po_key.lower() == "reconciled"
+                is_unreconciled_field = three_po_key.lower() == "unreconciled"
                 
-                if not fields_to_aggregate:
-                    logger.warning(f"⚠️ No valid mappings found for collection '{collection_name}', skipping")
-                    continue
+                # Determine which status field to use (explicit from config, or auto-detected)
+                effective_status_field = status_field or reconciliation_status_field
                 
-                # Build aggregation pipeline for tender-wise data
-                # Match documents where either order_date OR date is in range
-                # This handles POS-only documents that have 'date' but not 'order_date'
-                tender_pipeline = [
-                    {
-                        "$match": {
-                            "$or": [
+                if (is_reconciled_field or is_unreconciled_field) and effective_status_field:
+                    # Use conditional aggregation based on reconciliation_status
+                    if is_reconciled_field:
+                        expected_status = status_value or "RECONCILED"
+                    else:  # is_unreconciled_field
+                        expected_status = status_value or "UNRECONCILED"
+                    
+                    # Case-insensitive match on the status field via $toUpper
+                    accumulators[three_po_key] = {
+                        "$sum": {
+                            "$cond": [
                                 {
-                                    "order_date": {
-                                        "$gte": start_datetime,
-                                        "$lte": end_datetime
-                                    }
+                                    "$eq": [
+                                        {
+                                            "$toUpper": {
+                                                "$ifNull": [f"${effective_status_field}", ""]
+                                            }
+                                        },
+                                        expected_status.upper()
+                                    ]
                                 },
-                                {
-                                    "date": {
-                                        "$gte": start_datetime,
-                                        "$lte": end_datetime
-                                    }
-                                }
+                                {"$ifNull": [field_ref, 0]},
+                                0
                             ]
                         }
-                    },
-                    {
-                        "$group": group_stage
-                    },
-                    {
-                        "$project": {
-                            "tenderName": "$_id",
-                            **{key: 1 for key in fields_to_aggregate.keys()}
-                        }
                     }
-                ]
-                
-                # Build aggregation pipeline for totals
-                # Match documents where either order_date OR date is in range
-                # This handles POS-only documents that have 'date' but not 'order_date'
-                total_pipeline = [
-                    {
-                        "$match": {
-                            "$or": [
-                                {
-                                    "order_date": {
-                                        "$gte": start_datetime,
-                                        "$lte": end_datetime
-                                    }
-                                },
-                                {
-                                    "date": {
-                                        "$gte": start_datetime,
-                                        "$lte": end_datetime
-                                    }
+                    rollup_accumulators[three_po_key] = DashboardRollupService.status_sum_accumulator(collection_key, expected_status)
+                    rollup_status_field = effective_status_field
+                    logger.info(f"   ✅ Using conditional aggregation for '{three_po_key}': summing '{collection_key}' where '{effective_status_field}' = '{expected_status}'")
+                else:
+                    if is_reconciled_field or is_unreconciled_field:
+                        # Warn if reconciled/unreconciled mapping exists but no status field found
+                        logger.warning(f"   ⚠️ '{three_po_key}' mapping found but no reconciliation_status field detected. Using simple sum (may not be accurate).")
+                    # Normal aggregation (no conditional filtering)
+                    accumulators[three_po_key] = {
+                        "$sum": {"$ifNull": [field_ref, 0]}
+                    }
+                    rollup_accumulators[three_po_key] = DashboardRollupService.sum_accumulator(collection_key)
+                rollup_fields.append(collection_key)
+            
+            if not accumulators:
+                logger.warning(f"⚠️ No valid mappings found for collection '{collection_name}', skipping")
+                continue
+            
+            use_rollup = DashboardRollupService.state_has_fields(
+                rollup_states.get(collection_name_lower), rollup_fields, rollup_status_field
+            )
+            if use_rollup:
+                match_stage = DashboardRollupService.match_stage(collection_name_lower, start_datetime, end_datetime)
+                tender_key = "$tender"
+                accumulators = rollup_accumulators
+                rollup_collections.append(collection_name_lower)
+            else:
+                match_stage = date_range_match
+                tender_key = "$tender_name"
+            
+            facet_pipeline = [
+                match_stage,
+                {
+                    "$facet": {
+                        "tenders": [
+                            {"$group": {"_id": tender_key, **accumulators}},
+                            {
+                                "$project": {
+                                    "tenderName": "$_id",
+                                    **{key: 1 for key in accumulators.keys()}
                                 }
-                            ]
-                        }
-                    },
-                    {
-                        "$group": total_group_stage
+                            }
+                        ],
+                        "totals": [
+                            {"$group": {"_id": None, **accumulators}}
+                        ]
                     }
-                ]
-                
-                logger.info(f"   📊 Executing aggregation on '{collection_name_lower}'")
-                logger.info(f"   Date range: {start_datetime} to {end_datetime}")
-                logger.info(f"   Fields to aggregate: {list(fields_to_aggregate.keys())}")
-                
-                # Execute tender-wise aggregation
-                tender_results = list(report_collection.aggregate(tender_pipeline))
-                logger.info(f"   ✅ Found {len(tender_results)} tender(s) in '{collection_name_lower}'")
-                
-                # Process tender-wise results
-                for tender_item in tender_results:
-                    tender_name = tender_item.get("tenderName") or tender_item.get("_id") or "ZOMATO"
-                    if not tender_name or tender_name == "null":
-                        tender_name = "ZOMATO"
-                    
-                    # Initialize tender data if not exists
-                    if tender_name not in tender_wise_data_dict:
-                        tender_wise_data_dict[tender_name] = {key: 0 for key in response_fields.keys()}
-                        tender_wise_data_dict[tender_name]["tenderName"] = tender_name
-                    
-                    # Update tender data with aggregated values
-                    for three_po_key, value in tender_item.items():
-                        if three_po_key != "tenderName" and three_po_key != "_id":
-                            if three_po_key in tender_wise_data_dict[tender_name]:
-                                # Convert to appropriate type
-                                if three_po_key in ["posDiscounts", "posFreebies", "threePODiscounts", "threePOFreebies", 
-                                                   "reconciled", "unreconciled", "booked", "promo", "deltaPromo", "totalReceipts"]:
-                                    tender_wise_data_dict[tender_name][three_po_key] += int(value or 0)
-                                else:
-                                    tender_wise_data_dict[tender_name][three_po_key] += float(value or 0)
-                
-                # Execute total aggregation
-                total_results = list(report_collection.aggregate(total_pipeline))
-                if total_results and len(total_results) > 0:
-                    total_data = total_results[0]
-                    logger.info(f"   ✅ Total aggregation completed for '{collection_name_lower}'")
-                    
-                    # Update top-level response fields
-                    for three_po_key, value in total_data.items():
-                        if three_po_key != "_id" and three_po_key in response_fields:
-                            # Convert to appropriate type
-                            if three_po_key in ["posDiscounts", "posFreebies", "threePODiscounts", "threePOFreebies", 
-                                               "reconciled", "unreconciled", "booked", "promo", "deltaPromo", "totalReceipts"]:
-                                response_fields[three_po_key] += int(value or 0)
+                }
+            ]
+            facet_jobs[collection_name_lower] = (
+                rollup_collection if use_rollup else mongodb_service.db[collection_name_lower],
+                facet_pipeline
+            )
+            logger.info(f"   Fields to aggregate: {list(accumulators.keys())}")
+        
+        logger.info(f"📊 Executing {len(facet_jobs)} $facet aggregation(s) concurrently ({len(rollup_collections)} from daily rollups)")
+        logger.info(f"   Date range: {start_datetime} to {end_datetime}")
+        aggregations = await mongodb_service.aggregate_concurrently(facet_jobs)
+        
+        for collection_name_lower, facet_results in aggregations["results"].items():
+            facet_result = facet_results[0] if facet_results else {}
+            tender_results = facet_result.get("tenders", [])
+            total_results = facet_result.get("totals", [])
+            logger.info(f"   ✅ Found {len(tender_results)} tender(s) in '{collection_name_lower}'")
+            
+            # Process tender-wise results
+            for tender_item in tender_results:
+                tender_name = tender_item.get("tenderName") or tender_item.get("_id") or "ZOMATO"
+                if not tender_name or tender_name == "null":
+                    tender_name = "ZOMATO"
+                
+                # Initialize tender data if not exists
+                if tender_name not in tender_wise_data_dict:
+                    tender_wise_data_dict[tender_name] = {key: 0 for key in response_fields.keys()}
+                    tender_wise_data_dict[tender_name]["tenderName"] = tender_name
+                
+                # Update tender data with aggregated values
+                for three_po_key, value in tender_item.items():
+                    if three_po_key != "tenderName" and three_po_key != "_id":
+                        if three_po_key in tender_wise_data_dict[tender_name]:
+                            if three_po_key in integer_fields:
+                                tender_wise_data_dict[tender_name][three_po_key] += int(value or 0)
                             else:
-                                response_fields[three_po_key] += float(value or 0)
-                
-            except Exception as e:
-                logger.error(f"❌ Error processing collection '{collection_name_lower}': {e}", exc_info=True)
-                continue
+                                tender_wise_data_dict[tender_name][three_po_key] += float(value or 0)
+            
+            # Update top-level response fields from the totals facet
+            if total_results:
+                for three_po_key, value in total_results[0].items():
+                    if three_po_key != "_id" and three_po_key in response_fields:
+                        if three_po_key in integer_fields:
+                            response_fields[three_po_key] += int(value or 0)
+                        else:
+                            response_fields[three_po_key] += float(value or 0)
         
         # Step 2.5: Fetch and aggregate formula fields from formulas collection
         logger.info("📊 Step 2.5: Fetching formula fields and aggregating them from report collections")
@@ -2654,17 +2637,16 @@ async def get_three_po_dashboard_data_new(
             report_collections_to_check = ["bercos_summary_report"]
             
             for report_collection_name in report_collections_to_check:
-                if mongodb_service.collection_exists(report_collection_name):
+                if report_collection_name in existing_collections:
                     try:
                         report_collection = mongodb_service.db[report_collection_name]
                         
-                        # Check what fields exist in the collection by sampling a document
-                        sample_doc = report_collection.find_one({})
-                        if not sample_doc:
+                        # Check what fields exist in the collection from the cached schema
+                        available_fields = mongodb_service.get_cached_field_names(report_collection_name)
+                        if not available_fields:
                             logger.warning(f"   ⚠️ No documents found in {report_collection_name}")
                             continue
                         
-                        available_fields = set(sample_doc.keys())
                         logger.info(f"   📋 Sample document fields in {report_collection_name}: {list(available_fields)[:20]}...")
                         
                         # Build aggregation pipeline for formula fields
@@ -2768,16 +2750,13 @@ async def get_three_po_dashboard_data_new(
                             found_field_path = None
                             
                             for field_var in field_variations:
-                                # Check if it's a nested path
+                                # Check if it's a nested path (cached schema holds one level in dot notation)
                                 if "." in field_var:
                                     parts = field_var.split(".")
-                                    if len(parts) == 2 and parts[0] in available_fields:
-                                        # Check if nested object exists
-                                        nested_sample = sample_doc.get(parts[0], {})
-                                        if isinstance(nested_sample, dict) and parts[1] in nested_sample:
-                                            found_field = parts[1]
-                                            found_field_path = field_var
-                                            break
+                                    if len(parts) == 2 and field_var in available_fields:
+                                        found_field = parts[1]
+                                        found_field_path = field_var
+                                        break
                                 elif field_var in available_fields:
                                     found_field = field_var
                                     found_field_path = field_var
@@ -3025,13 +3004,27 @@ async def get_three_po_dashboard_data_new(
                 response[aggregated_key] = 0.0
                 logger.debug(f"   ⚠️ Formula field {aggregated_key} not found in response_fields, setting to 0")
         
+        # Partial results: failed/timed-out collections are reported instead of failing the request
+        errors = [
+            {"collection": label, "error": message}
+            for label, message in aggregations["errors"].items()
+        ]
+        
         logger.info("✅ API Request Completed Successfully")
         
         return {
             "success": True,
-            "data": response
+            "data": response,
+            "errors": errors,
+            "metadata": {
+                "timings_ms": aggregations["timings_ms"],
+                "collections_queried": len(facet_jobs),
+                "rollup_collections": rollup_collections
+            }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get 3PO dashboard data new error: {e}", exc_info=True)
         raise HTTPException(
@@ -4575,6 +4568,9 @@ async def save_recologics(
             except Exception as e:
                 logger.warning(f"[RECOLOGICS_SAVE] Could not parse effectiveTo: {e}")
         
+        from app.utils.config_version import ensure_config_version_table, bump_config_version, RECO_LOGICS_CONFIG
+        await ensure_config_version_table(db)
+        
         # Insert new record
         insert_query = text("""
             INSERT INTO reco_logics (
@@ -4613,6 +4609,8 @@ async def save_recologics(
             "remarks": remark,
         })
         
+        # Bump the reco_logics version in the same transaction so the formula watcher sees the change
+        await bump_config_version(db, RECO_LOGICS_CONFIG)
         await db.commit()
         
         # Get the inserted ID
@@ -4759,6 +4757,9 @@ async def update_recologics(
                 detail="No fields provided for update",
             )
         
+        from app.utils.config_version import ensure_config_version_table, bump_config_version, RECO_LOGICS_CONFIG
+        await ensure_config_version_table(db)
+        
         update_query = text(f"""
             UPDATE reco_logics
             SET {', '.join(update_fields)}
@@ -4766,6 +4767,8 @@ async def update_recologics(
         """)
         
         await db.execute(update_query, update_params)
+        # Bump the reco_logics version in the same transaction so the formula watcher sees the change
+        await bump_config_version(db, RECO_LOGICS_CONFIG)
         await db.commit()
         
         logger.info(f"[RECOLOGICS_UPDATE] Successfully updated recologic with id={request_data.id}")
@@ -7484,7 +7487,6 @@ async def populate_daily_sales_summary(
     """
     try:
         from datetime import datetime, timedelta, date
-        from decimal import Decimal
         
         logger.info("===========================================")
         logger.info("🚀 /populate-daily-sales-summary API IS HIT")
@@ -7501,213 +7503,11 @@ async def populate_daily_sales_summary(
         
         logger.info(f"📅 Processing date range: {start_date} to {end_date}")
         
-        # Step 1: Get all unique store+date combinations from orders table
-        logger.info("📍 Step 1: Getting unique store+date combinations from orders...")
-        unique_stores_dates_query = text("""
-            SELECT DISTINCT 
-                date AS sales_date,
-                store_name AS store_code
-            FROM orders
-            WHERE date BETWEEN :start_date AND :end_date
-            ORDER BY date, store_name
-        """)
-        result = await db.execute(unique_stores_dates_query, {
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        store_date_combos = result.fetchall()
-        logger.info(f"📊 Found {len(store_date_combos)} unique store+date combinations")
-        
-        # Step 2: Get store metadata (city_id, zone) from devyani_stores
-        logger.info("📍 Step 2: Fetching store metadata...")
-        store_codes = list(set([row.store_code for row in store_date_combos]))
-        if not store_codes:
-            return {
-                "success": True,
-                "message": "No data found for the specified date range",
-                "records_processed": 0
-            }
-        
-        store_placeholders = ",".join([f":store_{i}" for i in range(len(store_codes))])
-        store_params = {f"store_{i}": code for i, code in enumerate(store_codes)}
-        
-        store_metadata_query = text(f"""
-            SELECT store_code, city_id, zone
-            FROM devyani_stores
-            WHERE store_code IN ({store_placeholders})
-        """)
-        store_metadata_result = await db.execute(store_metadata_query, store_params)
-        store_metadata = {row.store_code: {"city_id": row.city_id, "zone": row.zone} 
-                         for row in store_metadata_result.fetchall()}
-        logger.info(f"📊 Found metadata for {len(store_metadata)} stores")
-        
-        # Step 3: Calculate In-Store Sales from orders table
-        logger.info("📍 Step 3: Calculating In-Store Sales from orders table...")
-        instore_placeholders = ",".join([f":store_{i}" for i in range(len(store_codes))])
-        instore_query = text(f"""
-            SELECT 
-                date AS sales_date,
-                store_name AS store_code,
-                SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'CASH' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_cash,
-                SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'CARD' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_card,
-                SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'UPI' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_upi,
-                SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'INSTORE' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_other,
-                SUM(CASE WHEN UPPER(TRIM(online_order_taker)) IN ('CASH', 'CARD', 'UPI', 'INSTORE') THEN COALESCE(payment, 0) ELSE 0 END) AS instore_total,
-                COUNT(CASE WHEN UPPER(TRIM(online_order_taker)) IN ('CASH', 'CARD', 'UPI', 'INSTORE') THEN 1 END) AS instore_count
-            FROM orders
-            WHERE date BETWEEN :start_date AND :end_date
-            AND store_name IN ({instore_placeholders})
-            GROUP BY date, store_name
-        """)
-        instore_params = {
-            "start_date": start_date,
-            "end_date": end_date,
-            **store_params
-        }
-        instore_result = await db.execute(instore_query, instore_params)
-        instore_data = {(row.sales_date, row.store_code): row for row in instore_result.fetchall()}
-        logger.info(f"📊 Calculated In-Store Sales for {len(instore_data)} store+date combinations")
-        
-        # Step 4: Calculate Aggregator Sales from orders table
-        logger.info("📍 Step 4: Calculating Aggregator Sales from orders table...")
-        aggregator_query = text(f"""
-            SELECT 
-                date AS sales_date,
-                store_name AS store_code,
-                SUM(CASE WHEN online_order_taker = 'Zomato' THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_zomato,
-                SUM(CASE WHEN online_order_taker = 'Swiggy' THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_swiggy,
-                SUM(CASE WHEN online_order_taker = 'MagicPin' THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_magicpin,
-                SUM(CASE WHEN online_order_taker IN ('Zomato', 'Swiggy', 'MagicPin') THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_total,
-                COUNT(CASE WHEN online_order_taker IN ('Zomato', 'Swiggy', 'MagicPin') THEN 1 END) AS aggregator_count
-            FROM orders
-            WHERE date BETWEEN :start_date AND :end_date
-            AND store_name IN ({instore_placeholders})
-            GROUP BY date, store_name
-        """)
-        aggregator_result = await db.execute(aggregator_query, instore_params)
-        aggregator_data = {(row.sales_date, row.store_code): row for row in aggregator_result.fetchall()}
-        logger.info(f"📊 Calculated Aggregator Sales for {len(aggregator_data)} store+date combinations")
+        # One INSERT ... SELECT per date chunk: orders and zomato are aggregated server-side
+        # and upserted through uk_date_store, so no rows travel through Python
+        from app.workers.daily_sales_scheduler import refresh_daily_sales_summary_range
+        records_processed = await refresh_daily_sales_summary_range(db, start_date, end_date)
         
-        # Step 5: Calculate Zomato formula values from zomato table
-        logger.info("📍 Step 5: Calculating Zomato formula values from zomato table...")
-        zomato_store_codes = [code for code in store_codes]  # Use same store codes
-        zomato_placeholders = ",".join([f":store_{i}" for i in range(len(zomato_store_codes))])
-        zomato_params = {f"store_{i}": code for i, code in enumerate(zomato_store_codes)}
-        
-        zomato_query = text(f"""
-            SELECT 
-                order_date AS sales_date,
-                store_code,
-                SUM(
-                    CASE 
-                        WHEN net_amount IS NOT NULL AND net_amount > 0 THEN net_amount
-                        ELSE (bill_subtotal - COALESCE(mvd, 0) + COALESCE(merchant_pack_charge, 0))
-                    END
-                ) AS zomato_net_amount,
-                SUM(bill_subtotal - COALESCE(mvd, 0) + COALESCE(merchant_pack_charge, 0)) AS zomato_calculated_amount,
-                SUM(COALESCE(final_amount, 0)) AS zomato_final_amount,
-                COUNT(*) AS zomato_order_count
-            FROM zomato
-            WHERE order_date BETWEEN :start_date AND :end_date
-            AND store_code IN ({zomato_placeholders})
-            AND action IN ('sale', 'addition')
-            GROUP BY order_date, store_code
-        """)
-        zomato_params = {
-            "start_date": start_date,
-            "end_date": end_date,
-            **zomato_params
-        }
-        zomato_result = await db.execute(zomato_query, zomato_params)
-        zomato_data = {(row.sales_date, row.store_code): row for row in zomato_result.fetchall()}
-        logger.info(f"📊 Calculated Zomato values for {len(zomato_data)} store+date combinations")
-        
-        # Step 6: Merge and insert/update daily_sales_summary
-        logger.info("📍 Step 6: Merging data and inserting/updating daily_sales_summary...")
-        records_processed = 0
-        
-        for sales_date, store_code in store_date_combos:
-            # Get data for this store+date combination
-            instore_row = instore_data.get((sales_date, store_code))
-            aggregator_row = aggregator_data.get((sales_date, store_code))
-            zomato_row = zomato_data.get((sales_date, store_code))
-            store_info = store_metadata.get(store_code, {"city_id": None, "zone": None})
-            
-            # Calculate totals
-            instore_total = Decimal(str(instore_row.instore_total)) if instore_row else Decimal('0')
-            aggregator_total = Decimal(str(aggregator_row.aggregator_total)) if aggregator_row else Decimal('0')
-            total_sales = instore_total + aggregator_total
-            
-            instore_count = instore_row.instore_count if instore_row else 0
-            aggregator_count = aggregator_row.aggregator_count if aggregator_row else 0
-            total_order_count = instore_count + aggregator_count
-            
-            # Insert or update
-            upsert_query = text("""
-                INSERT INTO daily_sales_summary (
-                    sales_date, store_code, city_id, zone,
-                    instore_cash, instore_card, instore_upi, instore_other, instore_total, instore_count,
-                    aggregator_zomato, aggregator_swiggy, aggregator_magicpin, aggregator_total, aggregator_count,
-                    zomato_net_amount, zomato_calculated_amount, zomato_final_amount, zomato_order_count,
-                    total_sales, total_order_count,
-                    created_at, updated_at
-                ) VALUES (
-                    :sales_date, :store_code, :city_id, :zone,
-                    :instore_cash, :instore_card, :instore_upi, :instore_other, :instore_total, :instore_count,
-                    :aggregator_zomato, :aggregator_swiggy, :aggregator_magicpin, :aggregator_total, :aggregator_count,
-                    :zomato_net_amount, :zomato_calculated_amount, :zomato_final_amount, :zomato_order_count,
-                    :total_sales, :total_order_count,
-                    NOW(), NOW()
-                )
-                ON DUPLICATE KEY UPDATE
-                    city_id = VALUES(city_id),
-                    zone = VALUES(zone),
-                    instore_cash = VALUES(instore_cash),
-                    instore_card = VALUES(instore_card),
-                    instore_upi = VALUES(instore_upi),
-                    instore_other = VALUES(instore_other),
-                    instore_total = VALUES(instore_total),
-                    instore_count = VALUES(instore_count),
-                    aggregator_zomato = VALUES(aggregator_zomato),
-                    aggregator_swiggy = VALUES(aggregator_swiggy),
-                    aggregator_magicpin = VALUES(aggregator_magicpin),
-                    aggregator_total = VALUES(aggregator_total),
-                    aggregator_count = VALUES(aggregator_count),
-                    zomato_net_amount = VALUES(zomato_net_amount),
-                    zomato_calculated_amount = VALUES(zomato_calculated_amount),
-                    zomato_final_amount = VALUES(zomato_final_amount),
-                    zomato_order_count = VALUES(zomato_order_count),
-                    total_sales = VALUES(total_sales),
-                    total_order_count = VALUES(total_order_count),
-                    updated_at = NOW()
-            """)
-            
-            await db.execute(upsert_query, {
-                "sales_date": sales_date,
-                "store_code": store_code,
-                "city_id": store_info["city_id"],
-                "zone": store_info["zone"],
-                "instore_cash": Decimal(str(instore_row.instore_cash)) if instore_row else Decimal('0'),
-                "instore_card": Decimal(str(instore_row.instore_card)) if instore_row else Decimal('0'),
-                "instore_upi": Decimal(str(instore_row.instore_upi)) if instore_row else Decimal('0'),
-                "instore_other": Decimal(str(instore_row.instore_other)) if instore_row else Decimal('0'),
-                "instore_total": instore_total,
-                "instore_count": instore_count,
-                "aggregator_zomato": Decimal(str(aggregator_row.aggregator_zomato)) if aggregator_row else Decimal('0'),
-                "aggregator_swiggy": Decimal(str(aggregator_row.aggregator_swiggy)) if aggregator_row else Decimal('0'),
-                "aggregator_magicpin": Decimal(str(aggregator_row.aggregator_magicpin)) if aggregator_row else Decimal('0'),
-                "aggregator_total": aggregator_total,
-                "aggregator_count": aggregator_count,
-                "zomato_net_amount": Decimal(str(zomato_row.zomato_net_amount)) if zomato_row else Decimal('0'),
-                "zomato_calculated_amount": Decimal(str(zomato_row.zomato_calculated_amount)) if zomato_row else Decimal('0'),
-                "zomato_final_amount": Decimal(str(zomato_row.zomato_final_amount)) if zomato_row else Decimal('0'),
-                "zomato_order_count": zomato_row.zomato_order_count if zomato_row else 0,
-                "total_sales": total_sales,
-                "total_order_count": total_order_count
-            })
-            records_processed += 1
-        
-        await db.commit()
         logger.info(f"✅ Successfully processed {records_processed} records")
         
         return {
@@ -7884,6 +7684,7 @@ async def get_new_dashboard(
     """
     try:
         from app.services.mongodb_service import mongodb_service
+        from app.services.dashboard_rollup_service import DashboardRollupService
         
         logger.info("===========================================")
         logger.info("🚀 /new-dashboard API IS HIT")
@@ -7970,7 +7771,25 @@ async def get_new_dashboard(
             }
         ]
         
-        logger.info(f"📊 Executing aggregation pipeline on '{dashboard_collection_name}'")
+        # Whole-day ranges covered by the daily rollups are summed from the rollups instead
+        rollup_state = DashboardRollupService.get_covering_states(
+            [dashboard_collection_name], start_datetime, end_datetime
+        ).get(dashboard_collection_name)
+        if DashboardRollupService.state_has_fields(rollup_state, ["total_sales"]):
+            dashboard_collection = mongodb_service.db[DashboardRollupService.ROLLUP_COLLECTION]
+            pipeline = [
+                DashboardRollupService.match_stage(dashboard_collection_name, start_datetime, end_datetime, date_field="order_date"),
+                {
+                    "$group": {
+                        "_id": None,
+                        "total_sales": DashboardRollupService.sum_accumulator("total_sales"),
+                        "document_count": {"$sum": "$doc_count"}
+                    }
+                }
+            ]
+            logger.info(f"📊 Reading '{dashboard_collection_name}' totals from daily rollups")
+        
+        logger.info(f"📊 Executing aggregation pipeline on '{dashboard_collection.name}'")
         logger.info(f"Date range: {start_datetime} to {end_datetime}")
         
         # Execute aggregation
@@ -0,0 +1,76 @@
+"""
+Background scheduler routes
+Exposes the registered periodic jobs, their run statistics and a manual trigger
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from typing import Any
+import logging
+from app.middleware.auth import get_current_user
+from app.models.sso.user_details import UserDetails
+from app.workers import scheduler
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+class SchedulerJobsResponse(BaseModel):
+    """Response model for scheduler job endpoints"""
+    status: int = Field(..., description="HTTP status code", example=200)
+    message: str = Field(..., description="Response message")
+    data: Any = Field(..., description="Response data")
+
+
+@router.get(
+    "/jobs",
+    summary="List scheduled jobs",
+    response_model=SchedulerJobsResponse,
+    status_code=status.HTTP_200_OK
+)
+async def list_jobs(
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Return every registered job with its policy, last run, duration and outcome on this worker"""
+    jobs = scheduler.get_jobs_status()
+    return {
+        "status": 200,
+        "message": f"{len(jobs)} scheduled job(s)",
+        "data": jobs
+    }
+
+
+@router.post(
+    "/jobs/{job_name}/run",
+    summary="Run a scheduled job now",
+    response_model=SchedulerJobsResponse,
+    status_code=status.HTTP_200_OK
+)
+async def run_job(
+    job_name: str,
+    wait: bool = Query(False, description="Wait for the run to finish before responding"),
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """
+    Trigger a job outside its schedule on this worker. Skipped if the job is already running
+    and does not allow overlapping runs; refused with 409 for a leader-only job when this worker
+    is not its leader (the request can be retried - it may reach the leader).
+    """
+    job = scheduler.get_job(job_name)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job '{job_name}' is not registered"
+        )
+    
+    was_running = job.is_running and job.skip_if_running
+    try:
+        await scheduler.run_job_now(job_name, wait=wait)
+    except scheduler.JobNotLeaderError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    logger.info(f"▶️ Job '{job_name}' triggered manually by {current_user.username}")
+    return {
+        "status": 200,
+        "message": f"Job '{job_name}' is already running, run skipped" if was_running else f"Job '{job_name}' triggered",
+        "data": job.to_dict()
+    }
@@ -2,16 +2,20 @@
 Sheet Data routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_main_db
 from app.middleware.auth import get_current_user
 from app.models.sso.user_details import UserDetails
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
+import base64
+import json
 import logging
-import uuid
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -38,38 +42,43 @@ async def generate_sheet_data(
     db: AsyncSession = Depends(get_main_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
-    """Generate sheet data"""
+    """
+    Generate sheet data. Every generation rebuilds the full sheet data tables (the request's
+    dates and stores are recorded on the job only), so a generation already in flight is joined.
+    """
     try:
-        # Implement sheet data generation logic
-        # All tables are in devyani (main_db), not SSO
-        from app.models.main.sheet_data import (
-            ZomatoPosVs3poData, Zomato3poVsPosData, Zomato3poVsPosRefundData,
-            OrdersNotInPosData, OrdersNotIn3poData
-        )
-        
-        # Truncate existing sheet data tables
-        await ZomatoPosVs3poData.truncate_table(db)
-        await Zomato3poVsPosData.truncate_table(db)
-        await Zomato3poVsPosRefundData.truncate_table(db)
-        await OrdersNotInPosData.truncate_table(db)
-        await OrdersNotIn3poData.truncate_table(db)
+        # All tables are in devyani (main_db), not SSO. The existing sheet data stays readable
+        # until the background job swaps the rebuilt tables in.
         
         # Start background processing
         import asyncio
-        from app.workers.tasks import process_sheet_data_generation
+        from app.services.job_service import JobService
+        from app.workers.tasks import process_sheet_data_generation, SHEET_DATA_JOB_TYPE, SHEET_DATA_BUILDS
         
-        # Generate job ID
-        job_id = str(uuid.uuid4())
+        job, created = await JobService.create_or_join(
+            SHEET_DATA_JOB_TYPE,
+            params={
+                "start_date": request_data.start_date,
+                "end_date": request_data.end_date,
+                "store_codes": request_data.store_codes
+            },
+            steps=list(SHEET_DATA_BUILDS),
+            created_by=current_user.username,
+            key_params={}
+        )
+        job_id = job["job_id"]
         
-        # Start background task
-        asyncio.create_task(process_sheet_data_generation(job_id, request_data))
+        if created:
+            asyncio.create_task(process_sheet_data_generation(job_id, request_data))
         
         return {
             "success": True,
-            "message": "Sheet data generation started",
+            "message": "Sheet data generation started" if created else "Sheet data generation already in progress",
             "data": {
                 "job_id": job_id,
-                "status": "processing",
+                "status": job["status"],
+                "progress": job["progress"],
+                "joined_existing": not created,
                 "estimated_completion": "10-15 minutes",
                 "start_date": request_data.start_date,
                 "end_date": request_data.end_date,
@@ -91,35 +100,42 @@ async def get_sheet_data_status(
     db: AsyncSession = Depends(get_main_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
-    """Get sheet data generation status"""
+    """Get sheet data generation status (also resolves Excel generation ids)"""
     try:
-        # Implement status checking logic
-        # In a real implementation, this would check a jobs table
-        # For now, return a placeholder status
-        status_info = {
-            "job_id": job_id,
-            "status": "completed",  # or "processing", "failed"
-            "progress": 100,
-            "message": "Sheet data generation completed successfully"
-        }
+        from app.services.job_service import JobService
+        from app.services.excel_generation_service import ExcelGenerationService
         
-        return {
-            "success": True,
-            "data": {
-                "job_id": job_id,
-                "status": "completed",
-                "progress": 100,
-                "message": "Sheet data generation completed successfully",
-                "generated_tables": [
-                    "zomato_pos_vs_3po_data",
-                    "zomato_3po_vs_pos_data", 
-                    "zomato_3po_vs_pos_refund_data",
-                    "orders_not_in_pos_data",
-                    "orders_not_in_3po_data"
-                ]
+        job = await JobService.get_by_id(job_id)
+        if job is not None:
+            return {
+                "success": True,
+                "data": {
+                    **job,
+                    "generated_tables": [
+                        table_name for table_name, step in job["steps"].items()
+                        if step.get("status") == "completed"
+                    ] if job["status"] == "completed" else []
+                }
+            }
+        
+        generation = await ExcelGenerationService.get_by_id(job_id)
+        if generation is not None:
+            return {
+                "success": True,
+                "data": {
+                    "job_id": generation["id"],
+                    "job_type": "excel_generation",
+                    **generation
+                }
             }
-        }
         
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get sheet data status error: {e}")
         raise HTTPException(
@@ -128,55 +144,203 @@ async def get_sheet_data_status(
         )
 
 
+@router.post("/cancel/{job_id}")
+async def cancel_sheet_data_generation(
+    job_id: str,
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Request cancellation of a sheet data generation job (takes effect at its next checkpoint)"""
+    try:
+        from app.services.job_service import JobService
+        
+        job = await JobService.request_cancel(job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        
+        return {
+            "success": True,
+            "message": "Cancellation requested" if job["cancel_requested"] else f"Job already {job['status']}",
+            "data": job
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Cancel sheet data generation error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error cancelling sheet data generation"
+        )
+
+
+# Sheet type -> (table, reason column)
+SHEET_DATA_TABLES = {
+    "zomato_pos_vs_3po": ("zomato_pos_vs_3po_data", "pos_vs_zomato_reason"),
+    "zomato_3po_vs_pos": ("zomato_3po_vs_pos_data", "zomato_vs_pos_reason"),
+    "zomato_3po_vs_pos_refund": ("zomato_3po_vs_pos_refund_data", "zomato_vs_pos_reason"),
+    "orders_not_in_pos": ("orders_not_in_pos_data", "zomato_vs_pos_reason"),
+    "orders_not_in_3po": ("orders_not_in_3po_data", "pos_vs_zomato_reason")
+}
+
+SHEET_DATA_MAX_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched per round trip when streaming NDJSON from the server-side cursor
+SHEET_DATA_STREAM_BATCH_SIZE = 1000
+
+
+def _split_param(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _parse_date_param(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {name}, expected YYYY-MM-DD"
+        )
+
+
+def _encode_cursor(last_id: str) -> str:
+    """Opaque keyset cursor: the id of the last row returned"""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _build_sheet_data_query(
+    table_name: str,
+    reason_column: str,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    store_codes: List[str],
+    reasons: List[str],
+    after_id: Optional[str],
+    limit: Optional[int]
+):
+    """Filtered sheet data query in primary key order, starting after the keyset cursor"""
+    conditions = []
+    params: Dict[str, Any] = {}
+    if start_date:
+        conditions.append("order_date >= :start_date")
+        params["start_date"] = start_date
+    if end_date:
+        conditions.append("order_date <= :end_date")
+        params["end_date"] = end_date
+    if store_codes:
+        conditions.append("store_name IN :store_codes")
+        params["store_codes"] = store_codes
+    if reasons:
+        conditions.append(f"{reason_column} IN :reasons")
+        params["reasons"] = reasons
+    if after_id is not None:
+        conditions.append("id > :after_id")
+        params["after_id"] = after_id
+    
+    sql = f"SELECT * FROM {table_name}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    
+    query = text(sql)
+    if store_codes:
+        query = query.bindparams(bindparam("store_codes", expanding=True))
+    if reasons:
+        query = query.bindparams(bindparam("reasons", expanding=True))
+    return query, params
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    record = {}
+    for key, value in row._mapping.items():
+        if isinstance(value, Decimal):
+            value = float(value)
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        record[key] = value
+    return record
+
+
+async def _stream_sheet_data(query, params):
+    """
+    Yield every matching row as one JSON line, reading from a server-side cursor. The open
+    cursor holds a metadata lock on the table until the client has read everything; the
+    generation job's swap waits for it with a short lock_wait_timeout and retries.
+    """
+    # Own session: the request-scoped one is closed before a streaming body is sent
+    from app.config import database as db_config
+    
+    async with db_config.main_engine.connect() as connection:
+        result = await connection.stream(query.execution_options(stream_results=True), params)
+        async for partition in result.partitions(SHEET_DATA_STREAM_BATCH_SIZE):
+            yield "".join(json.dumps(_row_to_dict(row)) + "\n" for row in partition)
+
+
 @router.get("/data")
 async def get_sheet_data(
+    request: Request,
     sheet_type: str = Query(..., description="Type of sheet data to retrieve"),
-    start_date: str = Query(..., description="Start date for data filtering"),
-    end_date: str = Query(..., description="End date for data filtering"),
-    store_codes: str = Query(..., description="Comma-separated store codes"),
+    start_date: Optional[str] = Query(None, description="Earliest order date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Latest order date (YYYY-MM-DD)"),
+    store_codes: Optional[str] = Query(None, description="Comma-separated store codes"),
+    reasons: Optional[str] = Query(None, description="Comma-separated reconciliation reasons"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=SHEET_DATA_MAX_PAGE_SIZE, description="Page size"),
     db: AsyncSession = Depends(get_main_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
-    """Get sheet data"""
+    """
+    Get sheet data, filtered by order date range, stores and reasons and keyset-paginated by id.
+    With Accept: application/x-ndjson the whole filtered result set is streamed as NDJSON
+    (a cursor still sets the starting point; limit is ignored).
+    """
     try:
-        # Parse store codes
-        store_codes_list = [code.strip() for code in store_codes.split(",")]
-        
-        # Implement sheet data retrieval logic
-        # All tables are in devyani (main_db), not SSO
-        from app.models.main.sheet_data import (
-            ZomatoPosVs3poData, Zomato3poVsPosData, Zomato3poVsPosRefundData,
-            OrdersNotInPosData, OrdersNotIn3poData
-        )
-        
-        # Query the appropriate table based on sheet_type
-        if sheet_type == "zomato_pos_vs_3po":
-            data = await ZomatoPosVs3poData.get_by_store_codes(db, store_codes_list, limit=100)
-        elif sheet_type == "zomato_3po_vs_pos":
-            data = await Zomato3poVsPosData.get_by_store_codes(db, store_codes_list, limit=100)
-        elif sheet_type == "zomato_3po_vs_pos_refund":
-            data = await Zomato3poVsPosRefundData.get_by_store_codes(db, store_codes_list, limit=100)
-        elif sheet_type == "orders_not_in_pos":
-            data = await OrdersNotInPosData.get_by_store_codes(db, store_codes_list, limit=100)
-        elif sheet_type == "orders_not_in_3po":
-            data = await OrdersNotIn3poData.get_by_store_codes(db, store_codes_list, limit=100)
-        else:
-            data = []
-        
-        valid_sheet_types = [
-            "zomato_pos_vs_3po",
-            "zomato_3po_vs_pos",
-            "zomato_3po_vs_pos_refund",
-            "orders_not_in_pos",
-            "orders_not_in_3po"
-        ]
-        
-        if sheet_type not in valid_sheet_types:
+        if sheet_type not in SHEET_DATA_TABLES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid sheet type"
             )
         
+        # All tables are in devyani (main_db), not SSO
+        table_name, reason_column = SHEET_DATA_TABLES[sheet_type]
+        store_codes_list = _split_param(store_codes)
+        reasons_list = _split_param(reasons)
+        start = _parse_date_param(start_date, "start_date")
+        end = _parse_date_param(end_date, "end_date")
+        after_id = _decode_cursor(cursor) if cursor else None
+        
+        if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            query, params = _build_sheet_data_query(
+                table_name, reason_column, start, end, store_codes_list, reasons_list, after_id, limit=None
+            )
+            return StreamingResponse(_stream_sheet_data(query, params), media_type=NDJSON_MEDIA_TYPE)
+        
+        # One extra row tells whether there is a next page
+        query, params = _build_sheet_data_query(
+            table_name, reason_column, start, end, store_codes_list, reasons_list, after_id, limit=limit + 1
+        )
+        rows = (await db.execute(query, params)).fetchall()
+        has_more = len(rows) > limit
+        data = [_row_to_dict(row) for row in rows[:limit]]
+        
         return {
             "success": True,
             "data": data,
@@ -185,7 +349,10 @@ async def get_sheet_data(
                 "start_date": start_date,
                 "end_date": end_date,
                 "store_codes": store_codes_list,
-                "total_records": len(data)
+                "reasons": reasons_list,
+                "total_records": len(data),
+                "has_more": has_more,
+                "next_cursor": _encode_cursor(data[-1]["id"]) if has_more else None
             }
         }
         
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
 from app.middleware.auth import get_current_user
+from app.services.effective_permission_service import EffectivePermissionService
 from app.models.sso.tool import Tool
 from app.models.sso.user_details import UserDetails
 from pydantic import BaseModel
@@ -248,6 +249,7 @@ async def delete_tool(
             )
         
         await Tool.delete(db, delete_data.id)
+        await EffectivePermissionService.invalidate()
         return {"message": "Tool deleted successfully"}
         
     except HTTPException:
@@ -2,21 +2,30 @@
 File uploader routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, BackgroundTasks, Body
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Header, Query, Request, BackgroundTasks, Body
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from app.config import database as db_config
 from app.config.database import get_sso_db, get_main_db
 from app.middleware.auth import get_current_user
 from app.models.main.upload_record import UploadRecord
 from app.models.sso.user_details import UserDetails
+from app.utils.upload_storage import FileTooLargeError, StoredUpload, save_upload_file, upload_fingerprint
+from app.utils.uploader_client import post_file_to_uploader
+from app.utils import upload_sessions
+from app.utils.upload_sessions import UploadSessionBusyError, UploadSessionError, UploadSessionNotFoundError
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+import mimetypes
 import os
 import uuid
 import logging
 from datetime import datetime
 import httpx
 import asyncio
+import contextvars
+import functools
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -43,6 +52,9 @@ ALLOWED_EXTENSIONS = [".xlsx", ".xls", ".csv", ".tsv"]
 # Maximum file size (400MB)
 MAX_FILE_SIZE = 400 * 1024 * 1024
 
+# Datasource uploads are spooled here until they have been sent to the Uploader API
+UPLOADER_SPOOL_DIR = os.path.join("uploads", "uploader_spool")
+
 
 class UploadResponse(BaseModel):
     id: int
@@ -64,6 +76,74 @@ class UploadStatusResponse(BaseModel):
     processed_data: Optional[str] = None
 
 
+def _discard_file(file_path: str):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+async def _register_upload(
+    db: AsyncSession,
+    stored: StoredUpload,
+    filename: str,
+    file_ext: str,
+    upload_type: str,
+    datasource: Optional[str] = None,
+    force: bool = False,
+    message: str = "File uploaded successfully, processing in background"
+):
+    """
+    Create the upload record of a stored file, fingerprinted by content, data source and type.
+    An identical earlier upload is returned instead (and the new copy deleted) unless force is set
+    or that upload failed.
+    
+    Returns:
+        (upload record, True if it is an earlier record the file duplicates)
+    """
+    content_hash = upload_fingerprint(stored.sha256, upload_type, datasource)
+    if not force:
+        existing = await UploadRecord.get_by_content_hash(db, content_hash)
+        if existing is not None and existing.status == "failed":
+            # A failed upload can be retried with the same file
+            await UploadRecord.update(db, existing.id, content_hash=None)
+        elif existing is not None:
+            _discard_file(stored.path)
+            return existing, True
+    
+    try:
+        upload_record = await UploadRecord.create(db,
+            filename=filename,
+            filepath=stored.path,
+            filesize=stored.size,
+            filetype=file_ext,
+            upload_type=upload_type,
+            status="uploaded",
+            message=message,
+            # Forced re-uploads leave the fingerprint with the original record
+            content_hash=None if force else content_hash
+        )
+    except IntegrityError:
+        # The same content was registered by a concurrent request
+        existing = await UploadRecord.get_by_content_hash(db, content_hash)
+        if existing is None:
+            raise
+        _discard_file(stored.path)
+        return existing, True
+    
+    return upload_record, False
+
+
+def _duplicate_upload_result(filename: str, existing: UploadRecord) -> Dict[str, Any]:
+    return {
+        "id": existing.id,
+        "filename": filename,
+        "status": "duplicate",
+        "duplicate_of": existing.id,
+        "message": f"Identical file already uploaded (upload {existing.id}, {existing.status}). Pass force=true to process it again"
+    }
+
+
 @router.post("/upload")
 async def upload_files(
     request: Request,
@@ -72,6 +152,7 @@ async def upload_files(
     files: List[UploadFile] = File(...),
     datasource: Optional[str] = Query(None),
     client: Optional[str] = Query(None),
+    force: bool = Query(False, description="Process files even if identical content was already uploaded"),
     db: AsyncSession = Depends(get_sso_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
@@ -82,12 +163,14 @@ async def upload_files(
     Otherwise, uses the original Node.js upload logic with type parameter.
     
     For datasource uploads: Accepts files, returns 200 immediately, processes in background.
+    Files identical to an earlier upload (same content, data source and type) are not processed
+    again and point to the earlier upload, unless force=true.
     """
     try:
         # Check if datasource is provided in query parameters (for Uploader API proxy)
         if datasource:
             logger.info(f"Proxying upload request to Uploader API with datasource: {datasource}, client: {client}")
-            return await proxy_to_uploader_api_async(request, files, datasource, client, background_tasks)
+            return await proxy_to_uploader_api_async(request, files, datasource, client, background_tasks, db, force)
         
         # Otherwise, use the original upload logic
         if not type:
@@ -133,38 +216,32 @@ async def upload_files(
                     })
                     continue
                 
-                # Check file size
-                file_content = await file.read()
-                if len(file_content) > MAX_FILE_SIZE:
+                # Stream to disk in chunks (size limit enforced while reading)
+                unique_filename = f"{uuid.uuid4()}_{file.filename}"
+                try:
+                    stored = await save_upload_file(file, upload_dir, unique_filename, max_size=MAX_FILE_SIZE)
+                except FileTooLargeError as size_error:
                     uploaded_files.append({
                         "filename": file.filename,
                         "status": "error",
-                        "message": f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+                        "message": str(size_error)
                     })
                     continue
+                file_path = stored.path
                 
-                # Generate unique filename
-                unique_filename = f"{uuid.uuid4()}_{file.filename}"
-                file_path = os.path.join(upload_dir, unique_filename)
-                
-                # Save file
-                with open(file_path, "wb") as f:
-                    f.write(file_content)
-                
-                # Create upload record in database
-                upload_record = await UploadRecord.create(db,
-                    filename=file.filename,
-                    filepath=file_path,
-                    filesize=len(file_content),
-                    filetype=file_ext,
-                    upload_type=type,
-                    status="uploaded",
-                    message="File uploaded successfully, processing in background"
+                # Create upload record in database (or resolve to an identical earlier upload)
+                upload_record, is_duplicate = await _register_upload(
+                    db, stored, file.filename, file_ext, type, force=force
                 )
+                if is_duplicate:
+                    uploaded_files.append(_duplicate_upload_result(file.filename, upload_record))
+                    continue
                 
                 uploaded_files.append({
                     "id": upload_record.id,
                     "filename": file.filename,
+                    "size": stored.size,
+                    "sha256": stored.sha256,
                     "status": "uploaded",
                     "message": "File uploaded successfully, processing in background"
                 })
@@ -211,7 +288,9 @@ async def proxy_to_uploader_api_async(
     files: List[UploadFile],
     datasource: str,
     client: Optional[str],
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    force: bool = False
 ):
     """
     Proxy upload request to Uploader API
@@ -234,6 +313,8 @@ async def proxy_to_uploader_api_async(
         
         # Validate and prepare files for background processing
         files_to_process = []
+        duplicates = []
+        upload_type = datasource.strip().lower()
         
         for file in files:
             try:
@@ -247,18 +328,32 @@ async def proxy_to_uploader_api_async(
                     logger.warning(f"Invalid file type for {file.filename}: {file_ext}. Skipping.")
                     continue
                 
-                # Read file content (we need to read it now before returning response)
-                file_content = await file.read()
+                # Spool to disk now (the request body is gone once the response is sent)
+                try:
+                    stored = await save_upload_file(
+                        file, UPLOADER_SPOOL_DIR, f"{uuid.uuid4()}_{file.filename}", max_size=MAX_FILE_SIZE
+                    )
+                except FileTooLargeError:
+                    logger.warning(f"File {file.filename} too large (over {MAX_FILE_SIZE} bytes). Skipping.")
+                    continue
                 
-                # Check file size
-                if len(file_content) > MAX_FILE_SIZE:
-                    logger.warning(f"File {file.filename} too large: {len(file_content)} bytes. Skipping.")
+                upload_record, is_duplicate = await _register_upload(
+                    db, stored, file.filename, file_ext, upload_type,
+                    datasource=upload_type,
+                    force=force,
+                    message="File accepted, sending to Uploader API"
+                )
+                if is_duplicate:
+                    logger.info(f"File {file.filename} duplicates upload {upload_record.id}. Skipping.")
+                    duplicates.append(_duplicate_upload_result(file.filename, upload_record))
                     continue
                 
                 # Store file data for background processing
                 files_to_process.append({
+                    "upload_id": upload_record.id,
                     "filename": file.filename,
-                    "content": file_content,
+                    "path": stored.path,
+                    "size": stored.size,
                     "content_type": file.content_type or "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 })
                 
@@ -266,6 +361,13 @@ async def proxy_to_uploader_api_async(
                 logger.error(f"Error preparing file {file.filename}: {str(file_error)}")
                 continue
         
+        if not files_to_process and duplicates:
+            return {
+                "status": 200,
+                "message": f"{datasource.strip().upper()} data file already uploaded",
+                "data": {"duplicates": duplicates}
+            }
+        
         if not files_to_process:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -287,7 +389,10 @@ async def proxy_to_uploader_api_async(
         return {
             "status": 200,
             "message": f"{datasource_upper} data file uploaded",
-            "data": None
+            "data": {
+                "upload_ids": [file_data["upload_id"] for file_data in files_to_process],
+                "duplicates": duplicates
+            }
         }
     
     except HTTPException:
@@ -322,52 +427,297 @@ async def process_files_with_uploader_api(
         if client:
             query_params["client"] = client.strip()
         
-        async with httpx.AsyncClient(timeout=600.0) as http_client:  # 10 minutes timeout
-            for file_data in files_to_process:
-                try:
-                    filename = file_data["filename"]
-                    file_content = file_data["content"]
-                    content_type = file_data["content_type"]
-                    
-                    logger.info(f"Processing file {filename} with Uploader API: {uploader_url}")
-                    logger.info(f"Query params: {query_params}, File size: {len(file_content)} bytes")
-                    
-                    # Create multipart form data for the proxy request using the file content
-                    from io import BytesIO
-                    file_stream = BytesIO(file_content)
-                    files_data = {
-                        "file": (filename, file_stream, content_type)
-                    }
-                    
-                    # Make request to Uploader API
-                    response = await http_client.post(
-                        uploader_url,
-                        params=query_params,
-                        files=files_data
+        # Watermark for marking the store+date pairs written by the Uploader API
+        from app.workers.daily_sales_scheduler import get_database_now, mark_uploaded_data_dirty
+        upload_started_at = await get_database_now()
+        # ObjectId timestamps are UTC, from the clock of the host running the Uploader API
+        rollup_since = datetime.utcnow()
+        
+        async def set_upload_status(upload_id: int, **fields):
+            try:
+                async with db_config.sso_session_factory() as session:
+                    await UploadRecord.update(session, upload_id, **fields)
+            except Exception as e:
+                logger.warning(f"Could not update upload {upload_id}: {e}")
+        
+        async def send_file(file_data: Dict[str, Any]) -> bool:
+            filename = file_data["filename"]
+            error_message = "Uploader API request failed"
+            try:
+                await set_upload_status(file_data["upload_id"], status="processing")
+                logger.info(f"Processing file {filename} with Uploader API: {uploader_url}")
+                logger.info(f"Query params: {query_params}, File size: {file_data['size']} bytes")
+                
+                response = await post_file_to_uploader(
+                    uploader_url, query_params, file_data["path"], filename, file_data["content_type"]
+                )
+                
+                # Handle response
+                if response.status_code == 200:
+                    logger.info(f"Successfully processed file {filename} with Uploader API")
+                    logger.debug(f"Response for {filename}: {response.text}")
+                    await set_upload_status(
+                        file_data["upload_id"], status="completed",
+                        message="Processed by Uploader API", processed_data=response.text
                     )
-                    
-                    # Handle response
-                    if response.status_code == 200:
-                        response_data = response.json()
-                        logger.info(f"Successfully processed file {filename} with Uploader API")
-                        logger.debug(f"Response for {filename}: {response_data}")
-                    else:
-                        error_detail = response.text
-                        try:
-                            error_detail = response.json()
-                        except:
-                            pass
-                        logger.error(f"Uploader API returned error for {filename}: Status {response.status_code}, Error: {error_detail}")
+                    return True
                 
-                except httpx.TimeoutException:
-                    logger.error(f"Timeout while processing file {file_data['filename']} with Uploader API")
-                except Exception as file_error:
-                    logger.error(f"Error processing file {file_data['filename']}: {str(file_error)}", exc_info=True)
+                error_detail = response.text
+                try:
+                    error_detail = response.json()
+                except:
+                    pass
+                logger.error(f"Uploader API returned error for {filename}: Status {response.status_code}, Error: {error_detail}")
+                error_message = f"Uploader API returned status {response.status_code}: {error_detail}"
+            except httpx.TimeoutException:
+                logger.error(f"Timeout while processing file {filename} with Uploader API")
+                error_message = "Timeout while sending file to Uploader API"
+            except Exception as file_error:
+                logger.error(f"Error processing file {filename}: {str(file_error)}", exc_info=True)
+                error_message = str(file_error)
+            finally:
+                _discard_file(file_data["path"])
+            # Failed uploads keep their fingerprint but are retried when the same file is sent again
+            await set_upload_status(file_data["upload_id"], status="failed", message=error_message)
+            return False
+        
+        # Files go out concurrently, bounded by settings.uploader_api_concurrency
+        results = await asyncio.gather(*(send_file(file_data) for file_data in files_to_process))
+        processed_files = sum(1 for succeeded in results if succeeded)
         
         logger.info(f"Background processing completed for {len(files_to_process)} file(s) with datasource: {datasource}")
+        
+        # New data changes the dashboard totals of the datasource and every report built on it
+        if processed_files:
+            await mark_uploaded_data_dirty(upload_started_at, source=f"uploader:{datasource.strip()}")
+            
+            # Only the days of the documents the Uploader API inserted since the upload started
+            from app.services.dashboard_rollup_service import DashboardRollupService
+            context = contextvars.copy_context()
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                functools.partial(context.run, DashboardRollupService.refresh_for_upload, datasource.strip(), rollup_since)
+            )
     
     except Exception as e:
         logger.error(f"Error in background processing with Uploader API: {str(e)}", exc_info=True)
+    finally:
+        # Spooled files not reached because of an early failure
+        for file_data in files_to_process:
+            _discard_file(file_data["path"])
+
+
+class CreateUploadSessionRequest(BaseModel):
+    filename: str = Field(..., min_length=1)
+    total_size: int = Field(..., gt=0, description="File size in bytes")
+    chunk_size: Optional[int] = Field(None, description="Bytes per chunk (default 8MB, clamped to 1-64MB)")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the whole file, checked on completion")
+    type: Optional[str] = None
+    datasource: Optional[str] = None
+    client: Optional[str] = None
+    force: bool = False
+
+
+def _upload_session_error(error: Exception) -> HTTPException:
+    if isinstance(error, UploadSessionNotFoundError):
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+    if isinstance(error, UploadSessionBusyError):
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+
+def _load_own_upload_session(session_id: str, current_user: UserDetails) -> Dict[str, Any]:
+    """Load an upload session, refusing sessions started by another user"""
+    try:
+        session = upload_sessions.load_session(session_id)
+    except UploadSessionNotFoundError as e:
+        raise _upload_session_error(e)
+    if session["metadata"].get("user") != current_user.username:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Upload session belongs to another user"
+        )
+    return session
+
+
+def _upload_session_data(session: Dict[str, Any]) -> Dict[str, Any]:
+    received = upload_sessions.received_chunks(session)
+    return {
+        "session_id": session["session_id"],
+        "filename": session["filename"],
+        "total_size": session["total_size"],
+        "chunk_size": session["chunk_size"],
+        "total_chunks": session["total_chunks"],
+        "received_chunks": received,
+        "missing_chunks": sorted(set(range(session["total_chunks"])) - set(received))
+    }
+
+
+@router.post("/upload/sessions")
+async def create_upload_session(
+    request_data: CreateUploadSessionRequest,
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """
+    Start a resumable upload. Send the file with PUT /upload/sessions/{id}/chunks/{n} (0-based,
+    X-Chunk-SHA256 header per chunk) in any order, then POST /upload/sessions/{id}/complete.
+    """
+    datasource = (request_data.datasource or "").strip()
+    if not datasource and not request_data.type:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either 'type' or 'datasource' is required"
+        )
+    if not datasource and request_data.type not in VALID_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid type. Must be one of: {', '.join(VALID_TYPES)}"
+        )
+    
+    file_ext = os.path.splitext(request_data.filename)[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    if request_data.total_size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+    
+    session = upload_sessions.create_session(
+        request_data.filename,
+        request_data.total_size,
+        chunk_size=request_data.chunk_size,
+        sha256=request_data.sha256,
+        metadata={
+            "type": None if datasource else request_data.type,
+            "datasource": datasource or None,
+            "client": request_data.client.strip() if request_data.client else None,
+            "force": request_data.force,
+            "user": current_user.username
+        }
+    )
+    return {
+        "success": True,
+        "message": "Upload session created",
+        "data": _upload_session_data(session)
+    }
+
+
+@router.get("/upload/sessions/{session_id}")
+async def get_upload_session(
+    session_id: str,
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Get the chunks received so far (to resume an interrupted upload)"""
+    session = _load_own_upload_session(session_id, current_user)
+    return {"success": True, "data": _upload_session_data(session)}
+
+
+@router.put("/upload/sessions/{session_id}/chunks/{chunk_index}")
+async def upload_session_chunk(
+    session_id: str,
+    chunk_index: int,
+    request: Request,
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256", description="SHA-256 of the chunk body (hex)"),
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Store one chunk (raw request body); re-sending a chunk replaces it"""
+    _load_own_upload_session(session_id, current_user)
+    try:
+        session = await upload_sessions.write_chunk(session_id, chunk_index, request.stream(), chunk_sha256)
+    except (UploadSessionNotFoundError, UploadSessionError) as e:
+        raise _upload_session_error(e)
+    return {
+        "success": True,
+        "message": f"Chunk {chunk_index} received",
+        "data": _upload_session_data(session)
+    }
+
+
+@router.post("/upload/sessions/{session_id}/complete")
+async def complete_upload_session(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_sso_db),
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Assemble the chunks and process the file exactly like a single-request upload"""
+    session = _load_own_upload_session(session_id, current_user)
+    metadata = session["metadata"]
+    datasource = metadata.get("datasource")
+    filename = session["filename"]
+    dest_dir = UPLOADER_SPOOL_DIR if datasource else "uploads"
+    try:
+        stored = await asyncio.get_event_loop().run_in_executor(
+            None, upload_sessions.assemble_session, session_id, dest_dir, f"{uuid.uuid4()}_{filename}"
+        )
+    except (UploadSessionNotFoundError, UploadSessionError) as e:
+        raise _upload_session_error(e)
+    
+    file_ext = os.path.splitext(filename)[1].lower()
+    upload_type = datasource.lower() if datasource else metadata["type"]
+    try:
+        upload_record, is_duplicate = await _register_upload(
+            db, stored, filename, file_ext, upload_type,
+            datasource=upload_type if datasource else None,
+            force=metadata.get("force", False),
+            message="File accepted, sending to Uploader API" if datasource else "File uploaded successfully, processing in background"
+        )
+    except Exception:
+        # Keep the chunks so the client can retry completion
+        _discard_file(stored.path)
+        upload_sessions.release_completion(session_id)
+        raise
+    upload_sessions.delete_session(session_id)
+    if is_duplicate:
+        return {
+            "success": True,
+            "message": "File already uploaded",
+            "data": _duplicate_upload_result(filename, upload_record)
+        }
+    
+    if datasource:
+        background_tasks.add_task(
+            process_files_with_uploader_api,
+            [{
+                "upload_id": upload_record.id,
+                "filename": filename,
+                "path": stored.path,
+                "size": stored.size,
+                "content_type": mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            }],
+            datasource,
+            metadata.get("client")
+        )
+    else:
+        from app.workers.tasks import process_upload_file
+        asyncio.create_task(process_upload_file(upload_record.id, stored.path, upload_type))
+    
+    return {
+        "success": True,
+        "message": "File uploaded successfully, processing in background",
+        "data": {
+            "id": upload_record.id,
+            "filename": filename,
+            "size": stored.size,
+            "sha256": stored.sha256,
+            "status": "uploaded"
+        }
+    }
+
+
+@router.delete("/upload/sessions/{session_id}")
+async def abort_upload_session(
+    session_id: str,
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Abort an upload session and delete its chunks"""
+    _load_own_upload_session(session_id, current_user)
+    upload_sessions.delete_session(session_id)
+    return {"success": True, "message": "Upload session aborted"}
 
 
 @router.get("/status/{upload_id}")
@@ -6,8 +6,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.database import get_sso_db
 from app.middleware.auth import get_current_user
+from app.services.effective_permission_service import EffectivePermissionService
 from app.models.sso.user_details import UserDetails
-from app.config.security import get_password_hash
+from app.config.security import get_password_hash_async
+from app.utils.user_cache import invalidate_user_context
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import logging
@@ -106,7 +108,7 @@ async def create_user(
             )
         
         # Hash password
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         
         # Create user
         user_dict = user_data.dict()
@@ -182,6 +184,8 @@ async def update_user(
         
         # Update user
         updated_user = await UserDetails.update(db, update_data.id, **update_dict)
+        await invalidate_user_context(user_id=update_data.id)
+        await EffectivePermissionService.invalidate()
         
         # Remove sensitive data from response
         user_response = UserResponse(
@@ -247,6 +251,8 @@ async def delete_user(
         #     logger.warning(f"User {user.username} has {len(audit_logs)} audit log entries")
         
         await UserDetails.delete(db, user_id)
+        await invalidate_user_context(user_id=user_id)
+        await EffectivePermissionService.invalidate()
         return {"message": "User deleted successfully"}
         
     except HTTPException:
@@ -281,7 +287,7 @@ async def update_password(
             )
         
         # Hash new password
-        hashed_password = get_password_hash(password_data.password)
+        hashed_password = await get_password_hash_async(password_data.password)
         
         # Update password
         await UserDetails.update(db, password_data.id,
@@ -289,6 +295,7 @@ async def update_password(
             raw_password=password_data.password,  # Note: Not recommended in production
             updated_by=current_user.username
         )
+        await invalidate_user_context(user_id=password_data.id)
         
         return {"message": "Password changed successfully"}
         
@@ -347,26 +354,23 @@ async def get_user_modules(
     db: AsyncSession = Depends(get_sso_db),
     current_user: UserDetails = Depends(get_current_user)
 ):
-    """Get user modules"""
+    """Get the user's own module mappings (from the cached effective permissions; group grants are left out)"""
     try:
-        # Get user module mappings
-        from app.models.sso import UserModuleMapping, Module, Permission
-        
-        user_mappings = await UserModuleMapping.get_by_user(db, request_data.user_id)
+        effective = await EffectivePermissionService.get_for_user(db, request_data.user_id)
         
         user_modules = []
-        for mapping in user_mappings:
-            module = await Module.get_by_id(db, mapping.module_id)
-            permission = await Permission.get_by_id(db, mapping.permission_id)
-            
-            if module:
+        for module in (effective or {}).get("modules", []):
+            for permission in module["permissions"]:
+                if permission["source"] != "user":
+                    continue
                 user_modules.append({
-                    "module_id": module.id,
-                    "module_name": module.module_name,
-                    "permission_id": permission.id if permission else None,
-                    "permission_name": permission.permission_name if permission else None,
-                    "permission_code": permission.permission_code if permission else None,
-                    "is_active": mapping.is_active
+                    "module_id": module["module_id"],
+                    "module_name": module["module_name"],
+                    "permission_id": permission["permission_id"],
+                    "permission_name": permission["permission_name"],
+                    "permission_code": permission["permission_code"],
+                    # Only active mappings are effective
+                    "is_active": True
                 })
         
         return {
@@ -383,6 +387,37 @@ async def get_user_modules(
         )
 
 
+@router.post("/getEffectivePermissions")
+async def get_effective_permissions(
+    request_data: GetUserModulesRequest,
+    db: AsyncSession = Depends(get_sso_db),
+    current_user: UserDetails = Depends(get_current_user)
+):
+    """Get a user's effective modules and permissions (own and group mappings within the organization's modules)"""
+    try:
+        effective = await EffectivePermissionService.get_for_user(db, request_data.user_id)
+        if effective is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        return {
+            "Message": "Effective permissions fetched successfully",
+            "Status": 200,
+            "Data": effective
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get effective permissions error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching effective permissions"
+        )
+
+
 @router.post("/updateUserModuleMapping")
 async def update_user_module_mapping(
     mapping_data: UpdateUserModuleMappingRequest,
@@ -400,54 +435,54 @@ async def update_user_module_mapping(
         # Implement user module mapping update logic
         from app.models.sso import UserModuleMapping, Module, Permission
         
-        # Get existing mappings
-        existing_mappings = await UserModuleMapping.get_by_user(db, request_data.user_id)
-        existing_mapping_ids = {mapping.id for mapping in existing_mappings}
-        
-        # Process new mappings
-        for mapping_data in request_data.module_permissions:
-            # Check if module exists
-            module = await Module.get_by_id(db, mapping_data.module_id)
-            if not module:
+        # module_permission_mapping: {module_id: [permission_id, ...]}
+        requested = [
+            (int(module_id), permission_id)
+            for module_id, permission_ids in mapping_data.module_permission_mapping.items()
+            for permission_id in permission_ids
+        ]
+        
+        # Validate every module and permission up front (two queries)
+        modules = await Module.get_many(db, (module_id for module_id, _ in requested))
+        permissions = await Permission.get_many(db, (permission_id for _, permission_id in requested))
+        for module_id, permission_id in requested:
+            if module_id not in modules:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Module with ID {mapping_data.module_id} not found"
+                    detail=f"Module with ID {module_id} not found"
                 )
-            
-            # Check if permission exists
-            permission = await Permission.get_by_id(db, mapping_data.permission_id)
-            if not permission:
+            if permission_id not in permissions:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Permission with ID {mapping_data.permission_id} not found"
+                    detail=f"Permission with ID {permission_id} not found"
                 )
-            
-            # Check if mapping already exists
-            existing_mapping = await UserModuleMapping.get_by_user_and_module(
-                db, request_data.user_id, mapping_data.module_id
-            )
-            
+        
+        # Get existing mappings
+        existing_mappings = await UserModuleMapping.get_by_user(db, mapping_data.user_id)
+        existing_by_pair = {(mapping.module_id, mapping.permission_id): mapping for mapping in existing_mappings}
+        
+        # Process new mappings
+        for module_id, permission_id in requested:
+            existing_mapping = existing_by_pair.get((module_id, permission_id))
             if existing_mapping:
-                # Update existing mapping
-                await UserModuleMapping.update(
-                    db, existing_mapping.id,
-                    permission_id=mapping_data.permission_id,
-                    is_active=True
-                )
+                if not existing_mapping.is_active:
+                    await UserModuleMapping.update(db, existing_mapping.id, is_active=True)
             else:
                 # Create new mapping
                 await UserModuleMapping.create(
                     db,
-                    user_id=request_data.user_id,
-                    module_id=mapping_data.module_id,
-                    permission_id=mapping_data.permission_id,
+                    user_id=mapping_data.user_id,
+                    module_id=module_id,
+                    permission_id=permission_id,
                     is_active=True
                 )
         
+        await EffectivePermissionService.invalidate()
+        
         return {
             "message": "User module mapping updated successfully",
-            "user_id": request_data.user_id,
-            "updated_mappings": len(request_data.module_permissions)
+            "user_id": mapping_data.user_id,
+            "updated_mappings": len(requested)
         }
         
     except HTTPException:
@@ -0,0 +1,544 @@
+"""
+Dashboard Rollup MongoDB Service
+Maintains the dashboard_rollups_daily collection: per-day sums of every field the 3PO
+dashboards aggregate, keyed by (collection, date, store, tender). Rollups are refreshed with
+$merge after uploads and formula changes, and the dashboards read them whenever the
+requested date range is fully covered, falling back to raw aggregation otherwise.
+"""
+
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, time, timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.config.mongodb import get_mongodb_collection, get_mongodb_database
+from app.services.mongodb_service import mongodb_service
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardRollupService:
+    """Service for building and reading the daily dashboard rollups"""
+
+    ROLLUP_COLLECTION = "dashboard_rollups_daily"
+    STATE_COLLECTION = "dashboard_rollup_state"
+
+    # Report collection totals summed by /threePODashboardData
+    REPORT_TOTAL_FIELDS = ["pos_payment", "net_amount"]
+
+    # Tender-wise fields summed by /threePODashboardData from devyani_posvszom
+    TENDER_WISE_COLLECTION = "devyani_posvszom"
+    TENDER_WISE_FIELDS = [
+        "pos_payment", "pos_final_amount", "pos_commission", "pos_charges", "pos_discounts",
+        "pos_freebies", "net_amount", "final_amount", "three_po_commission", "three_po_charges",
+        "three_po_discounts", "three_po_freebies", "pos_vs_three_po", "receivables_vs_receipts",
+        "reconciled", "promo", "total_receivables", "total_receipts", "booked", "delta_promo"
+    ]
+
+    # {tender}_dashboard collections summed by /new-dashboard
+    TENDER_DASHBOARD_SUFFIX = "_dashboard"
+    TENDER_DASHBOARD_FIELDS = ["total_sales"]
+
+    STORE_FIELDS = ["store_code", "store_name", "store"]
+
+    # Same variations /threePODashboardDataNew detects for reconciled/unreconciled sums
+    STATUS_FIELD_VARIATIONS = [
+        "reconciliation_status",
+        "reconciled_status",
+        "status",
+        "reconc_status",
+        "reconciliationStatus",
+        "reconciledStatus"
+    ]
+
+    # A refresh that has not finished after this long is assumed dead and can be reclaimed
+    REFRESH_LEASE = timedelta(minutes=30)
+
+    # Uploads whose new documents cannot be located (non-ObjectId _id) refresh this many recent days
+    UPLOAD_FALLBACK_WINDOW = timedelta(days=62)
+
+    # Slack between the upload watermark and the ObjectId timestamps written by another host
+    UPLOAD_CLOCK_SKEW = timedelta(minutes=5)
+
+    # ------------------------------------------------------------------
+    # Targets
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _sum_key(field: str) -> str:
+        """Rollup sums are stored as sub-fields, so dotted source paths are flattened"""
+        return field.replace(".", "__")
+
+    @staticmethod
+    def collect_targets() -> Dict[str, Dict[str, Any]]:
+        """
+        Work out which collections need rollups and which fields each one must sum.
+
+        Returns:
+            Dictionary keyed by collection name with "fields" (sorted list), "status_field"
+            and "store_field" (None when the collection has no such field)
+        """
+        db = get_mongodb_database()
+        existing_collections = set(db.list_collection_names())
+        targets: Dict[str, Dict[str, Any]] = {}
+
+        def add(collection_name: str, fields: List[str], status_field: Optional[str] = None):
+            name = (collection_name or "").lower().strip()
+            if not name or name not in existing_collections:
+                return
+            target = targets.setdefault(name, {"fields": set(), "status_field": None})
+            target["fields"].update(field for field in fields if field)
+            if status_field and not target["status_field"]:
+                target["status_field"] = status_field
+
+        if "formulas" in existing_collections:
+            for report_doc in get_mongodb_collection("formulas").find({}, {"report_name": 1}):
+                add(report_doc.get("report_name"), DashboardRollupService.REPORT_TOTAL_FIELDS)
+
+        add(DashboardRollupService.TENDER_WISE_COLLECTION, DashboardRollupService.TENDER_WISE_FIELDS)
+
+        if "dashboard_api_mapping_keys" in existing_collections:
+            for mapping_doc in get_mongodb_collection("dashboard_api_mapping_keys").find({"is_3PO": True}):
+                mappings = [m for m in mapping_doc.get("mapping_keys") or [] if isinstance(m, dict)]
+                explicit_status_field = next((m.get("status_field") for m in mappings if m.get("status_field")), None)
+                add(
+                    mapping_doc.get("name"),
+                    [m.get("collection_key") for m in mappings if m.get("3po_key")],
+                    explicit_status_field
+                )
+
+        for name in existing_collections:
+            if name.endswith(DashboardRollupService.TENDER_DASHBOARD_SUFFIX):
+                add(name, DashboardRollupService.TENDER_DASHBOARD_FIELDS)
+
+        for name, target in targets.items():
+            available_fields = mongodb_service.get_cached_field_names(name)
+            if not target["status_field"]:
+                target["status_field"] = next(
+                    (f for f in DashboardRollupService.STATUS_FIELD_VARIATIONS if f in available_fields),
+                    None
+                )
+            target["store_field"] = next(
+                (f for f in DashboardRollupService.STORE_FIELDS if f in available_fields),
+                None
+            )
+            target["fields"] = sorted(target["fields"])
+
+        return targets
+
+    @staticmethod
+    def collections_for_source(source_name: str) -> List[str]:
+        """
+        Rollup collections affected by new data in a source collection: the source itself
+        and every report that joins it through its formula mapping_keys.
+        """
+        source = (source_name or "").lower().strip()
+        affected = {source}
+        if mongodb_service.collection_exists("formulas"):
+            for report_doc in get_mongodb_collection("formulas").find({}, {"report_name": 1, "mapping_keys": 1}):
+                mapping_sources = {name.lower().strip() for name in (report_doc.get("mapping_keys") or {})}
+                if source in mapping_sources and report_doc.get("report_name"):
+                    affected.add(report_doc["report_name"].lower().strip())
+        return sorted(affected)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _day_match(start_day: Optional[datetime], end_day: Optional[datetime]) -> Dict[str, Any]:
+        """
+        Match the documents whose bucket day falls in [start_day, end_day].
+        Documents are bucketed on order_date, falling back to date when order_date is missing,
+        exactly like the $group key below so a windowed refresh never splits a bucket.
+        """
+        date_condition: Dict[str, Any] = {"$type": "date"}
+        if start_day is not None:
+            date_condition["$gte"] = start_day
+        if end_day is not None:
+            date_condition["$lt"] = end_day + timedelta(days=1)
+        return {
+            "$or": [
+                {"order_date": date_condition},
+                {"order_date": None, "date": date_condition}
+            ]
+        }
+
+    @staticmethod
+    def _build_pipeline(
+        collection_name: str,
+        target: Dict[str, Any],
+        start_day: Optional[datetime],
+        end_day: Optional[datetime]
+    ) -> List[Dict[str, Any]]:
+        """Aggregation that groups raw documents into daily buckets and $merges them into the rollups"""
+        bucket_date = {"$ifNull": ["$order_date", "$date"]}
+        status_field = target.get("status_field")
+        store_field = target.get("store_field")
+
+        sums = {
+            DashboardRollupService._sum_key(field): {"$sum": {"$ifNull": [f"${field}", 0]}}
+            for field in target["fields"]
+        }
+
+        return [
+            {"$match": DashboardRollupService._day_match(start_day, end_day)},
+            {
+                "$group": {
+                    "_id": {
+                        "collection": collection_name,
+                        "date": {
+                            "$dateFromParts": {
+                                "year": {"$year": bucket_date},
+                                "month": {"$month": bucket_date},
+                                "day": {"$dayOfMonth": bucket_date}
+                            }
+                        },
+                        "date_field": {
+                            "$cond": [{"$eq": [{"$type": "$order_date"}, "date"]}, "order_date", "date"]
+                        },
+                        "store": f"${store_field}" if store_field else None,
+                        "tender": "$tender_name",
+                        "status": {"$toUpper": {"$ifNull": [f"${status_field}", ""]}} if status_field else ""
+                    },
+                    **sums,
+                    "doc_count": {"$sum": 1}
+                }
+            },
+            {
+                "$project": {
+                    "collection": "$_id.collection",
+                    "date": "$_id.date",
+                    "date_field": "$_id.date_field",
+                    "store": "$_id.store",
+                    "tender": "$_id.tender",
+                    "status": "$_id.status",
+                    "sums": {key: f"${key}" for key in sums},
+                    "doc_count": 1,
+                    "refreshed_at": {"$literal": datetime.utcnow()}
+                }
+            },
+            {
+                "$merge": {
+                    "into": DashboardRollupService.ROLLUP_COLLECTION,
+                    "on": "_id",
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert"
+                }
+            }
+        ]
+
+    @staticmethod
+    def _claim(collection_name: str) -> bool:
+        """Mark a collection's rollup as refreshing; False if another refresh holds it"""
+        state_collection = get_mongodb_collection(DashboardRollupService.STATE_COLLECTION)
+        now = datetime.utcnow()
+        try:
+            state_collection.update_one(
+                {
+                    "_id": collection_name,
+                    "$or": [
+                        {"status": {"$ne": "refreshing"}},
+                        {"refresh_started_at": {"$lt": now - DashboardRollupService.REFRESH_LEASE}}
+                    ]
+                },
+                {"$set": {"status": "refreshing", "refresh_started_at": now, "rerun_requested": False}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Another refresh is running; ask it to go again once it finishes
+            state_collection.update_one({"_id": collection_name}, {"$set": {"rerun_requested": True}})
+            return False
+
+    @staticmethod
+    def refresh_collection(
+        collection_name: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        target: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Rebuild the rollups of one collection, for the given dates only when possible.
+        A full rebuild is done when no dates are given or the summed fields changed.
+
+        Returns:
+            Dictionary with collection, status ("refreshed", "busy", "removed") and covered range
+        """
+        name = collection_name.lower().strip()
+        if target is None:
+            target = DashboardRollupService.collect_targets().get(name)
+
+        rollups = get_mongodb_collection(DashboardRollupService.ROLLUP_COLLECTION)
+        state_collection = get_mongodb_collection(DashboardRollupService.STATE_COLLECTION)
+
+        if target is None:
+            rollups.delete_many({"collection": name})
+            state_collection.delete_one({"_id": name})
+            return {"collection": name, "status": "removed"}
+
+        # Only a rollup that finished cleanly can be patched window by window
+        previous_state = state_collection.find_one({"_id": name}) or {}
+        patchable = previous_state.get("status") == "ready"
+
+        if not DashboardRollupService._claim(name):
+            logger.info(f"ℹ️ Rollup refresh for '{name}' already running, queued a rerun")
+            return {"collection": name, "status": "busy"}
+
+        try:
+            while True:
+                state = state_collection.find_one({"_id": name}) or {}
+                same_shape = (
+                    patchable
+                    and state.get("fields") == target["fields"]
+                    and state.get("status_field") == target.get("status_field")
+                    and state.get("store_field") == target.get("store_field")
+                    and state.get("covered_from") is not None
+                )
+                windowed = same_shape and start_date is not None and end_date is not None
+                start_day = datetime.combine(start_date.date(), time.min) if windowed else None
+                end_day = datetime.combine(end_date.date(), time.min) if windowed else None
+
+                window_filter: Dict[str, Any] = {"collection": name}
+                if windowed:
+                    window_filter["date"] = {"$gte": start_day, "$lte": end_day}
+                rollups.delete_many(window_filter)
+
+                pipeline = DashboardRollupService._build_pipeline(name, target, start_day, end_day)
+                list(mongodb_service.db[name].aggregate(pipeline, allowDiskUse=True))
+
+                # Coverage is contiguous: a full build covers every day with data, and days
+                # between the old coverage and a refreshed window have no data by construction
+                bounds = list(rollups.aggregate([
+                    {"$match": {"collection": name}},
+                    {"$group": {"_id": None, "first": {"$min": "$date"}, "last": {"$max": "$date"}}}
+                ]))
+                covered_from = bounds[0]["first"] if bounds else None
+                covered_to = bounds[0]["last"] if bounds else None
+                if windowed:
+                    covered_from = min(filter(None, [covered_from, state.get("covered_from"), start_day]))
+                    covered_to = max(filter(None, [covered_to, state.get("covered_to"), end_day]))
+
+                rerun = state_collection.find_one_and_update(
+                    {"_id": name, "rerun_requested": True},
+                    {"$set": {"rerun_requested": False}}
+                )
+                if rerun is None:
+                    break
+                # Data changed during the refresh; rebuild everything rather than guessing the window
+                logger.info(f"🔄 Rerunning rollup refresh for '{name}'")
+                start_date = end_date = None
+                patchable = False
+
+            state_collection.update_one(
+                {"_id": name},
+                {"$set": {
+                    "status": "ready",
+                    "fields": target["fields"],
+                    "status_field": target.get("status_field"),
+                    "store_field": target.get("store_field"),
+                    "covered_from": covered_from,
+                    "covered_to": covered_to,
+                    "refreshed_at": datetime.utcnow()
+                }}
+            )
+            logger.info(f"✅ Refreshed rollups for '{name}' ({'window' if windowed else 'full'}: {covered_from} - {covered_to})")
+            return {"collection": name, "status": "refreshed", "covered_from": covered_from, "covered_to": covered_to}
+
+        except Exception:
+            state_collection.update_one({"_id": name}, {"$set": {"status": "failed"}})
+            raise
+
+    @staticmethod
+    def refresh_collections(
+        collections: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Refresh the rollups of several collections (every rollup target when None).
+
+        Returns:
+            Dictionary with "refreshed", "skipped" and "failed" collection lists
+        """
+        targets = DashboardRollupService.collect_targets()
+        names = targets.keys() if collections is None else {name.lower().strip() for name in collections if name}
+
+        result = {"refreshed": [], "skipped": [], "failed": {}}
+        for name in sorted(names):
+            try:
+                outcome = DashboardRollupService.refresh_collection(name, start_date, end_date, targets.get(name))
+                if outcome["status"] == "refreshed":
+                    result["refreshed"].append(name)
+                else:
+                    result["skipped"].append(name)
+            except Exception as e:
+                result["failed"][name] = str(e)
+                logger.warning(f"⚠️ Failed to refresh rollups for '{name}': {e}")
+        return result
+
+    @staticmethod
+    def refresh_for_source(
+        source_name: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Refresh the rollups affected by an upload into a source collection"""
+        return DashboardRollupService.refresh_collections(
+            DashboardRollupService.collections_for_source(source_name),
+            start_date,
+            end_date
+        )
+
+    @staticmethod
+    def upload_window(source_name: str, since: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Bucket-day range of the documents inserted into a source collection since `since` (UTC),
+        found through their ObjectId creation time. None when no dated document was inserted.
+        """
+        since_id = ObjectId.from_datetime(since - DashboardRollupService.UPLOAD_CLOCK_SKEW)
+        bucket_date = {"$ifNull": ["$order_date", "$date"]}
+        pipeline = [
+            {"$match": {"_id": {"$gte": since_id}}},
+            {"$match": DashboardRollupService._day_match(None, None)},
+            {"$group": {"_id": None, "first": {"$min": bucket_date}, "last": {"$max": bucket_date}}}
+        ]
+        result = list(get_mongodb_collection(source_name.lower().strip()).aggregate(pipeline))
+        if not result or result[0].get("first") is None:
+            return None
+        return result[0]["first"], result[0]["last"]
+
+    @staticmethod
+    def refresh_for_upload(source_name: str, since: datetime) -> Dict[str, Any]:
+        """
+        Refresh the rollups affected by an upload that was not chunked here (Uploader API):
+        only the days of the documents inserted since `since`, or the recent fallback window
+        when they cannot be located - never a full rebuild.
+        """
+        window = DashboardRollupService.upload_window(source_name, since)
+        if window is None:
+            end_date = datetime.utcnow()
+            window = (end_date - DashboardRollupService.UPLOAD_FALLBACK_WINDOW, end_date)
+            logger.info(
+                f"⚠️ No dated documents found for the upload into '{source_name}', "
+                f"refreshing the last {DashboardRollupService.UPLOAD_FALLBACK_WINDOW.days} days"
+            )
+        return DashboardRollupService.refresh_for_source(source_name, *window)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def is_day_aligned(start_datetime: datetime, end_datetime: datetime) -> bool:
+        """Rollups have day granularity, so only whole-day ranges can be answered from them"""
+        return start_datetime.time() == time.min and end_datetime.time() >= time(23, 59, 59)
+
+    @staticmethod
+    def get_covering_states(
+        collection_names: List[str],
+        start_datetime: datetime,
+        end_datetime: datetime
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the rollup state of every collection whose rollups fully cover the range.
+        Collections missing from the result must be aggregated from raw documents.
+        """
+        if not collection_names or not DashboardRollupService.is_day_aligned(start_datetime, end_datetime):
+            return {}
+
+        start_day = datetime.combine(start_datetime.date(), time.min)
+        end_day = datetime.combine(end_datetime.date(), time.min)
+        states = get_mongodb_collection(DashboardRollupService.STATE_COLLECTION).find({
+            "_id": {"$in": list(collection_names)},
+            "status": "ready",
+            "covered_from": {"$lte": start_day},
+            "covered_to": {"$gte": end_day}
+        })
+        return {state["_id"]: state for state in states}
+
+    @staticmethod
+    def state_has_fields(state: Optional[Dict[str, Any]], fields: List[str], status_field: Optional[str] = None) -> bool:
+        """Whether a covering rollup sums all of the fields (split on the given status field)"""
+        if not state:
+            return False
+        if status_field and state.get("status_field") != status_field:
+            return False
+        return set(fields).issubset(state.get("fields") or [])
+
+    @staticmethod
+    def match_stage(
+        collection_name: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        date_field: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        $match on the rollups of one collection for the days in the range.
+        Pass date_field="order_date" for endpoints that ignore documents dated only by 'date'.
+        """
+        match: Dict[str, Any] = {
+            "collection": collection_name,
+            "date": {
+                "$gte": datetime.combine(start_datetime.date(), time.min),
+                "$lte": datetime.combine(end_datetime.date(), time.min)
+            }
+        }
+        if date_field:
+            match["date_field"] = date_field
+        return {"$match": match}
+
+    @staticmethod
+    def sum_accumulator(field: str) -> Dict[str, Any]:
+        """Rollup equivalent of {"$sum": {"$ifNull": ["$field", 0]}}"""
+        return {"$sum": f"$sums.{DashboardRollupService._sum_key(field)}"}
+
+    @staticmethod
+    def status_sum_accumulator(field: str, status_value: str) -> Dict[str, Any]:
+        """Rollup equivalent of summing a field only where the upper-cased status equals status_value"""
+        return {
+            "$sum": {
+                "$cond": [
+                    {"$eq": ["$status", status_value.upper()]},
+                    f"$sums.{DashboardRollupService._sum_key(field)}",
+                    0
+                ]
+            }
+        }
+
+    # ------------------------------------------------------------------
+    # Admin
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_status() -> List[Dict[str, Any]]:
+        """State of every rollup collection"""
+        states = []
+        for state in get_mongodb_collection(DashboardRollupService.STATE_COLLECTION).find({}):
+            state["collection"] = state.pop("_id")
+            for key in ("covered_from", "covered_to", "refreshed_at", "refresh_started_at"):
+                if hasattr(state.get(key), "isoformat"):
+                    state[key] = state[key].isoformat()
+            states.append(state)
+        return states
+
+    @staticmethod
+    def initialize_rollups():
+        """Create rollup indexes and build missing rollups - call this on application startup"""
+        try:
+            rollups = get_mongodb_collection(DashboardRollupService.ROLLUP_COLLECTION)
+            rollups.create_index([("collection", 1), ("date", 1), ("date_field", 1)], background=True)
+
+            built_collections = {
+                state["_id"]
+                for state in get_mongodb_collection(DashboardRollupService.STATE_COLLECTION).find({}, {"_id": 1})
+            }
+            targets = DashboardRollupService.collect_targets()
+            missing = [name for name in targets if name not in built_collections]
+            if missing:
+                result = DashboardRollupService.refresh_collections(missing)
+                logger.info(f"✅ Built dashboard rollups for {len(result['refreshed'])} collection(s)")
+            else:
+                logger.info("✅ Dashboard rollups already built")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to initialize dashboard rollups: {e}")
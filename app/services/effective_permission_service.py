@@ -0,0 +1,200 @@
+"""
+Effective Permission Service
+A user's effective modules and permissions - their own module mappings plus their group's,
+limited to the modules assigned to their organization - resolved with a constant number of SSO
+queries and cached per user.
+
+Queries run here directly rather than through the model getters, which log and return empty
+results on errors: a failed lookup must fail the request, not be cached as "no access".
+
+Cached entries are stamped with the "access_mappings" config version. Every route that edits
+user, group or organization mappings bumps it, so all workers drop stale entries by the next
+version poll (effective_permissions_version_check_seconds).
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.models.sso import (
+    GroupModuleMapping,
+    Module,
+    OrganizationTool,
+    Permission,
+    UserDetails,
+    UserModuleMapping
+)
+from app.utils.config_version import ACCESS_MAPPINGS_CONFIG, ConfigVersionPoller, publish_config_change
+
+logger = logging.getLogger(__name__)
+
+
+class EffectivePermissionService:
+    """Service for resolving and caching effective user permissions"""
+
+    _poller = ConfigVersionPoller(ACCESS_MAPPINGS_CONFIG, settings.effective_permissions_version_check_seconds)
+
+    # Bumped on local invalidation so entries go stale immediately in this worker
+    _local_generation = 0
+
+    # user_id -> (stamp, projection, permission codes)
+    _cache: "OrderedDict[int, Tuple[Tuple[Optional[int], int], Dict[str, Any], FrozenSet[str]]]" = OrderedDict()
+
+    _stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    async def _current_stamp() -> Tuple[Optional[int], int]:
+        version = await EffectivePermissionService._poller.current()
+        return (version, EffectivePermissionService._local_generation)
+
+    @staticmethod
+    async def _fetch_all(db: AsyncSession, statement) -> List[Any]:
+        return list((await db.execute(statement)).scalars().all())
+
+    @staticmethod
+    async def _fetch_by_ids(db: AsyncSession, model, ids: Iterable[int]) -> Dict[int, Any]:
+        ids = {item_id for item_id in ids if item_id is not None}
+        if not ids:
+            return {}
+        rows = await EffectivePermissionService._fetch_all(db, select(model).where(model.id.in_(ids)))
+        return {row.id: row for row in rows}
+
+    @staticmethod
+    async def _compute(db: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Build the projection for one user (six queries, whatever the number of mappings).
+        Database errors propagate, so nothing is cached for a failed computation.
+        """
+        fetch_all = EffectivePermissionService._fetch_all
+        user = (await db.execute(select(UserDetails).where(UserDetails.id == user_id))).scalar_one_or_none()
+        if not user:
+            return None
+
+        # Same filters as UserModuleMapping.get_by_user / GroupModuleMapping.get_by_group /
+        # OrganizationTool.get_by_organization
+        user_mappings = await fetch_all(db, select(UserModuleMapping).where(
+            UserModuleMapping.user_id == user_id,
+            UserModuleMapping.is_active == True
+        ))
+        group_mappings = []
+        if user.group_id:
+            group_mappings = await fetch_all(db, select(GroupModuleMapping).where(
+                GroupModuleMapping.group_id == user.group_id
+            ))
+
+        allowed_module_ids = None
+        if user.organization_id:
+            org_tools = await fetch_all(db, select(OrganizationTool).where(
+                OrganizationTool.organization_id == user.organization_id,
+                OrganizationTool.status == True
+            ))
+            allowed_module_ids = {org_tool.module_id for org_tool in org_tools}
+
+        grants = [(mapping.module_id, mapping.permission_id, "user") for mapping in user_mappings]
+        grants += [(mapping.module_id, mapping.permission_id, "group") for mapping in group_mappings]
+        if allowed_module_ids is not None:
+            grants = [grant for grant in grants if grant[0] in allowed_module_ids]
+
+        modules = await EffectivePermissionService._fetch_by_ids(
+            db, Module, (module_id for module_id, _, _ in grants)
+        )
+        permissions = await EffectivePermissionService._fetch_by_ids(
+            db, Permission, (permission_id for _, permission_id, _ in grants)
+        )
+
+        resolved: Dict[int, Dict[str, Any]] = {}
+        for module_id, permission_id, source in grants:
+            module = modules.get(module_id)
+            if not module:
+                continue
+            entry = resolved.setdefault(module_id, {
+                "module_id": module.id,
+                "module_name": module.module_name,
+                "tool_id": module.tool_id,
+                "permissions": {}
+            })
+            permission = permissions.get(permission_id)
+            if permission and permission.id not in entry["permissions"]:
+                entry["permissions"][permission.id] = {
+                    "permission_id": permission.id,
+                    "permission_name": permission.permission_name,
+                    "permission_code": permission.permission_code,
+                    "source": source
+                }
+
+        module_list = [
+            {**entry, "permissions": list(entry["permissions"].values())}
+            for _, entry in sorted(resolved.items())
+        ]
+        return {
+            "user_id": user.id,
+            "organization_id": user.organization_id,
+            "group_id": user.group_id,
+            "modules": module_list,
+            "permission_codes": sorted({
+                permission["permission_code"]
+                for module in module_list
+                for permission in module["permissions"]
+            })
+        }
+
+    @staticmethod
+    async def _get_entry(db: AsyncSession, user_id: int):
+        cache = EffectivePermissionService._cache
+        stamp = await EffectivePermissionService._current_stamp()
+
+        entry = cache.get(user_id)
+        if entry is not None and entry[0] == stamp:
+            cache.move_to_end(user_id)
+            EffectivePermissionService._stats["hits"] += 1
+            return entry
+
+        EffectivePermissionService._stats["misses"] += 1
+        projection = await EffectivePermissionService._compute(db, user_id)
+        if projection is None:
+            cache.pop(user_id, None)
+            return None
+
+        # Stamped with the version read before computing: a change made meanwhile makes it stale
+        entry = (stamp, projection, frozenset(projection["permission_codes"]))
+        cache[user_id] = entry
+        cache.move_to_end(user_id)
+        while len(cache) > max(settings.effective_permissions_cache_max_entries, 1):
+            cache.popitem(last=False)
+        return entry
+
+    @staticmethod
+    async def get_for_user(db: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Effective modules and permissions of a user (None if the user does not exist).
+        Raises on database errors.
+        """
+        entry = await EffectivePermissionService._get_entry(db, user_id)
+        return entry[1] if entry else None
+
+    @staticmethod
+    async def has_permission(db: AsyncSession, user_id: int, permission_code: str) -> bool:
+        """True if the user holds permission_code directly or through their group"""
+        entry = await EffectivePermissionService._get_entry(db, user_id)
+        return bool(entry) and permission_code in entry[2]
+
+    @staticmethod
+    async def invalidate():
+        """
+        Mark every cached projection stale, here and (through the config version) on the other
+        workers - call after changing user, group or organization mappings. Never raises.
+        """
+        EffectivePermissionService._local_generation += 1
+        EffectivePermissionService._stats["invalidations"] += 1
+        if settings.effective_permissions_version_check_seconds > 0:
+            await publish_config_change(ACCESS_MAPPINGS_CONFIG)
+            EffectivePermissionService._poller.expire()
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """Cache size and hit/miss counters for this worker"""
+        return {"entries": len(EffectivePermissionService._cache), **EffectivePermissionService._stats}
@@ -0,0 +1,280 @@
+"""
+Index Advisor MongoDB Service
+Derives the fields each report collection is filtered and grouped on from saved report
+formulas and dashboard_api_mapping_keys, creates the matching compound indexes and
+reports collections that are still answered by a collection scan (from explain() output).
+"""
+
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+from app.config.mongodb import get_mongodb_collection, get_mongodb_database
+
+logger = logging.getLogger(__name__)
+
+IndexSpec = List[Tuple[str, int]]
+
+
+class IndexAdvisorService:
+    """Service for recommending and creating indexes on report collections"""
+
+    # Date fields the dashboards and report Excel workers range-filter on
+    DATE_FIELDS = ["order_date", "date"]
+
+    # Fields the dashboards group on (first one present in the collection wins)
+    GROUP_FIELDS = ["tender_name", "store_code", "store_name"]
+
+    # Collections queried directly by the dashboards regardless of configuration
+    DASHBOARD_COLLECTIONS = ["devyani_posvszom", "bercos_summary_report"]
+
+    # Prefix for every index created by the advisor so they can be told apart from manual ones
+    INDEX_NAME_PREFIX = "advisor_"
+
+    @staticmethod
+    def _index_name(spec: IndexSpec) -> str:
+        """Build a stable index name from an index spec"""
+        return IndexAdvisorService.INDEX_NAME_PREFIX + "_".join(f"{field}_{direction}" for field, direction in spec)
+
+    @staticmethod
+    def _sample_fields(collection_name: str) -> set:
+        """Return the top-level field names of one sample document (empty set if none)"""
+        sample_doc = get_mongodb_collection(collection_name).find_one({})
+        return set(sample_doc.keys()) if sample_doc else set()
+
+    @staticmethod
+    def collect_query_shapes() -> Dict[str, Dict[str, Any]]:
+        """
+        Inspect saved report formulas and dashboard_api_mapping_keys to work out how each
+        collection is queried.
+
+        Returns:
+            Dictionary keyed by collection name with "range_fields", "group_fields",
+            "join_keys" and "filter_fields" lists and the "sources" that referenced it
+        """
+        db = get_mongodb_database()
+        existing_collections = set(db.list_collection_names())
+        shapes: Dict[str, Dict[str, Any]] = {}
+
+        def shape_for(collection_name: str, source: str) -> Optional[Dict[str, Any]]:
+            name = (collection_name or "").lower().strip()
+            if not name or name not in existing_collections:
+                return None
+            shape = shapes.setdefault(name, {
+                "range_fields": [],
+                "group_fields": [],
+                "join_keys": [],
+                "filter_fields": [],
+                "sources": []
+            })
+            if source not in shape["sources"]:
+                shape["sources"].append(source)
+            return shape
+
+        def add_unique(values: List[Any], value: Any):
+            if value and value not in values:
+                values.append(value)
+
+        # Report collections: range-filtered on order_date by the report Excel workers and
+        # /threePODashboardData, grouped by tender
+        if "formulas" in existing_collections:
+            for report_doc in get_mongodb_collection("formulas").find({}, {"report_name": 1, "mapping_keys": 1, "conditions": 1}):
+                report_shape = shape_for(report_doc.get("report_name"), "formulas")
+                if report_shape is not None:
+                    add_unique(report_shape["range_fields"], "order_date")
+                    add_unique(report_shape["group_fields"], "tender_name")
+
+                # Source collections are joined on their mapping keys
+                for source_name, keys in (report_doc.get("mapping_keys") or {}).items():
+                    source_shape = shape_for(source_name, "formulas.mapping_keys")
+                    if source_shape is not None and keys:
+                        add_unique(source_shape["join_keys"], tuple(keys))
+
+                # Conditions filter source collections on individual columns
+                for source_name, conditions in (report_doc.get("conditions") or {}).items():
+                    source_shape = shape_for(source_name, "formulas.conditions")
+                    if source_shape is not None:
+                        for condition in conditions or []:
+                            if isinstance(condition, dict):
+                                add_unique(source_shape["filter_fields"], condition.get("column"))
+
+        # /threePODashboardDataNew matches order_date OR date and groups by tender_name
+        if "dashboard_api_mapping_keys" in existing_collections:
+            for mapping_doc in get_mongodb_collection("dashboard_api_mapping_keys").find({"is_3PO": True}, {"name": 1}):
+                mapping_shape = shape_for(mapping_doc.get("name"), "dashboard_api_mapping_keys")
+                if mapping_shape is not None:
+                    for date_field in IndexAdvisorService.DATE_FIELDS:
+                        add_unique(mapping_shape["range_fields"], date_field)
+                    add_unique(mapping_shape["group_fields"], "tender_name")
+
+        for collection_name in IndexAdvisorService.DASHBOARD_COLLECTIONS:
+            dashboard_shape = shape_for(collection_name, "dashboard")
+            if dashboard_shape is not None:
+                for date_field in IndexAdvisorService.DATE_FIELDS:
+                    add_unique(dashboard_shape["range_fields"], date_field)
+                add_unique(dashboard_shape["group_fields"], "tender_name")
+
+        return shapes
+
+    @staticmethod
+    def recommend_indexes(shapes: Dict[str, Dict[str, Any]]) -> Dict[str, List[IndexSpec]]:
+        """
+        Turn query shapes into compound index specs, keeping only fields present in the data.
+        Range fields lead, followed by the group field so $match + $group can use one index.
+
+        Returns:
+            Dictionary keyed by collection name with a list of index specs
+        """
+        recommendations: Dict[str, List[IndexSpec]] = {}
+
+        for collection_name, shape in shapes.items():
+            available_fields = IndexAdvisorService._sample_fields(collection_name)
+            if not available_fields:
+                continue
+
+            specs: List[IndexSpec] = []
+            group_field = next(
+                (field for field in shape["group_fields"] + IndexAdvisorService.GROUP_FIELDS if field in available_fields),
+                None
+            )
+
+            for range_field in shape["range_fields"]:
+                if range_field not in available_fields:
+                    continue
+                spec = [(range_field, 1)]
+                if group_field:
+                    spec.append((group_field, 1))
+                specs.append(spec)
+
+            for join_keys in shape["join_keys"]:
+                present_keys = [key for key in join_keys if key in available_fields]
+                if present_keys:
+                    specs.append([(key, 1) for key in present_keys])
+
+            if specs:
+                recommendations[collection_name] = specs
+
+        return recommendations
+
+    @staticmethod
+    def ensure_indexes(collections: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Create the recommended indexes in the background.
+
+        Args:
+            collections: Restrict to these collections (None for every configured collection)
+
+        Returns:
+            Dictionary with created, existing and failed index names per collection
+        """
+        shapes = IndexAdvisorService.collect_query_shapes()
+        if collections is not None:
+            wanted = {name.lower().strip() for name in collections if name}
+            shapes = {name: shape for name, shape in shapes.items() if name in wanted}
+
+        result = {"created": {}, "existing": {}, "failed": {}}
+        for collection_name, specs in IndexAdvisorService.recommend_indexes(shapes).items():
+            collection = get_mongodb_collection(collection_name)
+            try:
+                existing_keys = [list(info["key"]) for info in collection.index_information().values()]
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read indexes for '{collection_name}': {e}")
+                existing_keys = []
+
+            for spec in specs:
+                index_name = IndexAdvisorService._index_name(spec)
+                # Any existing index with this key prefix already serves the query
+                if any(keys[:len(spec)] == spec for keys in existing_keys):
+                    result["existing"].setdefault(collection_name, []).append(index_name)
+                    continue
+                try:
+                    collection.create_index(spec, name=index_name, background=True)
+                    existing_keys.append(spec)
+                    result["created"].setdefault(collection_name, []).append(index_name)
+                    logger.info(f"✅ Created index '{index_name}' on '{collection_name}'")
+                except Exception as e:
+                    result["failed"].setdefault(collection_name, []).append({"index": index_name, "error": str(e)})
+                    logger.warning(f"⚠️ Failed to create index '{index_name}' on '{collection_name}': {e}")
+
+        return result
+
+    @staticmethod
+    def _plan_stages(plan: Any) -> List[str]:
+        """Flatten the stage names of an explain() plan tree"""
+        stages = []
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for key in ("inputStage", "queryPlan"):
+                stages.extend(IndexAdvisorService._plan_stages(plan.get(key)))
+            for child in plan.get("inputStages", []) or []:
+                stages.extend(IndexAdvisorService._plan_stages(child))
+        return stages
+
+    @staticmethod
+    def find_unindexed_collections(days: int = 30) -> List[Dict[str, Any]]:
+        """
+        Explain the dashboard range filter on every configured collection and report the
+        ones whose winning plan is a collection scan.
+
+        Args:
+            days: Size of the probe date range, ending now
+
+        Returns:
+            List of {collection, range_field, stages} for collections scanned without an index
+        """
+        end_datetime = datetime.utcnow()
+        start_datetime = end_datetime - timedelta(days=days)
+        unindexed = []
+
+        for collection_name, shape in IndexAdvisorService.collect_query_shapes().items():
+            collection = get_mongodb_collection(collection_name)
+            for range_field in shape["range_fields"]:
+                try:
+                    # queryPlanner verbosity: plan selection only, the probe query is not executed
+                    explain = collection.database.command(
+                        "explain",
+                        {
+                            "find": collection_name,
+                            "filter": {range_field: {"$gte": start_datetime, "$lte": end_datetime}}
+                        },
+                        verbosity="queryPlanner"
+                    )
+                    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+                    stages = IndexAdvisorService._plan_stages(winning_plan)
+                    if "COLLSCAN" in stages:
+                        unindexed.append({
+                            "collection": collection_name,
+                            "range_field": range_field,
+                            "stages": stages
+                        })
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not explain query on '{collection_name}.{range_field}': {e}")
+
+        return unindexed
+
+    @staticmethod
+    def get_advice() -> Dict[str, Any]:
+        """Recommended indexes plus the collections currently scanned without one"""
+        shapes = IndexAdvisorService.collect_query_shapes()
+        recommendations = IndexAdvisorService.recommend_indexes(shapes)
+        return {
+            "query_shapes": {
+                name: {**shape, "join_keys": [list(keys) for keys in shape["join_keys"]]}
+                for name, shape in shapes.items()
+            },
+            "recommended_indexes": {
+                name: [{"name": IndexAdvisorService._index_name(spec), "keys": dict(spec)} for spec in specs]
+                for name, specs in recommendations.items()
+            },
+            "unindexed_collections": IndexAdvisorService.find_unindexed_collections()
+        }
+
+    @staticmethod
+    def initialize_indexes():
+        """Initialize advisor indexes - call this on application startup"""
+        try:
+            result = IndexAdvisorService.ensure_indexes()
+            created = sum(len(names) for names in result["created"].values())
+            logger.info(f"✅ Index advisor created {created} index(es) on report collections")
+        except Exception as e:
+            logger.warning(f"⚠️ Index advisor failed to initialize indexes: {e}")
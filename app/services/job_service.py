@@ -0,0 +1,272 @@
+"""
+Background Job MongoDB Service
+Persistent registry for long-running background jobs (sheet data generation): state,
+per-step progress and row counts, duplicate detection and cooperative cancellation
+"""
+
+import hashlib
+import json
+import logging
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from app.config.mongodb import get_mongodb_collection
+import enum
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, enum.Enum):
+    """Background job status enum"""
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+ACTIVE_JOB_STATUSES = [JobStatus.PENDING.value, JobStatus.PROCESSING.value]
+
+
+class JobService:
+    """Service for background job tracking using MongoDB"""
+
+    COLLECTION_NAME = "jobs"
+
+    # An active job not updated for this long is assumed to have died with its worker
+    STALE_AFTER_MINUTES = 60
+
+    @staticmethod
+    def _get_collection():
+        """Get MongoDB collection for jobs"""
+        try:
+            return get_mongodb_collection(JobService.COLLECTION_NAME)
+        except Exception as e:
+            logger.error(f"❌ Error getting MongoDB collection '{JobService.COLLECTION_NAME}': {e}")
+            raise ConnectionError(f"MongoDB is not connected: {e}")
+
+    @staticmethod
+    def _create_indexes():
+        """Create indexes for better query performance"""
+        try:
+            collection = JobService._get_collection()
+
+            # active_key is only set while a job is pending/processing, so the unique sparse
+            # index allows one in-flight job per (job_type, params) and any number of finished ones
+            collection.create_index("active_key", unique=True, sparse=True, background=True)
+            collection.create_index([("job_type", 1), ("created_at", -1)], background=True)
+            collection.create_index([("status", 1), ("updated_at", 1)], background=True)
+
+            logger.info(f"✅ MongoDB indexes created for '{JobService.COLLECTION_NAME}'")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to create indexes for jobs: {e}")
+
+    @staticmethod
+    def params_hash(params: Dict[str, Any]) -> str:
+        """Stable hash of job parameters (key order and list order of store codes do not matter)"""
+        normalized = {
+            key: sorted(value) if isinstance(value, list) else value
+            for key, value in (params or {}).items()
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _to_dict(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert MongoDB document to API dictionary"""
+        def iso(value: Optional[datetime]) -> Optional[str]:
+            return value.isoformat() + "Z" if value else None
+
+        return {
+            "job_id": doc["_id"],
+            "job_type": doc.get("job_type"),
+            "status": (doc.get("status") or JobStatus.PENDING.value).lower(),
+            "progress": doc.get("progress", 0),
+            "message": doc.get("message"),
+            "error": doc.get("error"),
+            "params": doc.get("params", {}),
+            "steps": doc.get("steps", {}),
+            "row_counts": doc.get("row_counts", {}),
+            "cancel_requested": doc.get("cancel_requested", False),
+            "created_by": doc.get("created_by"),
+            "created_at": iso(doc.get("created_at")),
+            "updated_at": iso(doc.get("updated_at")),
+            "started_at": iso(doc.get("started_at")),
+            "finished_at": iso(doc.get("finished_at"))
+        }
+
+    @staticmethod
+    def _expire_stale(collection, active_key: str) -> bool:
+        """Fail an in-flight job holding active_key whose worker stopped reporting; True if one was expired"""
+        threshold = datetime.utcnow() - timedelta(minutes=JobService.STALE_AFTER_MINUTES)
+        result = collection.update_one(
+            {"active_key": active_key, "updated_at": {"$lt": threshold}},
+            {
+                "$set": {
+                    "status": JobStatus.FAILED.value,
+                    "error": f"Job stopped reporting progress for over {JobService.STALE_AFTER_MINUTES} minutes",
+                    "finished_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow()
+                },
+                "$unset": {"active_key": ""}
+            }
+        )
+        return result.modified_count > 0
+
+    @staticmethod
+    async def create_or_join(
+        job_type: str,
+        params: Dict[str, Any],
+        steps: List[str],
+        created_by: Optional[str] = None,
+        key_params: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Register a job, or return the in-flight job already running with identical parameters.
+
+        Args:
+            key_params: Parameters that make two jobs different (defaults to params). Pass {} for
+                jobs whose result does not depend on their parameters, so any in-flight job is joined.
+
+        Returns:
+            (job, created) - created is False when an existing job was joined
+        """
+        collection = JobService._get_collection()
+        active_key = f"{job_type}:{JobService.params_hash(params if key_params is None else key_params)}"
+        now = datetime.utcnow()
+        document = {
+            "_id": str(uuid.uuid4()),
+            "job_type": job_type,
+            "params": params,
+            "active_key": active_key,
+            "status": JobStatus.PENDING.value,
+            "progress": 0,
+            "message": "Queued",
+            "steps": {step: {"status": JobStatus.PENDING.value.lower(), "rows": None} for step in steps},
+            "row_counts": {},
+            "cancel_requested": False,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        for _ in range(2):
+            try:
+                collection.insert_one(document)
+                logger.info(f"✅ Created {job_type} job {document['_id']}")
+                return JobService._to_dict(document), True
+            except DuplicateKeyError:
+                existing = collection.find_one({"active_key": active_key})
+                if existing is not None and not JobService._expire_stale(collection, active_key):
+                    logger.info(f"ℹ️ Joined in-flight {job_type} job {existing['_id']}")
+                    return JobService._to_dict(existing), False
+
+        raise RuntimeError(f"Could not register {job_type} job")
+
+    @staticmethod
+    async def get_by_id(job_id: str) -> Optional[Dict[str, Any]]:
+        """Get job by ID"""
+        try:
+            doc = JobService._get_collection().find_one({"_id": job_id})
+            return JobService._to_dict(doc) if doc else None
+        except Exception as e:
+            logger.error(f"❌ Error getting job by id: {e}")
+            return None
+
+    @staticmethod
+    async def update_status(
+        job_id: str,
+        status: JobStatus,
+        progress: Optional[int] = None,
+        message: Optional[str] = None,
+        error: Optional[str] = None,
+        row_counts: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """Update job status; finishing a job releases its parameters for new requests"""
+        try:
+            status_value = status.value if isinstance(status, JobStatus) else status.upper()
+            now = datetime.utcnow()
+
+            update_data: Dict[str, Any] = {"status": status_value, "updated_at": now}
+            if progress is not None:
+                update_data["progress"] = progress
+            if message is not None:
+                update_data["message"] = message
+            if error is not None:
+                update_data["error"] = error
+            if row_counts is not None:
+                update_data["row_counts"] = row_counts
+
+            update: Dict[str, Any] = {"$set": update_data}
+            if status_value == JobStatus.PROCESSING.value:
+                update_data["started_at"] = now
+            elif status_value not in ACTIVE_JOB_STATUSES:
+                update_data["finished_at"] = now
+                update["$unset"] = {"active_key": ""}
+
+            result = JobService._get_collection().update_one({"_id": job_id}, update)
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"❌ Error updating job {job_id} status: {e}", exc_info=True)
+            return False
+
+    @staticmethod
+    async def update_step(
+        job_id: str,
+        step: str,
+        status: JobStatus,
+        rows: Optional[int] = None,
+        error: Optional[str] = None,
+        progress: Optional[int] = None
+    ) -> bool:
+        """Record the state (and row count) of one step of a job"""
+        try:
+            status_value = status.value if isinstance(status, JobStatus) else status.upper()
+            update_data: Dict[str, Any] = {
+                f"steps.{step}.status": status_value.lower(),
+                "updated_at": datetime.utcnow()
+            }
+            if rows is not None:
+                update_data[f"steps.{step}.rows"] = rows
+                update_data[f"row_counts.{step}"] = rows
+            if error is not None:
+                update_data[f"steps.{step}.error"] = error
+            if progress is not None:
+                update_data["progress"] = progress
+
+            result = JobService._get_collection().update_one({"_id": job_id}, {"$set": update_data})
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"❌ Error updating job {job_id} step '{step}': {e}")
+            return False
+
+    @staticmethod
+    async def request_cancel(job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Flag an in-flight job for cancellation; the worker stops at its next checkpoint.
+
+        Returns:
+            The job, or None if it does not exist
+        """
+        collection = JobService._get_collection()
+        collection.update_one(
+            {"_id": job_id, "status": {"$in": ACTIVE_JOB_STATUSES}},
+            {"$set": {"cancel_requested": True, "updated_at": datetime.utcnow()}}
+        )
+        doc = collection.find_one({"_id": job_id})
+        return JobService._to_dict(doc) if doc else None
+
+    @staticmethod
+    async def is_cancel_requested(job_id: str) -> bool:
+        """True if cancellation was requested for the job (False if the registry is unreachable)"""
+        try:
+            doc = JobService._get_collection().find_one({"_id": job_id}, {"cancel_requested": 1})
+            return bool(doc and doc.get("cancel_requested"))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not check cancellation for job {job_id}: {e}")
+            return False
+
+    @staticmethod
+    def initialize_indexes():
+        """Initialize indexes - call this on application startup"""
+        JobService._create_indexes()
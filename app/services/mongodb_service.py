@@ -4,7 +4,7 @@ This service provides the same interface as LB-Uploader's mongodb_service for co
 """
 
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Union
 from datetime import datetime
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from app.config.mongodb import (
@@ -15,6 +15,10 @@ from app.config.mongodb import (
 
 logger = logging.getLogger(__name__)
 
+# Memoized field names per (database, collection): {key: (cached_at_monotonic, field_names)}
+_field_names_cache: Dict[Tuple[str, str], Tuple[float, frozenset]] = {}
+FIELD_NAMES_CACHE_TTL_SECONDS = 300
+
 
 class MongoDBService:
     """Service for MongoDB operations - Adapter for LB-Backend MongoDB utilities"""
@@ -558,6 +562,39 @@ class MongoDBService:
             logger.error(f"❌ Error getting all keys from collection '{collection_name_lower}': {e}")
             raise ValueError(f"Failed to get all keys from collection: {str(e)}")
     
+    def get_cached_field_names(self, collection_name: str) -> frozenset:
+        """
+        Get the field names of a collection from a sampled document, memoized per database
+        and collection for FIELD_NAMES_CACHE_TTL_SECONDS.
+        One level of nested fields is included in dot notation (e.g. "zomato_bercos.packaging_charge")
+        so callers can resolve field-name variations without their own find_one probes.
+        
+        Args:
+            collection_name: Name of the collection (will be converted to lowercase)
+        
+        Returns:
+            Frozenset of field names (empty if the collection has no documents)
+        """
+        import time
+        
+        collection_name_lower = collection_name.lower()
+        current_db = get_mongodb_database()
+        cache_key = (current_db.name, collection_name_lower)
+        
+        cached = _field_names_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < FIELD_NAMES_CACHE_TTL_SECONDS:
+            return cached[1]
+        
+        sample_doc = current_db[collection_name_lower].find_one({}) or {}
+        field_names = set(sample_doc.keys())
+        for key, value in sample_doc.items():
+            if isinstance(value, dict):
+                field_names.update(f"{key}.{nested_key}" for nested_key in value.keys())
+        
+        field_names = frozenset(field_names)
+        _field_names_cache[cache_key] = (time.monotonic(), field_names)
+        return field_names
+    
     def save_collection_field_mapping(
         self,
         collection_name: str,
@@ -1337,16 +1374,7 @@ class MongoDBService:
             
             # Build query filter for date range
             # Convert start_date and end_date to datetime objects if they're dates
-            if isinstance(start_date, datetime):
-                start_datetime = start_date
-            else:
-                start_datetime = datetime.combine(start_date, datetime.min.time())
-            
-            if isinstance(end_date, datetime):
-                end_datetime = end_date
-            else:
-                # For end_date, include the entire day (end of day)
-                end_datetime = datetime.combine(end_date, datetime.max.time())
+            start_datetime, end_datetime = self._resolve_date_bounds(start_date, end_date)
             
             # Build query filter
             query_filter = {
@@ -1398,6 +1426,177 @@ class MongoDBService:
             logger.error(f"❌ Error querying collection '{collection_name_lower}': {e}")
             raise ValueError(f"Failed to query collection: {str(e)}")
     
+    def stream_collection_by_date_range(
+        self,
+        collection_name: str,
+        columns: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        date_field: str = "order_date",
+        batch_size: int = 5000,
+        no_cursor_timeout: bool = False,
+        as_columns: bool = False
+    ) -> Iterator[Union[List[Tuple[Any, ...]], Dict[str, Any]]]:
+        """
+        Stream a MongoDB collection by date range in batches, projecting only the requested columns.
+        Unlike query_collection_by_date_range, the full result set is never materialised in memory.
+        
+        Args:
+            collection_name: Name of the collection (will be converted to lowercase)
+            columns: List of column names to retrieve (projection pushed down to the server)
+            start_date: Start date for filtering (datetime object)
+            end_date: End date for filtering (datetime object)
+            date_field: Name of the date field to filter on (default: "order_date")
+            batch_size: Number of documents per cursor batch and per yielded batch
+            no_cursor_timeout: Keep the server cursor alive for long-running consumers
+            as_columns: Yield {column: numpy array} per batch instead of a list of row tuples
+        
+        Returns:
+            Iterator of batches. Each batch is a list of tuples ordered like `columns`,
+            or a dict of numpy object arrays when as_columns is True.
+        
+        Raises:
+            ConnectionError: If MongoDB is not connected
+            ValueError: If collection doesn't exist
+        """
+        if not self.is_connected():
+            raise ConnectionError("MongoDB is not connected")
+        
+        collection_name_lower = collection_name.lower()
+        
+        # Validate eagerly so callers get the error before they start consuming batches
+        current_db = get_mongodb_database()
+        if collection_name_lower not in current_db.list_collection_names():
+            raise ValueError(f"Collection '{collection_name_lower}' does not exist")
+        
+        collection = get_mongodb_collection(collection_name_lower)
+        start_datetime, end_datetime = self._resolve_date_bounds(start_date, end_date)
+        query_filter = {
+            date_field: {
+                "$gte": start_datetime,
+                "$lte": end_datetime
+            }
+        }
+        projection = {col: 1 for col in columns}
+        if "_id" not in projection:
+            projection["_id"] = 0
+        
+        def _generate():
+            from bson import ObjectId
+            import numpy as np
+            
+            cursor = collection.find(
+                query_filter,
+                projection,
+                no_cursor_timeout=no_cursor_timeout,
+                batch_size=batch_size
+            ).sort(date_field, 1)
+            
+            total = 0
+            batch: List[Tuple[Any, ...]] = []
+            try:
+                for doc in cursor:
+                    row = []
+                    for col in columns:
+                        value = doc.get(col)
+                        if isinstance(value, ObjectId):
+                            value = str(value)
+                        elif isinstance(value, datetime):
+                            value = value.isoformat()
+                        row.append(value)
+                    batch.append(tuple(row))
+                    
+                    if len(batch) >= batch_size:
+                        total += len(batch)
+                        yield self._batch_to_columns(batch, columns, np) if as_columns else batch
+                        batch = []
+                
+                if batch:
+                    total += len(batch)
+                    yield self._batch_to_columns(batch, columns, np) if as_columns else batch
+            finally:
+                cursor.close()
+                logger.info(f"✅ Streamed {total} document(s) from collection '{collection_name_lower}' filtered by {date_field} between {start_datetime} and {end_datetime}")
+        
+        return _generate()
+    
+    @staticmethod
+    def _batch_to_columns(batch: List[Tuple[Any, ...]], columns: List[str], np) -> Dict[str, Any]:
+        """Transpose a batch of row tuples into {column: numpy object array}"""
+        transposed = list(zip(*batch))
+        return {col: np.array(transposed[i], dtype=object) for i, col in enumerate(columns)}
+    
+    @staticmethod
+    def _resolve_date_bounds(start_date, end_date) -> Tuple[datetime, datetime]:
+        """Widen plain dates to datetimes covering the whole start and end day"""
+        if isinstance(start_date, datetime):
+            start_datetime = start_date
+        else:
+            start_datetime = datetime.combine(start_date, datetime.min.time())
+        
+        if isinstance(end_date, datetime):
+            end_datetime = end_date
+        else:
+            end_datetime = datetime.combine(end_date, datetime.max.time())
+        
+        return start_datetime, end_datetime
+    
+    async def aggregate_concurrently(
+        self,
+        jobs: Dict[str, Tuple[Any, List[Dict[str, Any]]]],
+        timeout_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Run several aggregation pipelines concurrently on the bounded dashboard executor.
+        A failing or slow pipeline never fails the whole batch - it is reported in "errors".
+        
+        Args:
+            jobs: {label: (collection, pipeline)} - collection objects must be resolved by the
+                  caller (in request context, so the per-user database is honoured)
+            timeout_seconds: Per-pipeline timeout, also sent to MongoDB as maxTimeMS
+                             (default: settings.dashboard_pipeline_timeout_seconds)
+        
+        Returns:
+            Dictionary with "results" ({label: list of documents}), "errors"
+            ({label: message}) and "timings_ms" ({label: elapsed milliseconds})
+        """
+        import asyncio
+        import time
+        from app.config.executor import get_dashboard_executor
+        from app.config.settings import settings
+        
+        if timeout_seconds is None:
+            timeout_seconds = settings.dashboard_pipeline_timeout_seconds
+        max_time_ms = int(timeout_seconds * 1000)
+        loop = asyncio.get_event_loop()
+        executor = get_dashboard_executor()
+        
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        errors: Dict[str, str] = {}
+        timings_ms: Dict[str, float] = {}
+        
+        async def run_one(label: str, collection, pipeline: List[Dict[str, Any]]):
+            started = time.perf_counter()
+            try:
+                future = loop.run_in_executor(
+                    executor,
+                    lambda: list(collection.aggregate(pipeline, maxTimeMS=max_time_ms))
+                )
+                # Small grace period so the server-side maxTimeMS error wins when both fire
+                results[label] = await asyncio.wait_for(future, timeout=timeout_seconds + 1)
+            except asyncio.TimeoutError:
+                errors[label] = f"Aggregation timed out after {timeout_seconds}s"
+                logger.warning(f"⏱️ Aggregation '{label}' timed out after {timeout_seconds}s")
+            except Exception as e:
+                errors[label] = str(e)
+                logger.error(f"❌ Aggregation '{label}' failed: {e}")
+            finally:
+                timings_ms[label] = round((time.perf_counter() - started) * 1000, 2)
+        
+        await asyncio.gather(*(run_one(label, collection, pipeline) for label, (collection, pipeline) in jobs.items()))
+        
+        return {"results": results, "errors": errors, "timings_ms": timings_ms}
+    
     def close(self):
         """Close MongoDB connection"""
         # Connection is managed by LB-Backend utilities, so we don't close it here
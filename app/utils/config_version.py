@@ -0,0 +1,109 @@
+"""
+Configuration version counters
+One monotonically increasing integer per configuration set (e.g. reco_logics), bumped in the
+same transaction as every change so pollers can detect changes with a primary-key lookup
+"""
+
+from typing import Optional
+from sqlalchemy import text
+from app.config import database as db_config
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+RECO_LOGICS_CONFIG = "reco_logics"
+USER_CONTEXT_CONFIG = "user_context"
+ACCESS_MAPPINGS_CONFIG = "access_mappings"
+
+_config_version_table_ready = False
+
+
+async def ensure_config_version_table(session):
+    """
+    Create config_versions if the migration has not been applied yet (once per process).
+    Call before making the change: DDL implicitly commits the open transaction in MySQL.
+    """
+    global _config_version_table_ready
+    if _config_version_table_ready:
+        return
+    
+    await session.execute(text("""
+        CREATE TABLE IF NOT EXISTS config_versions (
+            name VARCHAR(100) NOT NULL,
+            version BIGINT UNSIGNED NOT NULL,
+            updated_at DATETIME NOT NULL,
+            PRIMARY KEY (name)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """))
+    _config_version_table_ready = True
+
+
+async def bump_config_version(session, name: str):
+    """Increment the version of a configuration set; the caller commits together with its change"""
+    await session.execute(text("""
+        INSERT INTO config_versions (name, version, updated_at)
+        VALUES (:name, 1, NOW())
+        ON DUPLICATE KEY UPDATE version = version + 1, updated_at = NOW()
+    """), {"name": name})
+
+
+async def get_config_version(session, name: str) -> Optional[int]:
+    """Current version of a configuration set (None if it was never bumped or the table is missing)"""
+    try:
+        result = await session.execute(
+            text("SELECT version FROM config_versions WHERE name = :name"),
+            {"name": name}
+        )
+        row = result.fetchone()
+        return int(row.version) if row else None
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read config version '{name}': {e}")
+        await session.rollback()
+        return None
+
+
+async def publish_config_change(name: str):
+    """Bump a configuration version in its own main-database transaction (logs instead of raising)"""
+    try:
+        if not db_config.main_session_factory:
+            await db_config.create_engines()
+        async with db_config.main_session_factory() as session:
+            await ensure_config_version_table(session)
+            await bump_config_version(session, name)
+            await session.commit()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not bump config version '{name}': {e}")
+
+
+class ConfigVersionPoller:
+    """
+    Rate-limited reader of one configuration version for in-process caches: the version is read
+    from the main database at most once per interval and the last value is served in between
+    """
+    
+    def __init__(self, name: str, interval_seconds: float):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.version: Optional[int] = None
+        self._next_check = 0.0
+    
+    async def current(self) -> Optional[int]:
+        """Latest known version (None if never bumped, or if polling is disabled)"""
+        if self.interval_seconds <= 0 or time.monotonic() < self._next_check:
+            return self.version
+        
+        # Claim the check before awaiting so concurrent callers don't all hit the database
+        self._next_check = time.monotonic() + self.interval_seconds
+        try:
+            if not db_config.main_session_factory:
+                await db_config.create_engines()
+            async with db_config.main_session_factory() as session:
+                self.version = await get_config_version(session, self.name)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not poll config version '{self.name}': {e}")
+        return self.version
+    
+    def expire(self):
+        """Force a database read on the next call (after this worker bumped the version itself)"""
+        self._next_check = 0.0
@@ -0,0 +1,98 @@
+"""
+Helper functions to write report Excel files incrementally from streamed MongoDB batches
+This keeps only one batch in memory at a time instead of the full dataset plus a DataFrame copy
+"""
+import json
+import logging
+import math
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Iterable, List, Tuple
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+logger = logging.getLogger(__name__)
+
+# Values openpyxl writes as they are
+_EXCEL_NATIVE_TYPES = (str, bool, int, float, Decimal, datetime, date, time, timedelta)
+
+
+def _excel_value(value: Any) -> Any:
+    """
+    Cell value for a MongoDB field: NaN becomes an empty cell, nested documents and arrays are
+    written as JSON and anything else openpyxl rejects (ObjectId, Decimal128, ...) as text
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, _EXCEL_NATIVE_TYPES):
+        return value
+    return str(value)
+
+
+def write_report_batches_to_file(
+    filepath: str,
+    columns: List[str],
+    batches: Iterable[List[Tuple[Any, ...]]],
+    sheet_name: str = "Report",
+    progress_callback=None
+) -> int:
+    """
+    Write row batches to a single-sheet Excel file using a write-only workbook.
+
+    Args:
+        filepath: Destination .xlsx path
+        columns: Header row, in the same order as the values in each row tuple
+        batches: Iterable of row-tuple batches (see MongoDBService.stream_collection_by_date_range)
+        sheet_name: Name of the worksheet
+        progress_callback: Optional callable receiving the running row count after each batch
+
+    Returns:
+        Number of data rows written
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=sheet_name)
+
+    header = []
+    for col in columns:
+        cell = WriteOnlyCell(worksheet, value=col)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    worksheet.append(header)
+
+    rows_written = 0
+    for batch in batches:
+        for row in batch:
+            worksheet.append([_excel_value(value) for value in row])
+        rows_written += len(batch)
+        if progress_callback:
+            progress_callback(rows_written)
+
+    workbook.save(filepath)
+    logger.info(f"Wrote {rows_written} row(s) to {filepath}")
+    return rows_written
+
+
+def batches_to_dataframe(columns: List[str], batches: Iterable[List[Tuple[Any, ...]]]):
+    """
+    Build a single DataFrame from streamed row batches without an intermediate list of dicts.
+
+    Args:
+        columns: Column names, in the same order as the values in each row tuple
+        batches: Iterable of row-tuple batches
+
+    Returns:
+        pandas DataFrame with the given columns (empty if no batches)
+    """
+    import pandas as pd
+
+    frames = [pd.DataFrame.from_records(batch, columns=columns) for batch in batches]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True, copy=False)
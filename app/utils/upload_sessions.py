@@ -0,0 +1,265 @@
+"""
+Resumable upload sessions
+A large file is sent as numbered chunks, each verified against its SHA-256 and stored on local
+disk under uploads/sessions/<session id>/. Chunks can be re-sent in any order until the session
+is completed, when they are concatenated (streamed, never loaded whole) into the final file.
+Sessions idle for longer than UPLOAD_SESSION_TTL_HOURS are garbage-collected.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.utils.upload_storage import PARTIAL_UPLOAD_PREFIX, StoredUpload
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SESSIONS_DIR = os.path.join("uploads", "sessions")
+
+DEFAULT_SESSION_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_SESSION_CHUNK_SIZE = 1024 * 1024
+MAX_SESSION_CHUNK_SIZE = 64 * 1024 * 1024
+
+UPLOAD_SESSION_TTL_HOURS = 24
+
+# Buffer used when assembling chunks into the final file
+ASSEMBLE_BUFFER_SIZE = 1024 * 1024
+
+_SESSION_FILE = "session.json"
+_COMPLETE_LOCK_FILE = "complete.lock"
+
+
+class UploadSessionError(ValueError):
+    """Invalid request against an upload session (bad chunk, checksum mismatch, incomplete session)"""
+
+
+class UploadSessionBusyError(UploadSessionError):
+    """The upload session is being completed, so its chunks cannot change"""
+
+
+class UploadSessionNotFoundError(LookupError):
+    """The upload session does not exist (or was garbage-collected)"""
+
+
+def _session_dir(session_id: str) -> str:
+    # Session ids are UUIDs; anything else could point outside the sessions directory
+    try:
+        uuid.UUID(session_id)
+    except (ValueError, TypeError):
+        raise UploadSessionNotFoundError(f"Upload session {session_id} not found")
+    return os.path.join(UPLOAD_SESSIONS_DIR, session_id)
+
+
+def _chunk_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"{index:06d}.chunk")
+
+
+def _write_session(session: Dict[str, Any]):
+    directory = _session_dir(session["session_id"])
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=PARTIAL_UPLOAD_PREFIX)
+    with os.fdopen(fd, "w") as out:
+        json.dump(session, out)
+    os.replace(temp_path, os.path.join(directory, _SESSION_FILE))
+
+
+def create_session(
+    filename: str,
+    total_size: int,
+    chunk_size: Optional[int] = None,
+    sha256: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Start a session for a file of total_size bytes sent in chunks of chunk_size bytes"""
+    chunk_size = min(max(chunk_size or DEFAULT_SESSION_CHUNK_SIZE, MIN_SESSION_CHUNK_SIZE), MAX_SESSION_CHUNK_SIZE)
+    now = time.time()
+    session = {
+        "session_id": str(uuid.uuid4()),
+        "filename": filename,
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+        "total_chunks": max(math.ceil(total_size / chunk_size), 1),
+        "sha256": sha256.lower() if sha256 else None,
+        "metadata": metadata or {},
+        "created_at": now,
+        "updated_at": now
+    }
+    os.makedirs(_session_dir(session["session_id"]), exist_ok=True)
+    _write_session(session)
+    return session
+
+
+def load_session(session_id: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(_session_dir(session_id), _SESSION_FILE)) as session_file:
+            return json.load(session_file)
+    except FileNotFoundError:
+        raise UploadSessionNotFoundError(f"Upload session {session_id} not found")
+
+
+def received_chunks(session: Dict[str, Any]) -> List[int]:
+    directory = _session_dir(session["session_id"])
+    return [index for index in range(session["total_chunks"]) if os.path.exists(_chunk_path(directory, index))]
+
+
+def expected_chunk_size(session: Dict[str, Any], index: int) -> int:
+    if index == session["total_chunks"] - 1:
+        return session["total_size"] - index * session["chunk_size"]
+    return session["chunk_size"]
+
+
+async def write_chunk(
+    session_id: str,
+    index: int,
+    body: AsyncIterator[bytes],
+    expected_sha256: str
+) -> Dict[str, Any]:
+    """
+    Store one chunk after checking its size and SHA-256 (re-sending a chunk replaces it).
+    Refused while the session is being completed, so the assembled file cannot change under it.
+
+    Raises:
+        UploadSessionNotFoundError, UploadSessionBusyError, UploadSessionError
+    """
+    session = load_session(session_id)
+    if not 0 <= index < session["total_chunks"]:
+        raise UploadSessionError(f"Chunk index must be between 0 and {session['total_chunks'] - 1}")
+    _check_not_completing(session_id)
+
+    expected_size = expected_chunk_size(session, index)
+    directory = _session_dir(session_id)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=PARTIAL_UPLOAD_PREFIX, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for data in body:
+                size += len(data)
+                if size > expected_size:
+                    raise UploadSessionError(f"Chunk {index} is larger than {expected_size} bytes")
+                digest.update(data)
+                out.write(data)
+
+        if size != expected_size:
+            raise UploadSessionError(f"Chunk {index} has {size} bytes, expected {expected_size}")
+        if digest.hexdigest() != (expected_sha256 or "").strip().lower():
+            raise UploadSessionError(f"Checksum mismatch for chunk {index}")
+
+        # Completion may have started while the chunk was streaming in
+        _check_not_completing(session_id)
+        os.replace(temp_path, _chunk_path(directory, index))
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    session["updated_at"] = time.time()
+    _write_session(session)
+    return session
+
+
+def assemble_session(session_id: str, dest_dir: str, filename: str) -> StoredUpload:
+    """
+    Concatenate all chunks into dest_dir/filename (through a temp file, renamed into place).
+    The session stays locked for completion: the caller deletes it once the file is registered,
+    or calls release_completion() to let the client retry. Blocking - run it in an executor.
+
+    Raises:
+        UploadSessionNotFoundError, UploadSessionBusyError (the session is already being completed),
+        UploadSessionError (missing chunks, size or checksum mismatch)
+    """
+    session = load_session(session_id)
+    directory = _session_dir(session_id)
+
+    missing = sorted(set(range(session["total_chunks"])) - set(received_chunks(session)))
+    if missing:
+        raise UploadSessionError(f"Missing chunks: {missing[:20]}{'...' if len(missing) > 20 else ''}")
+
+    # Only one request (on any worker) may complete a session
+    try:
+        os.close(os.open(os.path.join(directory, _COMPLETE_LOCK_FILE), os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        raise UploadSessionBusyError("Upload session is already being completed")
+
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dest_dir, prefix=PARTIAL_UPLOAD_PREFIX, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for index in range(session["total_chunks"]):
+                with open(_chunk_path(directory, index), "rb") as chunk:
+                    while True:
+                        data = chunk.read(ASSEMBLE_BUFFER_SIZE)
+                        if not data:
+                            break
+                        digest.update(data)
+                        out.write(data)
+                        size += len(data)
+
+        if size != session["total_size"]:
+            raise UploadSessionError(f"Assembled file has {size} bytes, expected {session['total_size']}")
+        if session["sha256"] and digest.hexdigest() != session["sha256"]:
+            raise UploadSessionError("Checksum mismatch for the assembled file")
+
+        final_path = os.path.join(dest_dir, filename)
+        os.replace(temp_path, final_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        release_completion(session_id)
+        raise
+
+    return StoredUpload(path=final_path, size=size, sha256=digest.hexdigest())
+
+
+def _check_not_completing(session_id: str):
+    if os.path.exists(os.path.join(_session_dir(session_id), _COMPLETE_LOCK_FILE)):
+        raise UploadSessionBusyError("Upload session is being completed, chunks can no longer be sent")
+
+
+def release_completion(session_id: str):
+    """Drop the completion lock taken by assemble_session so the client can retry completion"""
+    try:
+        os.remove(os.path.join(_session_dir(session_id), _COMPLETE_LOCK_FILE))
+    except OSError:
+        pass
+
+
+def delete_session(session_id: str):
+    shutil.rmtree(_session_dir(session_id), ignore_errors=True)
+
+
+def collect_stale_sessions(ttl_hours: float = UPLOAD_SESSION_TTL_HOURS) -> int:
+    """Delete sessions with no activity for ttl_hours; returns how many were removed"""
+    if not os.path.isdir(UPLOAD_SESSIONS_DIR):
+        return 0
+
+    cutoff = time.time() - ttl_hours * 3600
+    removed = 0
+    for entry in os.scandir(UPLOAD_SESSIONS_DIR):
+        if not entry.is_dir():
+            continue
+        try:
+            session = load_session(entry.name)
+            last_activity = session.get("updated_at") or session.get("created_at") or 0
+        except (UploadSessionNotFoundError, ValueError):
+            # Half-created or unreadable session: judge it by the directory itself
+            last_activity = entry.stat().st_mtime
+        if last_activity < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+
+    if removed:
+        logger.info(f"[UPLOAD_SESSIONS] Removed {removed} stale upload session(s)")
+    return removed
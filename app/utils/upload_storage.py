@@ -0,0 +1,83 @@
+"""
+Upload storage helpers
+Stream an UploadFile to disk in fixed-size chunks - hashing and counting bytes on the fly and
+aborting as soon as the size limit is crossed - so peak memory per upload is one chunk
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request body per iteration
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Prefix of in-progress temp files (in the destination directory, so the final rename is atomic)
+PARTIAL_UPLOAD_PREFIX = ".upload-"
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the allowed size"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File too large. Maximum size: {max_size // (1024 * 1024)}MB")
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+async def save_upload_file(
+    file: UploadFile,
+    dest_dir: str,
+    filename: str,
+    max_size: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    Write an upload to dest_dir/filename through a temp file in the same directory, renamed into
+    place only once the whole body has been received.
+
+    Raises:
+        FileTooLargeError: the body exceeded max_size (nothing is left on disk)
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dest_dir, prefix=PARTIAL_UPLOAD_PREFIX, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(max_size)
+                digest.update(chunk)
+                out.write(chunk)
+
+        final_path = os.path.join(dest_dir, filename)
+        os.replace(temp_path, final_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    return StoredUpload(path=final_path, size=size, sha256=digest.hexdigest())
+
+
+def upload_fingerprint(content_sha256: str, upload_type: Optional[str], datasource: Optional[str] = None) -> str:
+    """Fingerprint of an upload: the same bytes sent for another data source or type are a different upload"""
+    key = "|".join([content_sha256, (datasource or "").strip().lower(), (upload_type or "").strip().lower()])
+    return hashlib.sha256(key.encode()).hexdigest()
@@ -0,0 +1,110 @@
+"""
+Uploader API client
+One long-lived httpx.AsyncClient per process with a bounded number of in-flight uploads.
+Files are streamed from disk as multipart file objects and retried with exponential backoff
+only when the request cannot have been processed: connection failures, pool timeouts and
+502/503/504 responses. The upload POST is not idempotent, so read timeouts are not retried.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# First retry delay; doubled per attempt
+RETRY_BACKOFF_SECONDS = 2.0
+
+# Bad gateway / unavailable: the Uploader API did not process the request. 504 is not
+# retried - the gateway gave up waiting, but the Uploader API may still be ingesting the file
+RETRYABLE_STATUS_CODES = {502, 503}
+
+_http_client: Optional[httpx.AsyncClient] = None
+_upload_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_uploader_http_client() -> httpx.AsyncClient:
+    """Shared client for Uploader API calls (keeps connections alive between uploads)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.uploader_api_timeout_seconds, connect=10.0),
+            limits=httpx.Limits(max_connections=max(settings.uploader_api_concurrency, 1) * 2)
+        )
+    return _http_client
+
+
+def _get_upload_semaphore() -> asyncio.Semaphore:
+    global _upload_semaphore
+    if _upload_semaphore is None:
+        _upload_semaphore = asyncio.Semaphore(max(settings.uploader_api_concurrency, 1))
+    return _upload_semaphore
+
+
+async def close_uploader_http_client():
+    """Close the shared client - call this on application shutdown"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _is_retryable(response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+    """True only if the file cannot have been ingested (a retry must not load it twice)"""
+    if error is not None:
+        # ConnectError / ConnectTimeout: nothing was sent; PoolTimeout: no connection was taken
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+    return response is not None and response.status_code in RETRYABLE_STATUS_CODES
+
+
+async def post_file_to_uploader(
+    url: str,
+    params: Dict[str, Any],
+    file_path: str,
+    filename: str,
+    content_type: str
+) -> httpx.Response:
+    """
+    POST one spooled file to the Uploader API as multipart "file", waiting for a free upload slot.
+
+    Returns:
+        The final response (non-retryable error responses are returned, not raised)
+
+    Raises:
+        httpx.ConnectError / httpx.ConnectTimeout / httpx.PoolTimeout: still failing after the last retry
+        httpx.TimeoutException / httpx.TransportError: any other failure (not retried)
+    """
+    client = get_uploader_http_client()
+    max_attempts = max(settings.uploader_api_max_retries, 0) + 1
+
+    async with _get_upload_semaphore():
+        for attempt in range(1, max_attempts + 1):
+            response, error = None, None
+            try:
+                # Reopened per attempt: httpx streams the multipart body from the file object
+                with open(file_path, "rb") as file_stream:
+                    response = await client.post(
+                        url,
+                        params=params,
+                        files={"file": (filename, file_stream, content_type)}
+                    )
+            except Exception as e:
+                error = e
+
+            if not _is_retryable(response, error) or attempt == max_attempts:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)) + random.uniform(0, RETRY_BACKOFF_SECONDS / 2)
+            reason = f"{type(error).__name__}" if error is not None else f"status {response.status_code}"
+            logger.warning(
+                f"⚠️ Uploader API attempt {attempt}/{max_attempts} for {filename} failed ({reason}), "
+                f"retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
@@ -0,0 +1,102 @@
+"""
+Authenticated user cache
+get_current_user resolves the same user for every API call a page makes. Resolved users are kept
+per token - keyed by (user, token issued-at) - in an in-process TTL + LRU cache, so only the first
+request of a token (and one per TTL) touches the SSO database.
+
+Edits to a user drop its entries through invalidate_user_context(). Other workers learn about the
+edit through the "user_context" config version counter, polled at most every
+user_cache_version_check_seconds; a change clears their whole cache.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import inspect
+
+from app.config.settings import settings
+from app.models.sso.user_details import UserDetails
+from app.utils.config_version import USER_CONTEXT_CONFIG, ConfigVersionPoller, publish_config_change
+
+logger = logging.getLogger(__name__)
+
+# (user id or username from the token, token iat/exp) -> (expires at, column values)
+_entries: "OrderedDict[Tuple[Hashable, Hashable], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+_version_poller = ConfigVersionPoller(USER_CONTEXT_CONFIG, settings.user_cache_version_check_seconds)
+_known_version: Optional[int] = None
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def token_cache_key(payload: Dict[str, Any]) -> Optional[Tuple[Hashable, Hashable]]:
+    """Cache key for a decoded token, or None if the token carries nothing to key on"""
+    subject = payload.get("id") or payload.get("jti")
+    issued = payload.get("iat") or payload.get("exp")
+    if subject is None or issued is None:
+        return None
+    return (subject, issued)
+
+
+def _snapshot(user: UserDetails) -> Dict[str, Any]:
+    return {column.key: getattr(user, column.key) for column in inspect(UserDetails).column_attrs}
+
+
+async def _sync_shared_version():
+    """Clear the cache when another worker has invalidated a user since the last check"""
+    global _known_version
+    version = await _version_poller.current()
+    if version != _known_version:
+        if _known_version is not None:
+            _entries.clear()
+        _known_version = version
+
+
+async def get_cached_user(key: Tuple[Hashable, Hashable]) -> Optional[UserDetails]:
+    """
+    Cached user for a token key, as a transient UserDetails (column attributes only - it is not
+    attached to any session, so relationships are not loaded)
+    """
+    await _sync_shared_version()
+
+    entry = _entries.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        if entry is not None:
+            _entries.pop(key, None)
+        _stats["misses"] += 1
+        return None
+
+    _entries.move_to_end(key)
+    _stats["hits"] += 1
+    return UserDetails(**entry[1])
+
+
+def cache_user(key: Tuple[Hashable, Hashable], user: UserDetails):
+    """Remember the user resolved for a token key"""
+    _entries[key] = (time.monotonic() + settings.user_cache_ttl_seconds, _snapshot(user))
+    _entries.move_to_end(key)
+    while len(_entries) > max(settings.user_cache_max_entries, 1):
+        _entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+async def invalidate_user_context(user_id: Optional[int] = None, username: Optional[str] = None):
+    """
+    Drop every cached entry of a user (call after updating, deactivating or deleting a user or
+    changing a password) and tell the other workers. Never raises.
+    """
+    for key, (_, values) in list(_entries.items()):
+        if (user_id is not None and values.get("id") == user_id) or \
+                (username is not None and values.get("username") == username):
+            _entries.pop(key, None)
+    _stats["invalidations"] += 1
+
+    if settings.user_cache_version_check_seconds > 0:
+        await publish_config_change(USER_CONTEXT_CONFIG)
+
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    """Cache size and hit/miss counters for this worker"""
+    return {"entries": len(_entries), **_stats}
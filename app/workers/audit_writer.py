@@ -0,0 +1,412 @@
+"""
+Write-behind audit log writer
+Audited requests hand their entry to enqueue_audit_log(), which never waits: the entry goes on a
+bounded in-process queue, and a background task writes queued entries to audit_log with
+multi-row INSERTs every audit_log_batch_size entries or audit_log_flush_interval_ms.
+
+Entries that cannot be written - the queue is full, or the SSO database rejects a batch - are
+appended to a per-process JSON-lines spill file under AUDIT_SPILL_DIR and replayed by the
+"audit_log_spill_replay" job once the database accepts writes again. Queue overflow is collected
+in a small in-memory buffer and spilled on a thread, so request handlers never touch the disk.
+Shutdown drains the queue.
+"""
+
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import database as db_config
+from app.config.settings import settings
+from app.models.sso.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_SPILL_DIR = os.path.join("uploads", "audit_spill")
+AUDIT_SPILL_REPLAY_JOB = "audit_log_spill_replay"
+
+# A replay file this old was left behind by a worker that died mid-replay
+ORPHANED_REPLAY_SECONDS = 10 * 60
+
+_AUDIT_COLUMNS = {column.key for column in AuditLog.__table__.columns} - {"id"}
+
+
+class AuditWriteError(Exception):
+    """
+    A batch write stopped partway: entries before `position` were handled (`written` of them
+    stored, the others rejected), the rest were not attempted
+    """
+
+    def __init__(self, position: int, written: int, cause: Exception):
+        super().__init__(str(cause))
+        self.position = position
+        self.written = written
+
+
+_queue: Optional[asyncio.Queue] = None
+_flush_task: Optional[asyncio.Task] = None
+_stopping = False
+
+# Batch _flush_loop is collecting or writing, spilled if the loop is cancelled on shutdown
+_inflight_batch: List[Dict[str, Any]] = []
+
+# Entries that did not fit in the queue, waiting for _overflow_spill to write them to disk
+_overflow: deque = deque()
+_overflow_spill: Optional[asyncio.Future] = None
+
+# Serializes appends from request handlers and the flush task within this process
+_spill_lock = threading.Lock()
+
+_stats = {
+    "enqueued": 0,
+    "written": 0,
+    "batches": 0,
+    "flush_failures": 0,
+    "overflow": 0,
+    "spilled": 0,
+    "dropped": 0,
+    "rejected": 0,
+    "replayed": 0
+}
+
+
+def _spill_path() -> str:
+    return os.path.join(AUDIT_SPILL_DIR, f"audit-{os.getpid()}.jsonl")
+
+
+def _open_spill_file():
+    """
+    Open this process's spill file for appending, holding its flock. The file is reopened if a
+    replay claimed (renamed) it while we were waiting, so nothing is appended to a claimed file.
+    """
+    path = _spill_path()
+    while True:
+        spill_file = open(path, "a")
+        fcntl.flock(spill_file, fcntl.LOCK_EX)
+        try:
+            if os.fstat(spill_file.fileno()).st_ino == os.stat(path).st_ino:
+                return spill_file
+        except FileNotFoundError:
+            pass
+        spill_file.close()
+
+
+def _spill(entries: List[Dict[str, Any]]) -> bool:
+    """Append entries to this process's spill file; False if even that failed"""
+    try:
+        with _spill_lock:
+            os.makedirs(AUDIT_SPILL_DIR, exist_ok=True)
+            with _open_spill_file() as spill_file:
+                for entry in entries:
+                    spill_file.write(json.dumps(entry, default=str) + "\n")
+        _stats["spilled"] += len(entries)
+        return True
+    except Exception as e:
+        _stats["dropped"] += len(entries)
+        logger.error(f"[AUDIT_WRITER] ❌ Dropped {len(entries)} audit entries, spill file not writable: {e}")
+        return False
+
+
+def _drain_overflow():
+    """Spill everything in the overflow buffer (runs on a thread)"""
+    entries = []
+    while _overflow:
+        entries.append(_overflow.popleft())
+    if entries:
+        _spill(entries)
+
+
+def _schedule_overflow_spill():
+    """Start a thread spilling the overflow buffer unless one is already running"""
+    global _overflow_spill
+    if _overflow_spill is not None and not _overflow_spill.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Called outside the event loop (no request to keep responsive)
+        _drain_overflow()
+        return
+    _overflow_spill = loop.run_in_executor(None, _drain_overflow)
+    # Entries appended after the thread emptied the buffer start another spill
+    _overflow_spill.add_done_callback(lambda _: _overflow and _schedule_overflow_spill())
+
+
+def enqueue_audit_log(**fields) -> bool:
+    """
+    Queue an audit entry (AuditLog column values) for the background writer. Never blocks and
+    never raises: when the queue is full the entry goes to the overflow buffer, which a thread
+    spills to disk (if that buffer is full too, the entry is dropped).
+
+    Returns:
+        True if the entry was queued, False if it was spilled or dropped
+    """
+    entry = {key: value for key, value in fields.items() if key in _AUDIT_COLUMNS}
+    # Stamped now: the row may reach the database seconds later
+    entry.setdefault("created_at", datetime.utcnow())
+    _stats["enqueued"] += 1
+
+    if _queue is not None and not _stopping:
+        try:
+            _queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+    _stats["overflow"] += 1
+    if len(_overflow) >= max(settings.audit_log_queue_size, 1):
+        _stats["dropped"] += 1
+        logger.error("[AUDIT_WRITER] ❌ Audit overflow buffer full, entry dropped")
+        return False
+    _overflow.append(entry)
+    _schedule_overflow_spill()
+    return False
+
+
+def _decode_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    created_at = entry.get("created_at")
+    if isinstance(created_at, str):
+        entry["created_at"] = datetime.fromisoformat(created_at)
+    return entry
+
+
+async def _insert_batch(entries: List[Dict[str, Any]]):
+    """One multi-row INSERT for the whole batch, in its own transaction"""
+    if not db_config.sso_session_factory:
+        await db_config.create_engines()
+    async with db_config.sso_session_factory() as session:
+        await session.execute(insert(AuditLog.__table__), entries)
+        await session.commit()
+
+
+async def _write(entries: List[Dict[str, Any]]) -> int:
+    """
+    Insert a batch. If the database rejects the data (not the connection), retry row by row and
+    drop only the rejected rows - otherwise one bad entry would keep its whole batch spilled.
+
+    Returns:
+        Number of rows written
+
+    Raises:
+        AuditWriteError: any other failure, with how far the batch got
+    """
+    try:
+        await _insert_batch(entries)
+        return len(entries)
+    except (IntegrityError, DataError):
+        pass
+    except Exception as e:
+        raise AuditWriteError(0, 0, e) from e
+
+    written = 0
+    for position, entry in enumerate(entries):
+        try:
+            await _insert_batch([entry])
+            written += 1
+        except (IntegrityError, DataError) as e:
+            _stats["rejected"] += 1
+            logger.error(f"[AUDIT_WRITER] ❌ Audit entry rejected by the database ({e.orig}): {entry}")
+        except Exception as e:
+            # Connection lost partway: the rows before this one must not be written twice
+            raise AuditWriteError(position, written, e) from e
+    return written
+
+
+async def _flush(entries: List[Dict[str, Any]]):
+    global _inflight_batch
+    try:
+        _stats["written"] += await _write(entries)
+        _stats["batches"] += 1
+    except AuditWriteError as e:
+        _stats["written"] += e.written
+        _stats["flush_failures"] += 1
+        remaining = entries[e.position:]
+        logger.warning(f"[AUDIT_WRITER] ⚠️ Could not write {len(remaining)} audit entries, spilling to disk: {e}")
+        # The spill thread finishes even if the loop is cancelled now, so shutdown must not spill these again
+        _inflight_batch = []
+        await asyncio.to_thread(_spill, remaining)
+
+
+async def _flush_loop():
+    """
+    Collect up to audit_log_batch_size entries, or whatever arrived within the flush interval.
+    A None entry (queued by stop_audit_log_writer) flushes the current batch and ends the loop.
+    """
+    global _inflight_batch
+    interval = settings.audit_log_flush_interval_ms / 1000
+    batch_size = max(settings.audit_log_batch_size, 1)
+
+    while True:
+        entry = await _queue.get()
+        if entry is None:
+            return
+        batch = [entry]
+        _inflight_batch = batch
+        deadline = time.monotonic() + interval
+        stop = False
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(_queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if entry is None:
+                stop = True
+                break
+            batch.append(entry)
+        await _flush(batch)
+        _inflight_batch = []
+        if stop:
+            return
+
+
+def _spill_base(path: str) -> str:
+    return os.path.join(os.path.dirname(path), os.path.basename(path).split(".")[0])
+
+
+def _claim_spill_files() -> List[str]:
+    """Rename spill files to names owned by this process so only one worker replays each"""
+    claimed = []
+    now = time.time()
+    candidates = glob.glob(os.path.join(AUDIT_SPILL_DIR, "*.jsonl"))
+    candidates += [
+        path for path in glob.glob(os.path.join(AUDIT_SPILL_DIR, "*.replay"))
+        if now - os.path.getmtime(path) > ORPHANED_REPLAY_SECONDS
+    ]
+    for index, path in enumerate(candidates):
+        target = f"{_spill_base(path)}.{os.getpid()}.{int(now * 1000)}.{index}.replay"
+        try:
+            # Under the writer's flock, so no append is in progress while the file is renamed
+            with open(path) as spill_file:
+                fcntl.flock(spill_file, fcntl.LOCK_EX)
+                os.rename(path, target)
+            claimed.append(target)
+        except OSError:
+            # Claimed by another worker first
+            continue
+    return claimed
+
+
+def _read_spill_file(path: str) -> List[Dict[str, Any]]:
+    with open(path) as spill_file:
+        return [_decode_entry(json.loads(line)) for line in spill_file if line.strip()]
+
+
+def _release_spill_file(path: str, entries: Optional[List[Dict[str, Any]]] = None):
+    """Hand a claimed file back for the next replay, optionally keeping only the given entries"""
+    if entries is not None:
+        with open(path, "w") as spill_file:
+            for entry in entries:
+                spill_file.write(json.dumps(entry, default=str) + "\n")
+    os.rename(path, path[:-len(".replay")] + ".jsonl")
+
+
+async def replay_spilled_audit_logs() -> int:
+    """Write spilled entries back to audit_log; returns how many were replayed"""
+    if not os.path.isdir(AUDIT_SPILL_DIR):
+        return 0
+
+    replayed = 0
+    batch_size = max(settings.audit_log_batch_size, 1)
+    claimed = await asyncio.to_thread(_claim_spill_files)
+    for position, path in enumerate(claimed):
+        entries = await asyncio.to_thread(_read_spill_file, path)
+        done = 0
+        try:
+            while done < len(entries):
+                batch = entries[done:done + batch_size]
+                written = await _write(batch)
+                done += len(batch)
+                replayed += written
+                _stats["replayed"] += written
+        except AuditWriteError as e:
+            done += e.position
+            replayed += e.written
+            _stats["replayed"] += e.written
+            # Database still unavailable: keep what is left for the next run
+            await asyncio.to_thread(_release_spill_file, path, entries[done:])
+            for other in claimed[position + 1:]:
+                await asyncio.to_thread(_release_spill_file, other)
+            raise
+        os.remove(path)
+
+    if replayed:
+        logger.info(f"[AUDIT_WRITER] ✅ Replayed {replayed} spilled audit entries")
+    return replayed
+
+
+async def start_audit_log_writer():
+    """Start the background writer and the spill replay job (every worker: spill files are local)"""
+    global _queue, _flush_task, _stopping
+    _stopping = False
+    _queue = asyncio.Queue(maxsize=max(settings.audit_log_queue_size, 1))
+    _flush_task = asyncio.create_task(_flush_loop())
+
+    from app.workers import scheduler
+    scheduler.register_job(
+        AUDIT_SPILL_REPLAY_JOB,
+        replay_spilled_audit_logs,
+        interval_seconds=60,
+        jitter_seconds=10,
+        max_runtime_seconds=10 * 60,
+        run_on_start=True
+    )
+    await scheduler.start_job(AUDIT_SPILL_REPLAY_JOB)
+    logger.info("[AUDIT_WRITER] ✅ Audit log writer started")
+
+
+async def stop_audit_log_writer():
+    """Stop accepting entries and write out everything still queued - call before closing the database"""
+    global _flush_task, _stopping, _inflight_batch
+    if _flush_task is None:
+        return
+
+    # Later entries are spilled; the writer drains everything queued before the marker
+    _stopping = True
+    pending = _queue.qsize()
+    await _queue.put(None)
+    try:
+        await asyncio.wait_for(_flush_task, timeout=settings.audit_log_shutdown_timeout_seconds)
+    except asyncio.TimeoutError:
+        logger.warning("[AUDIT_WRITER] ⚠️ Audit log flush timed out on shutdown, spilling what is left")
+        _flush_task.cancel()
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        # The batch being written when the loop was cancelled, then everything still queued
+        leftover = list(_inflight_batch)
+        _inflight_batch = []
+        while not _queue.empty():
+            entry = _queue.get_nowait()
+            if entry is not None:
+                leftover.append(entry)
+        if leftover:
+            await asyncio.to_thread(_spill, leftover)
+    _flush_task = None
+    
+    # Overflow still being spilled, or appended after the last spill started
+    if _overflow_spill is not None:
+        await asyncio.gather(_overflow_spill, return_exceptions=True)
+    if _overflow:
+        await asyncio.to_thread(_drain_overflow)
+    logger.info(f"[AUDIT_WRITER] ✅ Audit log writer stopped ({pending} pending entries flushed)")
+
+
+def get_audit_log_writer_stats() -> Dict[str, Any]:
+    """Queue depth and write/overflow counters for this worker"""
+    return {
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "overflow_buffered": len(_overflow),
+        "queue_size": settings.audit_log_queue_size,
+        **_stats
+    }
@@ -1,348 +1,539 @@
 """
 Daily Sales Summary Scheduler
-Runs every 10 seconds to populate daily_sales_summary table
+Runs every 10 seconds to recompute the daily_sales_summary rows marked in daily_sales_dirty,
+with a periodic full-window sweep as a safety net
 """
 
-import asyncio
 import logging
 import os
+import time
 from datetime import datetime, timedelta, date
-from typing import Optional
+from typing import Optional, Tuple
 
 from app.config import database as db_config
+from app.workers import scheduler
 
 logger = logging.getLogger(__name__)
 
-_scheduler_task: Optional[asyncio.Task] = None
-_stop_event: Optional[asyncio.Event] = None
-_scheduler_lock = asyncio.Lock()
-_initialized = False
+_last_full_sweep: Optional[float] = None
+_dirty_table_ready = False
+_zone_exists: Optional[bool] = None
+_timestamp_columns = {}
+
+JOB_NAME = "daily_sales_summary"
 
 # Allow overriding via env var, default 10 seconds
 SCHEDULER_INTERVAL_SECONDS = int(os.getenv("DAILY_SALES_SCHEDULER_INTERVAL_SECONDS", "10"))
 
+# A run still going after this long (default 30 minutes) is cancelled and retried with backoff
+SCHEDULER_MAX_RUNTIME_SECONDS = int(os.getenv("DAILY_SALES_SCHEDULER_MAX_RUNTIME_SECONDS", str(30 * 60)))
+
+# Full-window reconciliation sweep, default every 6 hours (and on the first run)
+FULL_SWEEP_INTERVAL_SECONDS = int(os.getenv("DAILY_SALES_FULL_SWEEP_INTERVAL_SECONDS", str(6 * 60 * 60)))
+
+# Days per INSERT ... SELECT chunk, bounding how long each upsert holds row locks
+SUMMARY_CHUNK_DAYS = int(os.getenv("DAILY_SALES_SUMMARY_CHUNK_DAYS", "7"))
+
+# Source tables feeding daily_sales_summary: (table, store column, business date column)
+_SOURCE_TABLES = [
+    ("orders", "store_name", "date"),
+    ("zomato", "store_code", "order_date"),
+]
+
+
+async def _ensure_dirty_table(session):
+    """Create daily_sales_dirty if the migration has not been applied yet (once per process)"""
+    global _dirty_table_ready
+    if _dirty_table_ready:
+        return
+    
+    from sqlalchemy.sql import text
+    await session.execute(text("""
+        CREATE TABLE IF NOT EXISTS daily_sales_dirty (
+            store_code VARCHAR(50) NOT NULL,
+            business_date DATE NOT NULL,
+            source VARCHAR(50) NULL,
+            marked_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            PRIMARY KEY (store_code, business_date),
+            INDEX idx_marked_at (marked_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """))
+    # Tables created with second precision: a re-mark in the snapshot's second would be cleared unseen
+    precision = (await session.execute(text("""
+        SELECT DATETIME_PRECISION FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'daily_sales_dirty' AND COLUMN_NAME = 'marked_at'
+    """))).scalar()
+    if not precision:
+        await session.execute(text("""
+            ALTER TABLE daily_sales_dirty
+            MODIFY marked_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+        """))
+    await session.commit()
+    _dirty_table_ready = True
+
 
-async def _populate_daily_sales_summary_internal():
+async def mark_daily_sales_dirty_range(
+    session,
+    start_date: date,
+    end_date: date,
+    source: Optional[str] = None
+) -> int:
     """
-    Internal function to populate daily_sales_summary table
-    Processes last 7 days of data
+    Mark every (store, date) with source rows or an existing summary row in the date range.
+    Summary rows are included so days whose source rows were deleted are recomputed too.
+    """
+    from sqlalchemy.sql import text
+    
+    await _ensure_dirty_table(session)
+    result = await session.execute(text("""
+        INSERT INTO daily_sales_dirty (store_code, business_date, source, marked_at)
+        SELECT pairs.store_code, pairs.business_date, :source, NOW(6)
+        FROM (
+            SELECT DISTINCT store_name AS store_code, date AS business_date
+            FROM orders
+            WHERE date BETWEEN :start_date AND :end_date
+            UNION
+            SELECT DISTINCT store_code, order_date AS business_date
+            FROM zomato
+            WHERE order_date BETWEEN :start_date AND :end_date
+            UNION
+            SELECT store_code, sales_date AS business_date
+            FROM daily_sales_summary
+            WHERE sales_date BETWEEN :start_date AND :end_date
+        ) pairs
+        WHERE pairs.store_code IS NOT NULL AND pairs.business_date IS NOT NULL
+        ON DUPLICATE KEY UPDATE source = VALUES(source), marked_at = VALUES(marked_at)
+    """), {"start_date": start_date, "end_date": end_date, "source": source})
+    return result.rowcount or 0
+
+
+async def _timestamp_column(session, table_name: str) -> Optional[str]:
+    """updated_at or created_at of a source table, whichever exists (None if neither)"""
+    from sqlalchemy.sql import text
+    
+    if table_name not in _timestamp_columns:
+        result = await session.execute(text("""
+            SELECT COLUMN_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = :table_name
+            AND COLUMN_NAME IN ('updated_at', 'created_at')
+        """), {"table_name": table_name})
+        columns = {row.COLUMN_NAME for row in result.fetchall()}
+        _timestamp_columns[table_name] = next((c for c in ("updated_at", "created_at") if c in columns), None)
+    return _timestamp_columns[table_name]
+
+
+async def mark_daily_sales_dirty_since(session, since: datetime, source: Optional[str] = None) -> int:
+    """
+    Mark the (store, date) pairs of source rows written since a database timestamp.
+    Used by upload paths that do not know which stores and dates a file touched; tables
+    without a timestamp column are left to the periodic full sweep.
+    """
+    from sqlalchemy.sql import text
+    
+    await _ensure_dirty_table(session)
+    marked = 0
+    for table_name, store_column, date_column in _SOURCE_TABLES:
+        timestamp_column = await _timestamp_column(session, table_name)
+        if not timestamp_column:
+            continue
+        result = await session.execute(text(f"""
+            INSERT INTO daily_sales_dirty (store_code, business_date, source, marked_at)
+            SELECT DISTINCT {store_column}, {date_column}, :source, NOW(6)
+            FROM {table_name}
+            WHERE {timestamp_column} >= :since
+            AND {store_column} IS NOT NULL AND {date_column} IS NOT NULL
+            ON DUPLICATE KEY UPDATE source = VALUES(source), marked_at = VALUES(marked_at)
+        """), {"since": since, "source": source})
+        marked += result.rowcount or 0
+    return marked
+
+
+async def get_database_now() -> Optional[datetime]:
     """
+    Current UTC time on the main database clock, used as the watermark for mark_uploaded_data_dirty.
+    UTC like every source row stamp (the ORM's datetime.utcnow, ingestion's UTC_TIMESTAMP()).
+    Returns None (nothing will be marked) if the database cannot be reached.
+    """
+    from sqlalchemy.sql import text
+    
     try:
         if not db_config.main_session_factory:
             await db_config.create_engines()
-        
         async with db_config.main_session_factory() as session:
-            from sqlalchemy.sql import text
-            from decimal import Decimal
-            
-            # Find the actual date range of data in orders table
-            # Process last 90 days OR the actual date range, whichever is wider
-            today = date.today()
-            default_start = today - timedelta(days=90)
-            
-            # Find min/max dates in orders table
-            date_range_query = text("""
-                SELECT 
-                    MIN(date) AS min_date,
-                    MAX(date) AS max_date
-                FROM orders
-            """)
-            date_range_result = await session.execute(date_range_query)
-            date_range_row = date_range_result.fetchone()
-            
-            if date_range_row and date_range_row.min_date and date_range_row.max_date:
-                # Use the actual date range from orders table
-                actual_start = date_range_row.min_date if isinstance(date_range_row.min_date, date) else date_range_row.min_date.date()
-                actual_end = date_range_row.max_date if isinstance(date_range_row.max_date, date) else date_range_row.max_date.date()
-                
-                # If data is recent (within last 90 days), process last 90 days
-                # If data is old, process the actual date range
-                if actual_end >= default_start:
-                    # Recent data: process last 90 days
-                    start_date = default_start
-                    end_date = min(today, actual_end)
-                else:
-                    # Old data: process the entire range
-                    start_date = actual_start
-                    end_date = actual_end
-                
-                logger.info(f"[DAILY_SALES_SCHEDULER] Data range in orders table: {actual_start} to {actual_end}")
-                logger.info(f"[DAILY_SALES_SCHEDULER] Processing date range: {start_date} to {end_date}")
-            else:
-                # No data in orders table, use default range
-                end_date = today
-                start_date = default_start
-                logger.info(f"[DAILY_SALES_SCHEDULER] No data in orders table, using default range: {start_date} to {end_date}")
-            
-            # Step 1: Get unique store+date combinations
-            unique_stores_dates_query = text("""
-                SELECT DISTINCT 
-                    date AS sales_date,
-                    store_name AS store_code
-                FROM orders
-                WHERE date BETWEEN :start_date AND :end_date
-                ORDER BY date, store_name
-            """)
-            result = await session.execute(unique_stores_dates_query, {
-                "start_date": start_date,
-                "end_date": end_date
-            })
-            store_date_combos = result.fetchall()
-            
-            if not store_date_combos:
-                logger.info(f"[DAILY_SALES_SCHEDULER] No data found for date range {start_date} to {end_date}")
-                return {"success": True, "records_processed": 0}
-            
-            logger.info(f"[DAILY_SALES_SCHEDULER] Found {len(store_date_combos)} unique store+date combinations")
-            
-            # Step 2: Get store metadata
-            store_codes = list(set([row.store_code for row in store_date_combos]))
-            store_placeholders = ",".join([f":store_{i}" for i in range(len(store_codes))])
-            store_params = {f"store_{i}": code for i, code in enumerate(store_codes)}
-            
-            # Check if zone column exists in devyani_stores table
-            check_zone_query = text("""
-                SELECT COUNT(*) as col_exists
-                FROM information_schema.COLUMNS
-                WHERE TABLE_SCHEMA = DATABASE()
-                AND TABLE_NAME = 'devyani_stores'
-                AND COLUMN_NAME = 'zone'
-            """)
-            zone_check_result = await session.execute(check_zone_query)
-            zone_exists = zone_check_result.fetchone().col_exists > 0
-            
-            # Query store metadata (with or without zone column)
-            if zone_exists:
-                store_metadata_query = text(f"""
-                    SELECT store_code, city_id, zone
-                    FROM devyani_stores
-                    WHERE store_code IN ({store_placeholders})
-                """)
-            else:
-                store_metadata_query = text(f"""
-                    SELECT store_code, city_id
-                    FROM devyani_stores
-                    WHERE store_code IN ({store_placeholders})
-                """)
-            
-            store_metadata_result = await session.execute(store_metadata_query, store_params)
-            if zone_exists:
-                store_metadata = {row.store_code: {"city_id": row.city_id, "zone": row.zone} 
-                                 for row in store_metadata_result.fetchall()}
-            else:
-                store_metadata = {row.store_code: {"city_id": row.city_id, "zone": None} 
-                                 for row in store_metadata_result.fetchall()}
-            
-            # Step 3: Calculate In-Store Sales
-            instore_query = text(f"""
-                SELECT 
-                    date AS sales_date,
-                    store_name AS store_code,
-                    SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'CASH' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_cash,
-                    SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'CARD' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_card,
-                    SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'UPI' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_upi,
-                    SUM(CASE WHEN UPPER(TRIM(online_order_taker)) = 'INSTORE' THEN COALESCE(payment, 0) ELSE 0 END) AS instore_other,
-                    SUM(CASE WHEN UPPER(TRIM(online_order_taker)) IN ('CASH', 'CARD', 'UPI', 'INSTORE') THEN COALESCE(payment, 0) ELSE 0 END) AS instore_total,
-                    COUNT(CASE WHEN UPPER(TRIM(online_order_taker)) IN ('CASH', 'CARD', 'UPI', 'INSTORE') THEN 1 END) AS instore_count
-                FROM orders
-                WHERE date BETWEEN :start_date AND :end_date
-                AND store_name IN ({store_placeholders})
-                GROUP BY date, store_name
-            """)
-            instore_params = {
-                "start_date": start_date,
-                "end_date": end_date,
-                **store_params
-            }
-            instore_result = await session.execute(instore_query, instore_params)
-            instore_data = {(row.sales_date, row.store_code): row for row in instore_result.fetchall()}
-            
-            # Step 4: Calculate Aggregator Sales
-            aggregator_query = text(f"""
-                SELECT 
-                    date AS sales_date,
-                    store_name AS store_code,
-                    SUM(CASE WHEN online_order_taker = 'Zomato' THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_zomato,
-                    SUM(CASE WHEN online_order_taker = 'Swiggy' THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_swiggy,
-                    SUM(CASE WHEN online_order_taker = 'MagicPin' THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_magicpin,
-                    SUM(CASE WHEN online_order_taker IN ('Zomato', 'Swiggy', 'MagicPin') THEN COALESCE(payment, 0) ELSE 0 END) AS aggregator_total,
-                    COUNT(CASE WHEN online_order_taker IN ('Zomato', 'Swiggy', 'MagicPin') THEN 1 END) AS aggregator_count
-                FROM orders
-                WHERE date BETWEEN :start_date AND :end_date
-                AND store_name IN ({store_placeholders})
-                GROUP BY date, store_name
-            """)
-            aggregator_result = await session.execute(aggregator_query, instore_params)
-            aggregator_data = {(row.sales_date, row.store_code): row for row in aggregator_result.fetchall()}
-            
-            # Step 5: Calculate Zomato formula values
-            zomato_query = text(f"""
-                SELECT 
-                    order_date AS sales_date,
-                    store_code,
-                    SUM(
-                        CASE 
-                            WHEN net_amount IS NOT NULL AND net_amount > 0 THEN net_amount
-                            ELSE (bill_subtotal - COALESCE(mvd, 0) + COALESCE(merchant_pack_charge, 0))
-                        END
-                    ) AS zomato_net_amount,
-                    SUM(bill_subtotal - COALESCE(mvd, 0) + COALESCE(merchant_pack_charge, 0)) AS zomato_calculated_amount,
-                    SUM(COALESCE(final_amount, 0)) AS zomato_final_amount,
-                    COUNT(*) AS zomato_order_count
-                FROM zomato
-                WHERE order_date BETWEEN :start_date AND :end_date
-                AND store_code IN ({store_placeholders})
-                AND action IN ('sale', 'addition')
-                GROUP BY order_date, store_code
-            """)
-            zomato_result = await session.execute(zomato_query, instore_params)
-            zomato_data = {(row.sales_date, row.store_code): row for row in zomato_result.fetchall()}
+            return (await session.execute(text("SELECT UTC_TIMESTAMP()"))).scalar()
+    except Exception as e:
+        logger.warning(f"[DAILY_SALES_SCHEDULER] ⚠️ Could not read database time: {e}")
+        return None
+
+
+async def mark_uploaded_data_dirty(since: Optional[datetime], source: Optional[str] = None) -> int:
+    """Mark the pairs written by an upload that started at `since`; never raises"""
+    if since is None:
+        return 0
+    try:
+        if not db_config.main_session_factory:
+            await db_config.create_engines()
+        async with db_config.main_session_factory() as session:
+            marked = await mark_daily_sales_dirty_since(session, since, source)
+            await session.commit()
+            logger.info(f"[DAILY_SALES_SCHEDULER] Marked {marked} store+date pair(s) dirty after {source or 'upload'}")
+            return marked
+    except Exception as e:
+        logger.warning(f"[DAILY_SALES_SCHEDULER] ⚠️ Could not mark uploaded data dirty: {e}")
+        return 0
+
+
+async def _zone_column_exists(session) -> bool:
+    """Whether devyani_stores has a zone column (checked once per process)"""
+    global _zone_exists
+    if _zone_exists is None:
+        from sqlalchemy.sql import text
+        check_zone_query = text("""
+            SELECT COUNT(*) as col_exists
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'devyani_stores'
+            AND COLUMN_NAME = 'zone'
+        """)
+        zone_check_result = await session.execute(check_zone_query)
+        _zone_exists = zone_check_result.fetchone().col_exists > 0
+    return _zone_exists
+
+
+async def _full_sweep_window(session) -> Tuple[date, date]:
+    """
+    Date range covered by the full reconciliation sweep:
+    the last 90 days, or the actual orders date range when all data is older
+    """
+    from sqlalchemy.sql import text
+    
+    today = date.today()
+    default_start = today - timedelta(days=90)
+    
+    # Find min/max dates in orders table
+    date_range_query = text("""
+        SELECT 
+            MIN(date) AS min_date,
+            MAX(date) AS max_date
+        FROM orders
+    """)
+    date_range_result = await session.execute(date_range_query)
+    date_range_row = date_range_result.fetchone()
+    
+    if date_range_row and date_range_row.min_date and date_range_row.max_date:
+        # Use the actual date range from orders table
+        actual_start = date_range_row.min_date if isinstance(date_range_row.min_date, date) else date_range_row.min_date.date()
+        actual_end = date_range_row.max_date if isinstance(date_range_row.max_date, date) else date_range_row.max_date.date()
+        
+        # If data is recent (within last 90 days), process last 90 days
+        # If data is old, process the actual date range
+        if actual_end >= default_start:
+            # Recent data: process last 90 days
+            start_date = default_start
+            end_date = min(today, actual_end)
+        else:
+            # Old data: process the entire range
+            start_date = actual_start
+            end_date = actual_end
+        
+        logger.info(f"[DAILY_SALES_SCHEDULER] Data range in orders table: {actual_start} to {actual_end}")
+    else:
+        # No data in orders table, use default range
+        end_date = today
+        start_date = default_start
+        logger.info(f"[DAILY_SALES_SCHEDULER] No data in orders table, using default range: {start_date} to {end_date}")
+    
+    return start_date, end_date
+
+
+async def upsert_daily_sales_summary(
+    session,
+    start_date: date,
+    end_date: date,
+    dirty_snapshot: Optional[datetime] = None
+) -> int:
+    """
+    Rebuild daily_sales_summary for one date chunk with a single INSERT ... SELECT.
+
+    Orders and zomato rows are projected onto one column layout, combined with UNION ALL and
+    summed per (date, store) with conditional aggregation; the upsert goes through the
+    uk_date_store unique key. Only pairs with orders rows are written, as before.
+
+    Args:
+        session: Main database session (the caller commits)
+        start_date: First sales date of the chunk
+        end_date: Last sales date of the chunk
+        dirty_snapshot: When given, only pairs in daily_sales_dirty marked at or before it
+
+    Returns:
+        MySQL affected-row count (1 per inserted row, 2 per changed row)
+    """
+    from sqlalchemy.sql import text
+    
+    if dirty_snapshot is not None:
+        orders_scope = """
+            JOIN daily_sales_dirty d ON d.business_date = o.date AND d.store_code = o.store_name
+            WHERE d.marked_at <= :snapshot AND o.date BETWEEN :start_date AND :end_date
+        """
+        zomato_scope = """
+            JOIN daily_sales_dirty d ON d.business_date = z.order_date AND d.store_code = z.store_code
+            WHERE d.marked_at <= :snapshot AND z.order_date BETWEEN :start_date AND :end_date
+        """
+    else:
+        orders_scope = "WHERE o.date BETWEEN :start_date AND :end_date"
+        zomato_scope = "WHERE z.order_date BETWEEN :start_date AND :end_date"
+    
+    zone_column = "MAX(st.zone)" if await _zone_column_exists(session) else "NULL"
+    store_zone = "MAX(zone) AS zone" if await _zone_column_exists(session) else "NULL AS zone"
+    
+    result = await session.execute(text(f"""
+        INSERT INTO daily_sales_summary (
+            sales_date, store_code, city_id, zone,
+            instore_cash, instore_card, instore_upi, instore_other, instore_total, instore_count,
+            aggregator_zomato, aggregator_swiggy, aggregator_magicpin, aggregator_total, aggregator_count,
+            zomato_net_amount, zomato_calculated_amount, zomato_final_amount, zomato_order_count,
+            total_sales, total_order_count,
+            created_at, updated_at
+        )
+        SELECT
+            src.sales_date,
+            src.store_code,
+            MAX(st.city_id),
+            {zone_column},
+            COALESCE(SUM(src.instore_cash), 0),
+            COALESCE(SUM(src.instore_card), 0),
+            COALESCE(SUM(src.instore_upi), 0),
+            COALESCE(SUM(src.instore_other), 0),
+            COALESCE(SUM(src.instore_total), 0),
+            SUM(src.instore_count),
+            COALESCE(SUM(src.aggregator_zomato), 0),
+            COALESCE(SUM(src.aggregator_swiggy), 0),
+            COALESCE(SUM(src.aggregator_magicpin), 0),
+            COALESCE(SUM(src.aggregator_total), 0),
+            SUM(src.aggregator_count),
+            COALESCE(SUM(src.zomato_net_amount), 0),
+            COALESCE(SUM(src.zomato_calculated_amount), 0),
+            COALESCE(SUM(src.zomato_final_amount), 0),
+            SUM(src.zomato_order_count),
+            COALESCE(SUM(src.instore_total), 0) + COALESCE(SUM(src.aggregator_total), 0),
+            SUM(src.instore_count) + SUM(src.aggregator_count),
+            NOW(), NOW()
+        FROM (
+            -- In-Store and Aggregator Sales from orders
+            SELECT
+                o.date AS sales_date,
+                o.store_name AS store_code,
+                CASE WHEN UPPER(TRIM(o.online_order_taker)) = 'CASH' THEN COALESCE(o.payment, 0) ELSE 0 END AS instore_cash,
+                CASE WHEN UPPER(TRIM(o.online_order_taker)) = 'CARD' THEN COALESCE(o.payment, 0) ELSE 0 END AS instore_card,
+                CASE WHEN UPPER(TRIM(o.online_order_taker)) = 'UPI' THEN COALESCE(o.payment, 0) ELSE 0 END AS instore_upi,
+                CASE WHEN UPPER(TRIM(o.online_order_taker)) = 'INSTORE' THEN COALESCE(o.payment, 0) ELSE 0 END AS instore_other,
+                CASE WHEN UPPER(TRIM(o.online_order_taker)) IN ('CASH', 'CARD', 'UPI', 'INSTORE') THEN COALESCE(o.payment, 0) ELSE 0 END AS instore_total,
+                CASE WHEN UPPER(TRIM(o.online_order_taker)) IN ('CASH', 'CARD', 'UPI', 'INSTORE') THEN 1 ELSE 0 END AS instore_count,
+                CASE WHEN o.online_order_taker = 'Zomato' THEN COALESCE(o.payment, 0) ELSE 0 END AS aggregator_zomato,
+                CASE WHEN o.online_order_taker = 'Swiggy' THEN COALESCE(o.payment, 0) ELSE 0 END AS aggregator_swiggy,
+                CASE WHEN o.online_order_taker = 'MagicPin' THEN COALESCE(o.payment, 0) ELSE 0 END AS aggregator_magicpin,
+                CASE WHEN o.online_order_taker IN ('Zomato', 'Swiggy', 'MagicPin') THEN COALESCE(o.payment, 0) ELSE 0 END AS aggregator_total,
+                CASE WHEN o.online_order_taker IN ('Zomato', 'Swiggy', 'MagicPin') THEN 1 ELSE 0 END AS aggregator_count,
+                NULL AS zomato_net_amount,
+                NULL AS zomato_calculated_amount,
+                NULL AS zomato_final_amount,
+                0 AS zomato_order_count,
+                1 AS has_orders
+            FROM orders o
+            {orders_scope}
             
-            # Step 6: Merge and insert/update
-            records_processed = 0
+            UNION ALL
             
-            for sales_date, store_code in store_date_combos:
-                instore_row = instore_data.get((sales_date, store_code))
-                aggregator_row = aggregator_data.get((sales_date, store_code))
-                zomato_row = zomato_data.get((sales_date, store_code))
-                store_info = store_metadata.get(store_code, {"city_id": None, "zone": None})
-                
-                instore_total = Decimal(str(instore_row.instore_total)) if instore_row else Decimal('0')
-                aggregator_total = Decimal(str(aggregator_row.aggregator_total)) if aggregator_row else Decimal('0')
-                total_sales = instore_total + aggregator_total
-                
-                instore_count = instore_row.instore_count if instore_row else 0
-                aggregator_count = aggregator_row.aggregator_count if aggregator_row else 0
-                total_order_count = instore_count + aggregator_count
-                
-                upsert_query = text("""
-                    INSERT INTO daily_sales_summary (
-                        sales_date, store_code, city_id, zone,
-                        instore_cash, instore_card, instore_upi, instore_other, instore_total, instore_count,
-                        aggregator_zomato, aggregator_swiggy, aggregator_magicpin, aggregator_total, aggregator_count,
-                        zomato_net_amount, zomato_calculated_amount, zomato_final_amount, zomato_order_count,
-                        total_sales, total_order_count,
-                        created_at, updated_at
-                    ) VALUES (
-                        :sales_date, :store_code, :city_id, :zone,
-                        :instore_cash, :instore_card, :instore_upi, :instore_other, :instore_total, :instore_count,
-                        :aggregator_zomato, :aggregator_swiggy, :aggregator_magicpin, :aggregator_total, :aggregator_count,
-                        :zomato_net_amount, :zomato_calculated_amount, :zomato_final_amount, :zomato_order_count,
-                        :total_sales, :total_order_count,
-                        NOW(), NOW()
-                    )
-                    ON DUPLICATE KEY UPDATE
-                        city_id = VALUES(city_id),
-                        zone = VALUES(zone),
-                        instore_cash = VALUES(instore_cash),
-                        instore_card = VALUES(instore_card),
-                        instore_upi = VALUES(instore_upi),
-                        instore_other = VALUES(instore_other),
-                        instore_total = VALUES(instore_total),
-                        instore_count = VALUES(instore_count),
-                        aggregator_zomato = VALUES(aggregator_zomato),
-                        aggregator_swiggy = VALUES(aggregator_swiggy),
-                        aggregator_magicpin = VALUES(aggregator_magicpin),
-                        aggregator_total = VALUES(aggregator_total),
-                        aggregator_count = VALUES(aggregator_count),
-                        zomato_net_amount = VALUES(zomato_net_amount),
-                        zomato_calculated_amount = VALUES(zomato_calculated_amount),
-                        zomato_final_amount = VALUES(zomato_final_amount),
-                        zomato_order_count = VALUES(zomato_order_count),
-                        total_sales = VALUES(total_sales),
-                        total_order_count = VALUES(total_order_count),
-                        updated_at = NOW()
-                """)
-                
-                await session.execute(upsert_query, {
-                    "sales_date": sales_date,
-                    "store_code": store_code,
-                    "city_id": store_info["city_id"],
-                    "zone": store_info["zone"],
-                    "instore_cash": Decimal(str(instore_row.instore_cash)) if instore_row else Decimal('0'),
-                    "instore_card": Decimal(str(instore_row.instore_card)) if instore_row else Decimal('0'),
-                    "instore_upi": Decimal(str(instore_row.instore_upi)) if instore_row else Decimal('0'),
-                    "instore_other": Decimal(str(instore_row.instore_other)) if instore_row else Decimal('0'),
-                    "instore_total": instore_total,
-                    "instore_count": instore_count,
-                    "aggregator_zomato": Decimal(str(aggregator_row.aggregator_zomato)) if aggregator_row else Decimal('0'),
-                    "aggregator_swiggy": Decimal(str(aggregator_row.aggregator_swiggy)) if aggregator_row else Decimal('0'),
-                    "aggregator_magicpin": Decimal(str(aggregator_row.aggregator_magicpin)) if aggregator_row else Decimal('0'),
-                    "aggregator_total": aggregator_total,
-                    "aggregator_count": aggregator_count,
-                    "zomato_net_amount": Decimal(str(zomato_row.zomato_net_amount)) if zomato_row else Decimal('0'),
-                    "zomato_calculated_amount": Decimal(str(zomato_row.zomato_calculated_amount)) if zomato_row else Decimal('0'),
-                    "zomato_final_amount": Decimal(str(zomato_row.zomato_final_amount)) if zomato_row else Decimal('0'),
-                    "zomato_order_count": zomato_row.zomato_order_count if zomato_row else 0,
-                    "total_sales": total_sales,
-                    "total_order_count": total_order_count
-                })
-                records_processed += 1
+            -- Zomato formula values
+            SELECT
+                z.order_date AS sales_date,
+                z.store_code,
+                0, 0, 0, 0, 0, 0,
+                0, 0, 0, 0, 0,
+                CASE 
+                    WHEN z.net_amount IS NOT NULL AND z.net_amount > 0 THEN z.net_amount
+                    ELSE (z.bill_subtotal - COALESCE(z.mvd, 0) + COALESCE(z.merchant_pack_charge, 0))
+                END,
+                z.bill_subtotal - COALESCE(z.mvd, 0) + COALESCE(z.merchant_pack_charge, 0),
+                COALESCE(z.final_amount, 0),
+                1,
+                0
+            FROM zomato z
+            {zomato_scope}
+            AND z.action IN ('sale', 'addition')
+        ) src
+        LEFT JOIN (
+            SELECT store_code, MAX(city_id) AS city_id, {store_zone}
+            FROM devyani_stores
+            GROUP BY store_code
+        ) st ON st.store_code = src.store_code
+        GROUP BY src.sales_date, src.store_code
+        HAVING MAX(src.has_orders) = 1
+        ON DUPLICATE KEY UPDATE
+            city_id = VALUES(city_id),
+            zone = VALUES(zone),
+            instore_cash = VALUES(instore_cash),
+            instore_card = VALUES(instore_card),
+            instore_upi = VALUES(instore_upi),
+            instore_other = VALUES(instore_other),
+            instore_total = VALUES(instore_total),
+            instore_count = VALUES(instore_count),
+            aggregator_zomato = VALUES(aggregator_zomato),
+            aggregator_swiggy = VALUES(aggregator_swiggy),
+            aggregator_magicpin = VALUES(aggregator_magicpin),
+            aggregator_total = VALUES(aggregator_total),
+            aggregator_count = VALUES(aggregator_count),
+            zomato_net_amount = VALUES(zomato_net_amount),
+            zomato_calculated_amount = VALUES(zomato_calculated_amount),
+            zomato_final_amount = VALUES(zomato_final_amount),
+            zomato_order_count = VALUES(zomato_order_count),
+            total_sales = VALUES(total_sales),
+            total_order_count = VALUES(total_order_count),
+            updated_at = NOW()
+    """), {"start_date": start_date, "end_date": end_date, "snapshot": dirty_snapshot})
+    return result.rowcount or 0
+
+
+def _date_chunks(start_date: date, end_date: date):
+    """Split [start_date, end_date] into SUMMARY_CHUNK_DAYS-long ranges"""
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(end_date, chunk_start + timedelta(days=SUMMARY_CHUNK_DAYS - 1))
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+async def refresh_daily_sales_summary_range(session, start_date: date, end_date: date) -> int:
+    """
+    Rebuild daily_sales_summary for a date range, one committed INSERT ... SELECT per chunk
+    so no statement holds locks on more than SUMMARY_CHUNK_DAYS days of rows.
+
+    Returns:
+        Number of daily_sales_summary rows in the range afterwards
+    """
+    from sqlalchemy.sql import text
+    
+    for chunk_start, chunk_end in _date_chunks(start_date, end_date):
+        await upsert_daily_sales_summary(session, chunk_start, chunk_end)
+        await session.commit()
+    
+    count_result = await session.execute(text("""
+        SELECT COUNT(*) FROM daily_sales_summary WHERE sales_date BETWEEN :start_date AND :end_date
+    """), {"start_date": start_date, "end_date": end_date})
+    return count_result.scalar() or 0
+
+
+async def _refresh_dirty_pairs(session) -> dict:
+    """
+    Recompute daily_sales_summary for the pairs currently in daily_sales_dirty, then clear them.
+    Every query joins the dirty table (snapshotted by marked_at) instead of passing store IN lists;
+    pairs re-marked while the refresh runs keep a newer marked_at (microsecond precision, so even
+    within the snapshot's second) and are picked up next time.
+    """
+    from sqlalchemy.sql import text
+    
+    snapshot_row = (await session.execute(text("""
+        SELECT MAX(marked_at) AS snapshot, COUNT(*) AS pending,
+               MIN(business_date) AS first_date, MAX(business_date) AS last_date
+        FROM daily_sales_dirty
+    """))).fetchone()
+    if not snapshot_row or not snapshot_row.pending:
+        return {"success": True, "records_processed": 0, "dirty_pairs": 0}
+    
+    snapshot = snapshot_row.snapshot
+    logger.info(f"[DAILY_SALES_SCHEDULER] Recomputing {snapshot_row.pending} dirty store+date pair(s)")
+    
+    records_processed = 0
+    for chunk_start, chunk_end in _date_chunks(snapshot_row.first_date, snapshot_row.last_date):
+        params = {"snapshot": snapshot, "start_date": chunk_start, "end_date": chunk_end}
+        
+        records_processed += await upsert_daily_sales_summary(session, chunk_start, chunk_end, dirty_snapshot=snapshot)
+        
+        # Drop summary rows of dirty pairs whose orders are gone, then clear the chunk's marks
+        await session.execute(text("""
+            DELETE s FROM daily_sales_summary s
+            JOIN daily_sales_dirty d ON d.business_date = s.sales_date AND d.store_code = s.store_code
+            WHERE d.marked_at <= :snapshot
+            AND d.business_date BETWEEN :start_date AND :end_date
+            AND NOT EXISTS (
+                SELECT 1 FROM orders o
+                WHERE o.date = s.sales_date AND o.store_name = s.store_code
+            )
+        """), params)
+        await session.execute(text("""
+            DELETE FROM daily_sales_dirty
+            WHERE marked_at <= :snapshot
+            AND business_date BETWEEN :start_date AND :end_date
+        """), params)
+        scheduler.ensure_leader(JOB_NAME)
+        await session.commit()
+    
+    logger.info(f"[DAILY_SALES_SCHEDULER] ✅ Successfully processed {snapshot_row.pending} dirty pair(s) ({records_processed} row change(s))")
+    
+    return {"success": True, "records_processed": records_processed, "dirty_pairs": snapshot_row.pending}
+
+
+async def _populate_daily_sales_summary_internal(full_sweep: bool = False):
+    """
+    Internal function to populate daily_sales_summary table
+    Recomputes only the (store, date) pairs marked in daily_sales_dirty; a full sweep
+    first marks the whole reconciliation window as a safety net for missed marks
+    """
+    try:
+        if not db_config.main_session_factory:
+            await db_config.create_engines()
+        
+        async with db_config.main_session_factory() as session:
+            await _ensure_dirty_table(session)
             
-            await session.commit()
-            logger.info(f"[DAILY_SALES_SCHEDULER] ✅ Successfully processed {records_processed} records")
+            if full_sweep:
+                start_date, end_date = await _full_sweep_window(session)
+                marked = await mark_daily_sales_dirty_range(session, start_date, end_date, source="full_sweep")
+                scheduler.ensure_leader(JOB_NAME)
+                await session.commit()
+                logger.info(f"[DAILY_SALES_SCHEDULER] Full sweep marked {marked} pair(s) for {start_date} to {end_date}")
             
-            return {"success": True, "records_processed": records_processed}
+            return await _refresh_dirty_pairs(session)
             
+    except scheduler.JobNotLeaderError:
+        raise
     except Exception as e:
         logger.error(f"[DAILY_SALES_SCHEDULER] ❌ Error: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
 
 
-async def _scheduler_loop():
-    """Background loop that runs the population task every 10 seconds"""
-    global _stop_event, _initialized
-    logger.info(f"[DAILY_SALES_SCHEDULER] Starting scheduler loop (interval={SCHEDULER_INTERVAL_SECONDS}s)")
+async def _run_scheduled_refresh() -> dict:
+    """Scheduled job: refresh dirty pairs, with a full-window sweep on the first run and every FULL_SWEEP_INTERVAL_SECONDS"""
+    global _last_full_sweep
     
-    while not _stop_event.is_set():
-        try:
-            async with _scheduler_lock:
-                result = await _populate_daily_sales_summary_internal()
-                if result.get("success"):
-                    logger.debug(f"[DAILY_SALES_SCHEDULER] ✅ Run successful: {result.get('records_processed', 0)} records")
-                else:
-                    logger.warning(f"[DAILY_SALES_SCHEDULER] ⚠️ Run failed: {result.get('error', 'Unknown error')}")
-            
-            if not _initialized:
-                _initialized = True
-                logger.info("[DAILY_SALES_SCHEDULER] ✅ Scheduler initialized and running")
-            
-        except Exception as e:
-            logger.error(f"[DAILY_SALES_SCHEDULER] Error in scheduler loop: {e}", exc_info=True)
-        
-        try:
-            await asyncio.wait_for(
-                _stop_event.wait(),
-                timeout=SCHEDULER_INTERVAL_SECONDS
-            )
-        except asyncio.TimeoutError:
-            continue
+    full_sweep = _last_full_sweep is None or time.monotonic() - _last_full_sweep >= FULL_SWEEP_INTERVAL_SECONDS
+    result = await _populate_daily_sales_summary_internal(full_sweep=full_sweep)
+    if not result.get("success"):
+        raise RuntimeError(result.get("error", "Unknown error"))
     
-    logger.info("[DAILY_SALES_SCHEDULER] Scheduler loop stopped")
+    if full_sweep:
+        _last_full_sweep = time.monotonic()
+    logger.debug(f"[DAILY_SALES_SCHEDULER] ✅ Run successful: {result.get('records_processed', 0)} records")
+    return result
 
 
 async def start_daily_sales_scheduler():
-    """Start the daily sales summary scheduler"""
-    global _scheduler_task, _stop_event
-    
-    if _scheduler_task and not _scheduler_task.done():
-        logger.info("[DAILY_SALES_SCHEDULER] Scheduler already running")
-        return
-    
-    _stop_event = asyncio.Event()
-    _scheduler_task = asyncio.create_task(_scheduler_loop(), name="daily_sales_scheduler")
-    logger.info("[DAILY_SALES_SCHEDULER] Scheduler task created")
+    """Register and start the daily sales summary job (runs on the leader worker only)"""
+    scheduler.register_job(
+        JOB_NAME,
+        _run_scheduled_refresh,
+        interval_seconds=SCHEDULER_INTERVAL_SECONDS,
+        jitter_seconds=SCHEDULER_INTERVAL_SECONDS / 5,
+        max_runtime_seconds=SCHEDULER_MAX_RUNTIME_SECONDS,
+        run_on_start=True,
+        leader_only=True
+    )
+    await scheduler.start_job(JOB_NAME)
+    logger.info(f"[DAILY_SALES_SCHEDULER] Scheduler started (interval={SCHEDULER_INTERVAL_SECONDS}s, full sweep every {FULL_SWEEP_INTERVAL_SECONDS}s)")
 
 
 async def stop_daily_sales_scheduler():
-    """Stop the daily sales summary scheduler"""
-    global _scheduler_task, _stop_event
-    
-    if _scheduler_task:
-        if _stop_event:
-            _stop_event.set()
-        await _scheduler_task
-        _scheduler_task = None
-        _stop_event = None
-        logger.info("[DAILY_SALES_SCHEDULER] Scheduler task stopped")
-
+    """Stop the daily sales summary job"""
+    await scheduler.stop_job(JOB_NAME)
@@ -1,30 +1,66 @@
 """
 Formula watcher scheduler
 Periodically reads formulas from reco_logics.recologic and prints them.
+Changed formulas recompute only the pipeline stages their tender feeds, coalesced over a short window.
+The recompute runs as its own scheduler job ("formula_recalc") on the watcher's leader, so it shows
+up in the job status, is fenced by leadership and is cancelled on shutdown.
 """
 
-import asyncio
 import json
 import logging
 import os
 import hashlib
+import time
 from typing import Optional, List, Dict, Any, Tuple, Iterable
-from datetime import datetime
+from datetime import datetime, date, timedelta
 
 from sqlalchemy import text
 
 from app.config import database as db_config
+from app.utils.config_version import get_config_version, RECO_LOGICS_CONFIG
+from app.workers import scheduler
 
 logger = logging.getLogger(__name__)
 
-_watcher_task: Optional[asyncio.Task] = None
-_stop_event: Optional[asyncio.Event] = None
-_recalc_lock = asyncio.Lock()
 _formula_hash_cache: Dict[int, str] = {}
+_formula_scope_cache: Dict[int, Tuple[Optional[str], Optional[date], Optional[date]]] = {}
 _initialized = False
+_last_seen_version: Optional[int] = None
+_pending_recalc: Dict[str, List[Tuple[Optional[date], Optional[date]]]] = {}
+# When the oldest change in _pending_recalc was queued (monotonic clock)
+_pending_since: Optional[float] = None
 
-# Allow overriding via env var, default 10 seconds
-#FORMULA_WATCH_INTERVAL_SECONDS = int(os.getenv("FORMULA_WATCH_INTERVAL_SECONDS", "3000"))
+# Allow overriding via env var, default 3000 seconds
+FORMULA_WATCH_INTERVAL_SECONDS = int(os.getenv("FORMULA_WATCH_INTERVAL_SECONDS", "3000"))
+
+# A check (including the recalculation pipeline it triggers) is cancelled after this long, default 1 hour
+FORMULA_WATCH_MAX_RUNTIME_SECONDS = int(os.getenv("FORMULA_WATCH_MAX_RUNTIME_SECONDS", str(60 * 60)))
+
+JOB_NAME = "formula_watcher"
+
+RECALC_JOB_NAME = "formula_recalc"
+
+# Changes arriving within this window (default 30 seconds) are merged into one recompute
+RECALC_COALESCE_SECONDS = float(os.getenv("FORMULA_RECALC_COALESCE_SECONDS", "30"))
+
+# Calculation pipeline stages in execution order:
+# (stage, tender keywords whose data feeds it, source (table, business date column) pairs)
+# A recologic whose tender matches no keyword recomputes every stage.
+RECALC_STAGES = [
+    ("populate_threepo", ("zomato", "pos"), (("orders", "date"), ("zomato", "order_date"))),
+    ("generate_trm", ("trm", "rzp", "razorpay"), (("trm", "date"),)),
+    ("prepare_self_reco", ("zomato",), (("zomato", "order_date"),)),
+    ("prepare_cross_reco", ("zomato", "pos"), (("zomato", "order_date"), ("orders", "date"))),
+]
+
+
+async def _fetch_reco_logics_version() -> Optional[int]:
+    """Read the reco_logics config version (None when it is not tracked yet)."""
+    if not db_config.main_session_factory:
+        await db_config.create_engines()
+    
+    async with db_config.main_session_factory() as session:
+        return await get_config_version(session, RECO_LOGICS_CONFIG)
 
 
 async def _fetch_recologics():
@@ -81,85 +117,97 @@ def _extract_formulas(recologic_json: str) -> List[Dict[str, Any]]:
     return formulas
 
 
-async def _formula_watcher_loop():
-    """Background loop that fetches and prints formulas."""
-    global _stop_event, _formula_hash_cache, _initialized
-    logger.info(f"[FORMULA_WATCHER] Starting formula watcher loop (interval={FORMULA_WATCH_INTERVAL_SECONDS}s)")
+async def _check_formulas():
+    """Fetch formulas once, log and mark changed rows and trigger recalculations."""
+    global _formula_hash_cache, _formula_scope_cache, _initialized, _last_seen_version
     
-    while not _stop_event.is_set():
-        try:
-            records = await _fetch_recologics()
-            
-            if not records:
-                logger.info("[FORMULA_WATCHER] No reco_logics records found")
-                _formula_hash_cache = {}
-            else:
-                changed_records, removed_ids = _detect_changes(records)
-                
-                # Process changed records: log them and mark as PROCESSED
-                if changed_records:
-                    processed_ids = []
-                    for row in changed_records:
-                        _log_formula_row(row)
-                        if hasattr(row, 'id'):
-                            processed_ids.append(row.id)
-                    
-                    # Mark formulas as PROCESSED after successful detection and logging
-                    if processed_ids:
-                        await _mark_as_processed(processed_ids)
-                        logger.info(f"[FORMULA_WATCHER] Marked {len(processed_ids)} formulas as PROCESSED after detection")
-                
-                # Trigger recalculations if needed (after formulas are marked as processed)
-                if (changed_records or removed_ids) and _initialized:
-                    await _trigger_recalculations(changed_records, removed_ids)
-                
-                # Update cache after processing
-                _formula_hash_cache = {
-                    row.id: _hash_recologic(row.recologic)
-                    for row in records
-                }
-                
-                if not _initialized:
-                    _initialized = True
-            
-        except Exception as e:
-            logger.error(f"[FORMULA_WATCHER] Error during formula extraction: {e}", exc_info=True)
+    # Idle ticks cost one primary-key lookup: reco_logics is only re-read once the version
+    # bumped by the save/update handlers has moved (or when no version is tracked)
+    version = await _fetch_reco_logics_version()
+    if _initialized and version is not None and version == _last_seen_version:
+        logger.debug(f"[FORMULA_WATCHER] reco_logics unchanged at version {version}")
+        return
+    
+    records = await _fetch_recologics()
+    
+    if not records:
+        logger.info("[FORMULA_WATCHER] No reco_logics records found")
+    
+    changed_records, removed_ids = _detect_changes(records)
+    
+    # Process changed records: log them and mark as PROCESSED
+    processed_ids = []
+    if changed_records:
+        for row in changed_records:
+            _log_formula_row(row)
+            if hasattr(row, 'id'):
+                processed_ids.append(row.id)
         
-        try:
-            await asyncio.wait_for(
-                _stop_event.wait(),
-                timeout=FORMULA_WATCH_INTERVAL_SECONDS
-            )
-        except asyncio.TimeoutError:
-            continue
+        # Mark formulas as PROCESSED after successful detection and logging
+        if processed_ids:
+            if await _mark_as_processed(processed_ids):
+                logger.info(f"[FORMULA_WATCHER] Marked {len(processed_ids)} formulas as PROCESSED after detection")
+            else:
+                processed_ids = []
+                # Keep re-reading until the rows are marked, even if the version does not move
+                version = None
+    
+    # Trigger recalculations if needed (after formulas are marked as processed)
+    if (changed_records or removed_ids) and _initialized:
+        await _trigger_recalculations(changed_records, removed_ids)
+    
+    # Update cache after processing. Rows marked PROCESSED drop out of the next fetch, so they
+    # are left out here - otherwise they would be reported as removed and recomputed twice
+    processed = set(processed_ids)
+    _formula_hash_cache = {
+        row.id: _hash_recologic(row.recologic)
+        for row in records
+        if row.id not in processed
+    }
+    _formula_scope_cache = {
+        row.id: _row_scope(row)
+        for row in records
+        if row.id not in processed
+    }
+    
+    _last_seen_version = version
     
-    logger.info("[FORMULA_WATCHER] Watcher loop stopped")
+    if not _initialized:
+        _initialized = True
 
 
 async def start_formula_watcher():
-    """Start the formula watcher background task."""
-    global _watcher_task, _stop_event
+    """Register and start the formula watcher and recompute jobs (run on the leader worker only)."""
+    scheduler.register_job(
+        JOB_NAME,
+        _check_formulas,
+        interval_seconds=FORMULA_WATCH_INTERVAL_SECONDS,
+        jitter_seconds=min(FORMULA_WATCH_INTERVAL_SECONDS / 10, 60),
+        max_runtime_seconds=FORMULA_WATCH_MAX_RUNTIME_SECONDS,
+        run_on_start=True,
+        leader_only=True
+    )
+    await scheduler.start_job(JOB_NAME)
     
-    if _watcher_task and not _watcher_task.done():
-        logger.info("[FORMULA_WATCHER] Watcher already running")
-        return
-    
-    _stop_event = asyncio.Event()
-    _watcher_task = asyncio.create_task(_formula_watcher_loop(), name="formula_watcher")
-    logger.info("[FORMULA_WATCHER] Watcher task created")
+    # Not leader_only: it would take a lease of its own, possibly on another worker than the
+    # watcher that queues the changes. It runs only where the watcher's lease is held instead.
+    scheduler.register_job(
+        RECALC_JOB_NAME,
+        _run_pending_recalculations,
+        interval_seconds=max(RECALC_COALESCE_SECONDS / 3, 1),
+        max_runtime_seconds=FORMULA_WATCH_MAX_RUNTIME_SECONDS
+    )
+    await scheduler.start_job(RECALC_JOB_NAME)
+    # ...and is cancelled as soon as the watcher's lease is lost
+    watcher, recalc = scheduler.get_job(JOB_NAME), scheduler.get_job(RECALC_JOB_NAME)
+    watcher.lease.add_loss_listener(lambda: recalc.cancel_runs("lost the formula watcher lease"))
+    logger.info(f"[FORMULA_WATCHER] Watcher started (interval={FORMULA_WATCH_INTERVAL_SECONDS}s)")
 
 
 async def stop_formula_watcher():
-    """Stop the formula watcher task."""
-    global _watcher_task, _stop_event
-    
-    if _watcher_task:
-        if _stop_event:
-            _stop_event.set()
-        await _watcher_task
-        _watcher_task = None
-        _stop_event = None
-        logger.info("[FORMULA_WATCHER] Watcher task stopped")
+    """Stop the formula watcher and recompute jobs (a running recompute is cancelled after the shutdown grace period)."""
+    await scheduler.stop_job(JOB_NAME)
+    await scheduler.stop_job(RECALC_JOB_NAME)
 
 
 def _hash_recologic(recologic: Optional[str]) -> str:
@@ -215,10 +263,10 @@ def _log_formula_row(row):
     logger.info("[FORMULA_WATCHER] %s", json.dumps(message, default=str))
 
 
-async def _mark_as_processed(record_ids: List[int]):
+async def _mark_as_processed(record_ids: List[int]) -> bool:
     """Update status to 'PROCESSED' for successfully processed formula records."""
     if not record_ids:
-        return
+        return True
     
     try:
         if not db_config.main_session_factory:
@@ -242,80 +290,191 @@ async def _mark_as_processed(record_ids: List[int]):
             """)
             
             await session.execute(update_query, params)
+            scheduler.ensure_leader(JOB_NAME)
             await session.commit()
             
             logger.info(f"[FORMULA_WATCHER] Marked {len(record_ids)} records as PROCESSED: {record_ids}")
+            return True
+    except scheduler.JobNotLeaderError:
+        raise
     except Exception as exc:
         logger.error(f"[FORMULA_WATCHER] Failed to mark records as PROCESSED: {exc}", exc_info=True)
+        return False
+
+
+def _row_scope(row) -> Tuple[Optional[str], Optional[date], Optional[date]]:
+    """(tender, effective from, effective to) of a reco_logics row."""
+    def as_date(value):
+        if isinstance(value, datetime):
+            return value.date()
+        return value if isinstance(value, date) else None
+    
+    return (
+        getattr(row, 'tender', None),
+        as_date(getattr(row, 'effectivefrom', None)),
+        as_date(getattr(row, 'effectiveto', None)),
+    )
+
+
+def _stages_for_tender(tender: Optional[str]) -> List[str]:
+    """Pipeline stages fed by a (comma-separated) tender; all stages if none match."""
+    tender_names = [name.strip().lower() for name in (tender or "").split(",") if name.strip()]
+    stages = [
+        stage
+        for stage, keywords, _ in RECALC_STAGES
+        if any(keyword in name for name in tender_names for keyword in keywords)
+    ]
+    return stages or [stage for stage, _, _ in RECALC_STAGES]
+
+
+def _build_recalc_plan(scopes: Iterable[Tuple[Optional[str], Optional[date], Optional[date]]]) -> Dict[str, List[Tuple[Optional[date], Optional[date]]]]:
+    """Map changed recologic scopes to {stage: [effective date ranges]}."""
+    plan: Dict[str, List[Tuple[Optional[date], Optional[date]]]] = {}
+    for tender, effective_from, effective_to in scopes:
+        for stage in _stages_for_tender(tender):
+            ranges = plan.setdefault(stage, [])
+            if (effective_from, effective_to) not in ranges:
+                ranges.append((effective_from, effective_to))
+    return plan
+
+
+async def _stage_has_data(session, stage: str, ranges: List[Tuple[Optional[date], Optional[date]]]) -> bool:
+    """
+    True when any source table of the stage has rows inside one of the changed effective ranges.
+    Stages rebuild their whole output table, so a range with no source rows is the only part
+    of the recompute that can be skipped. Errors count as "has data" to stay on the safe side.
+    """
+    sources = next(sources for name, _, sources in RECALC_STAGES if name == stage)
+    for effective_from, effective_to in ranges:
+        if effective_from is None and effective_to is None:
+            return True
+        for table, date_column in sources:
+            conditions = []
+            params = {}
+            if effective_from is not None:
+                conditions.append(f"{date_column} >= :start_date")
+                params["start_date"] = effective_from
+            if effective_to is not None:
+                conditions.append(f"{date_column} < :end_date")
+                params["end_date"] = effective_to + timedelta(days=1)
+            try:
+                result = await session.execute(
+                    text(f"SELECT 1 FROM {table} WHERE {' AND '.join(conditions)} LIMIT 1"),
+                    params
+                )
+                if result.first() is not None:
+                    return True
+            except Exception as exc:
+                logger.warning("[FORMULA_WATCHER] Could not check %s.%s for stage %s: %s", table, date_column, stage, exc)
+                await session.rollback()
+                return True
+    return False
 
 
 async def _trigger_recalculations(changed_rows: Iterable[Any], removed_ids: Iterable[int]):
-    """Run the full calculation pipeline when formulas change."""
-    if _recalc_lock.locked():
-        logger.info("[FORMULA_WATCHER] Recalc already running, skipping trigger")
-        return
+    """Queue the stages affected by the changed/removed formulas; changes within RECALC_COALESCE_SECONDS share one run."""
+    global _pending_since
+    
+    scopes = [_row_scope(row) for row in changed_rows]
+    scopes.extend(_formula_scope_cache[rid] for rid in removed_ids if rid in _formula_scope_cache)
+    # A removed row we never saw the scope of could affect anything
+    if any(rid not in _formula_scope_cache for rid in removed_ids):
+        scopes.append((None, None, None))
+    
+    for stage, ranges in _build_recalc_plan(scopes).items():
+        pending_ranges = _pending_recalc.setdefault(stage, [])
+        pending_ranges.extend(r for r in ranges if r not in pending_ranges)
+    logger.info("[FORMULA_WATCHER] Recalculation queued for stages: %s", sorted(_pending_recalc))
+    
+    if _pending_since is None:
+        _pending_since = time.monotonic()
+
+
+async def _run_pending_recalculations() -> Optional[Dict[str, Any]]:
+    """
+    Scheduled job: run the pending plan once its oldest change is RECALC_COALESCE_SECONDS old.
+    Changes queued while it runs wait for a later tick (the job does not overlap itself).
+    """
+    global _pending_recalc, _pending_since
+    
+    if not _pending_recalc or time.monotonic() - _pending_since < RECALC_COALESCE_SECONDS:
+        return None
     
-    async with _recalc_lock:
-        logger.info("[FORMULA_WATCHER] Triggering calculation pipeline due to formula update")
+    plan, _pending_recalc, _pending_since = _pending_recalc, {}, None
+    watcher = scheduler.get_job(JOB_NAME)
+    if watcher is None or not watcher.can_run_here:
+        # Leadership moved after the changes were queued; the new leader owns the pipeline now
+        logger.warning("[FORMULA_WATCHER] Not the watcher leader any more, dropping queued recalculation: %s", sorted(plan))
+        return None
+    
+    return await _run_recalc_plan(plan)
+
+
+async def _run_recalc_plan(plan: Dict[str, List[Tuple[Optional[date], Optional[date]]]]) -> Dict[str, Any]:
+    """Run the planned pipeline stages, in pipeline order, skipping stages with no data in the changed dates; returns per-stage results."""
+    logger.info("[FORMULA_WATCHER] Triggering calculation pipeline due to formula update: %s", json.dumps(plan, default=str))
+    
+    try:
+        if not db_config.main_session_factory:
+            await db_config.create_engines()
         
-        try:
-            if not db_config.main_session_factory:
-                await db_config.create_engines()
+        async with db_config.main_session_factory() as session:
+            from app.routes.reconciliation import (
+                check_reconciliation_status,
+                prepare_self_reco_table,
+                prepare_cross_reco_table,
+            )
+            from app.routes.reconciliation import generate_common_trm_table_internal
             
-            async with db_config.main_session_factory() as session:
-                from app.routes.reconciliation import (
-                    check_reconciliation_status,
-                    prepare_self_reco_table,
-                    prepare_cross_reco_table,
-                )
-                from app.routes.reconciliation import generate_common_trm_table_internal
-                
-                results = {}
-                all_successful = True
-                
-                # 1. Populate 3PO dashboard
-                try:
-                    results["populate_threepo"] = await check_reconciliation_status(db=session, current_user=None)
-                    if results["populate_threepo"].get("error"):
-                        all_successful = False
-                except Exception as exc:
-                    logger.error("[FORMULA_WATCHER] Error running populate-threepo: %s", exc, exc_info=True)
-                    results["populate_threepo"] = {"error": str(exc)}
-                    all_successful = False
-                
-                # 2. Generate TRM table
-                try:
-                    await generate_common_trm_table_internal(session)
-                    results["generate_trm"] = {"success": True}
-                except Exception as exc:
-                    logger.error("[FORMULA_WATCHER] Error generating TRM: %s", exc, exc_info=True)
-                    results["generate_trm"] = {"error": str(exc)}
-                    all_successful = False
-                
-                # 3. Prepare self-reco
-                try:
-                    results["prepare_self_reco"] = await prepare_self_reco_table(db=session, current_user=None)
-                    if results["prepare_self_reco"].get("error"):
-                        all_successful = False
-                except Exception as exc:
-                    logger.error("[FORMULA_WATCHER] Error preparing self-reco: %s", exc, exc_info=True)
-                    results["prepare_self_reco"] = {"error": str(exc)}
-                    all_successful = False
-                
-                # 4. Prepare cross-reco
+            async def populate_threepo():
+                return await check_reconciliation_status(db=session, current_user=None)
+            
+            async def generate_trm():
+                await generate_common_trm_table_internal(session)
+                return {"success": True}
+            
+            async def prepare_self_reco():
+                return await prepare_self_reco_table(db=session, current_user=None)
+            
+            async def prepare_cross_reco():
+                return await prepare_cross_reco_table(db=session, current_user=None)
+            
+            stage_runners = {
+                "populate_threepo": populate_threepo,
+                "generate_trm": generate_trm,
+                "prepare_self_reco": prepare_self_reco,
+                "prepare_cross_reco": prepare_cross_reco,
+            }
+            
+            results = {}
+            all_successful = True
+            
+            for stage, _, _ in RECALC_STAGES:
+                if stage not in plan:
+                    continue
+                # Stages commit as they go; a new watcher leader owns the pipeline after a takeover
+                scheduler.ensure_leader(JOB_NAME)
+                if not await _stage_has_data(session, stage, plan[stage]):
+                    logger.info("[FORMULA_WATCHER] No source data in changed dates for %s, skipping", stage)
+                    results[stage] = {"skipped": "no data in effective range"}
+                    continue
                 try:
-                    results["prepare_cross_reco"] = await prepare_cross_reco_table(db=session, current_user=None)
-                    if results["prepare_cross_reco"].get("error"):
+                    results[stage] = await stage_runners[stage]()
+                    if isinstance(results[stage], dict) and results[stage].get("error"):
                         all_successful = False
                 except Exception as exc:
-                    logger.error("[FORMULA_WATCHER] Error preparing cross-reco: %s", exc, exc_info=True)
-                    results["prepare_cross_reco"] = {"error": str(exc)}
+                    logger.error("[FORMULA_WATCHER] Error running %s: %s", stage, exc, exc_info=True)
+                    results[stage] = {"error": str(exc)}
                     all_successful = False
-                
-                logger.info("[FORMULA_WATCHER] Calculation pipeline results: %s", json.dumps(results, default=str))
-                
-                if not all_successful:
-                    logger.warning("[FORMULA_WATCHER] Some calculation pipeline steps failed, but formulas were already marked as PROCESSED")
-        except Exception as exc:
-            logger.error("[FORMULA_WATCHER] Failed to run calculation pipeline: %s", exc, exc_info=True)
-
+                    await session.rollback()
+            
+            logger.info("[FORMULA_WATCHER] Calculation pipeline results: %s", json.dumps(results, default=str))
+            
+            if not all_successful:
+                logger.warning("[FORMULA_WATCHER] Some calculation pipeline steps failed, but formulas were already marked as PROCESSED")
+            return results
+    except scheduler.JobNotLeaderError:
+        raise
+    except Exception as exc:
+        logger.error("[FORMULA_WATCHER] Failed to run calculation pipeline: %s", exc, exc_info=True)
+        raise
@@ -0,0 +1,586 @@
+"""
+Local file ingestion engine
+Loads uploaded CSV/TSV/XLSX files without the external Uploader API. Files are read in chunks
+(CSV via pandas chunksize, XLSX via openpyxl read_only), headers are normalized and narrowed to
+the collection's field mapping from database setup, and values are type-checked per column in
+vectorized form. MySQL targets are bulk-loaded from a staged CSV with LOAD DATA LOCAL INFILE
+(multi-row INSERT as fallback); other upload types go to their Mongo collection with
+insert_many(ordered=False), each document carrying a row fingerprint under a unique index so
+rows already loaded from an overlapping file are skipped.
+"""
+
+import asyncio
+import contextvars
+import csv
+import functools
+import hashlib
+import logging
+import os
+import re
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import text
+
+from app.config import database as db_config
+from app.config.executor import get_task_executor
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed and validated per chunk
+INGEST_CHUNK_ROWS = 10000
+
+# Rows per multi-row INSERT when LOAD DATA LOCAL INFILE is unavailable
+INSERT_BATCH_ROWS = 1000
+
+# Row-level errors kept on the upload record
+MAX_REPORTED_ERRORS = 50
+
+STAGING_DIR = os.path.join("uploads", "staging")
+
+# Per-row fingerprint stored on ingested Mongo documents (unique index), so overlapping files only add new rows
+# (row digest plus its occurrence number within the file, so repeated rows in one file are kept)
+ROW_HASH_FIELD = "_row_hash"
+
+# Recent documents sampled to keep a Mongo field's existing type when loading a new file
+MONGO_TYPE_SAMPLE_DOCUMENTS = 200
+
+# Row write timestamps, set by the loader rather than read from the file
+TIMESTAMP_COLUMNS = ("created_at", "updated_at")
+
+# Upload types loaded into MySQL tables; every other type is loaded into the Mongo collection of the same name
+MYSQL_UPLOAD_TABLES = {
+    "orders": "orders",
+    "trm": "trm",
+}
+
+_INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint"}
+_DECIMAL_TYPES = {"decimal", "numeric", "float", "double", "real"}
+_DATETIME_TYPES = {"datetime", "timestamp"}
+
+
+def normalize_header(header: Any) -> str:
+    """'Order Date ' -> 'order_date'"""
+    return re.sub(r"[^0-9a-z]+", "_", str(header or "").strip().lower()).strip("_")
+
+
+def _cell_to_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_file_chunks(file_path: str, chunk_rows: int = INGEST_CHUNK_ROWS) -> Iterator[Any]:
+    """
+    Yield the file as DataFrames of at most chunk_rows rows, every value a string or None,
+    with normalized column names.
+    """
+    import pandas as pd
+
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext in (".csv", ".tsv"):
+        reader = pd.read_csv(
+            file_path,
+            sep="\t" if ext == ".tsv" else ",",
+            dtype=str,
+            chunksize=chunk_rows,
+            keep_default_na=False,
+            na_values=[""],
+            encoding_errors="replace"
+        )
+        for chunk in reader:
+            chunk.columns = [normalize_header(column) for column in chunk.columns]
+            # Blank lines between records, as the XLSX path skips them
+            chunk = chunk.dropna(how="all")
+            if chunk.empty:
+                continue
+            yield chunk.astype(object).where(chunk.notna(), None)
+
+    elif ext == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header_row = next(rows, None)
+            if header_row is None:
+                return
+            columns = [normalize_header(column) for column in header_row]
+            batch: List[List[Optional[str]]] = []
+            for row in rows:
+                if not any(cell is not None for cell in row):
+                    continue
+                batch.append([_cell_to_text(cell) for cell in row[:len(columns)]])
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+
+    elif ext == ".xls":
+        # Legacy format: xlrd has no streaming reader, so the sheet is read whole and sliced
+        frame = pd.read_excel(file_path, dtype=str)
+        frame.columns = [normalize_header(column) for column in frame.columns]
+        frame = frame.dropna(how="all")
+        frame = frame.astype(object).where(frame.notna(), None)
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+
+def _column_kind(data_type: str) -> str:
+    data_type = (data_type or "").lower()
+    if data_type in _INTEGER_TYPES:
+        return "int"
+    if data_type in _DECIMAL_TYPES:
+        return "float"
+    if data_type in _DATETIME_TYPES:
+        return "datetime"
+    if data_type == "date":
+        return "date"
+    return "str"
+
+
+def validate_chunk(chunk, column_kinds: Dict[str, str], first_row_number: int, errors: List[str]):
+    """
+    Convert each column to its target type in one vectorized pass and drop rows with a value
+    that does not convert (blank values are allowed and become NULL).
+
+    Returns:
+        (valid rows as a DataFrame of strings/None, number of rejected rows)
+    """
+    import pandas as pd
+
+    rejected = pd.Series(False, index=chunk.index)
+    converted = {}
+
+    for column, kind in column_kinds.items():
+        raw = chunk[column]
+        text_values = raw.astype("string").str.strip()
+        present = text_values.notna() & (text_values != "")
+
+        if kind in ("int", "float"):
+            numbers = pd.to_numeric(text_values.str.replace(",", "", regex=False), errors="coerce")
+            bad = present & numbers.isna()
+            if kind == "int":
+                bad |= present & numbers.notna() & (numbers % 1 != 0)
+                values = numbers.where(~bad).astype("Int64").astype("string")
+            else:
+                values = numbers.astype("string")
+        elif kind in ("datetime", "date"):
+            timestamps = pd.to_datetime(text_values, errors="coerce", format="mixed")
+            bad = present & timestamps.isna()
+            values = timestamps.dt.strftime("%Y-%m-%d %H:%M:%S" if kind == "datetime" else "%Y-%m-%d")
+        else:
+            bad = pd.Series(False, index=chunk.index)
+            values = text_values
+
+        if bad.any() and len(errors) < MAX_REPORTED_ERRORS:
+            for position in bad[bad].index[:MAX_REPORTED_ERRORS - len(errors)]:
+                row_number = first_row_number + chunk.index.get_loc(position)
+                errors.append(f"Row {row_number}: invalid {kind} '{raw[position]}' in column '{column}'")
+
+        rejected |= bad
+        converted[column] = values.where(present, None)
+
+    valid = pd.DataFrame(converted, index=chunk.index)[~rejected]
+    return valid.astype(object).where(valid.notna(), None), int(rejected.sum())
+
+
+def _mapped_fields(collection_name: str) -> Optional[set]:
+    """Fields selected for the collection in database setup (None when no mapping is configured)"""
+    try:
+        from app.services.mongodb_service import mongodb_service
+
+        mapping = mongodb_service.get_collection_field_mapping(collection_name)
+    except Exception as e:
+        logger.warning(f"[INGEST] Could not read field mapping for '{collection_name}': {e}")
+        return None
+    if not mapping or not mapping.get("selected_fields"):
+        return None
+    return {normalize_header(field) for field in mapping["selected_fields"]}
+
+
+def _stage_mysql_rows(
+    file_path: str,
+    table_columns: Dict[str, str],
+    mapped_fields: Optional[set],
+    staged_path: str,
+    stats: Dict[str, Any]
+) -> List[str]:
+    """Validate the file chunk by chunk and write the valid rows to a staged CSV; returns its columns"""
+    load_columns: Optional[List[str]] = None
+    next_row_number = 2  # row 1 is the header
+
+    with open(staged_path, "w", newline="", encoding="utf-8") as staged:
+        writer = csv.writer(staged, lineterminator="\n")
+        for chunk in iter_file_chunks(file_path):
+            if load_columns is None:
+                load_columns = [
+                    column for column in dict.fromkeys(chunk.columns)
+                    if column in table_columns and (mapped_fields is None or column in mapped_fields)
+                ]
+                if not load_columns:
+                    raise ValueError("No columns in the file match the target table")
+                writer.writerow(load_columns)
+
+            valid, rejected = validate_chunk(
+                chunk, {column: table_columns[column] for column in load_columns},
+                next_row_number, stats["errors"]
+            )
+            next_row_number += len(chunk)
+            stats["rows_read"] += len(chunk)
+            stats["rows_rejected"] += rejected
+            writer.writerows(
+                ["" if value is None else value for value in row]
+                for row in valid[load_columns].itertuples(index=False, name=None)
+            )
+
+    return load_columns or []
+
+
+async def _get_table_columns(table_name: str) -> Dict[str, str]:
+    """Loadable columns of a MySQL table with their validation kind (auto-increment columns excluded)"""
+    async with db_config.main_session_factory() as session:
+        rows = (await session.execute(text("""
+            SELECT COLUMN_NAME, DATA_TYPE, EXTRA
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name
+            ORDER BY ORDINAL_POSITION
+        """), {"table_name": table_name})).fetchall()
+    if not rows:
+        raise ValueError(f"Table '{table_name}' does not exist")
+    return {
+        row.COLUMN_NAME: _column_kind(row.DATA_TYPE)
+        for row in rows
+        if "auto_increment" not in (row.EXTRA or "").lower()
+    }
+
+
+async def _load_data_local_infile(
+    table_name: str,
+    columns: List[str],
+    staged_path: str,
+    stamped_columns: List[str]
+) -> int:
+    """Bulk-load the staged CSV; needs local_infile enabled on the server (raises otherwise)"""
+    import aiomysql
+
+    url = db_config.main_engine.url
+    variables = ", ".join(f"@c{index}" for index in range(len(columns)))
+    assignments = ", ".join(
+        [f"`{column}` = NULLIF(@c{index}, '')" for index, column in enumerate(columns)]
+        + [f"`{column}` = UTC_TIMESTAMP()" for column in stamped_columns]
+    )
+    connection = await aiomysql.connect(
+        host=url.host,
+        port=url.port or 3306,
+        user=url.username,
+        password=url.password or "",
+        db=url.database,
+        charset="utf8mb4",
+        local_infile=True
+    )
+    try:
+        async with connection.cursor() as cursor:
+            # LOCAL implies IGNORE: rows that hit a unique key are skipped, not failed
+            await cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' IGNORE 1 LINES ({variables}) SET {assignments}",
+                (os.path.abspath(staged_path),)
+            )
+            loaded = cursor.rowcount
+        await connection.commit()
+        return loaded
+    finally:
+        connection.close()
+
+
+async def _insert_staged_rows(
+    table_name: str,
+    columns: List[str],
+    staged_path: str,
+    stamped_columns: List[str]
+) -> int:
+    """Fallback loader: multi-row INSERT IGNORE batches read from the staged CSV"""
+    column_list = ", ".join(f"`{column}`" for column in columns + stamped_columns)
+    placeholders = ", ".join(
+        [f":c{index}" for index in range(len(columns))] + ["UTC_TIMESTAMP()"] * len(stamped_columns)
+    )
+    statement = text(f"INSERT IGNORE INTO `{table_name}` ({column_list}) VALUES ({placeholders})")
+    loaded = 0
+
+    async with db_config.main_session_factory() as session:
+        with open(staged_path, newline="", encoding="utf-8") as staged:
+            reader = csv.reader(staged)
+            next(reader, None)
+            batch = []
+            for row in reader:
+                batch.append({f"c{index}": (value if value != "" else None) for index, value in enumerate(row)})
+                if len(batch) >= INSERT_BATCH_ROWS:
+                    loaded += (await session.execute(statement, batch)).rowcount
+                    await session.commit()
+                    batch = []
+            if batch:
+                loaded += (await session.execute(statement, batch)).rowcount
+                await session.commit()
+
+    return loaded
+
+
+async def _run_blocking(func, *args):
+    """Run on the task executor, keeping the request context (selects the user's Mongo database)"""
+    context = contextvars.copy_context()
+    return await asyncio.get_event_loop().run_in_executor(
+        get_task_executor(), functools.partial(context.run, func, *args)
+    )
+
+
+async def _ingest_into_mysql(file_path: str, upload_type: str, table_name: str, stats: Dict[str, Any]):
+    if not db_config.main_session_factory:
+        await db_config.create_engines()
+
+    table_columns = await _get_table_columns(table_name)
+    mapped_fields = await _run_blocking(_mapped_fields, upload_type)
+
+    # Write timestamps come from the database clock in UTC (UTC_TIMESTAMP(), as mark_uploaded_data_dirty
+    # compares against), never from the file, so every loaded row is found when its pairs are marked dirty
+    stamped_columns = [column for column in TIMESTAMP_COLUMNS if column in table_columns]
+    loadable_columns = {
+        column: kind for column, kind in table_columns.items() if column not in stamped_columns
+    }
+
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    staged_path = os.path.join(STAGING_DIR, f"{uuid.uuid4()}.csv")
+    try:
+        columns = await _run_blocking(
+            _stage_mysql_rows, file_path, loadable_columns, mapped_fields, staged_path, stats
+        )
+        try:
+            stats["rows_loaded"] = await _load_data_local_infile(table_name, columns, staged_path, stamped_columns)
+            stats["method"] = "load_data_local_infile"
+        except Exception as e:
+            logger.info(f"[INGEST] LOAD DATA LOCAL INFILE unavailable for '{table_name}' ({e}), using batched INSERT")
+            stats["rows_loaded"] = await _insert_staged_rows(table_name, columns, staged_path, stamped_columns)
+            stats["method"] = "executemany"
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+
+def _row_hashes(chunk, occurrences: Dict[str, int]):
+    """
+    Fingerprint of each row: SHA-256 of its values (column order does not matter) plus how many
+    identical rows came before it in the file. Legitimately repeated rows all load, while
+    re-uploading an overlapping file adds none of the rows already present.
+    `occurrences` carries the per-digest counts from one chunk to the next.
+    """
+    import pandas as pd
+
+    ordered = chunk[sorted(chunk.columns)].astype("string").fillna("")
+    fingerprints = []
+    for values in ordered.itertuples(index=False, name=None):
+        digest = hashlib.sha256("\x1f".join(values).encode("utf-8")).hexdigest()
+        occurrence = occurrences.get(digest, 0)
+        occurrences[digest] = occurrence + 1
+        fingerprints.append(f"{digest}:{occurrence}")
+    return pd.Series(fingerprints, index=chunk.index, dtype=object)
+
+
+def _mongo_field_types(collection, collection_name: str, columns: List[str]) -> Dict[str, str]:
+    """
+    Decide once per file how each column is stored: "number", "date" or "str".
+    Fields already in the collection keep the type most of their recent documents use; new
+    fields are numbers only when a dashboard rollup sums them and dates when their name says
+    so. Everything else stays text, so codes keep their leading zeros and long IDs their digits.
+    """
+    from collections import Counter
+
+    observed: Dict[str, Counter] = {column: Counter() for column in columns}
+    projection = {column: 1 for column in columns}
+    for document in collection.find({}, projection).sort("_id", -1).limit(MONGO_TYPE_SAMPLE_DOCUMENTS):
+        for column, value in document.items():
+            if column not in observed or value is None:
+                continue
+            if isinstance(value, datetime):
+                observed[column]["date"] += 1
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                observed[column]["number"] += 1
+            else:
+                observed[column]["str"] += 1
+
+    summed_fields = set()
+    try:
+        from app.services.dashboard_rollup_service import DashboardRollupService
+
+        target = DashboardRollupService.collect_targets().get(collection_name)
+        summed_fields = set(target["fields"]) if target else set()
+    except Exception as e:
+        logger.warning(f"[INGEST] Could not read rollup fields for '{collection_name}': {e}")
+
+    field_types = {}
+    for column in columns:
+        if observed[column]:
+            field_types[column] = observed[column].most_common(1)[0][0]
+        elif column in summed_fields:
+            field_types[column] = "number"
+        elif "date" in column:
+            field_types[column] = "date"
+        else:
+            field_types[column] = "str"
+    return field_types
+
+
+def _type_mongo_chunk(chunk, field_types: Dict[str, str]):
+    """
+    Convert each column to the type decided for the file; a value that does not convert is
+    kept as text rather than dropped (Mongo is schemaless, so nothing is rejected)
+    """
+    import pandas as pd
+
+    typed = {}
+    for column in chunk.columns:
+        text_values = chunk[column].astype("string").str.strip()
+        present = text_values.notna() & (text_values != "")
+        values = text_values.astype(object)
+        kind = field_types.get(column, "str")
+        if kind == "number":
+            numbers = pd.to_numeric(text_values.str.replace(",", "", regex=False), errors="coerce")
+            converted = present & numbers.notna()
+            integral = converted & (numbers % 1 == 0) & (numbers.abs() < 2 ** 53)
+            values = values.where(~converted, numbers.astype(object))
+            values = values.where(~integral, numbers.where(integral, 0).astype("int64").astype(object))
+        elif kind == "date":
+            timestamps = pd.to_datetime(text_values, errors="coerce", format="mixed")
+            values = values.where(~(present & timestamps.notna()), timestamps.astype(object))
+        typed[column] = values.where(present, None)
+    return pd.DataFrame(typed, index=chunk.index)
+
+
+def _bucket_day(document: Dict[str, Any]) -> Optional[datetime]:
+    """The day the dashboard rollups bucket a document on: order_date, falling back to date"""
+    value = document["order_date"] if "order_date" in document else document.get("date")
+    return value if isinstance(value, datetime) else None
+
+
+def _ingest_into_mongo(file_path: str, collection_name: str, stats: Dict[str, Any]):
+    """
+    Returns:
+        (first, last) bucket day of the loaded documents, or None when none of them is dated
+    """
+    import pandas as pd
+    from pymongo.errors import BulkWriteError
+    from app.config.mongodb import get_mongodb_collection
+
+    collection = get_mongodb_collection(collection_name)
+    collection.create_index(ROW_HASH_FIELD, unique=True, sparse=True, background=True)
+    mapped_fields = _mapped_fields(collection_name)
+    field_types = None
+    occurrences: Dict[str, int] = {}
+    first_day = last_day = None
+
+    for chunk in iter_file_chunks(file_path):
+        if mapped_fields is not None:
+            chunk = chunk[[column for column in chunk.columns if column in mapped_fields]]
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        stats["rows_read"] += len(chunk)
+
+        # Every chunk of a file shares its header, so the types are decided on the first one
+        if field_types is None:
+            field_types = _mongo_field_types(collection, collection_name, list(chunk.columns))
+        typed = _type_mongo_chunk(chunk, field_types)
+        typed[ROW_HASH_FIELD] = _row_hashes(chunk, occurrences)
+        documents = []
+        for record in typed.to_dict("records"):
+            document = {}
+            for key, value in record.items():
+                if value is None or pd.isna(value):
+                    continue
+                document[key] = value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+            if len(document) > 1:
+                documents.append(document)
+                day = _bucket_day(document)
+                if day is not None:
+                    first_day = day if first_day is None else min(first_day, day)
+                    last_day = day if last_day is None else max(last_day, day)
+        if not documents:
+            continue
+
+        try:
+            stats["rows_loaded"] += len(collection.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            details = e.details or {}
+            stats["rows_loaded"] += details.get("nInserted", 0)
+            write_errors = details.get("writeErrors", [])
+            # Duplicate key on the row fingerprint: the row is already in the collection
+            failed = [write_error for write_error in write_errors if write_error.get("code") != 11000]
+            stats["rows_duplicate"] += len(write_errors) - len(failed)
+            stats["rows_rejected"] += len(failed)
+            for write_error in failed[:max(MAX_REPORTED_ERRORS - len(stats["errors"]), 0)]:
+                stats["errors"].append(f"Document {write_error.get('index')}: {write_error.get('errmsg')}")
+
+    stats["method"] = "insert_many"
+    return (first_day, last_day) if first_day is not None else None
+
+
+async def _refresh_dashboard_rollups(collection_name: str, window):
+    """
+    Same hook as the uploader API path, limited to the days the file touched. Runs on the
+    default executor so a rollup rebuild never holds one of the task executor's ingest slots.
+    """
+    from app.services.dashboard_rollup_service import DashboardRollupService
+    context = contextvars.copy_context()
+    try:
+        await asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(context.run, DashboardRollupService.refresh_for_source, collection_name, *window)
+        )
+    except Exception as e:
+        logger.warning(f"[INGEST] ⚠️ Dashboard rollup refresh failed for '{collection_name}': {e}")
+
+
+async def ingest_upload_file(file_path: str, upload_type: str) -> Dict[str, Any]:
+    """
+    Load an uploaded file into the target of its upload type.
+
+    Returns:
+        Stats: target, method, rows_read, rows_loaded, rows_rejected and the first row errors
+    """
+    upload_type = (upload_type or "").lower()
+    table_name = MYSQL_UPLOAD_TABLES.get(upload_type)
+    stats: Dict[str, Any] = {
+        "target": f"mysql:{table_name}" if table_name else f"mongo:{upload_type}",
+        "method": None,
+        "rows_read": 0,
+        "rows_loaded": 0,
+        "rows_rejected": 0,
+        "rows_duplicate": 0,
+        "errors": []
+    }
+
+    if table_name:
+        await _ingest_into_mysql(file_path, upload_type, table_name, stats)
+        # LOAD DATA LOCAL / INSERT IGNORE skip rows that hit one of the table's unique keys
+        stats["rows_duplicate"] = max(stats["rows_read"] - stats["rows_rejected"] - stats["rows_loaded"], 0)
+    else:
+        window = await _run_blocking(_ingest_into_mongo, file_path, upload_type, stats)
+        # Undated documents never enter a rollup, so a file without dates needs no refresh
+        if stats["rows_loaded"] and window:
+            await _refresh_dashboard_rollups(upload_type, window)
+
+    logger.info(
+        f"[INGEST] ✅ {os.path.basename(file_path)} -> {stats['target']} via {stats['method']}: "
+        f"{stats['rows_loaded']}/{stats['rows_read']} rows loaded, {stats['rows_duplicate']} already present, "
+        f"{stats['rows_rejected']} rejected"
+    )
+    return stats
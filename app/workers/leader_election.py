@@ -0,0 +1,287 @@
+"""
+Scheduler leader election
+Keeps each in-process scheduler single-instance across uvicorn workers. The leader holds a
+MySQL named lock (GET_LOCK) on a dedicated connection and renews its lease with a heartbeat;
+followers retry on the same heartbeat and take over once the lock is released.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.config import database as db_config
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in scheduler_leaders and /health
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# MySQL limits user lock names to 64 characters
+_MAX_LOCK_NAME_LENGTH = 64
+
+_leases: Dict[str, "SchedulerLease"] = {}
+_leader_table_ready = False
+
+
+async def _ensure_leader_table(session):
+    """Create scheduler_leaders if the migration has not been applied yet (once per process)"""
+    global _leader_table_ready
+    if _leader_table_ready:
+        return
+
+    await session.execute(text("""
+        CREATE TABLE IF NOT EXISTS scheduler_leaders (
+            name VARCHAR(100) NOT NULL,
+            lock_name VARCHAR(64) NOT NULL,
+            holder VARCHAR(255) NOT NULL,
+            connection_id BIGINT UNSIGNED NOT NULL,
+            acquired_at DATETIME NOT NULL,
+            renewed_at DATETIME NOT NULL,
+            PRIMARY KEY (name)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """))
+    await session.commit()
+    _leader_table_ready = True
+
+
+class SchedulerLease:
+    """
+    Leadership lease for one named scheduler.
+
+    The lock lives as long as the connection that took it: if the leader process dies the
+    connection closes and MySQL frees the lock at once, and if the leader stops heartbeating
+    (blocked event loop) the connection's wait_timeout - set to the lease length - drops it
+    after one lease period. Followers poll every lease_seconds / 3, so a failed leader is
+    replaced within one lease.
+
+    A leader whose heartbeat has not renewed the lease for a whole lease period stops reporting
+    is_leader (its lock may already be gone), and loss listeners run as soon as the heartbeat
+    finds the lock lost, so work started as leader can be cancelled before another worker
+    takes over.
+    """
+
+    def __init__(self, name: str, lease_seconds: Optional[int] = None):
+        self.name = name
+        self.lease_seconds = max(int(lease_seconds or settings.scheduler_lease_seconds), 3)
+        self.lock_name: Optional[str] = None
+        self.acquired_at: Optional[datetime] = None
+        self.renewed_at: Optional[datetime] = None
+        self._connection = None
+        self._connection_id: Optional[int] = None
+        self._renewed_monotonic: Optional[float] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._loss_listeners: List[Callable[[], None]] = []
+
+    @property
+    def is_leader(self) -> bool:
+        """True while this process holds the scheduler's lock and renewed it within one lease period"""
+        return (
+            self._connection is not None
+            and self._renewed_monotonic is not None
+            and time.monotonic() - self._renewed_monotonic < self.lease_seconds
+        )
+
+    def add_loss_listener(self, callback: Callable[[], None]):
+        """Call `callback` (synchronously, on the event loop) whenever the heartbeat finds the lock lost"""
+        self._loss_listeners.append(callback)
+
+    def _build_lock_name(self) -> str:
+        # Lock names are server-wide, so scope them to the database the scheduler writes to
+        database_name = db_config.main_engine.url.database or "default"
+        return f"scheduler:{database_name}:{self.name}"[:_MAX_LOCK_NAME_LENGTH]
+
+    async def _discard_connection(self, connection):
+        """Drop a lock connection without returning it to the pool (it carries a custom wait_timeout)"""
+        try:
+            await connection.invalidate()
+        except Exception:
+            pass
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+    async def _try_acquire(self) -> bool:
+        """Try to take the lock without waiting; on success record this worker as leader"""
+        if not db_config.main_engine:
+            await db_config.create_engines()
+
+        if not _leader_table_ready:
+            async with db_config.main_session_factory() as session:
+                await _ensure_leader_table(session)
+
+        self.lock_name = self._build_lock_name()
+        connection = await db_config.main_engine.connect()
+        try:
+            await connection.execute(
+                text("SET SESSION wait_timeout = :lease_seconds"),
+                {"lease_seconds": self.lease_seconds}
+            )
+            acquired = (await connection.execute(
+                text("SELECT GET_LOCK(:lock_name, 0)"),
+                {"lock_name": self.lock_name}
+            )).scalar()
+            if acquired != 1:
+                await self._discard_connection(connection)
+                return False
+
+            connection_id = (await connection.execute(text("SELECT CONNECTION_ID()"))).scalar()
+            await connection.execute(text("""
+                INSERT INTO scheduler_leaders (name, lock_name, holder, connection_id, acquired_at, renewed_at)
+                VALUES (:name, :lock_name, :holder, :connection_id, NOW(), NOW())
+                ON DUPLICATE KEY UPDATE
+                    lock_name = VALUES(lock_name),
+                    holder = VALUES(holder),
+                    connection_id = VALUES(connection_id),
+                    acquired_at = VALUES(acquired_at),
+                    renewed_at = VALUES(renewed_at)
+            """), {
+                "name": self.name,
+                "lock_name": self.lock_name,
+                "holder": WORKER_ID,
+                "connection_id": connection_id
+            })
+            await connection.commit()
+        except Exception:
+            await self._discard_connection(connection)
+            raise
+
+        self._connection = connection
+        self._connection_id = connection_id
+        self.acquired_at = self.renewed_at = datetime.now()
+        self._renewed_monotonic = time.monotonic()
+        logger.info(f"[LEADER_ELECTION] 👑 {WORKER_ID} is now leader of '{self.name}'")
+        return True
+
+    async def _renew(self) -> bool:
+        """Confirm the lock is still held on our connection and bump the heartbeat"""
+        try:
+            still_held = (await self._connection.execute(
+                text("SELECT IS_USED_LOCK(:lock_name) = CONNECTION_ID()"),
+                {"lock_name": self.lock_name}
+            )).scalar()
+            if still_held == 1:
+                await self._connection.execute(text("""
+                    UPDATE scheduler_leaders
+                    SET renewed_at = NOW()
+                    WHERE name = :name AND connection_id = :connection_id
+                """), {"name": self.name, "connection_id": self._connection_id})
+                await self._connection.commit()
+                self.renewed_at = datetime.now()
+                self._renewed_monotonic = time.monotonic()
+                return True
+        except Exception as e:
+            logger.warning(f"[LEADER_ELECTION] ⚠️ Lease renewal failed for '{self.name}': {e}")
+
+        await self._lose_leadership()
+        for callback in list(self._loss_listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[LEADER_ELECTION] ⚠️ Leadership loss listener failed for '{self.name}': {e}")
+        return False
+
+    async def _lose_leadership(self):
+        connection, self._connection = self._connection, None
+        self._connection_id = None
+        self.acquired_at = self.renewed_at = None
+        self._renewed_monotonic = None
+        if connection is not None:
+            await self._discard_connection(connection)
+            logger.warning(f"[LEADER_ELECTION] ⚠️ {WORKER_ID} lost leadership of '{self.name}'")
+
+    async def _heartbeat_loop(self):
+        interval = self.lease_seconds / 3
+        while not self._stop_event.is_set():
+            try:
+                if self._connection is not None:
+                    await self._renew()
+                else:
+                    await self._try_acquire()
+            except Exception as e:
+                logger.warning(f"[LEADER_ELECTION] ⚠️ Could not acquire leadership of '{self.name}': {e}")
+
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                continue
+
+    async def start(self):
+        """Start competing for leadership in the background"""
+        if self._heartbeat_task and not self._heartbeat_task.done():
+            return
+        _leases[self.name] = self
+        self._stop_event = asyncio.Event()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop(), name=f"leader_election:{self.name}")
+
+    async def stop(self):
+        """Stop the heartbeat and release the lock so another worker can take over immediately"""
+        if self._stop_event:
+            self._stop_event.set()
+        if self._heartbeat_task:
+            await self._heartbeat_task
+            self._heartbeat_task = None
+            self._stop_event = None
+
+        if self._connection is not None:
+            try:
+                await self._connection.execute(text("""
+                    DELETE FROM scheduler_leaders
+                    WHERE name = :name AND connection_id = :connection_id
+                """), {"name": self.name, "connection_id": self._connection_id})
+                await self._connection.commit()
+                await self._connection.execute(
+                    text("SELECT RELEASE_LOCK(:lock_name)"),
+                    {"lock_name": self.lock_name}
+                )
+                logger.info(f"[LEADER_ELECTION] Released leadership of '{self.name}'")
+            except Exception as e:
+                logger.warning(f"[LEADER_ELECTION] ⚠️ Failed to release leadership of '{self.name}': {e}")
+            await self._lose_leadership()
+
+        _leases.pop(self.name, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "is_leader": self.is_leader,
+            "lease_seconds": self.lease_seconds,
+            "acquired_at": self.acquired_at.isoformat() if self.acquired_at else None,
+            "renewed_at": self.renewed_at.isoformat() if self.renewed_at else None
+        }
+
+
+async def get_scheduler_leaders() -> Dict[str, Any]:
+    """
+    Report, for every scheduler running in this process, whether this worker leads it and
+    which worker currently does. The database is only queried when a scheduler is running.
+    """
+    if not _leases:
+        return {}
+
+    schedulers = {
+        name: {**lease.to_dict(), "leader": WORKER_ID if lease.is_leader else None}
+        for name, lease in _leases.items()
+    }
+
+    try:
+        async with db_config.main_session_factory() as session:
+            rows = (await session.execute(text("""
+                SELECT name, holder, renewed_at, IS_USED_LOCK(lock_name) = connection_id AS active
+                FROM scheduler_leaders
+            """))).fetchall()
+        for row in rows:
+            if row.name in schedulers:
+                schedulers[row.name]["leader"] = row.holder if row.active == 1 else None
+                schedulers[row.name]["leader_renewed_at"] = row.renewed_at.isoformat() if row.renewed_at else None
+    except Exception as e:
+        logger.warning(f"[LEADER_ELECTION] ⚠️ Could not read scheduler leaders: {e}")
+
+    return schedulers
@@ -268,8 +268,8 @@ def run_report_excel_generation(generation_id, params: dict):
                 logger.info(f"[Process {generation_id}] Importing modules...")
                 from app.models.main.excel_generation import ExcelGeneration, ExcelGenerationStatus
                 from app.services.mongodb_service import mongodb_service
+                from app.utils.report_excel_helper import write_report_batches_to_file
                 from datetime import datetime
-                import pandas as pd
                 logger.info(f"[Process {generation_id}] Modules imported successfully")
             except Exception as import_error:
                 logger.error(f"[Process {generation_id}] Import/Initialization error: {import_error}", exc_info=True)
@@ -359,16 +359,17 @@ def run_report_excel_generation(generation_id, params: dict):
                 # Query collection with date filter on order_date field
                 collection_name = report_name.lower().strip()
                 
-                # 🔥 Validate collection exists by trying to query (background worker handles this)
-                data = mongodb_service.query_collection_by_date_range(
+                # 🔥 Validate collection exists up front; batches are pulled lazily while writing Excel
+                batches = mongodb_service.stream_collection_by_date_range(
                     collection_name=collection_name,
                     columns=columns,
                     start_date=start_datetime,
                     end_date=end_datetime,
-                    date_field="order_date"
+                    date_field="order_date",
+                    no_cursor_timeout=True
                 )
                 
-                logger.info(f"[Process {generation_id}] Retrieved {len(data)} record(s) from collection '{collection_name}'")
+                logger.info(f"[Process {generation_id}] Streaming records from collection '{collection_name}'")
                 
             except ValueError as e:
                 error_msg = str(e)
@@ -401,38 +402,7 @@ def run_report_excel_generation(generation_id, params: dict):
                 generation_id,
                 ExcelGenerationStatus.PROCESSING,
                 progress=50,
-                message=f"Processing {len(data)} record(s)..."
-            )
-            
-            # 🔥 HEAVY PANDAS OPERATIONS - blocks only THIS process
-            logger.info(f"[Process {generation_id}] Creating DataFrame from {len(data)} records...")
-            
-            # Create DataFrame from MongoDB data
-            if data:
-                # Create DataFrame with data
-                df = pd.DataFrame(data)
-                # Ensure columns are in the order specified in request
-                # Only include columns that exist in the data
-                available_columns = [col for col in columns if col in df.columns]
-                if available_columns:
-                    df = df[available_columns]
-                else:
-                    # If none of the requested columns exist, use all available columns
-                    logger.warning(f"[Process {generation_id}] None of the requested columns found, using all available columns")
-            else:
-                # No data found, create empty DataFrame with specified columns
-                df = pd.DataFrame(columns=columns)
-                logger.info(f"[Process {generation_id}] No data found for the specified date range")
-            
-            logger.info(f"[Process {generation_id}] DataFrame created: {len(df)} rows, {len(df.columns)} columns")
-            
-            # Update progress
-            await ExcelGeneration.update_status(
-                None,
-                generation_id,
-                ExcelGenerationStatus.PROCESSING,
-                progress=80,
-                message="Generating Excel file..."
+                message="Streaming records into Excel file..."
             )
             
             # Generate filename: report_name_start_date_to_end_date_generation_id.xlsx
@@ -443,12 +413,11 @@ def run_report_excel_generation(generation_id, params: dict):
             logger.info(f"[Process {generation_id}] Generating Excel file: {filepath}")
             logger.info(f"[Process {generation_id}] This Excel generation runs in separate process - main app is NOT blocked")
             
-            # Create Excel file
+            # Create Excel file, writing one batch at a time
             try:
-                with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                    df.to_excel(writer, sheet_name='Report', index=False)
+                rows_written = write_report_batches_to_file(filepath, columns, batches, sheet_name='Report')
                 
-                logger.info(f"[Process {generation_id}] Generated Excel file: {filename} with {len(df)} row(s) and columns: {list(df.columns)}")
+                logger.info(f"[Process {generation_id}] Generated Excel file: {filename} with {rows_written} row(s) and columns: {columns}")
             except Exception as excel_error:
                 logger.error(f"[Process {generation_id}] Error in Excel generation: {excel_error}", exc_info=True)
                 # Update error status before re-raising
@@ -552,6 +521,7 @@ def run_summary_report_excel_generation(generation_id, params: dict):
                 from app.models.main.excel_generation import ExcelGeneration, ExcelGenerationStatus
                 from app.services.mongodb_service import mongodb_service
                 from app.controllers.formulas_controller import FormulasController
+                from app.utils.report_excel_helper import batches_to_dataframe
                 from datetime import datetime
                 import pandas as pd
                 import os
@@ -782,14 +752,17 @@ def run_summary_report_excel_generation(generation_id, params: dict):
             end_datetime = datetime.combine(end_date_dt, datetime.max.time())
             
             try:
-                data = mongodb_service.query_collection_by_date_range(
+                batches = mongodb_service.stream_collection_by_date_range(
                     collection_name=collection_name,
                     columns=column_sequence,
                     start_date=start_datetime,
                     end_date=end_datetime,
-                    date_field="order_date"
+                    date_field="order_date",
+                    no_cursor_timeout=True
                 )
-                logger.info(f"[Summary Report Generation {generation_id}] Retrieved {len(data)} record(s)")
+                # Build the DataFrame batch by batch - no intermediate list of dicts
+                df = batches_to_dataframe(column_sequence, batches)
+                logger.info(f"[Summary Report Generation {generation_id}] Retrieved {len(df)} record(s)")
             except Exception as query_error:
                 error_message = f"Error querying collection: {str(query_error)}"
                 await ExcelGeneration.update_status(
@@ -807,24 +780,14 @@ def run_summary_report_excel_generation(generation_id, params: dict):
                 generation_id,
                 ExcelGenerationStatus.PROCESSING,
                 progress=50,
-                message=f"Processing {len(data)} record(s)..."
+                message=f"Processing {len(df)} record(s)..."
             )
             
-            # Create DataFrame
-            if data:
-                df = pd.DataFrame(data)
-                # Ensure columns are in the correct sequence
-                available_columns = [col for col in column_sequence if col in df.columns]
-                if available_columns:
-                    df = df[available_columns]
-                else:
-                    logger.warning(f"[Summary Report Generation {generation_id}] None of the requested columns found, using all available columns")
-            else:
-                df = pd.DataFrame(columns=column_sequence)
+            if df.empty:
                 logger.info(f"[Summary Report Generation {generation_id}] No data found for the specified date range")
             
             # Calculate summary statistics
-            total_orders = len(data)
+            total_orders = len(df)
             
             # Find reconciliation status field
             status_field = None
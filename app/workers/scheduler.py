@@ -0,0 +1,329 @@
+"""
+Periodic job scheduler
+Registry for in-process background jobs. Each job declares an interval, jitter, a max runtime
+and whether a tick is skipped while a previous run is still going; failed runs back off
+exponentially. Jobs can require the scheduler leader lease so only one uvicorn worker runs them.
+Run counts, last run, duration and outcome are kept per job for the admin endpoint.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.config.settings import settings
+from app.workers.leader_election import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+JobFunc = Callable[[], Awaitable[Any]]
+
+_jobs: Dict[str, "ScheduledJob"] = {}
+
+
+class JobNotLeaderError(RuntimeError):
+    """A leader-only job was triggered on a worker that does not hold its lease"""
+
+
+class ScheduledJob:
+    """A registered periodic job, its policy and its run statistics"""
+
+    def __init__(
+        self,
+        name: str,
+        func: JobFunc,
+        interval_seconds: float,
+        jitter_seconds: float = 0,
+        max_runtime_seconds: Optional[float] = None,
+        skip_if_running: bool = True,
+        max_backoff_seconds: Optional[float] = None,
+        run_on_start: bool = False,
+        leader_only: bool = False
+    ):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.max_runtime_seconds = max_runtime_seconds
+        self.skip_if_running = skip_if_running
+        self.max_backoff_seconds = max_backoff_seconds or max(interval_seconds * 32, 300)
+        self.run_on_start = run_on_start
+        self.leader_only = leader_only
+
+        self.lease: Optional[SchedulerLease] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._run_tasks: Set[asyncio.Task] = set()
+
+        self.runs = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.consecutive_failures = 0
+        self.last_started_at: Optional[datetime] = None
+        self.last_finished_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.last_outcome: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_result: Any = None
+        self.next_run_at: Optional[datetime] = None
+
+    @property
+    def is_started(self) -> bool:
+        return self._loop_task is not None and not self._loop_task.done()
+
+    @property
+    def is_running(self) -> bool:
+        return any(not task.done() for task in self._run_tasks)
+
+    def _next_delay(self) -> float:
+        """Interval plus jitter, doubled per consecutive failure up to max_backoff_seconds"""
+        delay = self.interval_seconds
+        if self.consecutive_failures:
+            delay = min(self.interval_seconds * (2 ** self.consecutive_failures), self.max_backoff_seconds)
+        if self.jitter_seconds:
+            delay += random.uniform(0, self.jitter_seconds)
+        # Followers re-check leadership every heartbeat so a takeover is not delayed by a long interval
+        if self.lease is not None and not self.lease.is_leader:
+            delay = min(delay, self.lease.lease_seconds / 3)
+        return delay
+
+    async def _run(self, trigger: str):
+        self.runs += 1
+        self.last_started_at = datetime.now()
+        started = time.monotonic()
+        try:
+            if self.max_runtime_seconds:
+                result = await asyncio.wait_for(self.func(), timeout=self.max_runtime_seconds)
+            else:
+                result = await self.func()
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.last_outcome = "success"
+            self.last_error = None
+            self.last_result = result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.consecutive_failures += 1
+            self.last_outcome = "timeout"
+            self.last_error = f"Exceeded max runtime of {self.max_runtime_seconds}s"
+            logger.warning(f"[SCHEDULER] ⚠️ Job '{self.name}' timed out after {self.max_runtime_seconds}s")
+        except JobNotLeaderError as e:
+            self.consecutive_failures = 0
+            self.last_outcome = "not_leader"
+            self.last_error = str(e)
+            logger.warning(f"[SCHEDULER] ⚠️ Job '{self.name}' stopped before committing: {e}")
+        except asyncio.CancelledError:
+            self.last_outcome = "cancelled"
+            raise
+        except Exception as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_outcome = "failed"
+            self.last_error = str(e)
+            logger.error(f"[SCHEDULER] ❌ Job '{self.name}' failed ({trigger}): {e}", exc_info=True)
+        finally:
+            self.last_finished_at = datetime.now()
+            self.last_duration_seconds = round(time.monotonic() - started, 3)
+
+    def cancel_runs(self, reason: str):
+        """Cancel the runs in progress (their open transactions roll back)"""
+        for task in list(self._run_tasks):
+            if not task.done():
+                logger.warning(f"[SCHEDULER] ⚠️ Cancelling running job '{self.name}': {reason}")
+                task.cancel()
+
+    def trigger(self, trigger: str = "schedule") -> Optional[asyncio.Task]:
+        """Start a run now unless one is in progress and the job skips overlapping runs"""
+        if self.skip_if_running and self.is_running:
+            self.skipped += 1
+            logger.info(f"[SCHEDULER] Job '{self.name}' still running, skipping {trigger} run")
+            return None
+
+        task = asyncio.create_task(self._run(trigger), name=f"job:{self.name}")
+        self._run_tasks.add(task)
+        task.add_done_callback(self._run_tasks.discard)
+        return task
+
+    async def _loop(self):
+        logger.info(
+            f"[SCHEDULER] Starting job '{self.name}' (interval={self.interval_seconds}s, "
+            f"jitter={self.jitter_seconds}s, max_runtime={f'{self.max_runtime_seconds}s' if self.max_runtime_seconds else 'none'})"
+        )
+        first_tick = True
+        while not self._stop_event.is_set():
+            if not (first_tick and self.run_on_start):
+                delay = self._next_delay()
+                self.next_run_at = datetime.fromtimestamp(time.time() + delay)
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+            first_tick = False
+
+            if self.lease is not None and not self.lease.is_leader:
+                logger.debug(f"[SCHEDULER] Not the leader of '{self.name}', skipping run")
+                continue
+            self.trigger()
+
+        self.next_run_at = None
+        logger.info(f"[SCHEDULER] Job '{self.name}' stopped")
+
+    async def start(self):
+        if self.is_started:
+            logger.info(f"[SCHEDULER] Job '{self.name}' already running")
+            return
+        if self.leader_only:
+            self.lease = SchedulerLease(self.name)
+            # Another worker may take over as soon as the lock is gone: stop writing as leader
+            self.lease.add_loss_listener(lambda: self.cancel_runs("lost the leader lease"))
+            await self.lease.start()
+        self._stop_event = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._loop(), name=f"scheduler:{self.name}")
+
+    @property
+    def can_run_here(self) -> bool:
+        """False for a leader-only job on a worker that does not hold (or has not started) its lease"""
+        if not self.leader_only:
+            return True
+        return self.lease is not None and self.lease.is_leader
+
+    async def stop(self):
+        """
+        Stop scheduling, give the current run scheduler_shutdown_grace_seconds (at most its max
+        runtime) to finish, cancel it after that, and release the lease
+        """
+        if self._stop_event:
+            self._stop_event.set()
+        if self._loop_task:
+            await self._loop_task
+            self._loop_task = None
+            self._stop_event = None
+
+        if self._run_tasks:
+            grace = settings.scheduler_shutdown_grace_seconds
+            if self.max_runtime_seconds:
+                grace = min(grace, self.max_runtime_seconds)
+            _, pending = await asyncio.wait(set(self._run_tasks), timeout=grace)
+            for task in pending:
+                logger.warning(f"[SCHEDULER] ⚠️ Job '{self.name}' still running after {grace}s, cancelling")
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+        if self.lease is not None:
+            await self.lease.stop()
+            self.lease = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        def iso(value: Optional[datetime]) -> Optional[str]:
+            return value.isoformat() if value else None
+
+        return {
+            "name": self.name,
+            "started": self.is_started,
+            "running": self.is_running,
+            "leader_only": self.leader_only,
+            "is_leader": self.lease.is_leader if self.lease is not None else None,
+            "interval_seconds": self.interval_seconds,
+            "jitter_seconds": self.jitter_seconds,
+            "max_runtime_seconds": self.max_runtime_seconds,
+            "skip_if_running": self.skip_if_running,
+            "runs": self.runs,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "consecutive_failures": self.consecutive_failures,
+            "last_started_at": iso(self.last_started_at),
+            "last_finished_at": iso(self.last_finished_at),
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_outcome": self.last_outcome,
+            "last_error": self.last_error,
+            "next_run_at": iso(self.next_run_at)
+        }
+
+
+def register_job(name: str, func: JobFunc, interval_seconds: float, **options) -> ScheduledJob:
+    """
+    Register a periodic job (returns the existing job if the name is already registered).
+
+    Args:
+        name: Unique job name (also the leader lease name for leader_only jobs)
+        func: Coroutine function run on every tick; raising marks the run failed
+        interval_seconds: Delay between ticks
+        **options: jitter_seconds, max_runtime_seconds, skip_if_running, max_backoff_seconds,
+            run_on_start, leader_only (see ScheduledJob)
+    """
+    job = _jobs.get(name)
+    if job is None:
+        job = ScheduledJob(name, func, interval_seconds, **options)
+        _jobs[name] = job
+    return job
+
+
+def get_job(name: str) -> Optional[ScheduledJob]:
+    return _jobs.get(name)
+
+
+async def start_job(name: str):
+    job = _jobs.get(name)
+    if job is None:
+        raise KeyError(f"Job '{name}' is not registered")
+    await job.start()
+
+
+async def stop_job(name: str):
+    job = _jobs.get(name)
+    if job is not None:
+        await job.stop()
+
+
+async def stop_all_jobs():
+    """Stop every started job - call this on application shutdown"""
+    await asyncio.gather(
+        *(job.stop() for job in _jobs.values() if job.is_started or job.is_running),
+        return_exceptions=True
+    )
+
+
+async def run_job_now(name: str, wait: bool = False) -> Optional[ScheduledJob]:
+    """
+    Trigger a registered job outside its schedule (subject to its skip_if_running policy).
+
+    Returns:
+        The job, or None if no job with that name is registered
+
+    Raises:
+        JobNotLeaderError: the job is leader-only and this worker is not its leader
+    """
+    job = _jobs.get(name)
+    if job is None:
+        return None
+    if not job.can_run_here:
+        raise JobNotLeaderError(f"This worker is not the leader of job '{name}'")
+    task = job.trigger("manual")
+    if task is not None and wait:
+        await task
+    return job
+
+
+def ensure_leader(name: str):
+    """
+    Re-check leadership right before a leader-only job commits: the lease can be lost while
+    the run is in progress.
+
+    Raises:
+        JobNotLeaderError: the job is leader-only and this worker no longer holds its lease
+    """
+    job = _jobs.get(name)
+    if job is not None and not job.can_run_here:
+        raise JobNotLeaderError(f"This worker is no longer the leader of job '{name}'")
+
+
+def get_jobs_status() -> List[Dict[str, Any]]:
+    return [job.to_dict() for job in _jobs.values()]
@@ -3,8 +3,9 @@ Background tasks and scheduled jobs
 """
 
 import asyncio
+import time
 from datetime import datetime
-from app.config.database import get_main_db
+from typing import Dict
 from app.config.executor import get_task_executor, run_in_executor
 from app.utils.email import send_email
 import logging
@@ -61,769 +62,503 @@ async def send_notification_email(recipients: list, subject: str, body: str):
 
 
 async def process_upload_file(upload_id: int, file_path: str, upload_type: str):
-    """Process uploaded file in background"""
+    """Process uploaded file in background - loads it with the local ingestion engine"""
+    import json
+    from app.config import database as db_config
+    from app.models.main.upload_record import UploadRecord
+    from app.workers.ingestion import ingest_upload_file
+    
     try:
         logger.info(f"Starting background processing for upload {upload_id}")
         
-        # Get database session
-        async with get_main_db() as db:
-            from app.models.main.upload_record import UploadRecord
-            
-            # Update status to processing
+        # Watermark for marking the store+date pairs this upload writes
+        from app.workers.daily_sales_scheduler import get_database_now, mark_uploaded_data_dirty
+        upload_started_at = await get_database_now()
+        
+        if not db_config.sso_session_factory:
+            await db_config.create_engines()
+        
+        # Upload records live in the SSO database (see routes/uploader.py)
+        async with db_config.sso_session_factory() as db:
             await UploadRecord.update(db, upload_id, status="processing")
-            
-            # Process file based on type
-            if upload_type == "reconciliation":
-                await process_reconciliation_file(db, upload_id, file_path)
-            elif upload_type == "sheet_data":
-                await process_sheet_data_file(db, upload_id, file_path)
-            else:
-                await process_generic_file(db, upload_id, file_path)
-            
-            # Update status to completed
-            await UploadRecord.update(db, upload_id, status="completed")
-            logger.info(f"Background processing completed for upload {upload_id}")
+        
+        stats = await ingest_upload_file(file_path, upload_type)
+        
+        message = (
+            f"Loaded {stats['rows_loaded']} of {stats['rows_read']} rows into {stats['target']}"
+            + (f", {stats['rows_duplicate']} already present" if stats["rows_duplicate"] else "")
+            + (f", {stats['rows_rejected']} rejected" if stats["rows_rejected"] else "")
+        )
+        async with db_config.sso_session_factory() as db:
+            await UploadRecord.update(
+                db, upload_id,
+                status="completed",
+                message=message,
+                processed_data=json.dumps(stats)
+            )
+        logger.info(f"Background processing completed for upload {upload_id}: {message}")
+        
+        # Let the daily sales scheduler recompute only what this upload touched
+        if stats["rows_loaded"]:
+            await mark_uploaded_data_dirty(upload_started_at, source=f"upload:{upload_type}")
             
     except Exception as e:
-        logger.error(f"Error processing upload {upload_id}: {e}")
+        logger.error(f"Error processing upload {upload_id}: {e}", exc_info=True)
         # Update status to failed
         try:
-            async with get_main_db() as db:
-                from app.models.main.upload_record import UploadRecord
+            async with db_config.sso_session_factory() as db:
                 await UploadRecord.update(db, upload_id, status="failed", message=str(e))
-        except:
+        except Exception:
             pass
 
 
-async def process_reconciliation_file(db, upload_id: int, file_path: str):
-    """Process reconciliation file"""
-    # TODO: Implement reconciliation file processing logic
-    logger.info(f"Processing reconciliation file: {file_path}")
-    pass
+SHADOW_TABLE_SUFFIX = "__next"
+RETIRED_TABLE_SUFFIX = "__old"
 
 
-async def process_sheet_data_file(db, upload_id: int, file_path: str):
-    """Process sheet data file"""
-    # TODO: Implement sheet data file processing logic
-    logger.info(f"Processing sheet data file: {file_path}")
-    pass
+async def _build_shadow_sheet_table(table_name: str, connection_ids: Dict[str, int] = None) -> int:
+    """
+    Build one sheet data table into its <name>__next shadow table on a dedicated session.
+    While the build runs, its MySQL connection id is kept in connection_ids so it can be killed.
+    """
+    from app.config import database as db_config
+    from sqlalchemy.sql import text
+    
+    shadow_table = f"{table_name}{SHADOW_TABLE_SUFFIX}"
+    async with db_config.main_session_factory() as db:
+        if connection_ids is not None:
+            connection_ids[table_name] = (await db.execute(text("SELECT CONNECTION_ID()"))).scalar()
+        try:
+            await db.execute(text(f"DROP TABLE IF EXISTS {shadow_table}"))
+            await db.execute(text(f"CREATE TABLE {shadow_table} LIKE {table_name}"))
+            return await populate_sheet_data_table(db, table_name, target_table=shadow_table)
+        finally:
+            if connection_ids is not None:
+                connection_ids.pop(table_name, None)
 
 
-async def process_generic_file(db, upload_id: int, file_path: str):
-    """Process generic file"""
-    # TODO: Implement generic file processing logic
-    logger.info(f"Processing generic file: {file_path}")
-    pass
+async def _drop_shadow_sheet_tables(db, suffix: str):
+    from sqlalchemy.sql import text
+    
+    for table_name in SHEET_DATA_BUILDS:
+        try:
+            await db.execute(text(f"DROP TABLE IF EXISTS {table_name}{suffix}"))
+        except Exception as e:
+            logger.warning(f"Could not drop {table_name}{suffix}: {e}")
 
 
-async def process_sheet_data_generation(job_id: str, request_data):
-    """Process sheet data generation in background - populates all 5 sheet data tables"""
-    try:
-        logger.info(f"Starting sheet data generation for job {job_id}")
-        
-        # Use main_db (devyani) for all operations since all tables are in devyani database
-        from app.config.database import get_main_db
-        from app.config.database import main_session_factory, create_engines
-        
-        # Ensure engines are created
-        if not main_session_factory:
-            await create_engines()
-        
-        async with main_session_factory() as db:
-            from sqlalchemy.sql import text
-            
-            # Truncate all sheet data tables first
-            logger.info("Truncating existing data from sheet data tables...")
-            truncate_queries = [
-                "TRUNCATE TABLE zomato_pos_vs_3po_data",
-                "TRUNCATE TABLE zomato_3po_vs_pos_data",
-                "TRUNCATE TABLE zomato_3po_vs_pos_refund_data",
-                "TRUNCATE TABLE orders_not_in_pos_data",
-                "TRUNCATE TABLE orders_not_in_3po_data"
-            ]
-            
-            for query_str in truncate_queries:
-                try:
-                    await db.execute(text(query_str))
-                    await db.commit()
-                    logger.info(f"Truncated table: {query_str}")
-                except Exception as e:
-                    logger.warning(f"Could not truncate {query_str}: {e}")
-            
-            logger.info("Tables truncated successfully")
-            
-            # Process all 5 sheet data tables (all using main_db/devyani)
-            logger.info("Populating Zomato POS vs 3PO data...")
-            await process_zomato_pos_vs_3po_data(db, request_data)
-            
-            logger.info("Populating Zomato 3PO vs POS data...")
-            await process_zomato_3po_vs_pos_data(db, request_data)
-            
-            logger.info("Populating Zomato 3PO vs POS Refund data...")
-            await process_zomato_3po_vs_pos_refund_data(db, request_data)
-            
-            logger.info("Populating Orders not in POS data...")
-            await process_orders_not_in_pos_data(db, request_data)
-            
-            logger.info("Populating Orders not in 3PO data...")
-            await process_orders_not_in_3po_data(db, request_data)
-            
-            logger.info(f"Sheet data generation completed for job {job_id}")
-            
-    except Exception as e:
-        logger.error(f"Error in sheet data generation for job {job_id}: {e}", exc_info=True)
-        raise
+SHEET_DATA_JOB_TYPE = "sheet_data_generation"
 
+# Share of job progress taken by the table builds; the swap takes the rest
+SHEET_BUILD_PROGRESS_SHARE = 90
 
-async def process_zomato_pos_vs_3po_data(db, request_data):
-    """Process Zomato POS vs 3PO data - all tables in devyani (main_db)"""
-    from sqlalchemy.sql import text
-    from decimal import Decimal
-    from datetime import datetime
+# How often running builds check for a cancellation request
+SHEET_CANCEL_POLL_SECONDS = 5
+
+# The swap's RENAME waits at most this long for readers of the live tables (a slow NDJSON client
+# holds a metadata lock until its stream ends) - every query on those tables queues behind it meanwhile
+SHEET_SWAP_LOCK_WAIT_SECONDS = 5
+SHEET_SWAP_MAX_ATTEMPTS = 30
+SHEET_SWAP_RETRY_DELAY_SECONDS = 10
+
+# MySQL "Lock wait timeout exceeded"
+MYSQL_LOCK_WAIT_TIMEOUT = 1205
+
+
+class JobCancelledError(Exception):
+    """Raised at a checkpoint when cancellation was requested for the running job"""
+
+
+async def _raise_if_cancelled(job_id: str):
+    from app.services.job_service import JobService
     
-    logger.info("Processing Zomato POS vs 3PO data")
+    if await JobService.is_cancel_requested(job_id):
+        raise JobCancelledError(f"Job {job_id} was cancelled")
+
+
+async def _build_tracked_shadow_sheet_table(
+    job_id: str,
+    table_name: str,
+    progress: Dict[str, int],
+    connection_ids: Dict[str, int]
+) -> int:
+    """Build one shadow table and record the builder's state and row count on the job"""
+    from app.services.job_service import JobService, JobStatus
     
+    await _raise_if_cancelled(job_id)
+    await JobService.update_step(job_id, table_name, JobStatus.PROCESSING)
     try:
-        # Query zomato_vs_pos_summary where pos_order_id is not null (using main_db)
-        query = text("""
-            SELECT * FROM zomato_vs_pos_summary
-            WHERE pos_order_id IS NOT NULL
-        """)
-        
-        result = await db.execute(query)
-        records = result.fetchall()
-        
-        if not records:
-            logger.info("No records found for Zomato POS vs 3PO data")
-            return
-        
-        # Prepare bulk insert data
-        bulk_data = []
-        for record in records:
-            record_dict = dict(record._mapping) if hasattr(record, '_mapping') else dict(record)
-            # Ensure all POS amounts are positive (convert negative to positive)
-            pos_net_amount = abs(float(record_dict.get('pos_net_amount') or 0))
-            pos_tax_paid = abs(float(record_dict.get('pos_tax_paid_by_customer') or 0))
-            pos_commission = abs(float(record_dict.get('pos_commission_value') or 0))
-            pos_pg_applied = abs(float(record_dict.get('pos_pg_applied_on') or 0))
-            pos_pg_charge = abs(float(record_dict.get('pos_pg_charge') or 0))
-            pos_taxes = abs(float(record_dict.get('pos_taxes_zomato_fee') or 0))
-            pos_tds = abs(float(record_dict.get('pos_tds_amount') or 0))
-            pos_final = abs(float(record_dict.get('pos_final_amount') or 0))
-            
-            bulk_data.append({
-                "id": f"ZPV3_{record_dict.get('pos_order_id', '')}",
-                "pos_order_id": record_dict.get('pos_order_id'),
-                "zomato_order_id": record_dict.get('zomato_order_id'),
-                "order_date": record_dict.get('order_date'),
-                "store_name": record_dict.get('store_name'),
-                "pos_net_amount": Decimal(str(pos_net_amount)),
-                "zomato_net_amount": Decimal(str(record_dict.get('zomato_net_amount') or 0)),
-                "pos_vs_zomato_net_amount_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_net_amount_delta') or 0)))),
-                "pos_tax_paid_by_customer": Decimal(str(pos_tax_paid)),
-                "zomato_tax_paid_by_customer": Decimal(str(record_dict.get('zomato_tax_paid_by_customer') or 0)),
-                "pos_vs_zomato_tax_paid_by_customer_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_tax_paid_by_customer_delta') or 0)))),
-                "pos_commission_value": Decimal(str(pos_commission)),
-                "zomato_commission_value": Decimal(str(record_dict.get('zomato_commission_value') or 0)),
-                "pos_vs_zomato_commission_value_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_commission_value_delta') or 0)))),
-                "pos_pg_applied_on": Decimal(str(pos_pg_applied)),
-                "zomato_pg_applied_on": Decimal(str(record_dict.get('zomato_pg_applied_on') or 0)),
-                "pos_vs_zomato_pg_applied_on_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_pg_applied_on_delta') or 0)))),
-                "pos_pg_charge": Decimal(str(pos_pg_charge)),
-                "zomato_pg_charge": Decimal(str(record_dict.get('zomato_pg_charge') or 0)),
-                "pos_vs_zomato_pg_charge_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_pg_charge_delta') or 0)))),
-                "pos_taxes_zomato_fee": Decimal(str(pos_taxes)),
-                "zomato_taxes_zomato_fee": Decimal(str(record_dict.get('zomato_taxes_zomato_fee') or 0)),
-                "pos_vs_zomato_taxes_zomato_fee_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_taxes_zomato_fee_delta') or 0)))),
-                "pos_tds_amount": Decimal(str(pos_tds)),
-                "zomato_tds_amount": Decimal(str(record_dict.get('zomato_tds_amount') or 0)),
-                "pos_vs_zomato_tds_amount_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_tds_amount_delta') or 0)))),
-                "pos_final_amount": Decimal(str(pos_final)),
-                "zomato_final_amount": Decimal(str(record_dict.get('zomato_final_amount') or 0)),
-                "pos_vs_zomato_final_amount_delta": Decimal(str(abs(float(record_dict.get('pos_vs_zomato_final_amount_delta') or 0)))),
-                "reconciled_status": record_dict.get('reconciled_status'),
-                "reconciled_amount": Decimal(str(record_dict.get('reconciled_amount') or 0)),
-                "unreconciled_amount": Decimal(str(record_dict.get('unreconciled_amount') or 0)),
-                "pos_vs_zomato_reason": record_dict.get('pos_vs_zomato_reason'),
-                "order_status_pos": record_dict.get('order_status_pos'),
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            })
-        
-        # Bulk insert using ON DUPLICATE KEY UPDATE (using same db - devyani)
-        if bulk_data:
-            insert_query = text("""
-                INSERT INTO zomato_pos_vs_3po_data (
-                    id, pos_order_id, zomato_order_id, order_date, store_name,
-                    pos_net_amount, zomato_net_amount, pos_vs_zomato_net_amount_delta,
-                    pos_tax_paid_by_customer, zomato_tax_paid_by_customer, pos_vs_zomato_tax_paid_by_customer_delta,
-                    pos_commission_value, zomato_commission_value, pos_vs_zomato_commission_value_delta,
-                    pos_pg_applied_on, zomato_pg_applied_on, pos_vs_zomato_pg_applied_on_delta,
-                    pos_pg_charge, zomato_pg_charge, pos_vs_zomato_pg_charge_delta,
-                    pos_taxes_zomato_fee, zomato_taxes_zomato_fee, pos_vs_zomato_taxes_zomato_fee_delta,
-                    pos_tds_amount, zomato_tds_amount, pos_vs_zomato_tds_amount_delta,
-                    pos_final_amount, zomato_final_amount, pos_vs_zomato_final_amount_delta,
-                    reconciled_status, reconciled_amount, unreconciled_amount,
-                    pos_vs_zomato_reason, order_status_pos, created_at, updated_at
-                ) VALUES (
-                    :id, :pos_order_id, :zomato_order_id, :order_date, :store_name,
-                    :pos_net_amount, :zomato_net_amount, :pos_vs_zomato_net_amount_delta,
-                    :pos_tax_paid_by_customer, :zomato_tax_paid_by_customer, :pos_vs_zomato_tax_paid_by_customer_delta,
-                    :pos_commission_value, :zomato_commission_value, :pos_vs_zomato_commission_value_delta,
-                    :pos_pg_applied_on, :zomato_pg_applied_on, :pos_vs_zomato_pg_applied_on_delta,
-                    :pos_pg_charge, :zomato_pg_charge, :pos_vs_zomato_pg_charge_delta,
-                    :pos_taxes_zomato_fee, :zomato_taxes_zomato_fee, :pos_vs_zomato_taxes_zomato_fee_delta,
-                    :pos_tds_amount, :zomato_tds_amount, :pos_vs_zomato_tds_amount_delta,
-                    :pos_final_amount, :zomato_final_amount, :pos_vs_zomato_final_amount_delta,
-                    :reconciled_status, :reconciled_amount, :unreconciled_amount,
-                    :pos_vs_zomato_reason, :order_status_pos, :created_at, :updated_at
-                )
-                ON DUPLICATE KEY UPDATE
-                    updated_at = VALUES(updated_at)
-            """)
-            
-            BATCH_SIZE = 1000
-            for i in range(0, len(bulk_data), BATCH_SIZE):
-                batch = bulk_data[i:i + BATCH_SIZE]
-                for record in batch:
-                    await db.execute(insert_query, record)
-                await db.commit()
-                logger.info(f"Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} records")
-        
-        logger.info(f"Successfully processed {len(bulk_data)} Zomato POS vs 3PO records")
-        
+        row_count = await _build_shadow_sheet_table(table_name, connection_ids)
     except Exception as e:
-        logger.error(f"Error processing Zomato POS vs 3PO data: {e}", exc_info=True)
+        if await JobService.is_cancel_requested(job_id):
+            await JobService.update_step(job_id, table_name, JobStatus.CANCELLED)
+            raise JobCancelledError(f"Job {job_id} was cancelled") from e
+        await JobService.update_step(job_id, table_name, JobStatus.FAILED, error=str(e))
         raise
+    
+    progress["completed"] += 1
+    await JobService.update_step(
+        job_id, table_name, JobStatus.COMPLETED,
+        rows=row_count,
+        progress=SHEET_BUILD_PROGRESS_SHARE * progress["completed"] // len(SHEET_DATA_BUILDS)
+    )
+    return row_count
 
 
-async def process_zomato_3po_vs_pos_data(db, request_data):
-    """Process Zomato 3PO vs POS data"""
+async def _swap_in_shadow_sheet_tables(db, job_id: str, table_names):
+    """
+    Swap the shadow tables in with one RENAME TABLE, giving up on each attempt after
+    SHEET_SWAP_LOCK_WAIT_SECONDS so waiting for a long-running reader never stalls other readers
+    """
+    from sqlalchemy.exc import OperationalError
     from sqlalchemy.sql import text
-    from decimal import Decimal
-    from datetime import datetime
-    
-    logger.info("Processing Zomato 3PO vs POS data")
     
+    renames = ", ".join(
+        f"{table_name} TO {table_name}{RETIRED_TABLE_SUFFIX}, "
+        f"{table_name}{SHADOW_TABLE_SUFFIX} TO {table_name}"
+        for table_name in table_names
+    )
+    await db.execute(text(f"SET SESSION lock_wait_timeout = {SHEET_SWAP_LOCK_WAIT_SECONDS}"))
     try:
-        # Query zomato_vs_pos_summary where zomato_order_id is not null
-        query = text("""
-            SELECT * FROM zomato_vs_pos_summary
-            WHERE zomato_order_id IS NOT NULL
-        """)
-        
-        result = await db.execute(query)
-        records = result.fetchall()
-        
-        if not records:
-            logger.info("No records found for Zomato 3PO vs POS data")
-            return
-        
-        # Prepare bulk insert data
-        bulk_data = []
-        for record in records:
-            record_dict = dict(record._mapping) if hasattr(record, '_mapping') else dict(record)
-            
-            # Ensure all POS amounts are positive (convert negative to positive)
-            pos_net_amount = abs(float(record_dict.get('pos_net_amount') or 0))
-            pos_tax_paid = abs(float(record_dict.get('pos_tax_paid_by_customer') or 0))
-            pos_commission = abs(float(record_dict.get('pos_commission_value') or 0))
-            pos_pg_applied = abs(float(record_dict.get('pos_pg_applied_on') or 0))
-            pos_pg_charge = abs(float(record_dict.get('pos_pg_charge') or 0))
-            pos_taxes = abs(float(record_dict.get('pos_taxes_zomato_fee') or 0))
-            pos_tds = abs(float(record_dict.get('pos_tds_amount') or 0))
-            pos_final = abs(float(record_dict.get('pos_final_amount') or 0))
-            
-            bulk_data.append({
-                "id": f"Z3PVP_{record_dict.get('zomato_order_id', '')}",
-                "zomato_order_id": record_dict.get('zomato_order_id'),
-                "pos_order_id": record_dict.get('pos_order_id'),
-                "order_date": record_dict.get('order_date'),
-                "store_name": record_dict.get('store_name'),
-                "zomato_net_amount": Decimal(str(record_dict.get('zomato_net_amount') or 0)),
-                "pos_net_amount": Decimal(str(pos_net_amount)),
-                "zomato_vs_pos_net_amount_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_net_amount_delta') or 0)))),
-                "zomato_tax_paid_by_customer": Decimal(str(record_dict.get('zomato_tax_paid_by_customer') or 0)),
-                "pos_tax_paid_by_customer": Decimal(str(pos_tax_paid)),
-                "zomato_vs_pos_tax_paid_by_customer_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_tax_paid_by_customer_delta') or 0)))),
-                "zomato_commission_value": Decimal(str(record_dict.get('zomato_commission_value') or 0)),
-                "pos_commission_value": Decimal(str(pos_commission)),
-                "zomato_vs_pos_commission_value_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_commission_value_delta') or 0)))),
-                "zomato_pg_applied_on": Decimal(str(record_dict.get('zomato_pg_applied_on') or 0)),
-                "pos_pg_applied_on": Decimal(str(pos_pg_applied)),
-                "zomato_vs_pos_pg_applied_on_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_pg_applied_on_delta') or 0)))),
-                "zomato_pg_charge": Decimal(str(record_dict.get('zomato_pg_charge') or 0)),
-                "pos_pg_charge": Decimal(str(pos_pg_charge)),
-                "zomato_vs_pos_pg_charge_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_pg_charge_delta') or 0)))),
-                "zomato_taxes_zomato_fee": Decimal(str(record_dict.get('zomato_taxes_zomato_fee') or 0)),
-                "pos_taxes_zomato_fee": Decimal(str(pos_taxes)),
-                "zomato_vs_pos_taxes_zomato_fee_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_taxes_zomato_fee_delta') or 0)))),
-                "zomato_tds_amount": Decimal(str(record_dict.get('zomato_tds_amount') or 0)),
-                "pos_tds_amount": Decimal(str(pos_tds)),
-                "zomato_vs_pos_tds_amount_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_tds_amount_delta') or 0)))),
-                "zomato_final_amount": Decimal(str(record_dict.get('zomato_final_amount') or 0)),
-                "pos_final_amount": Decimal(str(pos_final)),
-                "zomato_vs_pos_final_amount_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_final_amount_delta') or 0)))),
-                "calculated_zomato_net_amount": Decimal(str(record_dict.get('calculated_zomato_net_amount') or 0)),
-                "calculated_zomato_tax_paid_by_customer": Decimal(str(record_dict.get('calculated_zomato_tax_paid_by_customer') or 0)),
-                "calculated_zomato_commission_value": Decimal(str(record_dict.get('calculated_zomato_commission_value') or 0)),
-                "calculated_zomato_pg_applied_on": Decimal(str(record_dict.get('calculated_zomato_pg_applied_on') or 0)),
-                "calculated_zomato_pg_charge": Decimal(str(record_dict.get('calculated_zomato_pg_charge') or 0)),
-                "calculated_zomato_taxes_zomato_fee": Decimal(str(record_dict.get('calculated_zomato_taxes_zomato_fee') or 0)),
-                "calculated_zomato_tds_amount": Decimal(str(record_dict.get('calculated_zomato_tds_amount') or 0)),
-                "calculated_zomato_final_amount": Decimal(str(record_dict.get('calculated_zomato_final_amount') or 0)),
-                "fixed_credit_note_amount": Decimal(str(record_dict.get('fixed_credit_note_amount') or 0)),
-                "fixed_pro_discount_passthrough": Decimal(str(record_dict.get('fixed_pro_discount_passthrough') or 0)),
-                "fixed_customer_discount": Decimal(str(record_dict.get('fixed_customer_discount') or 0)),
-                "fixed_rejection_penalty_charge": Decimal(str(record_dict.get('fixed_rejection_penalty_charge') or 0)),
-                "fixed_user_credits_charge": Decimal(str(record_dict.get('fixed_user_credits_charge') or 0)),
-                "fixed_promo_recovery_adj": Decimal(str(record_dict.get('fixed_promo_recovery_adj') or 0)),
-                "fixed_icecream_handling": Decimal(str(record_dict.get('fixed_icecream_handling') or 0)),
-                "fixed_icecream_deductions": Decimal(str(record_dict.get('fixed_icecream_deductions') or 0)),
-                "fixed_order_support_cost": Decimal(str(record_dict.get('fixed_order_support_cost') or 0)),
-                "fixed_merchant_delivery_charge": Decimal(str(record_dict.get('fixed_merchant_delivery_charge') or 0)),
-                "reconciled_status": record_dict.get('reconciled_status'),
-                "reconciled_amount": Decimal(str(record_dict.get('reconciled_amount') or 0)),
-                "unreconciled_amount": Decimal(str(record_dict.get('unreconciled_amount') or 0)),
-                "zomato_vs_pos_reason": record_dict.get('zomato_vs_pos_reason'),
-                "order_status_zomato": record_dict.get('order_status_zomato'),
-                "action": record_dict.get('action'),  # Copy action from zomato_vs_pos_summary
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            })
-        
-        # Bulk insert using ON DUPLICATE KEY UPDATE
-        if bulk_data:
-            insert_query = text("""
-                INSERT INTO zomato_3po_vs_pos_data (
-                    id, zomato_order_id, pos_order_id, order_date, store_name,
-                    zomato_net_amount, pos_net_amount, zomato_vs_pos_net_amount_delta,
-                    zomato_tax_paid_by_customer, pos_tax_paid_by_customer, zomato_vs_pos_tax_paid_by_customer_delta,
-                    zomato_commission_value, pos_commission_value, zomato_vs_pos_commission_value_delta,
-                    zomato_pg_applied_on, pos_pg_applied_on, zomato_vs_pos_pg_applied_on_delta,
-                    zomato_pg_charge, pos_pg_charge, zomato_vs_pos_pg_charge_delta,
-                    zomato_taxes_zomato_fee, pos_taxes_zomato_fee, zomato_vs_pos_taxes_zomato_fee_delta,
-                    zomato_tds_amount, pos_tds_amount, zomato_vs_pos_tds_amount_delta,
-                    zomato_final_amount, pos_final_amount, zomato_vs_pos_final_amount_delta,
-                    calculated_zomato_net_amount, calculated_zomato_tax_paid_by_customer,
-                    calculated_zomato_commission_value, calculated_zomato_pg_applied_on,
-                    calculated_zomato_pg_charge, calculated_zomato_taxes_zomato_fee,
-                    calculated_zomato_tds_amount, calculated_zomato_final_amount,
-                    fixed_credit_note_amount, fixed_pro_discount_passthrough,
-                    fixed_customer_discount, fixed_rejection_penalty_charge,
-                    fixed_user_credits_charge, fixed_promo_recovery_adj,
-                    fixed_icecream_handling, fixed_icecream_deductions,
-                    fixed_order_support_cost, fixed_merchant_delivery_charge,
-                    reconciled_status, reconciled_amount, unreconciled_amount,
-                    zomato_vs_pos_reason, order_status_zomato, action, created_at, updated_at
-                ) VALUES (
-                    :id, :zomato_order_id, :pos_order_id, :order_date, :store_name,
-                    :zomato_net_amount, :pos_net_amount, :zomato_vs_pos_net_amount_delta,
-                    :zomato_tax_paid_by_customer, :pos_tax_paid_by_customer, :zomato_vs_pos_tax_paid_by_customer_delta,
-                    :zomato_commission_value, :pos_commission_value, :zomato_vs_pos_commission_value_delta,
-                    :zomato_pg_applied_on, :pos_pg_applied_on, :zomato_vs_pos_pg_applied_on_delta,
-                    :zomato_pg_charge, :pos_pg_charge, :zomato_vs_pos_pg_charge_delta,
-                    :zomato_taxes_zomato_fee, :pos_taxes_zomato_fee, :zomato_vs_pos_taxes_zomato_fee_delta,
-                    :zomato_tds_amount, :pos_tds_amount, :zomato_vs_pos_tds_amount_delta,
-                    :zomato_final_amount, :pos_final_amount, :zomato_vs_pos_final_amount_delta,
-                    :calculated_zomato_net_amount, :calculated_zomato_tax_paid_by_customer,
-                    :calculated_zomato_commission_value, :calculated_zomato_pg_applied_on,
-                    :calculated_zomato_pg_charge, :calculated_zomato_taxes_zomato_fee,
-                    :calculated_zomato_tds_amount, :calculated_zomato_final_amount,
-                    :fixed_credit_note_amount, :fixed_pro_discount_passthrough,
-                    :fixed_customer_discount, :fixed_rejection_penalty_charge,
-                    :fixed_user_credits_charge, :fixed_promo_recovery_adj,
-                    :fixed_icecream_handling, :fixed_icecream_deductions,
-                    :fixed_order_support_cost, :fixed_merchant_delivery_charge,
-                    :reconciled_status, :reconciled_amount, :unreconciled_amount,
-                    :zomato_vs_pos_reason, :order_status_zomato, :action, :created_at, :updated_at
+        for attempt in range(1, SHEET_SWAP_MAX_ATTEMPTS + 1):
+            try:
+                await db.execute(text(f"RENAME TABLE {renames}"))
+                return
+            except OperationalError as e:
+                if getattr(e.orig, "args", [None])[0] != MYSQL_LOCK_WAIT_TIMEOUT or attempt == SHEET_SWAP_MAX_ATTEMPTS:
+                    raise
+                logger.info(
+                    f"Sheet data tables busy, swap attempt {attempt}/{SHEET_SWAP_MAX_ATTEMPTS} for job {job_id} "
+                    f"timed out; retrying in {SHEET_SWAP_RETRY_DELAY_SECONDS}s"
                 )
-                ON DUPLICATE KEY UPDATE
-                    updated_at = VALUES(updated_at)
-            """)
-            
-            BATCH_SIZE = 1000
-            for i in range(0, len(bulk_data), BATCH_SIZE):
-                batch = bulk_data[i:i + BATCH_SIZE]
-                for record in batch:
-                    await db.execute(insert_query, record)
-                await db.commit()
-                logger.info(f"Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} records")
-        
-        logger.info(f"Successfully processed {len(bulk_data)} Zomato 3PO vs POS records")
-        
-    except Exception as e:
-        logger.error(f"Error processing Zomato 3PO vs POS data: {e}", exc_info=True)
-        raise
+            await asyncio.sleep(SHEET_SWAP_RETRY_DELAY_SECONDS)
+            await _raise_if_cancelled(job_id)
+    finally:
+        await db.execute(text("SET SESSION lock_wait_timeout = DEFAULT"))
 
 
-async def process_zomato_3po_vs_pos_refund_data(db, request_data):
-    """Process Zomato 3PO vs POS refund data"""
+async def _kill_builds_on_cancel(job_id: str, db, connection_ids: Dict[str, int]):
+    """
+    Poll for a cancellation request while the builds run; on one, interrupt every running build
+    with KILL QUERY (the build then fails and reports itself cancelled). Cancel this task once
+    the builds are done.
+    """
     from sqlalchemy.sql import text
-    from decimal import Decimal
-    from datetime import datetime
+    from app.services.job_service import JobService
     
-    logger.info("Processing Zomato 3PO vs POS refund data")
+    while True:
+        await asyncio.sleep(SHEET_CANCEL_POLL_SECONDS)
+        if not await JobService.is_cancel_requested(job_id):
+            continue
+        for table_name, connection_id in list(connection_ids.items()):
+            try:
+                await db.execute(text(f"KILL QUERY {int(connection_id)}"))
+                logger.info(f"Interrupted build of {table_name} for cancelled job {job_id}")
+            except Exception as e:
+                # The build finished (and its connection moved on) in the meantime
+                logger.debug(f"Could not interrupt build of {table_name}: {e}")
+        return
+
+
+async def process_sheet_data_generation(job_id: str, request_data):
+    """
+    Process sheet data generation in background - populates all 5 sheet data tables.
+    Each table is built concurrently into a <name>__next shadow table, then all five are
+    swapped in with one RENAME TABLE so readers never see empty or partially built tables.
+    State, per-table progress and row counts are recorded on the job in the job registry.
+    A cancellation request interrupts the running builds (KILL QUERY, polled every
+    SHEET_CANCEL_POLL_SECONDS) and is checked again before the swap and between swap attempts.
+    The live tables are left untouched when a job is cancelled.
+    """
+    from app.services.job_service import JobService, JobStatus
     
     try:
-        # Query zomato_vs_pos_summary where zomato_order_id is not null and order_status_zomato is 'refund'
-        query = text("""
-            SELECT * FROM zomato_vs_pos_summary
-            WHERE zomato_order_id IS NOT NULL
-            AND order_status_zomato = 'refund'
-        """)
-        
-        result = await db.execute(query)
-        records = result.fetchall()
+        logger.info(f"Starting sheet data generation for job {job_id}")
         
-        if not records:
-            logger.info("No records found for Zomato 3PO vs POS refund data")
-            return
+        # Use main_db (devyani) for all operations since all tables are in devyani database
+        from app.config import database as db_config
+        from sqlalchemy.sql import text
         
-        # Prepare bulk insert data (same structure as zomato_3po_vs_pos_data)
-        bulk_data = []
-        for record in records:
-            record_dict = dict(record._mapping) if hasattr(record, '_mapping') else dict(record)
-            
-            # Ensure all POS amounts are positive (convert negative to positive)
-            pos_net_amount = abs(float(record_dict.get('pos_net_amount') or 0))
-            pos_tax_paid = abs(float(record_dict.get('pos_tax_paid_by_customer') or 0))
-            pos_commission = abs(float(record_dict.get('pos_commission_value') or 0))
-            pos_pg_applied = abs(float(record_dict.get('pos_pg_applied_on') or 0))
-            pos_pg_charge = abs(float(record_dict.get('pos_pg_charge') or 0))
-            pos_taxes = abs(float(record_dict.get('pos_taxes_zomato_fee') or 0))
-            pos_tds = abs(float(record_dict.get('pos_tds_amount') or 0))
-            pos_final = abs(float(record_dict.get('pos_final_amount') or 0))
+        # Ensure engines are created
+        if not db_config.main_session_factory:
+            await db_config.create_engines()
+        
+        async with db_config.main_session_factory() as db:
+            # Shadow table names are shared, so only one generation may run at a time (across workers)
+            lock_name = f"sheet_data_generation:{db_config.main_engine.url.database}"
+            acquired = (await db.execute(text("SELECT GET_LOCK(:lock_name, 0)"), {"lock_name": lock_name})).scalar()
+            if acquired != 1:
+                raise RuntimeError("Another sheet data generation is already running")
             
-            bulk_data.append({
-                "id": f"Z3PVPR_{record_dict.get('zomato_order_id', '')}",
-                "zomato_order_id": record_dict.get('zomato_order_id'),
-                "pos_order_id": record_dict.get('pos_order_id'),
-                "order_date": record_dict.get('order_date'),
-                "store_name": record_dict.get('store_name'),
-                "zomato_net_amount": Decimal(str(record_dict.get('zomato_net_amount') or 0)),
-                "pos_net_amount": Decimal(str(pos_net_amount)),
-                "zomato_vs_pos_net_amount_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_net_amount_delta') or 0)))),
-                "zomato_tax_paid_by_customer": Decimal(str(record_dict.get('zomato_tax_paid_by_customer') or 0)),
-                "pos_tax_paid_by_customer": Decimal(str(pos_tax_paid)),
-                "zomato_vs_pos_tax_paid_by_customer_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_tax_paid_by_customer_delta') or 0)))),
-                "zomato_commission_value": Decimal(str(record_dict.get('zomato_commission_value') or 0)),
-                "pos_commission_value": Decimal(str(pos_commission)),
-                "zomato_vs_pos_commission_value_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_commission_value_delta') or 0)))),
-                "zomato_pg_applied_on": Decimal(str(record_dict.get('zomato_pg_applied_on') or 0)),
-                "pos_pg_applied_on": Decimal(str(pos_pg_applied)),
-                "zomato_vs_pos_pg_applied_on_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_pg_applied_on_delta') or 0)))),
-                "zomato_pg_charge": Decimal(str(record_dict.get('zomato_pg_charge') or 0)),
-                "pos_pg_charge": Decimal(str(pos_pg_charge)),
-                "zomato_vs_pos_pg_charge_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_pg_charge_delta') or 0)))),
-                "zomato_taxes_zomato_fee": Decimal(str(record_dict.get('zomato_taxes_zomato_fee') or 0)),
-                "pos_taxes_zomato_fee": Decimal(str(pos_taxes)),
-                "zomato_vs_pos_taxes_zomato_fee_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_taxes_zomato_fee_delta') or 0)))),
-                "zomato_tds_amount": Decimal(str(record_dict.get('zomato_tds_amount') or 0)),
-                "pos_tds_amount": Decimal(str(pos_tds)),
-                "zomato_vs_pos_tds_amount_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_tds_amount_delta') or 0)))),
-                "zomato_final_amount": Decimal(str(record_dict.get('zomato_final_amount') or 0)),
-                "pos_final_amount": Decimal(str(pos_final)),
-                "zomato_vs_pos_final_amount_delta": Decimal(str(abs(float(record_dict.get('zomato_vs_pos_final_amount_delta') or 0)))),
-                "calculated_zomato_net_amount": Decimal(str(record_dict.get('calculated_zomato_net_amount') or 0)),
-                "calculated_zomato_tax_paid_by_customer": Decimal(str(record_dict.get('calculated_zomato_tax_paid_by_customer') or 0)),
-                "calculated_zomato_commission_value": Decimal(str(record_dict.get('calculated_zomato_commission_value') or 0)),
-                "calculated_zomato_pg_applied_on": Decimal(str(record_dict.get('calculated_zomato_pg_applied_on') or 0)),
-                "calculated_zomato_pg_charge": Decimal(str(record_dict.get('calculated_zomato_pg_charge') or 0)),
-                "calculated_zomato_taxes_zomato_fee": Decimal(str(record_dict.get('calculated_zomato_taxes_zomato_fee') or 0)),
-                "calculated_zomato_tds_amount": Decimal(str(record_dict.get('calculated_zomato_tds_amount') or 0)),
-                "calculated_zomato_final_amount": Decimal(str(record_dict.get('calculated_zomato_final_amount') or 0)),
-                "fixed_credit_note_amount": Decimal(str(record_dict.get('fixed_credit_note_amount') or 0)),
-                "fixed_pro_discount_passthrough": Decimal(str(record_dict.get('fixed_pro_discount_passthrough') or 0)),
-                "fixed_customer_discount": Decimal(str(record_dict.get('fixed_customer_discount') or 0)),
-                "fixed_rejection_penalty_charge": Decimal(str(record_dict.get('fixed_rejection_penalty_charge') or 0)),
-                "fixed_user_credits_charge": Decimal(str(record_dict.get('fixed_user_credits_charge') or 0)),
-                "fixed_promo_recovery_adj": Decimal(str(record_dict.get('fixed_promo_recovery_adj') or 0)),
-                "fixed_icecream_handling": Decimal(str(record_dict.get('fixed_icecream_handling') or 0)),
-                "fixed_icecream_deductions": Decimal(str(record_dict.get('fixed_icecream_deductions') or 0)),
-                "fixed_order_support_cost": Decimal(str(record_dict.get('fixed_order_support_cost') or 0)),
-                "fixed_merchant_delivery_charge": Decimal(str(record_dict.get('fixed_merchant_delivery_charge') or 0)),
-                "reconciled_status": record_dict.get('reconciled_status'),
-                "reconciled_amount": Decimal(str(record_dict.get('reconciled_amount') or 0)),
-                "unreconciled_amount": Decimal(str(record_dict.get('unreconciled_amount') or 0)),
-                "zomato_vs_pos_reason": record_dict.get('zomato_vs_pos_reason'),
-                "order_status_zomato": record_dict.get('order_status_zomato'),
-                "action": record_dict.get('action'),  # Copy action from zomato_vs_pos_summary
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            })
-        
-        # Bulk insert using ON DUPLICATE KEY UPDATE
-        if bulk_data:
-            insert_query = text("""
-                INSERT INTO zomato_3po_vs_pos_refund_data (
-                    id, zomato_order_id, pos_order_id, order_date, store_name,
-                    zomato_net_amount, pos_net_amount, zomato_vs_pos_net_amount_delta,
-                    zomato_tax_paid_by_customer, pos_tax_paid_by_customer, zomato_vs_pos_tax_paid_by_customer_delta,
-                    zomato_commission_value, pos_commission_value, zomato_vs_pos_commission_value_delta,
-                    zomato_pg_applied_on, pos_pg_applied_on, zomato_vs_pos_pg_applied_on_delta,
-                    zomato_pg_charge, pos_pg_charge, zomato_vs_pos_pg_charge_delta,
-                    zomato_taxes_zomato_fee, pos_taxes_zomato_fee, zomato_vs_pos_taxes_zomato_fee_delta,
-                    zomato_tds_amount, pos_tds_amount, zomato_vs_pos_tds_amount_delta,
-                    zomato_final_amount, pos_final_amount, zomato_vs_pos_final_amount_delta,
-                    calculated_zomato_net_amount, calculated_zomato_tax_paid_by_customer,
-                    calculated_zomato_commission_value, calculated_zomato_pg_applied_on,
-                    calculated_zomato_pg_charge, calculated_zomato_taxes_zomato_fee,
-                    calculated_zomato_tds_amount, calculated_zomato_final_amount,
-                    fixed_credit_note_amount, fixed_pro_discount_passthrough,
-                    fixed_customer_discount, fixed_rejection_penalty_charge,
-                    fixed_user_credits_charge, fixed_promo_recovery_adj,
-                    fixed_icecream_handling, fixed_icecream_deductions,
-                    fixed_order_support_cost, fixed_merchant_delivery_charge,
-                    reconciled_status, reconciled_amount, unreconciled_amount,
-                    zomato_vs_pos_reason, order_status_zomato, action, created_at, updated_at
-                ) VALUES (
-                    :id, :zomato_order_id, :pos_order_id, :order_date, :store_name,
-                    :zomato_net_amount, :pos_net_amount, :zomato_vs_pos_net_amount_delta,
-                    :zomato_tax_paid_by_customer, :pos_tax_paid_by_customer, :zomato_vs_pos_tax_paid_by_customer_delta,
-                    :zomato_commission_value, :pos_commission_value, :zomato_vs_pos_commission_value_delta,
-                    :zomato_pg_applied_on, :pos_pg_applied_on, :zomato_vs_pos_pg_applied_on_delta,
-                    :zomato_pg_charge, :pos_pg_charge, :zomato_vs_pos_pg_charge_delta,
-                    :zomato_taxes_zomato_fee, :pos_taxes_zomato_fee, :zomato_vs_pos_taxes_zomato_fee_delta,
-                    :zomato_tds_amount, :pos_tds_amount, :zomato_vs_pos_tds_amount_delta,
-                    :zomato_final_amount, :pos_final_amount, :zomato_vs_pos_final_amount_delta,
-                    :calculated_zomato_net_amount, :calculated_zomato_tax_paid_by_customer,
-                    :calculated_zomato_commission_value, :calculated_zomato_pg_applied_on,
-                    :calculated_zomato_pg_charge, :calculated_zomato_taxes_zomato_fee,
-                    :calculated_zomato_tds_amount, :calculated_zomato_final_amount,
-                    :fixed_credit_note_amount, :fixed_pro_discount_passthrough,
-                    :fixed_customer_discount, :fixed_rejection_penalty_charge,
-                    :fixed_user_credits_charge, :fixed_promo_recovery_adj,
-                    :fixed_icecream_handling, :fixed_icecream_deductions,
-                    :fixed_order_support_cost, :fixed_merchant_delivery_charge,
-                    :reconciled_status, :reconciled_amount, :unreconciled_amount,
-                    :zomato_vs_pos_reason, :order_status_zomato, :action, :created_at, :updated_at
+            try:
+                await JobService.update_status(job_id, JobStatus.PROCESSING, message="Building sheet data tables")
+                started = time.monotonic()
+                table_names = list(SHEET_DATA_BUILDS)
+                progress = {"completed": 0}
+                connection_ids: Dict[str, int] = {}
+                cancel_watcher = asyncio.create_task(_kill_builds_on_cancel(job_id, db, connection_ids))
+                try:
+                    results = await asyncio.gather(
+                        *(
+                            _build_tracked_shadow_sheet_table(job_id, table_name, progress, connection_ids)
+                            for table_name in table_names
+                        ),
+                        return_exceptions=True
+                    )
+                finally:
+                    cancel_watcher.cancel()
+                    await asyncio.gather(cancel_watcher, return_exceptions=True)
+                failures = {
+                    table_name: result
+                    for table_name, result in zip(table_names, results)
+                    if isinstance(result, Exception)
+                }
+                if failures:
+                    await _drop_shadow_sheet_tables(db, SHADOW_TABLE_SUFFIX)
+                    if any(isinstance(result, JobCancelledError) for result in failures.values()):
+                        raise JobCancelledError(f"Job {job_id} was cancelled")
+                    raise RuntimeError(f"Failed to build sheet data tables: {failures}")
+                
+                try:
+                    await _raise_if_cancelled(job_id)
+                except JobCancelledError:
+                    await _drop_shadow_sheet_tables(db, SHADOW_TABLE_SUFFIX)
+                    raise
+                
+                # Swap all five tables in one atomic statement
+                await JobService.update_status(
+                    job_id, JobStatus.PROCESSING,
+                    progress=SHEET_BUILD_PROGRESS_SHARE,
+                    message="Swapping in rebuilt tables"
                 )
-                ON DUPLICATE KEY UPDATE
-                    updated_at = VALUES(updated_at)
-            """)
-            
-            BATCH_SIZE = 1000
-            for i in range(0, len(bulk_data), BATCH_SIZE):
-                batch = bulk_data[i:i + BATCH_SIZE]
-                for record in batch:
-                    await db.execute(insert_query, record)
-                await db.commit()
-                logger.info(f"Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} records")
-        
-        logger.info(f"Successfully processed {len(bulk_data)} Zomato 3PO vs POS refund records")
-        
+                await _drop_shadow_sheet_tables(db, RETIRED_TABLE_SUFFIX)
+                try:
+                    await _swap_in_shadow_sheet_tables(db, job_id, table_names)
+                except Exception:
+                    await _drop_shadow_sheet_tables(db, SHADOW_TABLE_SUFFIX)
+                    raise
+                await _drop_shadow_sheet_tables(db, RETIRED_TABLE_SUFFIX)
+                
+                row_counts = dict(zip(table_names, results))
+                elapsed = time.monotonic() - started
+                await JobService.update_status(
+                    job_id, JobStatus.COMPLETED,
+                    progress=100,
+                    message=f"Sheet data generation completed in {elapsed:.1f}s",
+                    row_counts=row_counts
+                )
+                logger.info(f"Sheet data generation completed for job {job_id} in {elapsed:.1f}s: {row_counts}")
+                return row_counts
+            finally:
+                await db.execute(text("SELECT RELEASE_LOCK(:lock_name)"), {"lock_name": lock_name})
+    
+    except JobCancelledError:
+        logger.info(f"Sheet data generation cancelled for job {job_id}")
+        await JobService.update_status(
+            job_id, JobStatus.CANCELLED,
+            message="Sheet data generation cancelled; existing sheet data was left unchanged"
+        )
+        return None
     except Exception as e:
-        logger.error(f"Error processing Zomato 3PO vs POS refund data: {e}", exc_info=True)
+        logger.error(f"Error in sheet data generation for job {job_id}: {e}", exc_info=True)
+        await JobService.update_status(
+            job_id, JobStatus.FAILED,
+            message="Sheet data generation failed",
+            error=str(e)
+        )
         raise
 
 
-async def process_orders_not_in_pos_data(db, request_data):
-    """Process orders not in POS data"""
+# Amount columns kept for each side (pos_/zomato_) of zomato_vs_pos_summary
+SHEET_AMOUNT_METRICS = [
+    "net_amount", "tax_paid_by_customer", "commission_value", "pg_applied_on",
+    "pg_charge", "taxes_zomato_fee", "tds_amount", "final_amount",
+]
+
+SHEET_FIXED_COLUMNS = [
+    "fixed_credit_note_amount", "fixed_pro_discount_passthrough",
+    "fixed_customer_discount", "fixed_rejection_penalty_charge",
+    "fixed_user_credits_charge", "fixed_promo_recovery_adj",
+    "fixed_icecream_handling", "fixed_icecream_deductions",
+    "fixed_order_support_cost", "fixed_merchant_delivery_charge",
+]
+
+
+def _amount(column: str):
+    """Copy an amount column, NULL as 0"""
+    return (column, f"COALESCE({column}, 0)")
+
+
+def _positive_amount(column: str):
+    """Copy an amount column as a positive value (POS amounts are stored negative, deltas are shown as magnitudes)"""
+    return (column, f"ABS(COALESCE({column}, 0))")
+
+
+def _copy(column: str):
+    return (column, column)
+
+
+def _sheet_columns(id_expression: str, key_columns, amount_columns, trailing_columns):
+    return (
+        [("id", id_expression)]
+        + [_copy(column) for column in key_columns]
+        + amount_columns
+        + [_copy("reconciled_status"), _amount("reconciled_amount"), _amount("unreconciled_amount")]
+        + [_copy(column) for column in trailing_columns]
+        + [("created_at", "UTC_TIMESTAMP()"), ("updated_at", "UTC_TIMESTAMP()")]
+    )
+
+
+def _zomato_vs_pos_columns(id_prefix: str):
+    """Columns of the 3PO-vs-POS sheets (regular and refund): zomato side first, POS side made positive"""
+    amount_columns = []
+    for metric in SHEET_AMOUNT_METRICS:
+        amount_columns += [
+            _amount(f"zomato_{metric}"),
+            _positive_amount(f"pos_{metric}"),
+            _positive_amount(f"zomato_vs_pos_{metric}_delta"),
+        ]
+    amount_columns += [_amount(f"calculated_zomato_{metric}") for metric in SHEET_AMOUNT_METRICS]
+    amount_columns += [_amount(column) for column in SHEET_FIXED_COLUMNS]
+    return _sheet_columns(
+        f"CONCAT('{id_prefix}', zomato_order_id)",
+        ["zomato_order_id", "pos_order_id", "order_date", "store_name"],
+        amount_columns,
+        ["zomato_vs_pos_reason", "order_status_zomato", "action"],
+    )
+
+
+def _pos_vs_zomato_columns():
+    amount_columns = []
+    for metric in SHEET_AMOUNT_METRICS:
+        amount_columns += [
+            _positive_amount(f"pos_{metric}"),
+            _amount(f"zomato_{metric}"),
+            _positive_amount(f"pos_vs_zomato_{metric}_delta"),
+        ]
+    return _sheet_columns(
+        "CONCAT('ZPV3_', pos_order_id)",
+        ["pos_order_id", "zomato_order_id", "order_date", "store_name"],
+        amount_columns,
+        ["pos_vs_zomato_reason", "order_status_pos"],
+    )
+
+
+def _orders_not_in_pos_columns():
+    amount_columns = [_amount(f"zomato_{metric}") for metric in SHEET_AMOUNT_METRICS]
+    amount_columns += [_amount(f"calculated_zomato_{metric}") for metric in SHEET_AMOUNT_METRICS]
+    amount_columns += [_amount(column) for column in SHEET_FIXED_COLUMNS]
+    return _sheet_columns(
+        "CONCAT('ONIP_', zomato_order_id)",
+        ["zomato_order_id", "order_date", "store_name"],
+        amount_columns,
+        ["zomato_vs_pos_reason", "order_status_zomato"],
+    )
+
+
+def _orders_not_in_3po_columns():
+    return _sheet_columns(
+        "CONCAT('ONI3_', pos_order_id)",
+        ["pos_order_id", "order_date", "store_name"],
+        [_amount(f"pos_{metric}") for metric in SHEET_AMOUNT_METRICS],
+        ["pos_vs_zomato_reason", "order_status_pos"],
+    )
+
+
+# Sheet data tables built from zomato_vs_pos_summary: table -> (label, row filter, [(column, SQL expression)])
+SHEET_DATA_BUILDS = {
+    "zomato_pos_vs_3po_data": (
+        "Zomato POS vs 3PO",
+        "pos_order_id IS NOT NULL",
+        _pos_vs_zomato_columns(),
+    ),
+    "zomato_3po_vs_pos_data": (
+        "Zomato 3PO vs POS",
+        "zomato_order_id IS NOT NULL",
+        _zomato_vs_pos_columns("Z3PVP_"),
+    ),
+    "zomato_3po_vs_pos_refund_data": (
+        "Zomato 3PO vs POS refund",
+        "zomato_order_id IS NOT NULL AND order_status_zomato = 'refund'",
+        _zomato_vs_pos_columns("Z3PVPR_"),
+    ),
+    "orders_not_in_pos_data": (
+        "orders not in POS",
+        "pos_order_id IS NULL AND zomato_order_id IS NOT NULL",
+        _orders_not_in_pos_columns(),
+    ),
+    "orders_not_in_3po_data": (
+        "orders not in 3PO",
+        "zomato_order_id IS NULL AND pos_order_id IS NOT NULL",
+        _orders_not_in_3po_columns(),
+    ),
+}
+
+
+async def populate_sheet_data_table(db, table_name: str, target_table: str = None) -> int:
+    """
+    Fill one sheet data table from zomato_vs_pos_summary with a single INSERT ... SELECT.
+    
+    Args:
+        db: Main database session
+        table_name: Key of SHEET_DATA_BUILDS
+        target_table: Table to insert into (defaults to table_name)
+    
+    Returns:
+        Number of rows inserted
+    """
     from sqlalchemy.sql import text
-    from decimal import Decimal
-    from datetime import datetime
     
-    logger.info("Processing orders not in POS data")
+    label, row_filter, columns = SHEET_DATA_BUILDS[table_name]
+    logger.info(f"Processing {label} data")
     
     try:
-        # Query zomato_vs_pos_summary where pos_order_id is null and zomato_order_id is not null
-        query = text("""
-            SELECT * FROM zomato_vs_pos_summary
-            WHERE pos_order_id IS NULL
-            AND zomato_order_id IS NOT NULL
+        insert_query = text(f"""
+            INSERT INTO {target_table or table_name} (
+                {", ".join(column for column, _ in columns)}
+            )
+            SELECT
+                {", ".join(expression for _, expression in columns)}
+            FROM zomato_vs_pos_summary
+            WHERE {row_filter}
+            ON DUPLICATE KEY UPDATE
+                updated_at = VALUES(updated_at)
         """)
+        result = await db.execute(insert_query)
+        await db.commit()
         
-        result = await db.execute(query)
-        records = result.fetchall()
-        
-        if not records:
-            logger.info("No records found for orders not in POS data")
-            return
-        
-        # Prepare bulk insert data
-        bulk_data = []
-        for record in records:
-            record_dict = dict(record._mapping) if hasattr(record, '_mapping') else dict(record)
-            bulk_data.append({
-                "id": f"ONIP_{record_dict.get('zomato_order_id', '')}",
-                "zomato_order_id": record_dict.get('zomato_order_id'),
-                "order_date": record_dict.get('order_date'),
-                "store_name": record_dict.get('store_name'),
-                "zomato_net_amount": Decimal(str(record_dict.get('zomato_net_amount') or 0)),
-                "zomato_tax_paid_by_customer": Decimal(str(record_dict.get('zomato_tax_paid_by_customer') or 0)),
-                "zomato_commission_value": Decimal(str(record_dict.get('zomato_commission_value') or 0)),
-                "zomato_pg_applied_on": Decimal(str(record_dict.get('zomato_pg_applied_on') or 0)),
-                "zomato_pg_charge": Decimal(str(record_dict.get('zomato_pg_charge') or 0)),
-                "zomato_taxes_zomato_fee": Decimal(str(record_dict.get('zomato_taxes_zomato_fee') or 0)),
-                "zomato_tds_amount": Decimal(str(record_dict.get('zomato_tds_amount') or 0)),
-                "zomato_final_amount": Decimal(str(record_dict.get('zomato_final_amount') or 0)),
-                "calculated_zomato_net_amount": Decimal(str(record_dict.get('calculated_zomato_net_amount') or 0)),
-                "calculated_zomato_tax_paid_by_customer": Decimal(str(record_dict.get('calculated_zomato_tax_paid_by_customer') or 0)),
-                "calculated_zomato_commission_value": Decimal(str(record_dict.get('calculated_zomato_commission_value') or 0)),
-                "calculated_zomato_pg_applied_on": Decimal(str(record_dict.get('calculated_zomato_pg_applied_on') or 0)),
-                "calculated_zomato_pg_charge": Decimal(str(record_dict.get('calculated_zomato_pg_charge') or 0)),
-                "calculated_zomato_taxes_zomato_fee": Decimal(str(record_dict.get('calculated_zomato_taxes_zomato_fee') or 0)),
-                "calculated_zomato_tds_amount": Decimal(str(record_dict.get('calculated_zomato_tds_amount') or 0)),
-                "calculated_zomato_final_amount": Decimal(str(record_dict.get('calculated_zomato_final_amount') or 0)),
-                "fixed_credit_note_amount": Decimal(str(record_dict.get('fixed_credit_note_amount') or 0)),
-                "fixed_pro_discount_passthrough": Decimal(str(record_dict.get('fixed_pro_discount_passthrough') or 0)),
-                "fixed_customer_discount": Decimal(str(record_dict.get('fixed_customer_discount') or 0)),
-                "fixed_rejection_penalty_charge": Decimal(str(record_dict.get('fixed_rejection_penalty_charge') or 0)),
-                "fixed_user_credits_charge": Decimal(str(record_dict.get('fixed_user_credits_charge') or 0)),
-                "fixed_promo_recovery_adj": Decimal(str(record_dict.get('fixed_promo_recovery_adj') or 0)),
-                "fixed_icecream_handling": Decimal(str(record_dict.get('fixed_icecream_handling') or 0)),
-                "fixed_icecream_deductions": Decimal(str(record_dict.get('fixed_icecream_deductions') or 0)),
-                "fixed_order_support_cost": Decimal(str(record_dict.get('fixed_order_support_cost') or 0)),
-                "fixed_merchant_delivery_charge": Decimal(str(record_dict.get('fixed_merchant_delivery_charge') or 0)),
-                "reconciled_status": record_dict.get('reconciled_status'),
-                "reconciled_amount": Decimal(str(record_dict.get('reconciled_amount') or 0)),
-                "unreconciled_amount": Decimal(str(record_dict.get('unreconciled_amount') or 0)),
-                "zomato_vs_pos_reason": record_dict.get('zomato_vs_pos_reason'),
-                "order_status_zomato": record_dict.get('order_status_zomato'),
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            })
-        
-        # Bulk insert using ON DUPLICATE KEY UPDATE
-        if bulk_data:
-            insert_query = text("""
-                INSERT INTO orders_not_in_pos_data (
-                    id, zomato_order_id, order_date, store_name,
-                    zomato_net_amount, zomato_tax_paid_by_customer, zomato_commission_value,
-                    zomato_pg_applied_on, zomato_pg_charge, zomato_taxes_zomato_fee,
-                    zomato_tds_amount, zomato_final_amount,
-                    calculated_zomato_net_amount, calculated_zomato_tax_paid_by_customer,
-                    calculated_zomato_commission_value, calculated_zomato_pg_applied_on,
-                    calculated_zomato_pg_charge, calculated_zomato_taxes_zomato_fee,
-                    calculated_zomato_tds_amount, calculated_zomato_final_amount,
-                    fixed_credit_note_amount, fixed_pro_discount_passthrough,
-                    fixed_customer_discount, fixed_rejection_penalty_charge,
-                    fixed_user_credits_charge, fixed_promo_recovery_adj,
-                    fixed_icecream_handling, fixed_icecream_deductions,
-                    fixed_order_support_cost, fixed_merchant_delivery_charge,
-                    reconciled_status, reconciled_amount, unreconciled_amount,
-                    zomato_vs_pos_reason, order_status_zomato, created_at, updated_at
-                ) VALUES (
-                    :id, :zomato_order_id, :order_date, :store_name,
-                    :zomato_net_amount, :zomato_tax_paid_by_customer, :zomato_commission_value,
-                    :zomato_pg_applied_on, :zomato_pg_charge, :zomato_taxes_zomato_fee,
-                    :zomato_tds_amount, :zomato_final_amount,
-                    :calculated_zomato_net_amount, :calculated_zomato_tax_paid_by_customer,
-                    :calculated_zomato_commission_value, :calculated_zomato_pg_applied_on,
-                    :calculated_zomato_pg_charge, :calculated_zomato_taxes_zomato_fee,
-                    :calculated_zomato_tds_amount, :calculated_zomato_final_amount,
-                    :fixed_credit_note_amount, :fixed_pro_discount_passthrough,
-                    :fixed_customer_discount, :fixed_rejection_penalty_charge,
-                    :fixed_user_credits_charge, :fixed_promo_recovery_adj,
-                    :fixed_icecream_handling, :fixed_icecream_deductions,
-                    :fixed_order_support_cost, :fixed_merchant_delivery_charge,
-                    :reconciled_status, :reconciled_amount, :unreconciled_amount,
-                    :zomato_vs_pos_reason, :order_status_zomato, :created_at, :updated_at
-                )
-                ON DUPLICATE KEY UPDATE
-                    updated_at = VALUES(updated_at)
-            """)
-            
-            BATCH_SIZE = 1000
-            for i in range(0, len(bulk_data), BATCH_SIZE):
-                batch = bulk_data[i:i + BATCH_SIZE]
-                for record in batch:
-                    await db.execute(insert_query, record)
-                await db.commit()
-                logger.info(f"Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} records")
-        
-        logger.info(f"Successfully processed {len(bulk_data)} orders not in POS records")
+        logger.info(f"Successfully processed {result.rowcount} {label} records")
+        return result.rowcount
         
     except Exception as e:
-        logger.error(f"Error processing orders not in POS data: {e}", exc_info=True)
+        await db.rollback()
+        logger.error(f"Error processing {label} data: {e}", exc_info=True)
         raise
 
 
+async def process_zomato_pos_vs_3po_data(db, request_data):
+    """Process Zomato POS vs 3PO data - all tables in devyani (main_db)"""
+    return await populate_sheet_data_table(db, "zomato_pos_vs_3po_data")
+
+
+async def process_zomato_3po_vs_pos_data(db, request_data):
+    """Process Zomato 3PO vs POS data"""
+    return await populate_sheet_data_table(db, "zomato_3po_vs_pos_data")
+
+
+async def process_zomato_3po_vs_pos_refund_data(db, request_data):
+    """Process Zomato 3PO vs POS refund data"""
+    return await populate_sheet_data_table(db, "zomato_3po_vs_pos_refund_data")
+
+
+async def process_orders_not_in_pos_data(db, request_data):
+    """Process orders not in POS data"""
+    return await populate_sheet_data_table(db, "orders_not_in_pos_data")
+
+
 async def process_orders_not_in_3po_data(db, request_data):
     """Process orders not in 3PO data"""
-    from sqlalchemy.sql import text
-    from decimal import Decimal
-    from datetime import datetime
-    
-    logger.info("Processing orders not in 3PO data")
-    
-    try:
-        # Query zomato_vs_pos_summary where zomato_order_id is null and pos_order_id is not null
-        query = text("""
-            SELECT * FROM zomato_vs_pos_summary
-            WHERE zomato_order_id IS NULL
-            AND pos_order_id IS NOT NULL
-        """)
-        
-        result = await db.execute(query)
-        records = result.fetchall()
-        
-        if not records:
-            logger.info("No records found for orders not in 3PO data")
-            return
-        
-        # Prepare bulk insert data
-        bulk_data = []
-        for record in records:
-            record_dict = dict(record._mapping) if hasattr(record, '_mapping') else dict(record)
-            bulk_data.append({
-                "id": f"ONI3_{record_dict.get('pos_order_id', '')}",
-                "pos_order_id": record_dict.get('pos_order_id'),
-                "order_date": record_dict.get('order_date'),
-                "store_name": record_dict.get('store_name'),
-                "pos_net_amount": Decimal(str(record_dict.get('pos_net_amount') or 0)),
-                "pos_tax_paid_by_customer": Decimal(str(record_dict.get('pos_tax_paid_by_customer') or 0)),
-                "pos_commission_value": Decimal(str(record_dict.get('pos_commission_value') or 0)),
-                "pos_pg_applied_on": Decimal(str(record_dict.get('pos_pg_applied_on') or 0)),
-                "pos_pg_charge": Decimal(str(record_dict.get('pos_pg_charge') or 0)),
-                "pos_taxes_zomato_fee": Decimal(str(record_dict.get('pos_taxes_zomato_fee') or 0)),
-                "pos_tds_amount": Decimal(str(record_dict.get('pos_tds_amount') or 0)),
-                "pos_final_amount": Decimal(str(record_dict.get('pos_final_amount') or 0)),
-                "reconciled_status": record_dict.get('reconciled_status'),
-                "reconciled_amount": Decimal(str(record_dict.get('reconciled_amount') or 0)),
-                "unreconciled_amount": Decimal(str(record_dict.get('unreconciled_amount') or 0)),
-                "pos_vs_zomato_reason": record_dict.get('pos_vs_zomato_reason'),
-                "order_status_pos": record_dict.get('order_status_pos'),
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            })
-        
-        # Bulk insert using ON DUPLICATE KEY UPDATE
-        if bulk_data:
-            insert_query = text("""
-                INSERT INTO orders_not_in_3po_data (
-                    id, pos_order_id, order_date, store_name,
-                    pos_net_amount, pos_tax_paid_by_customer, pos_commission_value,
-                    pos_pg_applied_on, pos_pg_charge, pos_taxes_zomato_fee,
-                    pos_tds_amount, pos_final_amount,
-                    reconciled_status, reconciled_amount, unreconciled_amount,
-                    pos_vs_zomato_reason, order_status_pos, created_at, updated_at
-                ) VALUES (
-                    :id, :pos_order_id, :order_date, :store_name,
-                    :pos_net_amount, :pos_tax_paid_by_customer, :pos_commission_value,
-                    :pos_pg_applied_on, :pos_pg_charge, :pos_taxes_zomato_fee,
-                    :pos_tds_amount, :pos_final_amount,
-                    :reconciled_status, :reconciled_amount, :unreconciled_amount,
-                    :pos_vs_zomato_reason, :order_status_pos, :created_at, :updated_at
-                )
-                ON DUPLICATE KEY UPDATE
-                    updated_at = VALUES(updated_at)
-            """)
-            
-            BATCH_SIZE = 1000
-            for i in range(0, len(bulk_data), BATCH_SIZE):
-                batch = bulk_data[i:i + BATCH_SIZE]
-                for record in batch:
-                    await db.execute(insert_query, record)
-                await db.commit()
-                logger.info(f"Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} records")
-        
-        logger.info(f"Successfully processed {len(bulk_data)} orders not in 3PO records")
-        
-    except Exception as e:
-        logger.error(f"Error processing orders not in 3PO data: {e}", exc_info=True)
-        raise
+    return await populate_sheet_data_table(db, "orders_not_in_3po_data")
 
 
 # Scheduled tasks
@@ -843,6 +578,85 @@ async def run_scheduled_tasks():
         logger.error(f"Error running scheduled tasks: {e}")
 
 
+STALE_GENERATION_SWEEP_JOB = "excel_generation_stale_sweep"
+STALE_GENERATION_THRESHOLD_MINUTES = 30
+
+
+async def sweep_stale_excel_generations() -> int:
+    """Mark Excel generation jobs pending for longer than the threshold as failed"""
+    from app.services.excel_generation_service import ExcelGenerationService
+    return await ExcelGenerationService.mark_stale_pending_as_failed(STALE_GENERATION_THRESHOLD_MINUTES)
+
+
+async def start_stale_generation_sweep():
+    """
+    Run the stale pending sweep once a minute instead of on every /generation-status request.
+    Every worker runs it (it is an idempotent update), so it does not depend on the leader lease.
+    """
+    from app.workers import scheduler
+    scheduler.register_job(
+        STALE_GENERATION_SWEEP_JOB,
+        sweep_stale_excel_generations,
+        interval_seconds=60,
+        jitter_seconds=15,
+        max_runtime_seconds=60,
+        run_on_start=True
+    )
+    await scheduler.start_job(STALE_GENERATION_SWEEP_JOB)
+
+
+UPLOAD_SESSION_GC_JOB = "upload_session_gc"
+
+
+async def collect_stale_upload_sessions() -> int:
+    """Delete resumable upload sessions idle for longer than their TTL"""
+    from app.utils.upload_sessions import collect_stale_sessions
+    return await asyncio.to_thread(collect_stale_sessions)
+
+
+async def start_upload_session_gc():
+    """
+    Garbage-collect stale upload sessions every 15 minutes. Sessions live on this host's disk,
+    so every worker runs it rather than only the leader.
+    """
+    from app.workers import scheduler
+    scheduler.register_job(
+        UPLOAD_SESSION_GC_JOB,
+        collect_stale_upload_sessions,
+        interval_seconds=15 * 60,
+        jitter_seconds=60,
+        max_runtime_seconds=5 * 60,
+        run_on_start=True
+    )
+    await scheduler.start_job(UPLOAD_SESSION_GC_JOB)
+
+
+DASHBOARD_ROLLUP_INIT_JOB = "dashboard_rollup_init"
+
+
+async def build_missing_dashboard_rollups():
+    """Build the rollups of collections that do not have them yet (index builds included)"""
+    from app.services.dashboard_rollup_service import DashboardRollupService
+    return await asyncio.to_thread(DashboardRollupService.initialize_rollups)
+
+
+async def start_dashboard_rollup_init():
+    """
+    Build missing dashboard rollups on startup and every 6 hours (new report collections).
+    Leader-only: two workers building the same rollup would race on its state document.
+    """
+    from app.workers import scheduler
+    scheduler.register_job(
+        DASHBOARD_ROLLUP_INIT_JOB,
+        build_missing_dashboard_rollups,
+        interval_seconds=6 * 60 * 60,
+        jitter_seconds=5 * 60,
+        run_on_start=True,
+        leader_only=True
+    )
+    await scheduler.start_job(DASHBOARD_ROLLUP_INIT_JOB)
+
+
 async def process_receivable_receipt_excel_generation(generation_id, params: dict):
     """Process receivable receipt Excel generation in background - similar to Node.js worker (MongoDB-based)"""
     try:
@@ -1292,8 +1106,8 @@ async def process_report_excel_generation(generation_id, params: dict):
     try:
         from app.models.main.excel_generation import ExcelGeneration, ExcelGenerationStatus
         from app.services.mongodb_service import mongodb_service
+        from app.utils.report_excel_helper import write_report_batches_to_file
         from datetime import datetime
-        import pandas as pd
         import os
         
         # Convert generation_id to string if it's an integer (for backward compatibility)
@@ -1380,16 +1194,17 @@ async def process_report_excel_generation(generation_id, params: dict):
             # Query collection with date filter on order_date field
             collection_name = report_name.lower().strip()
             
-            # 🔥 Validate collection exists by trying to query (background worker handles this)
-            data = mongodb_service.query_collection_by_date_range(
+            # 🔥 Validate collection exists up front; batches are pulled lazily while writing Excel
+            batches = mongodb_service.stream_collection_by_date_range(
                 collection_name=collection_name,
                 columns=columns,
                 start_date=start_datetime,
                 end_date=end_datetime,
-                date_field="order_date"
+                date_field="order_date",
+                no_cursor_timeout=True
             )
             
-            logger.info(f"[Report Excel Generation {generation_id}] Retrieved {len(data)} record(s) from collection '{collection_name}'")
+            logger.info(f"[Report Excel Generation {generation_id}] Streaming records from collection '{collection_name}'")
             
         except ValueError as e:
             error_msg = str(e)
@@ -1422,44 +1237,24 @@ async def process_report_excel_generation(generation_id, params: dict):
             generation_id,
             ExcelGenerationStatus.PROCESSING,
             progress=50,
-            message=f"Processing {len(data)} record(s)..."
-        )
-        
-        # Create DataFrame from MongoDB data
-        if data:
-            # Create DataFrame with data
-            df = pd.DataFrame(data)
-            # Ensure columns are in the order specified in request
-            # Only include columns that exist in the data
-            available_columns = [col for col in columns if col in df.columns]
-            if available_columns:
-                df = df[available_columns]
-            else:
-                # If none of the requested columns exist, use all available columns
-                logger.warning(f"[Report Excel Generation {generation_id}] None of the requested columns found, using all available columns")
-        else:
-            # No data found, create empty DataFrame with specified columns
-            df = pd.DataFrame(columns=columns)
-            logger.info(f"[Report Excel Generation {generation_id}] No data found for the specified date range")
-        
-        # Update progress
-        await ExcelGeneration.update_status(
-            None,
-            generation_id,
-            ExcelGenerationStatus.PROCESSING,
-            progress=80,
-            message="Generating Excel file..."
+            message="Streaming records into Excel file..."
         )
         
         # Generate filename: report_name_start_date_to_end_date_generation_id.xlsx
         filename = f"{report_name}_{start_date_dt.strftime('%Y-%m-%d')}_to_{end_date_dt.strftime('%Y-%m-%d')}_{generation_id}.xlsx"
         filepath = os.path.join(reports_dir, filename)
         
-        # Create Excel file
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Report', index=False)
+        # Create Excel file off the event loop, writing one batch at a time
+        loop = asyncio.get_event_loop()
+        rows_written = await loop.run_in_executor(
+            get_task_executor(),
+            write_report_batches_to_file,
+            filepath,
+            columns,
+            batches
+        )
         
-        logger.info(f"[Report Excel Generation {generation_id}] Generated Excel file: {filename} with {len(df)} row(s) and columns: {list(df.columns)}")
+        logger.info(f"[Report Excel Generation {generation_id}] Generated Excel file: {filename} with {rows_written} row(s) and columns: {columns}")
         
         # Update final status
         await ExcelGeneration.update_status(
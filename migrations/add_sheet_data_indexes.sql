@@ -0,0 +1,30 @@
+-- ============================================================================
+-- Indexes backing the filtered, keyset-paginated /api/sheet-data/data endpoint
+-- These indexes narrow the rows a filtered page has to look at; they do not
+-- deliver id order. Under a store or date range the optimizer either walks the
+-- primary key from the cursor (id > :cursor ORDER BY id, checking the filters
+-- row by row) or reads the range from one of these indexes and sorts it by id;
+-- unfiltered pages always use the primary key.
+-- The generation job builds shadow tables with CREATE TABLE ... LIKE, so these
+-- indexes survive every rebuild and swap.
+-- ============================================================================
+
+ALTER TABLE zomato_pos_vs_3po_data
+    ADD INDEX idx_store_date (store_name, order_date),
+    ADD INDEX idx_order_date (order_date);
+
+ALTER TABLE zomato_3po_vs_pos_data
+    ADD INDEX idx_store_date (store_name, order_date),
+    ADD INDEX idx_order_date (order_date);
+
+ALTER TABLE zomato_3po_vs_pos_refund_data
+    ADD INDEX idx_store_date (store_name, order_date),
+    ADD INDEX idx_order_date (order_date);
+
+ALTER TABLE orders_not_in_pos_data
+    ADD INDEX idx_store_date (store_name, order_date),
+    ADD INDEX idx_order_date (order_date);
+
+ALTER TABLE orders_not_in_3po_data
+    ADD INDEX idx_store_date (store_name, order_date),
+    ADD INDEX idx_order_date (order_date);
@@ -0,0 +1,10 @@
+-- ============================================================================
+-- Content fingerprint on upload_logs
+-- SHA-256 of (file SHA-256, data source, upload type). An identical re-upload is
+-- resolved to the record holding the fingerprint instead of being processed again
+-- (unless force=true, which creates a record without a fingerprint).
+-- ============================================================================
+
+ALTER TABLE upload_logs
+    ADD COLUMN content_hash CHAR(64) NULL AFTER processed_data,
+    ADD UNIQUE INDEX uq_upload_logs_content_hash (content_hash);
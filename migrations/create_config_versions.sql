@@ -0,0 +1,17 @@
+-- ============================================================================
+-- Create config_versions table
+-- One monotonically increasing counter per configuration set. The recologics
+-- save/update handlers bump 'reco_logics' in the same transaction as the change;
+-- the formula watcher only re-reads reco_logics when the counter has advanced.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS config_versions (
+    name VARCHAR(100) NOT NULL,
+    version BIGINT UNSIGNED NOT NULL,
+    updated_at DATETIME NOT NULL,
+    
+    PRIMARY KEY (name)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO config_versions (name, version, updated_at) VALUES ('reco_logics', 1, NOW());
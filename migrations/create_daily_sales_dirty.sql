@@ -0,0 +1,59 @@
+-- ============================================================================
+-- Create daily_sales_dirty table
+-- (store_code, business_date) pairs whose daily_sales_summary row must be recomputed.
+-- Filled by the upload paths, drained by the daily sales scheduler.
+-- Safe to re-run.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS daily_sales_dirty (
+    store_code VARCHAR(50) NOT NULL,
+    business_date DATE NOT NULL,
+    
+    -- What marked the pair (upload:<type>, uploader:<datasource>, full_sweep, ...)
+    source VARCHAR(50) NULL,
+    
+    -- Re-marking a pair bumps marked_at, so a refresh only clears marks it has seen
+    -- (microseconds: a re-mark within the same second as the refresh snapshot must still be newer)
+    marked_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    
+    PRIMARY KEY (store_code, business_date),
+    INDEX idx_marked_at (marked_at)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Tables created before marked_at had microsecond precision
+ALTER TABLE daily_sales_dirty
+    MODIFY marked_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6);
+
+-- Upload paths mark the pairs of rows written since the upload started;
+-- without these indexes that lookup scans the whole source table.
+-- MySQL has no ADD INDEX IF NOT EXISTS, so each index is added only when missing.
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'orders' AND INDEX_NAME = 'idx_orders_updated_at') = 0,
+    'ALTER TABLE orders ADD INDEX idx_orders_updated_at (updated_at)',
+    'DO 0'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'orders' AND INDEX_NAME = 'idx_orders_date_store') = 0,
+    'ALTER TABLE orders ADD INDEX idx_orders_date_store (date, store_name)',
+    'DO 0'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'zomato' AND INDEX_NAME = 'idx_zomato_date_store') = 0,
+    'ALTER TABLE zomato ADD INDEX idx_zomato_date_store (order_date, store_code)',
+    'DO 0'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
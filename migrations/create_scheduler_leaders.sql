@@ -0,0 +1,24 @@
+-- ============================================================================
+-- Create scheduler_leaders table
+-- One row per in-process scheduler naming the uvicorn worker that holds its
+-- GET_LOCK() lease. Written by the leader, read by /health.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS scheduler_leaders (
+    name VARCHAR(100) NOT NULL,
+    
+    -- MySQL user lock held by the leader (scheduler:<database>:<name>)
+    lock_name VARCHAR(64) NOT NULL,
+    
+    -- <hostname>:<pid> of the leader worker
+    holder VARCHAR(255) NOT NULL,
+    
+    -- Connection holding the lock; the row is current while IS_USED_LOCK(lock_name) = connection_id
+    connection_id BIGINT UNSIGNED NOT NULL,
+    
+    acquired_at DATETIME NOT NULL,
+    renewed_at DATETIME NOT NULL,
+    
+    PRIMARY KEY (name)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Uploader API client retry policy against a local stub server
+Run this from the Backend directory: python test_uploader_client.py
+(or: python -m pytest test_uploader_client.py)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+# Add Backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config.settings import settings
+from app.utils import uploader_client
+
+
+class StubUploaderHandler(BaseHTTPRequestHandler):
+    """
+    POST /status/<code>/<n> answers <code> to the first n requests and 200 afterwards;
+    POST /slow answers after SLOW_SECONDS (longer than the client read timeout);
+    POST /hold answers after HOLD_SECONDS, recording the most requests in flight at once
+    """
+
+    SLOW_SECONDS = 2.0
+    HOLD_SECONDS = 0.1
+    hits = {}
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+            count = self.hits[self.path]
+
+        parts = self.path.strip("/").split("/")
+        if parts[0] == "hold":
+            with self.lock:
+                StubUploaderHandler.in_flight += 1
+                StubUploaderHandler.max_in_flight = max(StubUploaderHandler.max_in_flight, StubUploaderHandler.in_flight)
+            time.sleep(self.HOLD_SECONDS)
+            with self.lock:
+                StubUploaderHandler.in_flight -= 1
+            code = 200
+        elif parts[0] == "slow":
+            time.sleep(self.SLOW_SECONDS)
+            code = 200
+        elif parts[0] == "status":
+            code = int(parts[1]) if count <= int(parts[2]) else 200
+        else:
+            code = 404
+
+        try:
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        except OSError:
+            # The client gave up (read timeout) before the answer
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUploaderHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _post(url: str, file_path: str) -> httpx.Response:
+    return await uploader_client.post_file_to_uploader(url, {}, file_path, "test.csv", "text/csv")
+
+
+def _run(coroutine):
+    async def run_and_close():
+        try:
+            return await coroutine
+        finally:
+            await uploader_client.close_uploader_http_client()
+    return asyncio.run(run_and_close())
+
+
+def _configure():
+    settings.uploader_api_max_retries = 2
+    settings.uploader_api_timeout_seconds = 0.5
+    uploader_client.RETRY_BACKOFF_SECONDS = 0.01
+    uploader_client._upload_semaphore = None
+    StubUploaderHandler.hits.clear()
+    StubUploaderHandler.in_flight = StubUploaderHandler.max_in_flight = 0
+
+
+def _test_file() -> str:
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as out:
+        out.write("store_code,amount\nS001,10\n")
+    return path
+
+
+def test_uploader_client_retry_policy():
+    """Only failures the Uploader API cannot have processed are retried"""
+    _configure()
+    server, base_url = _start_stub_server()
+    file_path = _test_file()
+    try:
+        # 503 from the gateway: retried until the stub answers 200
+        response = _run(_post(f"{base_url}/status/503/2", file_path))
+        assert response.status_code == 200
+        assert StubUploaderHandler.hits["/status/503/2"] == 3
+        print("✅ 503 retried until success")
+
+        # 500 from the Uploader API itself: it may have ingested part of the file
+        response = _run(_post(f"{base_url}/status/500/1", file_path))
+        assert response.status_code == 500
+        assert StubUploaderHandler.hits["/status/500/1"] == 1
+        print("✅ 500 returned without retry")
+
+        # 400: client error, returned as is
+        response = _run(_post(f"{base_url}/status/400/1", file_path))
+        assert response.status_code == 400
+        assert StubUploaderHandler.hits["/status/400/1"] == 1
+        print("✅ 400 returned without retry")
+
+        # Read timeout: the request reached the server, so it is not sent again
+        try:
+            _run(_post(f"{base_url}/slow", file_path))
+            raise AssertionError("ReadTimeout expected")
+        except httpx.ReadTimeout:
+            pass
+        assert StubUploaderHandler.hits["/slow"] == 1
+        print("✅ ReadTimeout raised without retry")
+
+        # Connection refused: nothing was sent, every attempt is used
+        attempts = []
+        original_post = httpx.AsyncClient.post
+
+        async def counting_post(self, *args, **kwargs):
+            attempts.append(args[0] if args else kwargs.get("url"))
+            return await original_post(self, *args, **kwargs)
+
+        httpx.AsyncClient.post = counting_post
+        try:
+            _run(_post(f"http://127.0.0.1:{_free_port()}/upload", file_path))
+            raise AssertionError("ConnectError expected")
+        except httpx.ConnectError:
+            pass
+        finally:
+            httpx.AsyncClient.post = original_post
+        assert len(attempts) == settings.uploader_api_max_retries + 1
+        print("✅ ConnectError retried on every attempt")
+    finally:
+        server.shutdown()
+        os.remove(file_path)
+
+
+def test_uploader_client_concurrency_bound():
+    """No more than uploader_api_concurrency files are in flight at once"""
+    _configure()
+    settings.uploader_api_concurrency = 2
+    server, base_url = _start_stub_server()
+    file_path = _test_file()
+
+    async def post_many():
+        return await asyncio.gather(*(_post(f"{base_url}/hold", file_path) for _ in range(8)))
+
+    try:
+        responses = _run(post_many())
+        assert all(response.status_code == 200 for response in responses)
+        assert StubUploaderHandler.hits["/hold"] == 8
+        assert StubUploaderHandler.max_in_flight <= settings.uploader_api_concurrency, StubUploaderHandler.max_in_flight
+        # The bound is reached, so requests do run in parallel up to it
+        assert StubUploaderHandler.max_in_flight == settings.uploader_api_concurrency
+        print(f"✅ At most {StubUploaderHandler.max_in_flight} requests in flight")
+    finally:
+        server.shutdown()
+        os.remove(file_path)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Uploader API Client Retry Test")
+    print("=" * 60)
+    try:
+        test_uploader_client_retry_policy()
+        test_uploader_client_concurrency_bound()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print("=" * 60)
+    print("All tests passed!")
+    print("=" * 60)
+    sys.exit(0)